@@ -1,3 +1,11 @@
+from tools.api_contract.api import build_simulation_context
+from tools.api_contract.api import iter_simulation as iter_simulation_contract
 from tools.api_contract.api import run_simulation as run_simulation_contract
+from tools.api_contract.api_batch import run_simulation_batch as run_simulation_batch_contract
 
-__all__ = ["run_simulation_contract"]
+__all__ = [
+    "build_simulation_context",
+    "run_simulation_contract",
+    "run_simulation_batch_contract",
+    "iter_simulation_contract",
+]
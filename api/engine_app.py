@@ -19,7 +19,12 @@ if str(TOOLS_DIR) not in sys.path:
 
 from tools.station.station_config import NODES
 from tools.station.station_rc_sections import RC_SECTIONS
-from api.contract import run_simulation_contract
+from api.contract import (
+    build_simulation_context,
+    iter_simulation_contract,
+    run_simulation_batch_contract,
+    run_simulation_contract,
+)
 from api.sim.helpers import (
     ID_TO_NAME,
     LEGACY_TO_CANONICAL_OPTION_KEYS,
@@ -31,6 +36,8 @@ from api.sim.helpers import (
     _fix_mojibake,
     _parse_flag,
     _resolve_rc_id,
+    _resolve_signal_id,
+    _resolve_switch_id,
     _states_ids_to_names,
     _to_float,
 )
@@ -104,9 +111,14 @@ _ROUTE_CTX: Dict[str, Any] = {
     "LEGACY_TO_CANONICAL_OPTION_KEYS": LEGACY_TO_CANONICAL_OPTION_KEYS,
     "build_station_layout": build_station_layout,
     "run_simulation_contract": run_simulation_contract,
+    "run_simulation_batch_contract": run_simulation_batch_contract,
+    "iter_simulation_contract": iter_simulation_contract,
+    "build_simulation_context": build_simulation_context,
     "_fix_mojibake": _fix_mojibake,
     "_canonicalize_options": _canonicalize_options,
     "_resolve_rc_id": _resolve_rc_id,
+    "_resolve_switch_id": _resolve_switch_id,
+    "_resolve_signal_id": _resolve_signal_id,
     "_build_detectors_config": _build_detectors_config,
     "_to_float": _to_float,
     "_convert_rc_states": _convert_rc_states,
@@ -1,27 +1,134 @@
 from __future__ import annotations
 
-from typing import Any, Dict, List
+import gzip
+import json
+from typing import Any, Dict, Iterator, List
 
-from api.sim.schemas import ScenarioIn, TimelineStepOut
-from api.services.simulate_service import simulate_scenario
-from fastapi import FastAPI
+from api.sim.schemas import BatchOut, CompactScenarioIn, ScenarioBatchIn, ScenarioIn, SimulateTraceOut, TimelineStepOut
+from api.services.simulate_service import (
+    iter_simulate_scenario,
+    simulate_batch,
+    simulate_compact_scenario,
+    simulate_scenario,
+)
+from api.sim.timeline_codec import (
+    COMPACT_JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    accepts_gzip,
+    encode_compact_timeline,
+    pack_msgpack,
+    timeline_media_type,
+)
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import Response, StreamingResponse
+from pydantic import TypeAdapter
+
+
+_STREAM_MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "sse": "text/event-stream",
+}
+
+
+_TIMELINE_ADAPTER = TypeAdapter(List[TimelineStepOut])
+# Smaller bodies are not worth the gzip round trip.
+_GZIP_MIN_BYTES = 1024
+
+
+def _timeline_response(rows: List[TimelineStepOut], request: Request) -> Response:
+    # Accept picks the body: plain JSON (default, same as response_model),
+    # compact columnar JSON or its msgpack form (api.sim.timeline_codec);
+    # media ranges and q-values are honoured, q=0 excludes a type.
+    # JSON bodies are gzipped when Accept-Encoding allows gzip with q > 0.
+    media_type = timeline_media_type(request.headers.get("accept", ""))
+    if media_type is None:
+        raise HTTPException(status_code=406, detail="msgpack is not installed on the server")
+    if media_type == MSGPACK_MEDIA_TYPE:
+        packed = pack_msgpack(encode_compact_timeline(rows))
+        return Response(packed, media_type=MSGPACK_MEDIA_TYPE, headers={"Vary": "Accept"})
+    if media_type == COMPACT_JSON_MEDIA_TYPE:
+        doc = encode_compact_timeline(rows)
+        body = json.dumps(doc, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    else:
+        body = _TIMELINE_ADAPTER.dump_json(rows)
+    headers = {"Vary": "Accept, Accept-Encoding"}
+    if len(body) >= _GZIP_MIN_BYTES and accepts_gzip(request.headers.get("accept-encoding", "")):
+        body = gzip.compress(body, compresslevel=5)
+        headers["Content-Encoding"] = "gzip"
+    return Response(body, media_type=media_type, headers=headers)
+
+
+def _simulate_kwargs(ctx: Dict[str, Any]) -> Dict[str, Any]:
+    return dict(
+        default_options=ctx["DEFAULT_OPTIONS"],
+        canonicalize_options=ctx["_canonicalize_options"],
+        resolve_rc_id=ctx["_resolve_rc_id"],
+        build_detectors_config=ctx["_build_detectors_config"],
+        to_float=ctx["_to_float"],
+        convert_rc_states=ctx["_convert_rc_states"],
+        convert_switch_states=ctx["_convert_switch_states"],
+        convert_signal_states=ctx["_convert_signal_states"],
+        build_simulation_context=ctx["build_simulation_context"],
+        parse_flag=ctx["_parse_flag"],
+        states_ids_to_names=ctx["_states_ids_to_names"],
+        id_to_name=ctx["ID_TO_NAME"],
+    )
+
+
+def _encode_stream(rows: Iterator[TimelineStepOut], fmt: str) -> Iterator[str]:
+    # NDJSON: one TimelineStepOut per line; SSE: "frame" events, then "end".
+    # An error after the first frame can no longer change the HTTP status,
+    # so it is sent in-band as the last record.
+    try:
+        for row in rows:
+            data = row.model_dump_json()
+            yield f"event: frame\ndata: {data}\n\n" if fmt == "sse" else data + "\n"
+    except Exception as exc:
+        err = json.dumps({"error": f"{type(exc).__name__}: {exc}"}, ensure_ascii=False)
+        yield f"event: error\ndata: {err}\n\n" if fmt == "sse" else err + "\n"
+        return
+    if fmt == "sse":
+        yield "event: end\ndata: {}\n\n"
 
 
 def register_routes(app: FastAPI, ctx: Dict[str, Any]) -> None:
     @app.post("/simulate", response_model=List[TimelineStepOut])
-    def simulate_endpoint(scenario: ScenarioIn) -> List[TimelineStepOut]:
-        return simulate_scenario(
+    def simulate_endpoint(scenario: ScenarioIn, request: Request) -> Response:
+        return _timeline_response(simulate_scenario(scenario, **_simulate_kwargs(ctx)), request)
+
+    @app.post("/simulate/trace", response_model=SimulateTraceOut)
+    def simulate_trace_endpoint(scenario: ScenarioIn) -> SimulateTraceOut:
+        # Same timeline as /simulate plus the phase-trace ring buffer.
+        trace: List[Dict[str, Any]] = []
+        timeline = simulate_scenario(scenario, trace_sink=trace, **_simulate_kwargs(ctx))
+        return SimulateTraceOut(timeline=timeline, trace=trace)
+
+    @app.post("/simulate/compact", response_model=List[TimelineStepOut])
+    def simulate_compact_endpoint(scenario: CompactScenarioIn, request: Request) -> Response:
+        # Header object table + per-step (index, state) deltas; names resolved once.
+        kwargs = _simulate_kwargs(ctx)
+        for key in ("convert_rc_states", "convert_switch_states", "convert_signal_states"):
+            kwargs.pop(key)
+        rows = simulate_compact_scenario(
             scenario,
-            default_options=ctx["DEFAULT_OPTIONS"],
-            canonicalize_options=ctx["_canonicalize_options"],
-            resolve_rc_id=ctx["_resolve_rc_id"],
-            build_detectors_config=ctx["_build_detectors_config"],
-            to_float=ctx["_to_float"],
-            convert_rc_states=ctx["_convert_rc_states"],
-            convert_switch_states=ctx["_convert_switch_states"],
-            convert_signal_states=ctx["_convert_signal_states"],
-            run_simulation_contract=ctx["run_simulation_contract"],
-            parse_flag=ctx["_parse_flag"],
-            states_ids_to_names=ctx["_states_ids_to_names"],
-            id_to_name=ctx["ID_TO_NAME"],
+            resolve_switch_id=ctx["_resolve_switch_id"],
+            resolve_signal_id=ctx["_resolve_signal_id"],
+            **kwargs,
         )
+        return _timeline_response(rows, request)
+
+    @app.post("/simulate/batch", response_model=BatchOut)
+    def simulate_batch_endpoint(batch: ScenarioBatchIn) -> BatchOut:
+        # N scenarios over the warm process pool; results keep input order.
+        kwargs = _simulate_kwargs(ctx)
+        kwargs.pop("build_simulation_context")
+        return simulate_batch(batch, run_simulation_batch_contract=ctx["run_simulation_batch_contract"], **kwargs)
+
+    @app.post("/simulate/stream")
+    def simulate_stream_endpoint(scenario: ScenarioIn, format: str = "ndjson") -> StreamingResponse:
+        # Rows are sent while SimulationContext runs (generator iter_frames).
+        fmt = format.lower()
+        if fmt not in _STREAM_MEDIA_TYPES:
+            raise HTTPException(status_code=400, detail="format must be 'ndjson' or 'sse'")
+        rows = iter_simulate_scenario(scenario, **_simulate_kwargs(ctx))
+        return StreamingResponse(_encode_stream(rows, fmt), media_type=_STREAM_MEDIA_TYPES[fmt])
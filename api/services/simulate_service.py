@@ -1,36 +1,46 @@
 from __future__ import annotations
 
-from typing import Any, Callable, Dict, List
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
 
 from fastapi import HTTPException
 
-from api.sim.schemas import ScenarioIn, TimelineStepOut
-from tools.core.sim_core import ScenarioStep
+from api.sim.schemas import BatchItemOut, BatchOut, CompactScenarioIn, ScenarioBatchIn, ScenarioIn, TimelineStepOut
+# Engine modules by their engine path (tools/ is on sys.path, see engine_app): under
+# tools.* they would be second copies, with a second station snapshot.
+from core.delta_scenario import RC, SIGNAL, STATE_MAX, STATE_MIN, SWITCH, DeltaScenario
+from core.phase_trace import PhaseTraceConfig
+from core.sim_core import ScenarioStep
+from station.station_snapshot import DependencyClosure, build_dependency_closure, get_station_snapshot
 
 
-def simulate_scenario(
-    scenario: ScenarioIn,
+@dataclass
+class SimulationRequest:
+    """Validated /simulate input in engine types (ScenarioStep, DetectorsConfig)."""
+    steps: Sequence[ScenarioStep]
+    detectors_configs: Dict[str, Any]
+    t_pk: float
+    primary_ctrl_rc_id: str
+
+
+def _resolve_targets(
+    target_rc_ids: Optional[List[str]],
+    scenario_rc_keys: Iterable[str],
+    options: Dict[str, Any],
     *,
-    default_options: Dict[str, Any],
-    canonicalize_options: Callable[[Dict[str, Any]], Dict[str, Any]],
     resolve_rc_id: Callable[[str], str | None],
     build_detectors_config: Callable[[str, Dict[str, Any]], Any],
-    to_float: Callable[[Dict[str, Any], str, float], float],
-    convert_rc_states: Callable[[Dict[str, int]], Dict[str, int]],
-    convert_switch_states: Callable[[Dict[str, int]], Dict[str, int]],
-    convert_signal_states: Callable[[Dict[str, int]], Dict[str, int]],
-    run_simulation_contract: Callable[[Dict[str, Any]], Dict[str, Any]],
-    parse_flag: Callable[[str, str | None], Dict[str, Any]],
-    states_ids_to_names: Callable[[Dict[str, int], set[int]], Dict[str, int]],
-    id_to_name: Dict[str, str],
-) -> List[TimelineStepOut]:
-    options = dict(default_options)
-    options.update(scenario.options or {})
-    options = canonicalize_options(options)
-
+) -> Tuple[List[str], Dict[str, Any], Optional[DependencyClosure]]:
+    """Target RC ids, their detector configs and (explicit targets only) the dependency closure."""
     seen: set[str] = set()
-    for st in scenario.steps:
-        for raw_rc in (st.rc_states or {}).keys():
+    if target_rc_ids is not None:
+        for raw_rc in target_rc_ids:
+            rc_id = resolve_rc_id(str(raw_rc))
+            if not rc_id:
+                raise HTTPException(status_code=400, detail=f"Unknown target RC: {raw_rc}")
+            seen.add(rc_id)
+    else:
+        for raw_rc in scenario_rc_keys:
             rc_id = resolve_rc_id(str(raw_rc))
             if rc_id and rc_id not in seen:
                 seen.add(rc_id)
@@ -38,147 +48,571 @@ def simulate_scenario(
     if not target_ids:
         raise HTTPException(status_code=400, detail="No target RCs resolved from scenario")
 
-    primary_ctrl_rc_id = target_ids[0]
-    det_cfg = build_detectors_config(primary_ctrl_rc_id, options)
-    t_pk = to_float(options, "t_pk", 30.0)
+    det_cfgs = {rc_id: build_detectors_config(rc_id, options) for rc_id in target_ids}
+    closure = None
+    if target_rc_ids is not None:
+        # Explicit targets: states outside their dependency closure cannot affect
+        # the result, so they are dropped and per-step work scales with the targets.
+        referenced = [
+            v for cfg in det_cfgs.values() for k, v in cfg.__dict__.items()
+            if isinstance(v, str) and (k.startswith("sig_") or k.endswith("_rc_name"))
+        ]
+        closure = build_dependency_closure(get_station_snapshot().model, target_ids, referenced)
+    return target_ids, det_cfgs, closure
+
+
+def _merged_options(
+    options: Dict[str, Any],
+    default_options: Dict[str, Any],
+    canonicalize_options: Callable[[Dict[str, Any]], Dict[str, Any]],
+) -> Dict[str, Any]:
+    merged = dict(default_options)
+    merged.update(options or {})
+    return canonicalize_options(merged)
+
+
+def _check_trace(trace: Optional[Dict[str, Any]]) -> None:
+    """Phase-trace filters are validated up front: unknown keys are HTTP 400, not 500."""
+    if trace is None:
+        return
+    try:
+        PhaseTraceConfig.from_dict(trace)
+    except ValueError as exc:
+        raise HTTPException(status_code=400, detail=str(exc)) from exc
+
 
+def build_simulation_request(
+    scenario: ScenarioIn,
+    *,
+    default_options: Dict[str, Any],
+    canonicalize_options: Callable[[Dict[str, Any]], Dict[str, Any]],
+    resolve_rc_id: Callable[[str], str | None],
+    build_detectors_config: Callable[[str, Dict[str, Any]], Any],
+    to_float: Callable[[Dict[str, Any], str, float], float],
+    convert_rc_states: Callable[[Dict[str, int]], Dict[str, int]],
+    convert_switch_states: Callable[[Dict[str, int]], Dict[str, int]],
+    convert_signal_states: Callable[[Dict[str, int]], Dict[str, int]],
+) -> SimulationRequest:
+    """ScenarioIn -> SimulationRequest (HTTP 400 on invalid input)."""
+    _check_trace(scenario.trace)
+    options = _merged_options(scenario.options, default_options, canonicalize_options)
+    target_ids, det_cfgs, closure = _resolve_targets(
+        scenario.target_rc_ids,
+        (raw_rc for st in scenario.steps for raw_rc in (st.rc_states or {})),
+        options,
+        resolve_rc_id=resolve_rc_id,
+        build_detectors_config=build_detectors_config,
+    )
+
+    # convert_* return fresh dicts: the steps own them, no further copies.
     steps_internal: List[ScenarioStep] = []
     for s in scenario.steps:
-        auto_actions = {str(k).lower(): int(v) for k, v in (s.auto_actions or {}).items()}
         total_t = float(s.t)
         if total_t <= 0:
             raise HTTPException(status_code=400, detail="Each scenario step must have t > 0")
         rc_states = convert_rc_states(s.rc_states)
         sw_states = convert_switch_states(s.switch_states)
         sig_states = convert_signal_states(s.signal_states)
-        indicator_states = {str(k): int(v) for k, v in (s.indicator_states or {}).items()}
+        if closure is not None:
+            rc_states, sw_states, sig_states = closure.prune(rc_states, sw_states, sig_states)
         steps_internal.append(
             ScenarioStep(
-                t=float(total_t),
-                rc_states=dict(rc_states),
-                switch_states=dict(sw_states),
-                signal_states=dict(sig_states),
+                t=total_t,
+                rc_states=rc_states,
+                switch_states=sw_states,
+                signal_states=sig_states,
                 modes=dict(s.modes or {}),
                 mu=dict(s.mu or {}),
                 dispatcher_control_state=s.dispatcher_control_state,
-                auto_actions=dict(auto_actions),
-                indicator_states=dict(indicator_states),
+                auto_actions={str(k).lower(): int(v) for k, v in (s.auto_actions or {}).items()},
+                indicator_states={str(k): int(v) for k, v in (s.indicator_states or {}).items()},
             )
         )
 
-    if len(target_ids) == 1:
-        contract_payload: Dict[str, Any] = {
-            "t_pk": t_pk,
-            "ctrl_rc_id": primary_ctrl_rc_id,
-            "detectors_config": det_cfg.__dict__,
-            "scenario": [
-                {
-                    "t": float(s.t),
-                    "rc_states": dict(s.rc_states),
-                    "switch_states": dict(s.switch_states),
-                    "signal_states": dict(s.signal_states),
-                    "modes": dict(s.modes or {}),
-                }
-                for s in steps_internal
-            ],
+    return SimulationRequest(
+        steps=steps_internal,
+        detectors_configs=det_cfgs,
+        t_pk=to_float(options, "t_pk", 30.0),
+        primary_ctrl_rc_id=target_ids[0],
+    )
+
+
+def build_compact_simulation_request(
+    scenario: CompactScenarioIn,
+    *,
+    default_options: Dict[str, Any],
+    canonicalize_options: Callable[[Dict[str, Any]], Dict[str, Any]],
+    resolve_rc_id: Callable[[str], str | None],
+    resolve_switch_id: Callable[[str], str | None],
+    resolve_signal_id: Callable[[str], str | None],
+    build_detectors_config: Callable[[str, Dict[str, Any]], Any],
+    to_float: Callable[[Dict[str, Any], str, float], float],
+) -> SimulationRequest:
+    """
+    CompactScenarioIn -> SimulationRequest over a DeltaScenario. Names are
+    resolved once per header entry; steps carry only (index, state) deltas
+    and are expanded lazily by the engine.
+    """
+    _check_trace(scenario.trace)
+    options = _merged_options(scenario.options, default_options, canonicalize_options)
+    objects: List[Tuple[str, str]] = []
+    for kind, names, resolve in (
+        (RC, scenario.rc, resolve_rc_id),
+        (SWITCH, scenario.switches, resolve_switch_id),
+        (SIGNAL, scenario.signals, resolve_signal_id),
+    ):
+        for name in names:
+            obj_id = resolve(str(name))
+            if obj_id is None:
+                raise HTTPException(status_code=400, detail=f"Unknown {kind} in header: {name}")
+            objects.append((kind, obj_id))
+    if len(scenario.initial) != len(objects):
+        raise HTTPException(status_code=400, detail="initial must have one state per header object")
+    for value in scenario.initial:
+        if value is not None and not STATE_MIN <= value <= STATE_MAX:
+            raise HTTPException(status_code=400, detail=f"State out of range: {value}")
+    if len(dict.fromkeys(objects)) != len(objects):
+        raise HTTPException(status_code=400, detail="Header objects must be unique after name resolution")
+
+    target_ids, det_cfgs, closure = _resolve_targets(
+        scenario.target_rc_ids,
+        (obj_id for kind, obj_id in objects if kind == RC),
+        options,
+        resolve_rc_id=resolve_rc_id,
+        build_detectors_config=build_detectors_config,
+    )
+    # Objects outside the closure stay in the table (indexes are stable) but never get a state.
+    keep = [
+        closure is None or obj_id in {RC: closure.rc_ids, SWITCH: closure.switch_ids, SIGNAL: closure.signal_ids}[kind]
+        for kind, obj_id in objects
+    ]
+    steps = DeltaScenario(objects, [v if k else None for v, k in zip(scenario.initial, keep)])
+    n = len(objects)
+    for s in scenario.steps:
+        if float(s.t) <= 0:
+            raise HTTPException(status_code=400, detail="Each scenario step must have t > 0")
+        if len(s.d) % 2:
+            raise HTTPException(status_code=400, detail="Step delta must be (index, state) pairs")
+        changes = list(zip(s.d[::2], s.d[1::2]))
+        for idx, value in changes:
+            if not 0 <= idx < n:
+                raise HTTPException(status_code=400, detail=f"Object index out of range: {idx}")
+            if not STATE_MIN <= value <= STATE_MAX:
+                raise HTTPException(status_code=400, detail=f"State out of range: {value}")
+        steps.append(
+            float(s.t),
+            [(idx, value) for idx, value in changes if keep[idx]],
+            modes=s.modes,
+            mu=s.mu,
+            dispatcher_control_state=s.dispatcher_control_state,
+            auto_actions={str(k).lower(): int(v) for k, v in (s.auto_actions or {}).items()},
+            indicator_states={str(k): int(v) for k, v in (s.indicator_states or {}).items()},
+        )
+
+    return SimulationRequest(
+        steps=steps,
+        detectors_configs=det_cfgs,
+        t_pk=to_float(options, "t_pk", 30.0),
+        primary_ctrl_rc_id=target_ids[0],
+    )
+
+
+def contract_payload_from_request(req: SimulationRequest) -> Dict[str, Any]:
+    """SimulationRequest -> JSON contract payload (batch workers, external clients)."""
+    scenario = [
+        {
+            "t": float(s.t),
+            "rc_states": dict(s.rc_states),
+            "switch_states": dict(s.switch_states),
+            "signal_states": dict(s.signal_states),
+            "modes": dict(s.modes or {}),
+            "mu": dict(s.mu or {}),
+            "dispatcher_control_state": s.dispatcher_control_state,
+            "auto_actions": dict(s.auto_actions or {}),
+            "indicator_states": dict(s.indicator_states or {}),
         }
-    else:
-        contract_payload = {
-            "t_pk": t_pk,
-            "ctrl_rc_ids": target_ids,
-            "detectors_configs": {rc_id: build_detectors_config(rc_id, options).__dict__ for rc_id in target_ids},
-            "scenario": [
-                {
-                    "t": float(s.t),
-                    "rc_states": dict(s.rc_states),
-                    "switch_states": dict(s.switch_states),
-                    "signal_states": dict(s.signal_states),
-                    "modes": dict(s.modes or {}),
-                }
-                for s in steps_internal
-            ],
+        for s in req.steps
+    ]
+    if len(req.detectors_configs) == 1:
+        return {
+            "t_pk": req.t_pk,
+            "ctrl_rc_id": req.primary_ctrl_rc_id,
+            "detectors_config": req.detectors_configs[req.primary_ctrl_rc_id].__dict__,
+            "scenario": scenario,
         }
+    return {
+        "t_pk": req.t_pk,
+        "ctrl_rc_ids": list(req.detectors_configs),
+        "detectors_configs": {rc_id: cfg.__dict__ for rc_id, cfg in req.detectors_configs.items()},
+        "scenario": scenario,
+    }
+
+
+def build_simulation_payload(scenario: ScenarioIn, **kwargs: Any) -> Tuple[Dict[str, Any], str]:
+    """ScenarioIn -> (contract payload, primary ctrl RC id)."""
+    req = build_simulation_request(scenario, **kwargs)
+    return contract_payload_from_request(req), req.primary_ctrl_rc_id
+
+
+def _dict_field(row: Dict[str, Any], key: str, default: Any = None) -> Any:
+    return row.get(key, default)
+
+
+def _attr_field(row: Any, key: str, default: Any = None) -> Any:
+    return getattr(row, key, default)
+
+
+def merge_contract_frame(
+    frame: Dict[str, Any],
+    primary_ctrl_rc_id: str,
+    *,
+    parse_flag: Callable[[str, str | None], Dict[str, Any]],
+    states_ids_to_names: Callable[[Dict[str, int], set[int]], Dict[str, int]],
+    id_to_name: Dict[str, str],
+) -> Optional[TimelineStepOut]:
+    """One contract frame (ctrl_rc_id -> step dict) -> merged API row (None for empty frames)."""
+    if not isinstance(frame, dict) or not frame:
+        return None
+    return _merge_rows(
+        list(frame.values()), primary_ctrl_rc_id, _dict_field,
+        parse_flag=parse_flag, states_ids_to_names=states_ids_to_names, id_to_name=id_to_name,
+    )
+
+
+def merge_timeline_frame(
+    frame: Dict[str, Any],
+    primary_ctrl_rc_id: str,
+    *,
+    parse_flag: Callable[[str, str | None], Dict[str, Any]],
+    states_ids_to_names: Callable[[Dict[str, int], set[int]], Dict[str, int]],
+    id_to_name: Dict[str, str],
+) -> Optional[TimelineStepOut]:
+    """One engine frame (ctrl_rc_id -> TimelineStep) -> merged API row, no DTO/dict round-trip."""
+    if not frame:
+        return None
+    return _merge_rows(
+        list(frame.values()), primary_ctrl_rc_id, _attr_field,
+        parse_flag=parse_flag, states_ids_to_names=states_ids_to_names, id_to_name=id_to_name,
+    )
+
+
+def _merge_rows(
+    rows: List[Any],
+    primary_ctrl_rc_id: str,
+    field: Callable[..., Any],
+    *,
+    parse_flag: Callable[[str, str | None], Dict[str, Any]],
+    states_ids_to_names: Callable[[Dict[str, int], set[int]], Dict[str, int]],
+    id_to_name: Dict[str, str],
+) -> Optional[TimelineStepOut]:
+    if not rows:
+        return None
+    row0 = rows[0]
+    merged_rc: Dict[str, int] = {}
+    merged_sw: Dict[str, int] = {}
+    merged_sig: Dict[str, int] = {}
+    merged_modes: Dict[str, Any] = {}
+    topology_by_rc: Dict[str, Dict[str, str]] = {}
+    lz_state_any = False
+    variant_max = 0
+    best_row = row0
+    best_score = (-1, -1)
+    flags_parsed: List[Dict[str, Any]] = []
+    seen_flags: set = set()
+
+    # Engine rows of one frame share the station state dicts: merge each dict once.
+    merged_src: set[int] = set()
+    for r in rows:
+        for merged, key in (
+            (merged_rc, "rc_states"),
+            (merged_sw, "switch_states"),
+            (merged_sig, "signal_states"),
+            (merged_modes, "modes"),
+        ):
+            src = field(r, key)
+            if src and id(src) not in merged_src:
+                merged_src.add(id(src))
+                merged.update(src)
 
-    contract_result = run_simulation_contract(contract_payload)
-    frames = contract_result.get("frames", []) or []
+        r_ctrl = str(field(r, "ctrl_rc_id") or "")
+        if r_ctrl:
+            r_prev_raw = field(r, "effective_prev_rc")
+            r_next_raw = field(r, "effective_next_rc")
+            r_prev_name = id_to_name.get(str(r_prev_raw), str(r_prev_raw or ""))
+            r_next_name = id_to_name.get(str(r_next_raw), str(r_next_raw or ""))
+            topology_by_rc[r_ctrl] = {"prev": r_prev_name, "next": r_next_name}
 
+        lz_state_any = lz_state_any or bool(field(r, "lz_state", False))
+        try:
+            rv = int(field(r, "lz_variant", 0) or 0)
+            variant_max = max(variant_max, rv)
+        except Exception:
+            rv = 0
+        has_neighbors = 1 if (field(r, "effective_prev_rc") or field(r, "effective_next_rc")) else 0
+        score = (rv, has_neighbors)
+        if score > best_score:
+            best_score = score
+            best_row = r
+        ctrl_for_flag = field(r, "ctrl_rc_id", primary_ctrl_rc_id)
+        for f in [str(x) for x in (field(r, "flags", []) or []) if x]:
+            key = (ctrl_for_flag, f)
+            if key in seen_flags:
+                continue
+            seen_flags.add(key)
+            flags_parsed.append(parse_flag(f, ctrl_for_flag))
+
+    prev_raw = field(best_row, "effective_prev_rc")
+    next_raw = field(best_row, "effective_next_rc")
+    ctrl_raw = str(field(best_row, "ctrl_rc_id") or field(row0, "ctrl_rc_id") or primary_ctrl_rc_id)
+    prev_name = id_to_name.get(str(prev_raw), str(prev_raw or ""))
+    next_name = id_to_name.get(str(next_raw), str(next_raw or ""))
+    return TimelineStepOut(
+        t=float(field(row0, "t", 0.0)),
+        step_duration=float(field(row0, "step_duration", 0.0)),
+        ctrl_rc_id=ctrl_raw,
+        topology_by_rc=topology_by_rc,
+        lz_state=lz_state_any,
+        variant=variant_max,
+        effective_prev_rc=prev_name,
+        effective_next_rc=next_name,
+        flags=flags_parsed,
+        modes=merged_modes,
+        rc_states=states_ids_to_names(merged_rc, {1}),
+        switch_states=states_ids_to_names(merged_sw, {2}),
+        signal_states=states_ids_to_names(merged_sig, {3, 4}),
+        mu_state=field(row0, "mu_state"),
+        nas_state=field(row0, "nas_state"),
+        chas_state=field(row0, "chas_state"),
+        dsp_state=field(row0, "dsp_state"),
+    )
+
+
+def timeline_from_contract_result(
+    contract_result: Dict[str, Any],
+    primary_ctrl_rc_id: str,
+    *,
+    parse_flag: Callable[[str, str | None], Dict[str, Any]],
+    states_ids_to_names: Callable[[Dict[str, int], set[int]], Dict[str, int]],
+    id_to_name: Dict[str, str],
+) -> List[TimelineStepOut]:
+    """Contract frames -> merged API timeline (one row per frame)."""
     result: List[TimelineStepOut] = []
+    for frame in contract_result.get("frames", []) or []:
+        row = merge_contract_frame(
+            frame,
+            primary_ctrl_rc_id,
+            parse_flag=parse_flag,
+            states_ids_to_names=states_ids_to_names,
+            id_to_name=id_to_name,
+        )
+        if row is not None:
+            result.append(row)
+    return result
+
+
+def _timeline_rows(
+    frames: Iterator[Dict[str, Any]],
+    primary_ctrl_rc_id: str,
+    **merge_kwargs: Any,
+) -> Iterator[TimelineStepOut]:
     for frame in frames:
-        if not isinstance(frame, dict) or not frame:
-            continue
-        rows = list(frame.values())
-        if not rows:
+        row = merge_timeline_frame(frame, primary_ctrl_rc_id, **merge_kwargs)
+        if row is not None:
+            yield row
+
+
+def simulate_scenario(
+    scenario: ScenarioIn,
+    *,
+    default_options: Dict[str, Any],
+    canonicalize_options: Callable[[Dict[str, Any]], Dict[str, Any]],
+    resolve_rc_id: Callable[[str], str | None],
+    build_detectors_config: Callable[[str, Dict[str, Any]], Any],
+    to_float: Callable[[Dict[str, Any], str, float], float],
+    convert_rc_states: Callable[[Dict[str, int]], Dict[str, int]],
+    convert_switch_states: Callable[[Dict[str, int]], Dict[str, int]],
+    convert_signal_states: Callable[[Dict[str, int]], Dict[str, int]],
+    build_simulation_context: Callable[..., Any],
+    parse_flag: Callable[[str, str | None], Dict[str, Any]],
+    states_ids_to_names: Callable[[Dict[str, int], set[int]], Dict[str, int]],
+    id_to_name: Dict[str, str],
+    trace_sink: Optional[List[Dict[str, Any]]] = None,
+) -> List[TimelineStepOut]:
+    """
+    In-process run: ScenarioStep objects go straight to SimulationContext and
+    rows are merged from its TimelineStep frames (no contract dict round-trip).
+    """
+    req = build_simulation_request(
+        scenario,
+        default_options=default_options,
+        canonicalize_options=canonicalize_options,
+        resolve_rc_id=resolve_rc_id,
+        build_detectors_config=build_detectors_config,
+        to_float=to_float,
+        convert_rc_states=convert_rc_states,
+        convert_switch_states=convert_switch_states,
+        convert_signal_states=convert_signal_states,
+    )
+    ctx = build_simulation_context(
+        req.steps,
+        req.detectors_configs,
+        t_pk=req.t_pk,
+        trace=dict(scenario.trace or {}) if trace_sink is not None else None,
+    )
+    timeline = list(_timeline_rows(
+        ctx.iter_frames(),
+        req.primary_ctrl_rc_id,
+        parse_flag=parse_flag,
+        states_ids_to_names=states_ids_to_names,
+        id_to_name=id_to_name,
+    ))
+    if trace_sink is not None:
+        trace_sink.extend(ctx.trace_events())
+    return timeline
+
+
+def iter_simulate_scenario(
+    scenario: ScenarioIn,
+    *,
+    default_options: Dict[str, Any],
+    canonicalize_options: Callable[[Dict[str, Any]], Dict[str, Any]],
+    resolve_rc_id: Callable[[str], str | None],
+    build_detectors_config: Callable[[str, Dict[str, Any]], Any],
+    to_float: Callable[[Dict[str, Any], str, float], float],
+    convert_rc_states: Callable[[Dict[str, int]], Dict[str, int]],
+    convert_switch_states: Callable[[Dict[str, int]], Dict[str, int]],
+    convert_signal_states: Callable[[Dict[str, int]], Dict[str, int]],
+    build_simulation_context: Callable[..., Any],
+    parse_flag: Callable[[str, str | None], Dict[str, Any]],
+    states_ids_to_names: Callable[[Dict[str, int], set[int]], Dict[str, int]],
+    id_to_name: Dict[str, str],
+) -> Iterator[TimelineStepOut]:
+    """
+    Streaming simulate_scenario: merged rows are produced one frame at a time.
+    Validation (HTTP 400) and context construction run before the iterator is returned.
+    """
+    req = build_simulation_request(
+        scenario,
+        default_options=default_options,
+        canonicalize_options=canonicalize_options,
+        resolve_rc_id=resolve_rc_id,
+        build_detectors_config=build_detectors_config,
+        to_float=to_float,
+        convert_rc_states=convert_rc_states,
+        convert_switch_states=convert_switch_states,
+        convert_signal_states=convert_signal_states,
+    )
+    ctx = build_simulation_context(req.steps, req.detectors_configs, t_pk=req.t_pk)
+    return _timeline_rows(
+        ctx.iter_frames(),
+        req.primary_ctrl_rc_id,
+        parse_flag=parse_flag,
+        states_ids_to_names=states_ids_to_names,
+        id_to_name=id_to_name,
+    )
+
+
+def simulate_compact_scenario(
+    scenario: CompactScenarioIn,
+    *,
+    default_options: Dict[str, Any],
+    canonicalize_options: Callable[[Dict[str, Any]], Dict[str, Any]],
+    resolve_rc_id: Callable[[str], str | None],
+    resolve_switch_id: Callable[[str], str | None],
+    resolve_signal_id: Callable[[str], str | None],
+    build_detectors_config: Callable[[str, Dict[str, Any]], Any],
+    to_float: Callable[[Dict[str, Any], str, float], float],
+    build_simulation_context: Callable[..., Any],
+    parse_flag: Callable[[str, str | None], Dict[str, Any]],
+    states_ids_to_names: Callable[[Dict[str, int], set[int]], Dict[str, int]],
+    id_to_name: Dict[str, str],
+) -> List[TimelineStepOut]:
+    """Same timeline as simulate_scenario for the delta-encoded input."""
+    req = build_compact_simulation_request(
+        scenario,
+        default_options=default_options,
+        canonicalize_options=canonicalize_options,
+        resolve_rc_id=resolve_rc_id,
+        resolve_switch_id=resolve_switch_id,
+        resolve_signal_id=resolve_signal_id,
+        build_detectors_config=build_detectors_config,
+        to_float=to_float,
+    )
+    # /simulate/compact returns no trace buffer, so the phase tracer stays off.
+    ctx = build_simulation_context(req.steps, req.detectors_configs, t_pk=req.t_pk)
+    return list(_timeline_rows(
+        ctx.iter_frames(),
+        req.primary_ctrl_rc_id,
+        parse_flag=parse_flag,
+        states_ids_to_names=states_ids_to_names,
+        id_to_name=id_to_name,
+    ))
+
+
+def simulate_batch(
+    batch: ScenarioBatchIn,
+    *,
+    default_options: Dict[str, Any],
+    canonicalize_options: Callable[[Dict[str, Any]], Dict[str, Any]],
+    resolve_rc_id: Callable[[str], str | None],
+    build_detectors_config: Callable[[str, Dict[str, Any]], Any],
+    to_float: Callable[[Dict[str, Any], str, float], float],
+    convert_rc_states: Callable[[Dict[str, int]], Dict[str, int]],
+    convert_switch_states: Callable[[Dict[str, int]], Dict[str, int]],
+    convert_signal_states: Callable[[Dict[str, int]], Dict[str, int]],
+    run_simulation_batch_contract: Callable[..., Dict[str, Any]],
+    parse_flag: Callable[[str, str | None], Dict[str, Any]],
+    states_ids_to_names: Callable[[Dict[str, int], set[int]], Dict[str, int]],
+    id_to_name: Dict[str, str],
+) -> BatchOut:
+    """
+    N scenarios -> results in input order. Scenarios rejected at validation
+    (HTTP 400 for a single /simulate) are reported per item, not for the batch.
+    """
+    items: List[BatchItemOut | None] = [None] * len(batch.scenarios)
+    payloads: List[Dict[str, Any]] = []
+    payload_meta: List[Tuple[int, str]] = []
+    for index, scenario in enumerate(batch.scenarios):
+        try:
+            payload, primary_ctrl_rc_id = build_simulation_payload(
+                scenario,
+                default_options=default_options,
+                canonicalize_options=canonicalize_options,
+                resolve_rc_id=resolve_rc_id,
+                build_detectors_config=build_detectors_config,
+                to_float=to_float,
+                convert_rc_states=convert_rc_states,
+                convert_switch_states=convert_switch_states,
+                convert_signal_states=convert_signal_states,
+            )
+        except HTTPException as exc:
+            items[index] = BatchItemOut(index=index, ok=False, elapsed_ms=0.0, error=str(exc.detail))
             continue
-        row0 = rows[0]
-        merged_rc: Dict[str, int] = {}
-        merged_sw: Dict[str, int] = {}
-        merged_sig: Dict[str, int] = {}
-        merged_modes: Dict[str, Any] = {}
-        topology_by_rc: Dict[str, Dict[str, str]] = {}
-        lz_state_any = False
-        variant_max = 0
-        best_row = row0
-        best_score = (-1, -1)
-        flags_parsed: List[Dict[str, Any]] = []
-        seen_flags: set = set()
-
-        for r in rows:
-            merged_rc.update(dict(r.get("rc_states", {}) or {}))
-            merged_sw.update(dict(r.get("switch_states", {}) or {}))
-            merged_sig.update(dict(r.get("signal_states", {}) or {}))
-            merged_modes.update(dict(r.get("modes", {}) or {}))
-
-            r_ctrl = str(r.get("ctrl_rc_id") or "")
-            if r_ctrl:
-                r_prev_raw = r.get("effective_prev_rc")
-                r_next_raw = r.get("effective_next_rc")
-                r_prev_name = id_to_name.get(str(r_prev_raw), str(r_prev_raw or ""))
-                r_next_name = id_to_name.get(str(r_next_raw), str(r_next_raw or ""))
-                topology_by_rc[r_ctrl] = {"prev": r_prev_name, "next": r_next_name}
-
-            lz_state_any = lz_state_any or bool(r.get("lz_state", False))
-            try:
-                rv = int(r.get("lz_variant", 0) or 0)
-                variant_max = max(variant_max, rv)
-            except Exception:
-                rv = 0
-            has_neighbors = 1 if (r.get("effective_prev_rc") or r.get("effective_next_rc")) else 0
-            score = (rv, has_neighbors)
-            if score > best_score:
-                best_score = score
-                best_row = r
-            ctrl_for_flag = r.get("ctrl_rc_id", primary_ctrl_rc_id)
-            for f in [str(x) for x in (r.get("flags", []) or []) if x]:
-                key = (ctrl_for_flag, f)
-                if key in seen_flags:
-                    continue
-                seen_flags.add(key)
-                flags_parsed.append(parse_flag(f, ctrl_for_flag))
-
-        prev_raw = best_row.get("effective_prev_rc")
-        next_raw = best_row.get("effective_next_rc")
-        ctrl_raw = str(best_row.get("ctrl_rc_id") or row0.get("ctrl_rc_id") or primary_ctrl_rc_id)
-        prev_name = id_to_name.get(str(prev_raw), str(prev_raw or ""))
-        next_name = id_to_name.get(str(next_raw), str(next_raw or ""))
-        result.append(
-            TimelineStepOut(
-                t=float(row0.get("t", 0.0)),
-                step_duration=float(row0.get("step_duration", 0.0)),
-                ctrl_rc_id=ctrl_raw,
-                topology_by_rc=topology_by_rc,
-                lz_state=lz_state_any,
-                variant=variant_max,
-                effective_prev_rc=prev_name,
-                effective_next_rc=next_name,
-                flags=flags_parsed,
-                modes=merged_modes,
-                rc_states=states_ids_to_names(merged_rc, {1}),
-                switch_states=states_ids_to_names(merged_sw, {2}),
-                signal_states=states_ids_to_names(merged_sig, {3, 4}),
-                mu_state=row0.get("mu_state"),
-                nas_state=row0.get("nas_state"),
-                chas_state=row0.get("chas_state"),
-                dsp_state=row0.get("dsp_state"),
+        payloads.append(payload)
+        payload_meta.append((index, primary_ctrl_rc_id))
+
+    batch_result = run_simulation_batch_contract(payloads, max_workers=batch.max_workers)
+    for (index, primary_ctrl_rc_id), res in zip(payload_meta, batch_result.get("results", [])):
+        if not res.get("ok"):
+            items[index] = BatchItemOut(
+                index=index, ok=False, elapsed_ms=float(res.get("elapsed_ms", 0.0)), error=res.get("error")
             )
+            continue
+        items[index] = BatchItemOut(
+            index=index,
+            ok=True,
+            elapsed_ms=float(res.get("elapsed_ms", 0.0)),
+            timeline=timeline_from_contract_result(
+                res.get("result") or {},
+                primary_ctrl_rc_id,
+                parse_flag=parse_flag,
+                states_ids_to_names=states_ids_to_names,
+                id_to_name=id_to_name,
+            ),
         )
-    return result
+
+    return BatchOut(
+        results=[item for item in items if item is not None],
+        elapsed_ms=float(batch_result.get("elapsed_ms", 0.0)),
+        workers=int(batch_result.get("workers", 0)),
+    )
@@ -1,7 +1,8 @@
 from __future__ import annotations
 
 import re
-from typing import Any, Dict, List, Optional
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 
 from fastapi import HTTPException
 
@@ -155,6 +156,10 @@ def _canonicalize_options(options: Dict[str, Any]) -> Dict[str, Any]:
     return out
 
 
+# Name resolution is memoized (bounded): every spelling seen in a payload costs
+# one _norm_name pass per process, later steps are cache hits. Spellings of
+# known objects are resolved up front (_warm_resolve_caches below).
+@lru_cache(maxsize=4096)
 def _resolve_rc_id(value: str) -> Optional[str]:
     if not value:
         return None
@@ -173,6 +178,7 @@ def _resolve_rc_id(value: str) -> Optional[str]:
     return None
 
 
+@lru_cache(maxsize=4096)
 def _resolve_switch_id(value: str) -> Optional[str]:
     if not value:
         return None
@@ -189,6 +195,7 @@ def _resolve_switch_id(value: str) -> Optional[str]:
     return None
 
 
+@lru_cache(maxsize=4096)
 def _resolve_signal_id(value: str) -> Optional[str]:
     if not value:
         return None
@@ -203,6 +210,12 @@ def _resolve_signal_id(value: str) -> Optional[str]:
 
 
 def _parse_flag(raw: str, ctrl_rc_id: Optional[str]) -> Dict[str, Any]:
+    # Parsed once per (flag, RC); callers get their own dict.
+    return dict(_parse_flag_cached(raw, ctrl_rc_id))
+
+
+@lru_cache(maxsize=4096)
+def _parse_flag_cached(raw: str, ctrl_rc_id: Optional[str]) -> Dict[str, Any]:
     variant = ""
     ftype = ""
     phase: Optional[str] = None
@@ -290,9 +303,9 @@ def _to_int_list(options: Dict[str, Any], key: str) -> Optional[List[int]]:
 
 
 def _build_detectors_config(ctrl_rc_id: str, options: Dict[str, Any]) -> DetectorsConfig:
-    from tools.station.station_model import load_station_from_config
+    from station.station_snapshot import get_station_snapshot
 
-    model = load_station_from_config()
+    model = get_station_snapshot().model
     node = model.rc_nodes.get(ctrl_rc_id)
     if node is None:
         raise HTTPException(status_code=400, detail=f"Unknown target RC id: {ctrl_rc_id}")
@@ -508,12 +521,49 @@ def _convert_signal_states(payload: Dict[str, int]) -> Dict[str, int]:
     return out
 
 
+# ID -> (node type, display name with mojibake repaired), built once.
+DISPLAY_NAME_BY_ID: Dict[str, Tuple[int, str]] = {
+    oid: (int(data.get("type", 0)), _fix_mojibake(str(data.get("name", oid)))) for oid, data in NODES.items()
+}
+
+
 def _states_ids_to_names(states: Dict[str, int], type_codes: set[int]) -> Dict[str, int]:
     out: Dict[str, int] = {}
     for key, value in (states or {}).items():
         name = str(key)
-        node = NODES.get(str(key))
-        if node and int(node.get("type", 0)) in type_codes:
-            name = _fix_mojibake(str(node.get("name", key)))
+        display = DISPLAY_NAME_BY_ID.get(name)
+        if display is not None and display[0] in type_codes:
+            name = display[1]
         out[name] = int(value)
     return out
+
+
+def _known_spellings(oid: str, name: str) -> List[str]:
+    """ID, name and its case / mojibake / normalized variants."""
+    out = [oid, name, name.upper(), name.lower(), _fix_mojibake(name), _norm_name(name)]
+    try:
+        out.append(name.encode("utf-8").decode("cp1251"))
+    except UnicodeDecodeError:
+        pass
+    return out
+
+
+def _warm_resolve_caches() -> None:
+    for alias in RC_TARGET_ALIASES:
+        _resolve_rc_id(alias)
+    for oid, data in NODES.items():
+        ntype = int(data.get("type", 0))
+        spellings = _known_spellings(oid, str(data.get("name", "")))
+        if ntype == 1:
+            for sp in spellings:
+                _resolve_rc_id(sp)
+        elif ntype == 2:
+            for sp in spellings:
+                _resolve_switch_id(sp)
+                _resolve_switch_id(f"SW{sp}")
+        elif ntype in (3, 4):
+            for sp in spellings:
+                _resolve_signal_id(sp)
+
+
+_warm_resolve_caches()
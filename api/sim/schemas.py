@@ -22,6 +22,38 @@ class ScenarioIn(BaseModel):
     dt: float = 1.0
     options: Dict[str, Any] = Field(default_factory=dict)
     steps: List[ScenarioStepIn]
+    # Phase trace filters: {"detectors": [...], "rc_ids": [...], "buffer_size": N}.
+    trace: Optional[Dict[str, Any]] = None
+    # Only these RCs are simulated; others are inputs only (pruned to the dependency closure).
+    target_rc_ids: Optional[List[str]] = None
+
+
+class CompactStepIn(BaseModel):
+    t: float
+    # Changed objects only, flat (object index, state) pairs: [i0, s0, i1, s1, ...].
+    d: List[int] = Field(default_factory=list)
+    modes: Dict[str, Any] = Field(default_factory=dict)
+    mu: Dict[str, int] = Field(default_factory=dict)
+    dispatcher_control_state: Optional[int] = None
+    auto_actions: Dict[str, int] = Field(default_factory=dict)
+    indicator_states: Dict[str, int] = Field(default_factory=dict)
+
+
+class CompactScenarioIn(BaseModel):
+    """Initial state + per-step deltas; objects are named once in the header table."""
+    station: str = "Visochino"
+    dt: float = 1.0
+    options: Dict[str, Any] = Field(default_factory=dict)
+    # Object table (names or IDs); object index = position in rc + switches + signals.
+    rc: List[str] = Field(default_factory=list)
+    switches: List[str] = Field(default_factory=list)
+    signals: List[str] = Field(default_factory=list)
+    # One state per object of the table; null = not set until a delta sets it.
+    initial: List[Optional[int]]
+    steps: List[CompactStepIn]
+    # Validated like ScenarioIn.trace; the compact response has no trace, so it is not recorded.
+    trace: Optional[Dict[str, Any]] = None
+    target_rc_ids: Optional[List[str]] = None
 
 
 class TimelineStepOut(BaseModel):
@@ -42,3 +74,28 @@ class TimelineStepOut(BaseModel):
     nas_state: Optional[int] = None
     chas_state: Optional[int] = None
     dsp_state: Optional[int] = None
+
+
+class SimulateTraceOut(BaseModel):
+    timeline: List[TimelineStepOut]
+    trace: List[Dict[str, Any]] = Field(default_factory=list)
+
+
+class ScenarioBatchIn(BaseModel):
+    scenarios: List[ScenarioIn]
+    # None = one worker per CPU (capped by the number of scenarios).
+    max_workers: Optional[int] = None
+
+
+class BatchItemOut(BaseModel):
+    index: int
+    ok: bool
+    elapsed_ms: float
+    timeline: List[TimelineStepOut] = Field(default_factory=list)
+    error: Optional[str] = None
+
+
+class BatchOut(BaseModel):
+    results: List[BatchItemOut]
+    elapsed_ms: float
+    workers: int
@@ -0,0 +1,219 @@
+"""
+Compact timeline encoding for /simulate responses.
+
+A merged timeline repeats full rc/switch/signal/modes maps and flag dicts on
+every row. The compact form is columnar:
+
+- "names": shared string table (object names, RC ids, modes keys); strings
+  below are indexes into it;
+- scalar columns (t, step_duration, lz_state, variant, ctrl_rc_id, neighbours,
+  mu/nas/chas/dsp states) as one list per field;
+- "flag_table": unique flag descriptors, "flags": per-row lists of indexes;
+- map fields (rc_states, switch_states, signal_states, modes, topology_by_rc):
+  per-row deltas against the previous row, {"set": [[k, v, k, v, ...] per row],
+  "del": [[row, k, ...] only for rows that drop keys]}.
+
+decode_compact_timeline() restores the TimelineStepOut dicts (the same logic
+is in frontend/static/timeline-render.js: decodeCompactTimeline).
+The binary form is this structure packed with msgpack (optional dependency).
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, Iterable, List, Optional
+
+try:
+    import msgpack
+except ImportError:  # optional: binary responses are offered only when installed
+    msgpack = None
+
+
+COMPACT_FORMAT = "rcdiag-timeline-compact/1"
+COMPACT_JSON_MEDIA_TYPE = "application/vnd.rcdiag.timeline+json"
+MSGPACK_MEDIA_TYPE = "application/x-msgpack"
+
+_SCALARS = ("t", "step_duration", "lz_state", "variant", "mu_state", "nas_state", "chas_state", "dsp_state")
+_NAMED = ("ctrl_rc_id", "effective_prev_rc", "effective_next_rc")
+_MAPS = ("rc_states", "switch_states", "signal_states", "modes")
+_FLAG_KEYS = ("variant", "type", "rc_id", "phase", "raw")
+
+
+class _Names:
+    def __init__(self) -> None:
+        self.items: List[str] = []
+        self._index: Dict[str, int] = {}
+
+    def __call__(self, name: Any) -> int:
+        key = "" if name is None else str(name)
+        idx = self._index.get(key)
+        if idx is None:
+            idx = self._index[key] = len(self.items)
+            self.items.append(key)
+        return idx
+
+
+def _field(row: Any, key: str) -> Any:
+    return row.get(key) if isinstance(row, dict) else getattr(row, key)
+
+
+def _map_delta(prev: Dict[str, Any], cur: Dict[str, Any], names: _Names, row: int, dels: List[List[Any]]) -> List[Any]:
+    out: List[Any] = []
+    for k, v in cur.items():
+        if k not in prev or prev[k] != v:
+            out.append(names(k))
+            out.append(v)
+    gone = [names(k) for k in prev if k not in cur]
+    if gone:
+        dels.append([row] + gone)
+    return out
+
+
+def encode_compact_timeline(rows: Iterable[Any]) -> Dict[str, Any]:
+    """Merged rows (TimelineStepOut or its dicts) -> compact columnar document."""
+    names = _Names()
+    doc: Dict[str, Any] = {"format": COMPACT_FORMAT}
+    columns: Dict[str, List[Any]] = {key: [] for key in _SCALARS + _NAMED}
+    flag_index: Dict[tuple, int] = {}
+    flag_table: List[List[Any]] = []
+    flags: List[List[int]] = []
+    maps = {key: {"set": [], "del": []} for key in _MAPS + ("topology_by_rc",)}
+    prev_maps: Dict[str, Dict[str, Any]] = {key: {} for key in maps}
+
+    n = 0
+    for n, row in enumerate(rows, start=1):
+        i = n - 1
+        for key in _SCALARS:
+            v = _field(row, key)
+            columns[key].append(int(v) if key == "lz_state" else v)
+        for key in _NAMED:
+            columns[key].append(names(_field(row, key)))
+        row_flags: List[int] = []
+        for f in _field(row, "flags") or []:
+            desc = tuple(f.get(k) for k in _FLAG_KEYS)
+            idx = flag_index.get(desc)
+            if idx is None:
+                idx = flag_index[desc] = len(flag_table)
+                flag_table.append(list(desc))
+            row_flags.append(idx)
+        flags.append(row_flags)
+        for key in _MAPS:
+            cur = _field(row, key) or {}
+            maps[key]["set"].append(_map_delta(prev_maps[key], cur, names, i, maps[key]["del"]))
+            prev_maps[key] = cur
+        # topology_by_rc: rc -> {"prev", "next"}; value is [prev idx, next idx]
+        topo = {
+            rc: [names(v.get("prev")), names(v.get("next"))]
+            for rc, v in (_field(row, "topology_by_rc") or {}).items()
+        }
+        maps["topology_by_rc"]["set"].append(
+            _map_delta(prev_maps["topology_by_rc"], topo, names, i, maps["topology_by_rc"]["del"])
+        )
+        prev_maps["topology_by_rc"] = topo
+
+    doc["n"] = n
+    doc["names"] = names.items
+    doc.update(columns)
+    doc["flag_table"] = flag_table
+    doc["flags"] = flags
+    doc.update(maps)
+    return doc
+
+
+def decode_compact_timeline(doc: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Compact document -> list of TimelineStepOut dicts."""
+    if doc.get("format") != COMPACT_FORMAT:
+        raise ValueError(f"Unsupported timeline format: {doc.get('format')}")
+    names = doc["names"]
+    flag_table = [dict(zip(_FLAG_KEYS, f)) for f in doc["flag_table"]]
+    dels: Dict[str, Dict[int, List[int]]] = {
+        key: {d[0]: d[1:] for d in doc[key]["del"]} for key in _MAPS + ("topology_by_rc",)
+    }
+    cur: Dict[str, Dict[str, Any]] = {key: {} for key in dels}
+    out: List[Dict[str, Any]] = []
+    for i in range(doc["n"]):
+        for key in cur:
+            state = dict(cur[key])
+            for k in dels[key].get(i, ()):
+                state.pop(names[k], None)
+            pairs = doc[key]["set"][i]
+            for j in range(0, len(pairs), 2):
+                state[names[pairs[j]]] = pairs[j + 1]
+            cur[key] = state
+        row: Dict[str, Any] = {key: doc[key][i] for key in _SCALARS}
+        row["lz_state"] = bool(row["lz_state"])
+        for key in _NAMED:
+            row[key] = names[doc[key][i]]
+        row["flags"] = [dict(flag_table[f]) for f in doc["flags"][i]]
+        for key in _MAPS:
+            row[key] = dict(cur[key])
+        row["topology_by_rc"] = {
+            rc: {"prev": names[p], "next": names[nx]} for rc, (p, nx) in cur["topology_by_rc"].items()
+        }
+        out.append(row)
+    return out
+
+
+def pack_msgpack(doc: Dict[str, Any]) -> Optional[bytes]:
+    """Binary form of the compact document (None when msgpack is not installed)."""
+    if msgpack is None:
+        return None
+    return msgpack.packb(doc, use_bin_type=True)
+
+
+def _qvalues(header: str) -> Dict[str, float]:
+    """Accept-style header -> {lowercase token: q}; other parameters are ignored."""
+    out: Dict[str, float] = {}
+    for part in header.split(","):
+        token, *params = part.split(";")
+        token = token.strip().lower()
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, value = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = min(max(float(value.strip()), 0.0), 1.0)
+                except ValueError:
+                    q = 0.0
+        out[token] = max(q, out.get(token, 0.0))
+    return out
+
+
+def _media_q(ranges: Dict[str, float], media_type: str) -> float:
+    # The most specific range wins: type/subtype, then type/*, then */*.
+    for key in (media_type, media_type.split("/", 1)[0] + "/*", "*/*"):
+        if key in ranges:
+            return ranges[key]
+    return 0.0
+
+
+def timeline_media_type(accept: str) -> Optional[str]:
+    """
+    Body type of a timeline response for the Accept header.
+
+    The compact forms are chosen only when named explicitly with q > 0 and ranked
+    no lower than application/json (ties: msgpack, then compact JSON). Otherwise
+    plain JSON, also when nothing acceptable is offered. None: only msgpack is
+    acceptable and it is not installed.
+    """
+    if not accept.strip():
+        return "application/json"
+    ranges = _qvalues(accept)
+    best, best_q = "application/json", _media_q(ranges, "application/json")
+    for media_type in (MSGPACK_MEDIA_TYPE, COMPACT_JSON_MEDIA_TYPE):
+        q = ranges.get(media_type, 0.0)
+        if q <= 0.0 or q < best_q or (best != "application/json" and q == best_q):
+            continue
+        if media_type == MSGPACK_MEDIA_TYPE and msgpack is None:
+            if best_q <= 0.0 and ranges.get(COMPACT_JSON_MEDIA_TYPE, 0.0) <= 0.0:
+                return None
+            continue
+        best, best_q = media_type, q
+    return best
+
+
+def accepts_gzip(accept_encoding: str) -> bool:
+    """gzip is allowed by Accept-Encoding with q > 0 (directly or via "*")."""
+    codings = _qvalues(accept_encoding)
+    return (codings["gzip"] if "gzip" in codings else codings.get("*", 0.0)) > 0.0
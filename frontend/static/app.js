@@ -208,7 +208,7 @@ async function runSimulation() {
       renderScenarioTextarea();
     }
 
-    const resp = await fetch("/simulate", {
+    const resp = await fetch("/simulate/stream?format=ndjson", {
       method: "POST",
       headers: { "Content-Type": "application/json" },
       body: JSON.stringify(scenario),
@@ -221,12 +221,8 @@ async function runSimulation() {
       return;
     }
 
-    const timelineRaw = await resp.json();
-    const timeline =
-      Array.isArray(timelineRaw) ? timelineRaw :
-      Array.isArray(timelineRaw.timeline) ? timelineRaw.timeline :
-      (timelineRaw.data && Array.isArray(timelineRaw.data)) ? timelineRaw.data :
-      [];
+    // Кадры рисуются по мере расчёта (NDJSON), итог — полный таймлайн.
+    const timeline = await renderTimelineStream(resp);
 
     lastTimeline = timeline;
     window.lastTimeline = lastTimeline;
@@ -241,13 +237,7 @@ async function runSimulation() {
       }
     });
 
-    console.log("runSimulation: rendering timeline, length =", timeline.length);
-
-    if (typeof renderTimeline === "function") {
-      renderTimeline(timeline);
-    } else {
-      console.error("renderTimeline is not defined");
-    }
+    console.log("runSimulation: rendered timeline, length =", timeline.length);
   } catch (e) {
     console.error("runSimulation error", e);
     alert("Ошибка парсинга JSON или вызова API");
@@ -496,8 +496,112 @@ function moveSelectionRelativeImpl(delta) {
   moveSelection(newIndex);
 }
 
+// Компактный ответ /simulate (Accept: application/vnd.rcdiag.timeline+json):
+// общая таблица имён, колонки скаляров, таблица флагов и дельты словарей по
+// строкам (см. api/sim/timeline_codec.py). Восстанавливает строки TimelineStepOut.
+const COMPACT_TIMELINE_FORMAT = "rcdiag-timeline-compact/1";
+const COMPACT_TIMELINE_MEDIA_TYPE = "application/vnd.rcdiag.timeline+json";
+const COMPACT_SCALARS = ["t", "step_duration", "lz_state", "variant", "mu_state", "nas_state", "chas_state", "dsp_state"];
+const COMPACT_NAMED = ["ctrl_rc_id", "effective_prev_rc", "effective_next_rc"];
+const COMPACT_MAPS = ["rc_states", "switch_states", "signal_states", "modes", "topology_by_rc"];
+const COMPACT_FLAG_KEYS = ["variant", "type", "rc_id", "phase", "raw"];
+
+function decodeCompactTimeline(doc) {
+  if (!doc || doc.format !== COMPACT_TIMELINE_FORMAT) {
+    throw new Error(`Unsupported timeline format: ${doc && doc.format}`);
+  }
+  const names = doc.names || [];
+  const flagTable = (doc.flag_table || []).map((f) => {
+    const out = {};
+    COMPACT_FLAG_KEYS.forEach((k, i) => { out[k] = f[i]; });
+    return out;
+  });
+  const dels = {};
+  const cur = {};
+  COMPACT_MAPS.forEach((key) => {
+    dels[key] = new Map((doc[key].del || []).map((d) => [d[0], d.slice(1)]));
+    cur[key] = {};
+  });
+
+  const rows = [];
+  for (let i = 0; i < doc.n; i += 1) {
+    COMPACT_MAPS.forEach((key) => {
+      const state = { ...cur[key] };
+      (dels[key].get(i) || []).forEach((k) => { delete state[names[k]]; });
+      const pairs = doc[key].set[i] || [];
+      for (let j = 0; j < pairs.length; j += 2) state[names[pairs[j]]] = pairs[j + 1];
+      cur[key] = state;
+    });
+    const row = {};
+    COMPACT_SCALARS.forEach((key) => { row[key] = doc[key][i]; });
+    row.lz_state = Boolean(row.lz_state);
+    COMPACT_NAMED.forEach((key) => { row[key] = names[doc[key][i]]; });
+    row.flags = (doc.flags[i] || []).map((f) => ({ ...flagTable[f] }));
+    ["rc_states", "switch_states", "signal_states", "modes"].forEach((key) => { row[key] = cur[key]; });
+    row.topology_by_rc = {};
+    Object.entries(cur.topology_by_rc).forEach(([rc, [p, n]]) => {
+      row.topology_by_rc[rc] = { prev: names[p], next: names[n] };
+    });
+    rows.push(row);
+  }
+  return rows;
+}
+
+// Ответ /simulate в любом JSON-виде (обычный список строк или компактный) -> строки.
+async function readTimelineResponse(resp) {
+  const contentType = resp.headers.get("content-type") || "";
+  const data = await resp.json();
+  return contentType.includes(COMPACT_TIMELINE_MEDIA_TYPE) ? decodeCompactTimeline(data) : data;
+}
+
+// Потоковый рендер: читает NDJSON из /simulate/stream и перерисовывает таблицу
+// по мере прихода кадров (не чаще раза в STREAM_RENDER_INTERVAL_MS).
+const STREAM_RENDER_INTERVAL_MS = 250;
+
+async function renderTimelineStream(resp) {
+  const reader = resp.body.getReader();
+  const decoder = new TextDecoder();
+  const rows = [];
+  let buf = "";
+  let lastRender = 0;
+  let streamError = null;
+
+  const consumeLine = (line) => {
+    if (!line.trim()) return;
+    const obj = JSON.parse(line);
+    if (obj && obj.error && obj.t === undefined) {
+      streamError = obj.error;
+      return;
+    }
+    rows.push(obj);
+  };
+
+  for (;;) {
+    const { value, done } = await reader.read();
+    if (done) break;
+    buf += decoder.decode(value, { stream: true });
+    const lines = buf.split("\n");
+    buf = lines.pop();
+    lines.forEach(consumeLine);
+    const now = Date.now();
+    if (rows.length && now - lastRender >= STREAM_RENDER_INTERVAL_MS) {
+      lastRender = now;
+      renderTimeline(rows.slice());
+    }
+  }
+  buf += decoder.decode();
+  consumeLine(buf);
+  renderTimeline(rows);
+  if (streamError) throw new Error(streamError);
+  return rows;
+}
+
 export {
+  COMPACT_TIMELINE_MEDIA_TYPE,
+  decodeCompactTimeline,
+  readTimelineResponse,
   renderTimeline,
+  renderTimelineStream,
   renderTimebar,
   moveSelection,
   moveSelectionRelativeImpl,
@@ -506,5 +610,8 @@ export {
 };
 
 window.renderTimeline = renderTimeline;
+window.renderTimelineStream = renderTimelineStream;
+window.decodeCompactTimeline = decodeCompactTimeline;
+window.readTimelineResponse = readTimelineResponse;
 window.renderTimebar = renderTimebar;
 window.moveSelectionRelativeImpl = moveSelectionRelativeImpl;
@@ -1,9 +1,10 @@
-﻿from typing import Any, Dict, List
+﻿from typing import Any, Dict, Iterator, List, Optional
 
-from api_contract.api_adapter import normalize_run_output
+from api_contract.api_adapter import columnar_run_output, timeline_step_to_dto
 from api_contract.api_metadata import get_metadata_dto
-from api_contract.api_schema import RunRequestDTO, RunResponseDTO, dto_to_dict
+from api_contract.api_schema import RunRequestDTO, dto_to_dict
 from core.detectors_engine import DetectorsConfig
+from core.phase_trace import PhaseTraceConfig
 from core.sim_core import ScenarioStep, SimulationConfig, SimulationContext
 
 
@@ -19,38 +20,110 @@ def _build_scenario(steps: List[Dict[str, Any]]) -> List[ScenarioStep]:
             switch_states=dict(step.get("switch_states", {})),
             signal_states=dict(step.get("signal_states", {})),
             modes=dict(step.get("modes", {})),
+            mu=dict(step.get("mu") or {}),
+            dispatcher_control_state=step.get("dispatcher_control_state"),
+            auto_actions=dict(step.get("auto_actions") or {}),
+            indicator_states=dict(step.get("indicator_states") or {}),
         )
         for step in steps
     ]
 
 
-def run_simulation(payload: Dict[str, Any]) -> Dict[str, Any]:
-    req = RunRequestDTO(**payload)
+def _build_trace_config(data: Optional[Dict[str, Any]]) -> Optional[PhaseTraceConfig]:
+    if data is None:
+        return None
+    return PhaseTraceConfig.from_dict(data)
+
+
+def build_simulation_context(
+    scenario: List[ScenarioStep],
+    detectors_configs: Dict[str, DetectorsConfig],
+    *,
+    t_pk: float,
+    ctrl_rc_ids: Optional[List[str]] = None,
+    trace: Optional[Dict[str, Any]] = None,
+    event_driven: bool = False,
+) -> SimulationContext:
+    """
+    In-process entry: typed ScenarioStep / DetectorsConfig go to the engine as-is
+    (no dict payload, no copies; mu, indicator_states, auto_actions and
+    dispatcher_control_state are kept). Results are read from
+    ctx.iter_frames() as TimelineStep objects. run_simulation() is the JSON
+    contract over the same context.
+    """
+    sim_cfg = SimulationConfig(
+        t_pk=float(t_pk),
+        detectors_configs=dict(detectors_configs),
+        phase_trace=_build_trace_config(trace),
+        event_driven=event_driven,
+    )
+    return SimulationContext(
+        config=sim_cfg,
+        scenario=scenario,
+        ctrl_rc_ids=ctrl_rc_ids,
+    )
+
+
+def _build_context(req: RunRequestDTO) -> SimulationContext:
     scenario = _build_scenario(req.scenario)
 
     if req.detectors_configs:
         configs = {rc_id: _build_detectors_config(cfg) for rc_id, cfg in req.detectors_configs.items()}
-        sim_cfg = SimulationConfig(t_pk=float(req.t_pk), detectors_configs=configs)
-        ctx = SimulationContext(
-            config=sim_cfg,
-            scenario=scenario,
+        return build_simulation_context(
+            scenario,
+            configs,
+            t_pk=req.t_pk,
             ctrl_rc_ids=req.ctrl_rc_ids,
+            trace=req.trace,
+            event_driven=req.event_driven,
         )
-    else:
-        if req.detectors_config is None:
-            raise ValueError("Either detectors_config or detectors_configs must be provided")
-        det_cfg = _build_detectors_config(req.detectors_config)
-        sim_cfg = SimulationConfig(t_pk=float(req.t_pk), detectors_config=det_cfg)
-        ctx = SimulationContext(
-            config=sim_cfg,
-            scenario=scenario,
-            ctrl_rc_id=req.ctrl_rc_id or det_cfg.ctrl_rc_id,
-        )
 
-    raw = ctx.run()
-    frames, timeline, mode, ctrl_rc_ids = normalize_run_output(raw)
-    resp = RunResponseDTO(mode=mode, ctrl_rc_ids=ctrl_rc_ids, timeline=timeline, frames=frames)
-    return dto_to_dict(resp)
+    trace_cfg = _build_trace_config(req.trace)
+
+    if req.detectors_config is None:
+        raise ValueError("Either detectors_config or detectors_configs must be provided")
+    det_cfg = _build_detectors_config(req.detectors_config)
+    sim_cfg = SimulationConfig(
+        t_pk=float(req.t_pk),
+        detectors_config=det_cfg,
+        phase_trace=trace_cfg,
+        event_driven=req.event_driven,
+    )
+    return SimulationContext(
+        config=sim_cfg,
+        scenario=scenario,
+        ctrl_rc_id=req.ctrl_rc_id or det_cfg.ctrl_rc_id,
+    )
+
+
+def run_simulation(payload: Dict[str, Any]) -> Dict[str, Any]:
+    req = RunRequestDTO(**payload)
+    ctx = _build_context(req)
+
+    # Колоночный результат: при длинных сценариях не держим все TimelineStep в памяти,
+    # ответ сериализуется прямо из колонок (поля RunResponseDTO, без промежуточных DTO).
+    frames, timeline, mode, ctrl_rc_ids = columnar_run_output(ctx.run_columnar())
+    return {
+        "mode": mode,
+        "ctrl_rc_ids": ctrl_rc_ids,
+        "timeline": timeline,
+        "frames": frames,
+        "trace": ctx.trace_events() if req.trace is not None else None,
+    }
+
+
+def iter_simulation(payload: Dict[str, Any]) -> Iterator[Dict[str, Dict[str, Any]]]:
+    """
+    Streaming run_simulation: yields frames (ctrl_rc_id -> TimelineStepDTO dict)
+    while the simulation runs; same frames as run_simulation()["frames"].
+    The context is built eagerly so payload errors surface before the first frame.
+    The phase trace is not streamed (use run_simulation with "trace").
+    """
+    ctx = _build_context(RunRequestDTO(**payload))
+    return (
+        {str(rc_id): dto_to_dict(timeline_step_to_dto(step)) for rc_id, step in frame.items()}
+        for frame in ctx.iter_frames()
+    )
 
 
 def get_metadata() -> Dict[str, Any]:
@@ -18,6 +18,10 @@ def timeline_step_to_dto(step: Any) -> TimelineStepDTO:
         lz_state=bool(step.lz_state),
         lz_variant=int(step.lz_variant),
         flags=list(step.flags),
+        mu_state=step.mu_state,
+        nas_state=step.nas_state,
+        chas_state=step.chas_state,
+        dsp_state=step.dsp_state,
     )
 
 
@@ -66,3 +70,17 @@ def normalize_run_output(raw: Any) -> Tuple[List[Dict[str, TimelineStepDTO]], Li
     return frames, flat, mode, ctrl_rc_ids
 
 
+def columnar_run_output(store: Any) -> Tuple[List[Dict[str, Dict[str, Any]]], List[Dict[str, Any]], str, List[str]]:
+    """
+    Same shape as normalize_run_output(), but for a ColumnarTimeline and already
+    serialized: step dicts are read straight from the columns (no TimelineStepDTO,
+    no asdict copies). frames and timeline share the same step dicts.
+    """
+    ctrl_rc_ids = [str(rc_id) for rc_id in store.ctrl_rc_ids]
+    if not len(store):
+        return [], [], "single", []
+    mode = "single" if len(ctrl_rc_ids) == 1 else "multi"
+    flat = list(store.iter_records())
+    n = len(ctrl_rc_ids)
+    frames = [dict(zip(ctrl_rc_ids, flat[i : i + n])) for i in range(0, len(flat), n)]
+    return frames, flat, mode, ctrl_rc_ids
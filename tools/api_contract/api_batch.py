@@ -0,0 +1,101 @@
+from concurrent.futures import FIRST_COMPLETED, Future, ProcessPoolExecutor, wait
+import os
+import threading
+import time
+from typing import Any, Dict, List, Optional, Tuple
+
+from api_contract.api import run_simulation
+from api_contract.api_schema import BatchItemResultDTO, BatchResponseDTO, dto_to_dict
+
+
+# One cpu_count-sized pool per process, created lazily and never resized, so
+# workers keep the station snapshot warm across batches. A batch's max_workers
+# only bounds how many of its scenarios are in flight at once.
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_SIZE = max(1, os.cpu_count() or 1)
+_POOL_LOCK = threading.Lock()
+
+
+def _warm_worker() -> None:
+    """Pool initializer: build the station snapshot once per worker process."""
+    from station.station_snapshot import get_station_snapshot
+
+    get_station_snapshot()
+
+
+def _run_one(payload: Dict[str, Any]) -> Tuple[bool, Any, float]:
+    started = time.perf_counter()
+    try:
+        result: Any = run_simulation(payload)
+        ok = True
+    except Exception as exc:  # reported per scenario, the batch keeps going
+        result = f"{type(exc).__name__}: {exc}"
+        ok = False
+    return ok, result, (time.perf_counter() - started) * 1000.0
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=_POOL_SIZE, initializer=_warm_worker)
+        return _POOL
+
+
+def shutdown_batch_pool() -> None:
+    """Stops the shared pool (tests, process exit); the next batch creates a new one."""
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def _run_bounded(
+    pool: ProcessPoolExecutor, payloads: List[Dict[str, Any]], limit: int
+) -> List[Tuple[bool, Any, float]]:
+    """Runs payloads on the shared pool with at most `limit` in flight; input order."""
+    outcomes: List[Optional[Tuple[bool, Any, float]]] = [None] * len(payloads)
+    pending: Dict[Future, int] = {}
+    next_index = 0
+    while next_index < len(payloads) or pending:
+        while next_index < len(payloads) and len(pending) < limit:
+            pending[pool.submit(_run_one, payloads[next_index])] = next_index
+            next_index += 1
+        done, _ = wait(pending, return_when=FIRST_COMPLETED)
+        for fut in done:
+            outcomes[pending.pop(fut)] = fut.result()
+    return [o for o in outcomes if o is not None]
+
+
+def run_simulation_batch(payloads: List[Dict[str, Any]], max_workers: Optional[int] = None) -> Dict[str, Any]:
+    """
+    Runs N run_simulation payloads and returns results in input order with
+    per-scenario timing. A single payload (or max_workers=1) runs in-process.
+    """
+    started = time.perf_counter()
+    workers = max(1, min(int(max_workers or _POOL_SIZE), _POOL_SIZE, len(payloads) or 1))
+
+    if workers == 1 or len(payloads) <= 1:
+        outcomes = [_run_one(p) for p in payloads]
+        workers = 1
+    else:
+        outcomes = _run_bounded(_get_pool(), payloads, workers)
+
+    results: List[BatchItemResultDTO] = []
+    for index, (ok, value, elapsed_ms) in enumerate(outcomes):
+        results.append(
+            BatchItemResultDTO(
+                index=index,
+                ok=ok,
+                elapsed_ms=elapsed_ms,
+                result=value if ok else None,
+                error=None if ok else value,
+            )
+        )
+    resp = BatchResponseDTO(
+        results=results,
+        elapsed_ms=(time.perf_counter() - started) * 1000.0,
+        workers=workers,
+    )
+    return dto_to_dict(resp)
@@ -16,6 +16,10 @@ class TimelineStepDTO:
     lz_state: bool
     lz_variant: int
     flags: List[str]
+    mu_state: Optional[int] = None
+    nas_state: Optional[int] = None
+    chas_state: Optional[int] = None
+    dsp_state: Optional[int] = None
 
 
 @dataclass
@@ -26,6 +30,10 @@ class RunRequestDTO:
     detectors_configs: Dict[str, Dict[str, Any]] = field(default_factory=dict)
     ctrl_rc_id: Optional[str] = None
     ctrl_rc_ids: Optional[List[str]] = None
+    # Phase trace options (PhaseTraceConfig fields); None = tracing disabled.
+    trace: Optional[Dict[str, Any]] = None
+    # Event-driven stepping (SimulationConfig.event_driven): one frame per deadline segment.
+    event_driven: bool = False
 
 
 @dataclass
@@ -34,6 +42,23 @@ class RunResponseDTO:
     ctrl_rc_ids: List[str]
     timeline: List[TimelineStepDTO]
     frames: List[Dict[str, TimelineStepDTO]]
+    trace: Optional[List[Dict[str, Any]]] = None
+
+
+@dataclass
+class BatchItemResultDTO:
+    index: int
+    ok: bool
+    elapsed_ms: float
+    result: Optional[Dict[str, Any]] = None
+    error: Optional[str] = None
+
+
+@dataclass
+class BatchResponseDTO:
+    results: List[BatchItemResultDTO]
+    elapsed_ms: float
+    workers: int
 
 
 @dataclass
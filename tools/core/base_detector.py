@@ -4,6 +4,8 @@ from enum import Enum
 from typing import Any, Callable, List, Optional, Tuple, Dict
 from dataclasses import dataclass, field
 
+from core import phase_trace
+
 
 class CompletionMode(Enum):
     FREE_TIME = "free_time"
@@ -113,6 +115,13 @@ class BaseDetector:
         self.completion_timer: float = 0.0
         self.last_open_offset: Optional[float] = None
         self.last_close_offset: Optional[float] = None
+        # True, если последний update не изменил состояние (при тех же входах не изменит и дальше)
+        self.at_rest: bool = False
+
+        # Скомпилированное ядро update (core.detectors.kernels); None — интерпретатор.
+        self._custom_cond = condition_fn is not None
+        self._custom_compl = completion_state_fn is not None
+        self._kernel = None
 
     def _detect_declarative_mode(self) -> bool:
         """РџСЂРѕРІРµСЂСЏРµРј, РµСЃС‚СЊ Р»Рё С…РѕС‚СЏ Р±С‹ РѕРґРЅР° С„Р°Р·Р° СЃ mask_fn"""
@@ -261,9 +270,11 @@ class BaseDetector:
 
             cond = self._cond(self.current_phase_id, step)
             
-            # DEBUG: Log phase state
-            prev, ctrl, nxt = self._get_effective_neighbors(step)
-            print(f"DEBUG {id(self)}: {self.config.variant_name} ph={self.current_phase_id} timer={self.timer:.2f}/{phase.duration:.2f} cond={cond} rem={remaining:.2f} prev={prev} ctrl={ctrl} nxt={nxt}")
+            if phase_trace.ENABLED:
+                self._trace(
+                    "formation", step,
+                    timer=self.timer, duration=phase.duration, cond=bool(cond), remaining=remaining,
+                )
 
             if not cond:
                 # Для фаз, Requiring neighbors...
@@ -275,7 +286,8 @@ class BaseDetector:
                         or not modes.get("next_control_ok", True)
                     )
                 ):
-                    print(f"DEBUG {id(self)}: RESET due to control loss! modes={modes}")
+                    if phase_trace.ENABLED:
+                        self._trace("reset_control_loss", step)
                     self.timer = 0.0
                     self.current_phase_id = self.config.initial_phase_id
                     break
@@ -358,18 +370,25 @@ class BaseDetector:
         self.completion_timer = 0.0
         self.last_open_offset = None
         self.last_close_offset = None
+        self.at_rest = False
 
     def update(self, step: Any, dt: float) -> Tuple[bool, bool]:
         """
         Обновление состояния детектора на шаге dt.
         """
-        prev, ctrl, nxt = self._get_effective_neighbors(step)
-        print(f"DEBUG {id(self)}: {self.config.variant_name} phase={self.current_phase_id} prev={prev} ctrl={ctrl} nxt={nxt} rc_states={{k:v for k,v in step.rc_states.items() if k in (prev, ctrl, nxt)}}")
+        # Ядро — пока в этом контексте нет трассировки; ENABLED общий на процесс
+        # и не должен переводить на интерпретатор прогоны без трассировки.
+        kernel = self._kernel
+        if kernel is not None and phase_trace._CURRENT.get() is None:
+            return kernel.update(self, step, dt)
+        if phase_trace.ENABLED:
+            self._trace("update", step, dt=float(dt), active=self.active)
         
         opened = False
         closed = False
         self.last_open_offset = None
         self.last_close_offset = None
+        before = (self.current_phase_id, self.timer, self.active, self.completion_timer)
 
         if not self.active:
             opened, remaining = self._update_formation(step, dt)
@@ -389,8 +408,45 @@ class BaseDetector:
             if closed:
                 self.last_close_offset = float(close_off)
 
+        self.at_rest = not opened and not closed and before == (
+            self.current_phase_id, self.timer, self.active, self.completion_timer
+        )
         return opened, closed
 
+    def next_deadline(self, inputs_changed: bool = False) -> Optional[float]:
+        """
+        Время до ближайшего перехода (порог фазы / t_kon) при неизменных входах.
+        None — детектор в покое и без смены входов ничего не произойдёт.
+        inputs_changed=True: входы сменились, покой прошлого шага не в счёт.
+        """
+        if self.at_rest and not inputs_changed:
+            return None
+        if self.active:
+            return max(self.config.t_kon - self.completion_timer, 0.0)
+        phase = self._get_phase(self.current_phase_id)
+        if phase is None:
+            return None
+        return max(phase.duration - self.timer, 0.0)
+
+    def _trace(self, kind: str, step: Any, **fields: Any) -> None:
+        """Событие трассировки (вызывать только при phase_trace.ENABLED)."""
+        tracer = phase_trace.current_tracer()
+        if tracer is None:
+            return
+        name = self.config.variant_name
+        prev, ctrl, nxt = self._get_effective_neighbors(step)
+        if not tracer.wants(name, ctrl):
+            return
+        rc_states = getattr(step, "rc_states", {}) or {}
+        tracer.emit(
+            kind, name, ctrl,
+            phase=self.current_phase_id,
+            prev=prev,
+            next=nxt,
+            rc_states={k: v for k, v in rc_states.items() if k in (prev, ctrl, nxt)},
+            **fields,
+        )
+
     def get_current_mask_id(self) -> Optional[int]:
         """Р’РѕР·РІСЂР°С‰Р°РµС‚ ID РјР°СЃРєРё С‚РµРєСѓС‰РµР№ С„Р°Р·С‹ (РґР»СЏ РѕС‚Р»Р°РґРєРё)"""
         phase = self._get_phase(self.current_phase_id)
@@ -1,4 +1,4 @@
-﻿from typing import Any, Tuple, List
+﻿from typing import Any, Tuple, List, Optional
 from core.base_detector import BaseDetector
 
 class BaseVariantWrapper:
@@ -49,3 +49,7 @@ class BaseVariantWrapper:
                 self.last_close_offset = min(closed_offsets)
         
         return opened, closed
+
+    def next_deadline(self, inputs_changed: bool = False) -> Optional[float]:
+        deadlines = [d for d in (det.next_deadline(inputs_changed) for det in self.detectors) if d is not None]
+        return min(deadlines) if deadlines else None
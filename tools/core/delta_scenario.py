@@ -0,0 +1,147 @@
+# -*- coding: utf-8 -*-
+"""
+delta_scenario.py — сценарий в виде начального состояния и дельт по шагам.
+
+ScenarioStep держит полные rc_states/switch_states/signal_states на каждый шаг,
+хотя между соседними шагами меняется один-два объекта. DeltaScenario хранит:
+
+- таблицу объектов (вид, ID) — объект задаётся индексом в ней;
+- начальные состояния всех объектов таблицы;
+- на шаг: t и изменения (индекс, состояние) в общем пуле array('i').
+
+Шаги ScenarioStep разворачиваются лениво при обходе: словари вида, в котором
+на шаге ничего не изменилось, — те же объекты, что у предыдущего шага
+(только для чтения, как и словари StationFrame). SimulationContext хранит
+DeltaScenario как есть, без разворачивания в список.
+
+Для C: массив t + пул дельт (idx, value) со смещениями по шагам.
+"""
+
+from __future__ import annotations
+
+from array import array
+from itertools import islice
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from core.sim_types import ScenarioStep
+
+RC = "rc"
+SWITCH = "switch"
+SIGNAL = "signal"
+KINDS = (RC, SWITCH, SIGNAL)
+
+# Состояния хранятся в array('i'): допустимый диапазон — int32
+STATE_MIN = -(2 ** 31)
+STATE_MAX = 2 ** 31 - 1
+
+# Поля ScenarioStep помимо состояний (задаются на шаг явно, по умолчанию пустые)
+_EXTRA_FIELDS = ("modes", "mu", "dispatcher_control_state", "auto_actions", "indicator_states")
+
+
+class DeltaScenario(Sequence[ScenarioStep]):
+    """
+    Последовательность ScenarioStep, развёрнутая из начального состояния и дельт.
+    Реализует sim_types.LazyScenario: SimulationContext не разворачивает её в список.
+    """
+
+    def __init__(
+        self,
+        objects: Sequence[Tuple[str, str]],
+        initial: Sequence[Optional[int]],
+    ) -> None:
+        if len(initial) != len(objects):
+            raise ValueError("initial must have one state per object")
+        self.objects: Tuple[Tuple[str, str], ...] = tuple(objects)
+        self._kind_of: List[int] = []
+        for kind, _obj_id in self.objects:
+            if kind not in KINDS:
+                raise ValueError(f"Unknown object kind: {kind}")
+            self._kind_of.append(KINDS.index(kind))
+        for value in initial:
+            if value is not None and not STATE_MIN <= int(value) <= STATE_MAX:
+                raise ValueError(f"State out of range: {value}")
+        # None — объекта нет в начальном состоянии (появится первой дельтой)
+        self.initial: Tuple[Optional[int], ...] = tuple(initial)
+        self._t = array("d")
+        self._offsets = array("l", [0])
+        self._delta_idx = array("i")
+        self._delta_val = array("i")
+        self._extras: Dict[int, Dict[str, Any]] = {}
+
+    def append(
+        self,
+        t: float,
+        changes: Iterable[Tuple[int, int]] = (),
+        **extras: Any,
+    ) -> None:
+        """Шаг: длительность t, изменения (индекс объекта, состояние), поля _EXTRA_FIELDS."""
+        n = len(self.objects)
+        changes = [(idx, int(value)) for idx, value in changes]
+        # Проверка до записи: при ошибке пул дельт не меняется
+        for idx, value in changes:
+            if not 0 <= idx < n:
+                raise IndexError(f"Object index out of range: {idx}")
+            if not STATE_MIN <= value <= STATE_MAX:
+                raise ValueError(f"State out of range: {value}")
+        unknown = set(extras) - set(_EXTRA_FIELDS)
+        if unknown:
+            raise TypeError(f"Unknown ScenarioStep fields: {sorted(unknown)}")
+        for idx, value in changes:
+            self._delta_idx.append(idx)
+            self._delta_val.append(value)
+        if any(v not in (None, {}) for v in extras.values()):
+            self._extras[len(self._t)] = extras
+        self._t.append(float(t))
+        self._offsets.append(len(self._delta_idx))
+
+    def __len__(self) -> int:
+        return len(self._t)
+
+    def __iter__(self) -> Iterator[ScenarioStep]:
+        states: List[Dict[str, int]] = [{}, {}, {}]
+        for (kind, obj_id), k, value in zip(self.objects, self._kind_of, self.initial):
+            if value is not None:
+                states[k][obj_id] = int(value)
+        objects, kind_of = self.objects, self._kind_of
+        for i, t in enumerate(self._t):
+            lo, hi = self._offsets[i], self._offsets[i + 1]
+            copied = [False, False, False]
+            for j in range(lo, hi):
+                idx = self._delta_idx[j]
+                k = kind_of[idx]
+                obj_id = objects[idx][1]
+                value = self._delta_val[j]
+                if states[k].get(obj_id) == value:
+                    continue
+                if not copied[k]:
+                    # Копия при записи: словари прошлого шага уже отданы наружу
+                    states[k] = dict(states[k])
+                    copied[k] = True
+                states[k][obj_id] = value
+            extras = self._extras.get(i, {})
+            yield ScenarioStep(
+                t=t,
+                rc_states=states[0],
+                switch_states=states[1],
+                signal_states=states[2],
+                modes=dict(extras.get("modes") or {}),
+                mu=dict(extras.get("mu") or {}),
+                dispatcher_control_state=extras.get("dispatcher_control_state"),
+                auto_actions=dict(extras.get("auto_actions") or {}),
+                indicator_states=dict(extras.get("indicator_states") or {}),
+            )
+
+    def __getitem__(self, index: Union[int, slice]) -> Any:
+        # Произвольный доступ — проход от начала (O(дельты до шага)); основной путь — __iter__.
+        if isinstance(index, slice):
+            return list(self)[index]
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError("DeltaScenario index out of range")
+        return next(islice(iter(self), index, None))
+
+    def has_negative_t(self) -> bool:
+        """Есть ли шаги с t < 0 (истории исключений нужны только тогда)."""
+        return any(t < 0.0 for t in self._t)
@@ -0,0 +1,315 @@
+# -*- coding: utf-8 -*-
+"""
+kernels.py — компиляция BaseDetector в специализированную функцию update.
+
+BaseDetector интерпретирует DetectorConfig на каждом вызове: линейный поиск фазы
+(_get_phase), ветвление по requires_neighbors, getattr/hasattr в
+_get_effective_neighbors, обход abort_exception_keys. compile_detector() один раз
+генерирует Python-исходник update(det, step, dt) для конкретного конфига:
+фазы — индексированные ветки с константами (длительность, следующая фаза,
+режим таймера), проверки соседей и исключений развёрнуты, маски вызываются
+напрямую. Состояние (current_phase_id, timer, active, ...) остаётся в BaseDetector,
+так что reset/next_deadline/трассировка работают как раньше.
+
+Исходник доступен для просмотра: kernel_source(det) или det._kernel.source;
+он же зарегистрирован в linecache (трассировки исключений показывают строки).
+
+Интерпретируемый BaseDetector — эталон:
+- ENABLED = False — init_detectors_engine не компилирует (чистый интерпретатор);
+- PARITY_CHECK = True — каждый вызов ядра повторяется интерпретатором с того же
+  состояния, расхождение — KernelMismatch (включается в test_detector_kernels).
+Если в текущем контексте активна трассировка (phase_trace.tracing),
+BaseDetector.update идёт по интерпретируемому пути — события те же; прогоны в
+других потоках/контекстах продолжают работать на ядрах.
+
+Для C: тот же генератор может выдавать switch по индексу фазы.
+"""
+
+from __future__ import annotations
+
+import linecache
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Tuple
+
+from core.base_detector import BaseDetector, CompletionMode, NeighborRequirement
+from core.uni_states import rc_is_free, rc_is_occupied
+
+ENABLED: bool = True
+PARITY_CHECK: bool = False
+
+_EPS = 1e-9
+_CODE_CACHE: Dict[str, Any] = {}
+
+
+class KernelMismatch(RuntimeError):
+    """Ядро и интерпретатор BaseDetector разошлись (режим PARITY_CHECK)."""
+
+
+class CompiledKernel(NamedTuple):
+    update: Callable[[BaseDetector, Any, float], Tuple[bool, bool]]
+    source: str
+    filename: str
+
+
+def _phase_table(det: BaseDetector) -> List[Any]:
+    """Фазы в порядке конфига; для повторяющегося phase_id — первая (как _get_phase)."""
+    seen = set()
+    out = []
+    for phase in det.config.phases:
+        if phase.phase_id in seen:
+            continue
+        seen.add(phase.phase_id)
+        out.append(phase)
+    return out
+
+
+def _cond_expr(phase: Any, idx: int, ctrl_const: bool) -> str:
+    if phase.mask_fn is None:
+        return "False"
+    req = phase.requires_neighbors
+    parts = []
+    if req == NeighborRequirement.ONLY_CTRL:
+        parts.append("ctrl in step.rc_states")
+    elif req == NeighborRequirement.BOTH:
+        parts.append('modes.get("prev_control_ok", True)')
+        parts.append('modes.get("next_control_ok", True)')
+    elif req == NeighborRequirement.ONE_NC:
+        parts.append('(modes.get("prev_nc", False) or modes.get("next_nc", False))')
+    elif req == NeighborRequirement.ONE_ADJ:
+        parts.append("(prev or nxt)")
+    if not ctrl_const:
+        parts.insert(0, "ctrl")
+    parts.append(f"MASK_{idx}(step, prev, ctrl, nxt)")
+    return " and ".join(parts)
+
+
+def generate_source(det: BaseDetector) -> str:
+    """Исходник update(det, step, dt) для конфига детектора (без привязки к объектам)."""
+    cfg = det.config
+    phases = _phase_table(det)
+    ctrl_const = bool(det._config_ctrl_rc)
+    custom_cond = getattr(det, "_custom_cond", False)
+    custom_compl = getattr(det, "_custom_compl", False)
+    L: List[str] = []
+    w = L.append
+
+    w(f"# variant={cfg.variant_name!r} phases={[p.phase_id for p in phases]} t_kon={cfg.t_kon!r}")
+    w("def formation(det, step, dt):")
+    w('    modes = getattr(step, "modes", {}) or {}')
+    w("    try:")
+    w("        prev = step.effective_prev_rc")
+    w("    except AttributeError:")
+    w("        prev = CFG_PREV")
+    if ctrl_const:
+        w("    ctrl = CTRL")
+    else:
+        w('    ctrl = getattr(step, "ctrl_rc_name", None) or ""')
+    w("    try:")
+    w("        nxt = step.effective_next_rc")
+    w("    except AttributeError:")
+    w("        nxt = CFG_NEXT")
+    w("    pid = det.current_phase_id")
+    w("    timer = det.timer")
+    w("    opened = False")
+    w("    remaining = float(dt)")
+    w("    guard = 0")
+    w(f"    while remaining > {_EPS!r}:")
+    w("        guard += 1")
+    w("        if guard > 32:")
+    w("            break")
+    for idx, phase in enumerate(phases):
+        kw = "if" if idx == 0 else "elif"
+        w(f"        {kw} pid == {int(phase.phase_id)!r}:  # [{idx}] mask_id={phase.mask_id!r}")
+        keys = tuple(phase.abort_exception_keys or ())
+        if keys:
+            w("            if " + " or ".join(f"modes.get({k!r}, False)" for k in keys) + ":")
+            w("                timer = 0.0")
+            if phase.reset_on_exception:
+                w("                pid = INITIAL")
+            w("                break")
+        if custom_cond:
+            w("            cond = det._cond(pid, step)")
+        else:
+            w(f"            cond = {_cond_expr(phase, idx, ctrl_const)}")
+        w("            if not cond:")
+        if phase.requires_neighbors == NeighborRequirement.BOTH:
+            w('                if not modes.get("prev_control_ok", True) or not modes.get("next_control_ok", True):')
+            w("                    timer = 0.0")
+            w("                    pid = INITIAL")
+            w("                    break")
+        if phase.timer_mode == "continuous":
+            w("                timer = 0.0")
+        w("                break")
+        w(f"            need = DUR_{idx} - timer  # duration={phase.duration!r}")
+        w("            if need < 0.0:")
+        w("                need = 0.0")
+        w(f"            consume = remaining if need <= {_EPS!r} else min(remaining, need)")
+        w("            timer += consume")
+        w("            remaining -= consume")
+        w(f"            if timer + {_EPS!r} < DUR_{idx}:")
+        w("                break")
+        if int(phase.next_phase_id) < 0:
+            w("            det.active = True")
+            w("            det.completion_timer = 0.0")
+            w("            timer = 0.0")
+            w("            opened = True")
+            w("            break")
+        else:
+            w(f"            pid = {int(phase.next_phase_id)!r}")
+            if phase.reset_on_exit:
+                w("            timer = 0.0")
+    if phases:
+        w("        else:")
+        w("            break")
+    else:
+        w("        break")
+    w("    det.current_phase_id = pid")
+    w("    det.timer = timer")
+    w("    return opened, remaining")
+    w("")
+    w("def completion(det, step, dt):")
+    if custom_compl:
+        w("    is_free, is_occ = det._compl_state(step)")
+        test = "is_free" if cfg.completion_mode == CompletionMode.FREE_TIME else "is_occ"
+    else:
+        if ctrl_const:
+            w("    st = step.rc_states.get(CTRL, 0)")
+        else:
+            w('    ctrl = getattr(step, "ctrl_rc_name", None) or ""')
+            w("    st = step.rc_states.get(ctrl, 0) if ctrl else 3")
+        test = "rc_is_free(st)" if cfg.completion_mode == CompletionMode.FREE_TIME else "rc_is_occupied(st)"
+    w("    prev_timer = det.completion_timer")
+    w(f"    if {test}:")
+    w("        det.completion_timer = prev_timer + dt")
+    w("    else:")
+    w("        det.completion_timer = 0.0")
+    w("    if det.completion_timer >= T_KON:")
+    w("        need = T_KON - prev_timer")
+    w("        if need < 0.0:")
+    w("            need = 0.0")
+    w("        close_offset = min(float(dt), need)")
+    w("        det.reset()")
+    w("        return True, close_offset")
+    w("    return False, 0.0")
+    w("")
+    w("def update(det, step, dt):")
+    w("    opened = False")
+    w("    closed = False")
+    w("    det.last_open_offset = None")
+    w("    det.last_close_offset = None")
+    w("    before = (det.current_phase_id, det.timer, det.active, det.completion_timer)")
+    w("    if not det.active:")
+    w("        opened, remaining = formation(det, step, dt)")
+    w("        if opened:")
+    w("            open_off = float(dt) - float(remaining)")
+    w("            det.last_open_offset = open_off")
+    w("            if det.active and remaining > 0.0:")
+    w("                # completion может сбросить детектор (reset обнуляет last_open_offset)")
+    w("                closed, close_off = completion(det, step, remaining)")
+    w("                if closed:")
+    w("                    det.last_close_offset = open_off + float(close_off)")
+    w("    else:")
+    w("        closed, close_off = completion(det, step, dt)")
+    w("        if closed:")
+    w("            det.last_close_offset = float(close_off)")
+    w("    det.at_rest = not opened and not closed and before == (")
+    w("        det.current_phase_id, det.timer, det.active, det.completion_timer")
+    w("    )")
+    w("    return opened, closed")
+    return "\n".join(L) + "\n"
+
+
+def _compiled_code(source: str, filename: str) -> Any:
+    # Один code object на уникальный исходник: РЦ с одинаковым конфигом делят компиляцию.
+    code = _CODE_CACHE.get(source)
+    if code is None:
+        code = compile(source, filename, "exec")
+        _CODE_CACHE[source] = code
+        linecache.cache[filename] = (len(source), None, source.splitlines(True), filename)
+    return code
+
+
+def compile_detector(det: BaseDetector) -> CompiledKernel:
+    """Генерирует и компилирует ядро детектора (det._kernel не меняет)."""
+    source = generate_source(det)
+    filename = f"<detector-kernel:{det.config.variant_name}:{abs(hash(source)):x}>"
+    code = _compiled_code(source, filename)
+    phases = _phase_table(det)
+    namespace: Dict[str, Any] = {
+        "__builtins__": __builtins__,
+        "CFG_PREV": det._config_prev_rc,
+        "CFG_NEXT": det._config_next_rc,
+        "CTRL": det._config_ctrl_rc,
+        "INITIAL": det.config.initial_phase_id,
+        "T_KON": det.config.t_kon,
+        "rc_is_free": rc_is_free,
+        "rc_is_occupied": rc_is_occupied,
+    }
+    for idx, phase in enumerate(phases):
+        namespace[f"MASK_{idx}"] = phase.mask_fn
+        namespace[f"DUR_{idx}"] = phase.duration
+    exec(code, namespace)
+    return CompiledKernel(update=namespace["update"], source=source, filename=code.co_filename)
+
+
+def install_kernel(det: BaseDetector) -> CompiledKernel:
+    """Компилирует детектор и переключает его update на ядро."""
+    kernel = compile_detector(det)
+    det._kernel = _with_parity_check(kernel) if PARITY_CHECK else kernel
+    return kernel
+
+
+def kernel_source(det: BaseDetector) -> Optional[str]:
+    """Исходник установленного ядра (None — детектор интерпретируется)."""
+    kernel = getattr(det, "_kernel", None)
+    return kernel.source if kernel is not None else None
+
+
+_STATE_ATTRS = (
+    "current_phase_id",
+    "timer",
+    "active",
+    "completion_timer",
+    "last_open_offset",
+    "last_close_offset",
+    "at_rest",
+)
+
+
+def _snapshot(det: BaseDetector) -> Tuple[Any, ...]:
+    return tuple(getattr(det, a) for a in _STATE_ATTRS)
+
+
+def _with_parity_check(kernel: CompiledKernel) -> CompiledKernel:
+    compiled_update = kernel.update
+
+    def update(det: BaseDetector, step: Any, dt: float) -> Tuple[bool, bool]:
+        before = _snapshot(det)
+        got = compiled_update(det, step, dt)
+        got_state = _snapshot(det)
+        for attr, value in zip(_STATE_ATTRS, before):
+            setattr(det, attr, value)
+        kernel_attr, det._kernel = det._kernel, None
+        try:
+            want = det.update(step, dt)
+        finally:
+            det._kernel = kernel_attr
+        want_state = _snapshot(det)
+        if (got, got_state) != (want, want_state):
+            raise KernelMismatch(
+                f"detector kernel mismatch ({det.config.variant_name}): "
+                f"compiled={got} {got_state} interpreted={want} {want_state}\n{kernel.source}"
+            )
+        return want
+
+    return kernel._replace(update=update)
+
+
+def compile_detectors(base_detectors: Any) -> int:
+    """Ставит ядра всем BaseDetector из итерируемого (key, det); число скомпилированных."""
+    if not ENABLED:
+        return 0
+    n = 0
+    for _key, det in base_detectors:
+        install_kernel(det)
+        n += 1
+    return n
@@ -2,19 +2,14 @@
 from typing import List, Tuple
 
 from core.base_detector import BaseDetector
+from core.detectors.registry import enabled_detectors
 from core.detectors.types import DetectorsConfig, DetectorsState
 
 
 def iter_base_detectors_with_key(det_state: DetectorsState):
     """Итерирует все BaseDetector в состоянии, включая ветки wrapper-вариантов."""
-    for key in (
-        "v1", "v2", "v3", "v4", "v5", "v6", "v7", "v8",
-        "ls9", "ls1", "ls2", "ls4", "ls5", "ls6",
-        "lz9", "lz10", "lz11", "lz12", "lz13",
-    ):
-        obj = getattr(det_state, key, None)
-        if obj is None:
-            continue
+    for spec, obj in enabled_detectors(det_state):
+        key = spec.key
         if isinstance(obj, BaseDetector):
             yield key, obj
             continue
@@ -0,0 +1,332 @@
+# -*- coding: utf-8 -*-
+"""
+Табличный реестр вариантов детекторов ЛЗ/ЛС.
+
+Одна запись DetectorSpec на вариант: поле DetectorsState, номер варианта
+(ЛЗ — 1..13, ЛС — 100 + n), семейство, флаг включения в DetectorsConfig,
+фабрика, поля/биты результата. Порядок записей — порядок обновления.
+
+init_detectors_engine строит по реестру компактный список включённых
+детекторов (DetectorsState.enabled) один раз; все пошаговые пути
+(update_detectors, reset_formation_phases, build_flags_simple, дедлайны)
+обходят только его.
+"""
+
+from dataclasses import dataclass
+from typing import Any, Callable, Dict, Tuple
+
+from core.detectors.types import DetectorsConfig, DetectorsState
+from core.flag_bits import ACTIVE, CLOSED, OPEN, FlagBits, variant_bit
+from variants.lz.variant1_lz_factory import make_lz1_detector
+from variants.lz.variant2_lz_factory import make_lz2_detector
+from variants.lz.variant3_lz_factory import make_lz3_detector
+from variants.lz.variant4_lz_factory import make_lz4_detector
+from variants.lz.variant5_lz_factory import make_lz5_detector
+from variants.lz.variant6_lz_factory import make_lz6_detector
+from variants.lz.variant7_lz_factory import make_lz7_detector
+from variants.lz.variant8_lz_factory import make_lz8_detector
+from variants.ls.variant_ls9_lz_factory import make_ls9_detector
+from variants.ls.variant_ls1_lz_factory import make_ls1_detector
+from variants.ls.variant_ls2_lz_factory import make_ls2_detector
+from variants.ls.variant_ls4_lz_factory import make_ls4_detector
+from variants.ls.variant_ls5_lz_factory import make_ls5_detector
+from variants.lz.variant_lz9_lz_factory import make_lz9_detector
+from variants.lz.variant_lz12_lz_factory import make_lz12_detector
+from variants.lz.variant_lz11_lz_factory import make_lz11_detector
+from variants.lz.variant_lz13_lz_factory import make_lz13_detector
+from variants.lz.variant_lz10_lz_factory import make_lz10_detector
+from variants.ls.variant_ls6_lz_factory import make_ls6_detector
+
+
+@dataclass(frozen=True)
+class DetectorSpec:
+    key: str  # поле DetectorsState
+    variant: int  # ЛЗ: 1..13, ЛС: 100 + n (как DetectorsResult.active_variant)
+    family: str  # "lz" | "ls"
+    enable_attr: str  # флаг в DetectorsConfig
+    factory: Callable[[DetectorsConfig], Any]
+    open_attr: str  # поле DetectorsResult
+    closed_attr: str
+    active_bit: FlagBits
+    open_bit: FlagBits
+    closed_bit: FlagBits
+    # Исторически ls5/lz9..lz13/ls6 не выставляют DetectorsResult.opened/closed.
+    marks_event: bool = True
+    # Исторически ls2 не сбрасывается при смене соседей.
+    reset_on_topology: bool = True
+
+
+# Фабрики — именованные функции модуля (DetectorsState.enabled должен сериализоваться).
+def _make_v1(cfg: DetectorsConfig) -> Any:
+    return make_lz1_detector(
+        prev_rc_name=cfg.prev_rc_name,
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        next_rc_name=cfg.next_rc_name,
+        ts01_lz1=cfg.ts01_lz1,
+        tlz_lz1=cfg.tlz_lz1,
+        tkon_lz1=cfg.tkon_lz1,
+    )
+
+
+def _make_v2(cfg: DetectorsConfig) -> Any:
+    return make_lz2_detector(
+        prev_rc_name=cfg.prev_rc_name,
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        next_rc_name=cfg.next_rc_name,
+        ts01_lz2=cfg.ts01_lz2,
+        ts02_lz2=cfg.ts02_lz2,
+        tlz_lz2=cfg.tlz_lz2,
+        tkon_lz2=cfg.tkon_lz2,
+    )
+
+
+def _make_v3(cfg: DetectorsConfig) -> Any:
+    return make_lz3_detector(
+        prev_rc_name=cfg.prev_rc_name,
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        next_rc_name=cfg.next_rc_name,
+        ts01_lz3=cfg.ts01_lz3,
+        ts02_lz3=cfg.ts02_lz3,
+        tlz_lz3=cfg.tlz_lz3,
+        tkon_lz3=cfg.tkon_lz3,
+    )
+
+
+def _make_v4(cfg: DetectorsConfig) -> Any:
+    return make_lz4_detector(
+        ctrl_rc_id=cfg.ctrl_rc_id,
+        ts01_lz4=cfg.ts01_lz4,
+        tlz_lz4=cfg.tlz_lz4,
+        tkon_lz4=cfg.tkon_lz4,
+        sig_prev_to_ctrl=cfg.sig_lz4_prev_to_ctrl,
+        sig_ctrl_to_next=cfg.sig_lz4_ctrl_to_next,
+    )
+
+
+def _make_v5(cfg: DetectorsConfig) -> Any:
+    return make_lz5_detector(
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        ts01_lz5=cfg.ts01_lz5,
+        tlz_lz5=cfg.tlz_lz5,
+        tkon_lz5=cfg.tkon_lz5,
+    )
+
+
+def _make_v6(cfg: DetectorsConfig) -> Any:
+    return make_lz6_detector(
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        ts01_lz6=cfg.ts01_lz6,
+        tlz_lz6=cfg.tlz_lz6,
+        tkon_lz6=cfg.tkon_lz6,
+    )
+
+
+def _make_v7(cfg: DetectorsConfig) -> Any:
+    return make_lz7_detector(
+        prev_rc_name=cfg.prev_rc_name,
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        next_rc_name=cfg.next_rc_name,
+        ts01_lz7=cfg.ts01_lz7,
+        tlz_lz7=cfg.tlz_lz7,
+        tkon_lz7=cfg.tkon_lz7,
+    )
+
+
+def _make_v8(cfg: DetectorsConfig) -> Any:
+    return make_lz8_detector(
+        prev_rc_name=cfg.prev_rc_name,
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        next_rc_name=cfg.next_rc_name,
+        ts01_lz8=cfg.ts01_lz8,
+        ts02_lz8=cfg.ts02_lz8,
+        tlz_lz8=cfg.tlz_lz8,
+        tkon_lz8=cfg.tkon_lz8,
+    )
+
+
+def _make_ls9(cfg: DetectorsConfig) -> Any:
+    return make_ls9_detector(
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        ts01_ls9=cfg.ts01_ls9,
+        tlz_ls9=cfg.tlz_ls9,
+        tkon_ls9=cfg.tkon_ls9,
+    )
+
+
+def _make_ls1(cfg: DetectorsConfig) -> Any:
+    return make_ls1_detector(
+        prev_rc_name=cfg.prev_rc_name,
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        next_rc_name=cfg.next_rc_name,
+        ts01_ls1=cfg.ts01_ls1,
+        tlz_ls1=cfg.tlz_ls1,
+        tkon_ls1=cfg.tkon_ls1,
+    )
+
+
+def _make_ls2(cfg: DetectorsConfig) -> Any:
+    return make_ls2_detector(
+        prev_rc_name=cfg.prev_rc_name,
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        next_rc_name=cfg.next_rc_name,
+        ts01_ls2=cfg.ts01_ls2,
+        tlz_ls2=cfg.tlz_ls2,
+        ts02_ls2=cfg.ts02_ls2,
+        tkon_ls2=cfg.tkon_ls2,
+    )
+
+
+def _make_ls4(cfg: DetectorsConfig) -> Any:
+    return make_ls4_detector(
+        prev_rc_name=cfg.prev_rc_name,
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        next_rc_name=cfg.next_rc_name,
+        ts01_ls4=cfg.ts01_ls4,
+        tlz01_ls4=cfg.tlz01_ls4,
+        tlz02_ls4=cfg.tlz02_ls4,
+        ts02_ls4=cfg.ts02_ls4,
+        tkon_ls4=cfg.tkon_ls4,
+    )
+
+
+def _make_ls5(cfg: DetectorsConfig) -> Any:
+    return make_ls5_detector(
+        prev_rc_name=cfg.prev_rc_name,
+        ctrl_rc_name=cfg.ctrl_rc_name,
+        next_rc_name=cfg.next_rc_name,
+        ts01_ls5=cfg.ts01_ls5,
+        tlz_ls5=cfg.tlz_ls5,
+        tkon_ls5=cfg.tkon_ls5,
+    )
+
+
+def _make_lz9(cfg: DetectorsConfig) -> Any:
+    return make_lz9_detector(
+        ctrl_rc_id=cfg.ctrl_rc_id,
+        ts01_lz9=cfg.ts01_lz9,
+        tlz_lz9=cfg.tlz_lz9,
+        t_kon=cfg.tkon_lz9,
+    )
+
+
+def _make_lz12(cfg: DetectorsConfig) -> Any:
+    return make_lz12_detector(
+        ctrl_rc_id=cfg.ctrl_rc_id,
+        ts01_lz12=cfg.ts01_lz12,
+        ts02_lz12=cfg.ts02_lz12,
+        tlz_lz12=cfg.tlz_lz12,
+        t_kon=cfg.tkon_lz12,
+    )
+
+
+def _make_lz11(cfg: DetectorsConfig) -> Any:
+    return make_lz11_detector(
+        ctrl_rc_id=cfg.ctrl_rc_id,
+        sig_ids=(cfg.sig_lz11_a, cfg.sig_lz11_b),
+        ts01_lz11=cfg.ts01_lz11,
+        tlz_lz11=cfg.tlz_lz11,
+        tkon_lz11=cfg.tkon_lz11,
+    )
+
+
+def _make_lz13(cfg: DetectorsConfig) -> Any:
+    return make_lz13_detector(
+        ctrl_rc_id=cfg.ctrl_rc_id,
+        prev_rc_id=cfg.prev_rc_name,
+        next_rc_id=cfg.next_rc_name,
+        sig_prev=cfg.sig_lz13_prev,
+        sig_next=cfg.sig_lz13_next,
+        ts01_lz13=cfg.ts01_lz13,
+        ts02_lz13=cfg.ts02_lz13,
+        tlz_lz13=cfg.tlz_lz13,
+        tkon_lz13=cfg.tkon_lz13,
+    )
+
+
+def _make_lz10(cfg: DetectorsConfig) -> Any:
+    return make_lz10_detector(
+        ctrl_rc_id=cfg.ctrl_rc_id,
+        prev_rc_id=cfg.prev_rc_name,
+        next_rc_id=cfg.next_rc_name,
+        sig_to_next=cfg.sig_lz10_to_next,
+        sig_to_prev=cfg.sig_lz10_to_prev,
+        ts01_lz10=cfg.ts01_lz10,
+        ts02_lz10=cfg.ts02_lz10,
+        ts03_lz10=cfg.ts03_lz10,
+        tlz_lz10=cfg.tlz_lz10,
+        tkon_lz10=cfg.tkon_lz10,
+    )
+
+
+def _make_ls6(cfg: DetectorsConfig) -> Any:
+    return make_ls6_detector(
+        ctrl_rc_id=cfg.ctrl_rc_id,
+        prev_rc_id=cfg.prev_rc_name,
+        next_rc_id=cfg.next_rc_name,
+        sig_prev=cfg.sig_ls6_prev,
+        ts01_ls6=cfg.ts01_ls6,
+        tlz_ls6=cfg.tlz_ls6,
+        tkon_ls6=cfg.tkon_ls6,
+    )
+
+
+def _spec(key: str, family: str, n: int, factory: Callable[[DetectorsConfig], Any], **kw: Any) -> DetectorSpec:
+    name = f"{family}{n}"
+    return DetectorSpec(
+        key=key,
+        variant=n if family == "lz" else 100 + n,
+        family=family,
+        enable_attr=f"enable_{name}",
+        factory=factory,
+        open_attr=f"{name}_open",
+        closed_attr=f"{name}_closed",
+        active_bit=variant_bit(family, n, ACTIVE),
+        open_bit=variant_bit(family, n, OPEN),
+        closed_bit=variant_bit(family, n, CLOSED),
+        **kw,
+    )
+
+
+DETECTOR_SPECS: Tuple[DetectorSpec, ...] = (
+    _spec("v1", "lz", 1, _make_v1),
+    _spec("v2", "lz", 2, _make_v2),
+    _spec("v3", "lz", 3, _make_v3),
+    _spec("v4", "lz", 4, _make_v4),
+    _spec("v5", "lz", 5, _make_v5),
+    _spec("v6", "lz", 6, _make_v6),
+    _spec("v7", "lz", 7, _make_v7),
+    _spec("v8", "lz", 8, _make_v8),
+    _spec("ls9", "ls", 9, _make_ls9),
+    _spec("ls1", "ls", 1, _make_ls1),
+    _spec("ls2", "ls", 2, _make_ls2, reset_on_topology=False),
+    _spec("ls4", "ls", 4, _make_ls4),
+    _spec("ls5", "ls", 5, _make_ls5, marks_event=False),
+    _spec("lz9", "lz", 9, _make_lz9, marks_event=False),
+    _spec("lz12", "lz", 12, _make_lz12, marks_event=False),
+    _spec("lz11", "lz", 11, _make_lz11, marks_event=False),
+    _spec("lz13", "lz", 13, _make_lz13, marks_event=False),
+    _spec("lz10", "lz", 10, _make_lz10, marks_event=False),
+    _spec("ls6", "ls", 6, _make_ls6, marks_event=False),
+)
+
+# Сброс по номеру ЛЗ-варианта (DSP-политика исключений).
+LZ_SPECS_BY_VARIANT: Dict[int, DetectorSpec] = {s.variant: s for s in DETECTOR_SPECS if s.family == "lz"}
+
+
+def build_enabled(state: DetectorsState) -> Tuple[Tuple[DetectorSpec, Any], ...]:
+    """Пары (spec, детектор) для заполненных полей state, в порядке реестра."""
+    out = []
+    for spec in DETECTOR_SPECS:
+        det = getattr(state, spec.key)
+        if det:
+            out.append((spec, det))
+    return tuple(out)
+
+
+def enabled_detectors(state: DetectorsState) -> Tuple[Tuple[DetectorSpec, Any], ...]:
+    """Компактный список включённых детекторов (строится один раз на state)."""
+    enabled = state.enabled
+    if enabled is None:
+        enabled = build_enabled(state)
+        state.enabled = enabled
+    return enabled
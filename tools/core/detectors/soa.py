@@ -0,0 +1,760 @@
+# -*- coding: utf-8 -*-
+"""
+soa.py — станционный движок детекторов в виде struct-of-arrays (NumPy, опционально).
+
+Состояние BaseDetector (current_phase_id, timer, active, completion_timer,
+last_open/close_offset, at_rest) хранится в массивах по строкам (РЦ, ветка
+детектора): одна строка — один BaseDetector декларативного режима, в том числе
+ветки BaseVariantWrapper (v2/v7/v8/lz10/...). За шаг advance() для всех РЦ сразу:
+- маски вычисляются векторно по классам состояний РЦ (free/occupied/locked) для
+  стандартных масок variants_common; прочие маски (сигналы, can_lock, замыкания
+  фабрик) — вызовом mask_fn по строкам;
+- фазы формирования и завершения — арифметика таймеров над массивами, с теми же
+  правилами, что BaseDetector._update_formation / _update_completion (включая
+  мгновенные переходы внутри dt, guard=32, смещения открытия/закрытия).
+Детекторы с собственной логикой (LS4, LZ9 и т.п.) обновляются как объекты.
+
+Результат шага — DetectorsResult на РЦ, как у update_detectors (смена топологии
+и сброс неактивных фаз — тоже как там). Объекты BaseDetector в advance() не
+обновляются: write_back() переносит состояние массивов в объекты, load()
+(всех или части РЦ) — обратно.
+
+В SimulationContext включается SimulationConfig.detector_engine = "soa"
+(sim_step_runner.step_rcs_soa): один advance() на подшаг для всех РЦ, затем
+write_back() — флаги, исключения, next_deadline и ДСП-гейт работают с объектами;
+после сброса детекторов гейтом контекст вызывает load([rc_id]). Классы РЦ — по
+таблице битов снимка станции: ID вне неё — "нет класса", как в StepClasses.
+
+Без NumPy модуль импортируется, но SoADetectorEngine выдаёт ImportError.
+
+Для C: это и есть раскладка массивов для станционного прогона.
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, List, Mapping, NamedTuple, Optional, Tuple, Union
+
+try:
+    import numpy as np
+except ImportError:  # NumPy — необязательная зависимость
+    np = None
+
+from core import variants_common as vc
+from core.base_detector import BaseDetector, CompletionMode, NeighborRequirement
+from core.base_wrapper import BaseVariantWrapper
+from core.detectors.registry import enabled_detectors
+from core.detectors.types import DetectorsConfig, DetectorsResult, DetectorsState
+from core.detectors_engine import _StepAdapter, _ensure_rc_states_by_id, _rc_capabilities_for
+from core.step_classes import FREE, LOCKED, OCCUPIED, StepClasses, _default_rc_bits, _state_class
+
+_EPS = 1e-9
+_INF = float("inf")
+
+_REQ_CODES = {
+    NeighborRequirement.BOTH: 1,
+    NeighborRequirement.NONE: 0,
+    NeighborRequirement.ONLY_CTRL: 2,
+    NeighborRequirement.ONE_NC: 3,
+    NeighborRequirement.ONE_ADJ: 4,
+}
+
+
+class _Lanes(NamedTuple):
+    """Признаки строк для векторных масок (булевы массивы одной длины)."""
+    pf: Any
+    po: Any
+    pl: Any
+    cf: Any
+    co: Any
+    cl: Any
+    nf: Any
+    no: Any
+    nl: Any
+    p_none: Any  # prev is None
+    n_none: Any
+    p_empty: Any  # not prev (None или "")
+    n_empty: Any
+    pnc: Any  # modes["prev_nc"]
+    nnc: Any
+
+
+def _free_or_nc(x: _Lanes, side: str) -> Any:
+    return (x.p_empty | x.pnc | x.pf) if side == "prev" else (x.n_empty | x.nnc | x.nf)
+
+
+def _occ_not_nc(x: _Lanes, side: str) -> Any:
+    return (~x.p_empty & ~x.pnc & x.po) if side == "prev" else (~x.n_empty & ~x.nnc & x.no)
+
+
+def _m000(x: _Lanes) -> Any:
+    return x.cf & (x.p_empty | x.pf) & (x.n_empty | x.nf)
+
+
+def _m001(x: _Lanes) -> Any:
+    return ~x.n_none & ~x.p_empty & x.pf & x.cf & x.no
+
+
+def _m100(x: _Lanes) -> Any:
+    return ~x.p_none & ~x.n_empty & x.po & x.cf & x.nf
+
+
+# Векторные аналоги масок variants_common (семантика None/"" — как в исходных функциях;
+# проверка "ctrl непустой" делается общей для всех масок).
+_VECTOR_MASKS = {
+    vc.mask_000: _m000,
+    vc.mask_010: lambda x: x.co & (x.p_empty | x.pf) & (x.n_empty | x.nf),
+    vc.mask_101: lambda x: ~x.p_none & ~x.n_none & x.po & x.cf & x.no,
+    vc.mask_111: lambda x: ~x.p_none & ~x.n_none & x.po & x.co & x.no,
+    vc.mask_100: _m100,
+    vc.mask_110: lambda x: ~x.p_none & ~x.n_empty & x.po & x.co & x.nf,
+    vc.mask_100_or_000: lambda x: _m100(x) | _m000(x),
+    vc.mask_001: _m001,
+    vc.mask_011: lambda x: ~x.n_none & ~x.p_empty & x.pf & x.co & x.no,
+    vc.mask_001_or_000: lambda x: _m001(x) | _m000(x),
+    vc.mask_x0x: lambda x: x.p_none & x.n_none & x.cf,
+    vc.mask_x1x: lambda x: x.p_none & x.n_none & x.co,
+    vc.mask_00x: lambda x: x.p_none & ~x.n_none & x.cf & x.nf,
+    vc.mask_01x: lambda x: x.p_none & ~x.n_none & x.co & x.nf,
+    vc.mask_x00: lambda x: ~x.p_none & x.n_none & x.pf & x.cf,
+    vc.mask_x10: lambda x: ~x.p_none & x.n_none & x.pf & x.co,
+    vc.mask_110_or_111: lambda x: ~x.p_none & x.po & x.co,
+    vc.mask_011_or_111: lambda x: ~x.n_none & x.co & x.no,
+    vc.mask_01X_or_X10: lambda x: x.co & (x.p_empty | x.n_empty | x.pf | x.nf),
+    vc.mask_ctrl_free: lambda x: x.cf,
+    vc.mask_ctrl_occupied: lambda x: x.co,
+    vc.mask_rc_1l_0l_0l: lambda x: ~x.p_none & x.po & x.pl & x.cf & x.cl,
+    vc.mask_rc_0l_0l_1l: lambda x: ~x.n_none & x.no & x.nl & x.cf & x.cl,
+    vc.mask_rc_1l_0l_1l: lambda x: ~x.p_none & ~x.n_none & x.po & x.pl & x.no & x.nl & x.cf & x.cl,
+    vc.mask_rc_n_1_0l: lambda x: x.pnc & ~x.n_empty & x.co & x.cl & x.nf & x.nl,
+    vc.mask_rc_n_1_1l: lambda x: x.pnc & ~x.n_empty & x.co & x.cl & x.no & x.nl,
+    vc.mask_rc_l0_1_n: lambda x: x.nnc & ~x.p_empty & x.co & x.cl & x.pf & x.pl,
+    vc.mask_rc_l1_1_n: lambda x: x.nnc & ~x.p_empty & x.co & x.cl & x.po & x.pl,
+    vc.mask_rc_0_0l_0: lambda x: x.cf & _free_or_nc(x, "prev") & _free_or_nc(x, "next"),
+    vc.mask_rc_ctrl_1_adj_free_or_nc: lambda x: x.co & _free_or_nc(x, "prev") & _free_or_nc(x, "next"),
+    vc.mask_rc_ctrl_0_adj_occ: lambda x: x.cf & (_occ_not_nc(x, "prev") | _occ_not_nc(x, "next")),
+    vc.mask_rc_ctrl_1_adj_occ: lambda x: x.co & (_occ_not_nc(x, "prev") | _occ_not_nc(x, "next")),
+    vc.mask_rc_ctrl_1_prev_occ: lambda x: x.co & _occ_not_nc(x, "prev"),
+    vc.mask_rc_ctrl_1_next_occ: lambda x: x.co & _occ_not_nc(x, "next"),
+}
+
+
+def detector_step(
+    det_state: DetectorsState,
+    cfg: DetectorsConfig,
+    rc_states: Dict[str, int],
+    signal_states: Dict[str, int],
+    topology_info: Dict[str, Any],
+    modes: Dict[str, Any],
+    station_model: Any = None,
+    rc_classes: Optional[StepClasses] = None,
+) -> _StepAdapter:
+    """Шаг детекторов РЦ — тот же _StepAdapter, что строит update_detectors."""
+    rc_states_by_id = _ensure_rc_states_by_id(rc_states)
+    if rc_classes is None or not rc_classes.matches(rc_states_by_id, signal_states):
+        rc_classes = StepClasses(rc_states_by_id, signal_states, rc_classes.rc_bits if rc_classes else None)
+    return _StepAdapter(
+        rc_states=rc_states_by_id,
+        rc_capabilities=_rc_capabilities_for(det_state, station_model),
+        modes=modes,
+        signal_states=signal_states,
+        effective_prev_rc=topology_info.get("effective_prev_rc"),
+        effective_next_rc=topology_info.get("effective_next_rc"),
+        ctrl_rc_name=cfg.ctrl_rc_id,
+        classes=rc_classes,
+    )
+
+
+def soa_eligible(det: Any) -> bool:
+    """BaseDetector, который движок может вести в массивах."""
+    return (
+        type(det) is BaseDetector
+        and det._declarative_mode
+        and not det._custom_cond
+        and not det._custom_compl
+        and isinstance(det.config.t_kon, (int, float))
+    )
+
+
+class _Unit(NamedTuple):
+    """Детектор варианта РЦ в порядке реестра: строки массивов или объект."""
+    rc: int
+    spec: Any
+    obj: Any
+    rows: Optional[Tuple[int, ...]]  # None — объект обновляется сам (obj.update)
+
+
+class SoADetectorEngine:
+    """
+    Детекторы нескольких контролируемых РЦ в массивах (строка = РЦ x ветка).
+
+    states: rc_id -> DetectorsState (из init_detectors_engine). Фазовые
+    исключения (abort_exception_keys) должны быть уже навешены.
+    rc_bits: таблица РЦ снимка станции (StationSnapshot.rc_bits); по умолчанию —
+    станция по умолчанию.
+    """
+
+    def __init__(self, states: Mapping[str, DetectorsState], rc_bits: Optional[Mapping[str, int]] = None) -> None:
+        if np is None:
+            raise ImportError("SoADetectorEngine требует numpy (pip install numpy)")
+        self.rc_bits = rc_bits if rc_bits is not None else _default_rc_bits()
+        self.states = dict(states)
+        self.rc_ids: List[str] = list(self.states)
+        self._rc_index = {rc_id: i for i, rc_id in enumerate(self.rc_ids)}
+
+        self.units: List[_Unit] = []
+        self.row_dets: List[BaseDetector] = []
+        rows_rc: List[int] = []
+        for ri, rc_id in enumerate(self.rc_ids):
+            for spec, obj in enabled_detectors(self.states[rc_id]):
+                if soa_eligible(obj):
+                    branches = [obj]
+                elif (
+                    type(obj) is BaseVariantWrapper
+                    and obj.detectors
+                    and all(soa_eligible(d) for d in obj.detectors)
+                ):
+                    branches = list(obj.detectors)
+                else:
+                    self.units.append(_Unit(ri, spec, obj, None))
+                    continue
+                first = len(self.row_dets)
+                self.row_dets.extend(branches)
+                rows_rc.extend([ri] * len(branches))
+                self.units.append(_Unit(ri, spec, obj, tuple(range(first, len(self.row_dets)))))
+
+        self.n_rows = len(self.row_dets)
+        self.row_rc = np.asarray(rows_rc, dtype=np.int64)
+        self._build_tables()
+        self._build_units()
+
+        # Индекс РЦ для векторных классов; столбец 0 — "нет соседа" (None).
+        self._ids: List[Any] = [None]
+        self._col: Dict[Any, int] = {}
+        # ctrl из конфига детектора; пустой — берётся из шага (ctrl_rc_name)
+        self._row_ctrl_from_step = np.array([not d._config_ctrl_rc for d in self.row_dets], dtype=bool)
+        self.row_ctrl_col = np.array(
+            [0 if not d._config_ctrl_rc else self._col_of(d._config_ctrl_rc) for d in self.row_dets],
+            dtype=np.int64,
+        )
+
+        self.slot = np.zeros(self.n_rows, dtype=np.int64)
+        self.timer = np.zeros(self.n_rows)
+        self.active = np.zeros(self.n_rows, dtype=bool)
+        self.completion_timer = np.zeros(self.n_rows)
+        self.last_open_offset = np.full(self.n_rows, np.nan)
+        self.last_close_offset = np.full(self.n_rows, np.nan)
+        self.at_rest = np.zeros(self.n_rows, dtype=bool)
+        # Состояние строк на момент последней синхронизации с объектами (write_back/load)
+        self._synced = tuple(a.copy() for a in self._state_arrays())
+        self.load()
+
+    # ------------------------------------------------------------------ таблицы
+
+    def _build_tables(self) -> None:
+        """Фазы строк -> индексированные массивы (R, K); K — максимум слотов."""
+        self._slot_pids: List[List[Any]] = []
+        self._slot_of: List[Dict[Any, int]] = []
+        tables = []
+        for det in self.row_dets:
+            pids: List[Any] = []
+            slot_of: Dict[Any, int] = {}
+            phases = []
+            for p in det.config.phases:
+                if p.phase_id not in slot_of:
+                    slot_of[p.phase_id] = len(pids)
+                    pids.append(p.phase_id)
+                    phases.append(p)
+            # Ссылки на несуществующие фазы — виртуальные слоты (формирование на них стоит).
+            for pid in [det.config.initial_phase_id] + [p.next_phase_id for p in phases if int(p.next_phase_id) >= 0]:
+                if pid not in slot_of:
+                    slot_of[pid] = len(pids)
+                    pids.append(pid)
+            self._slot_pids.append(pids)
+            self._slot_of.append(slot_of)
+            tables.append(phases)
+        k = max((len(p) for p in self._slot_pids), default=1) or 1
+        r = self.n_rows
+        self.exists = np.zeros((r, k), dtype=bool)
+        self.dur = np.zeros((r, k))
+        self.next_slot = np.zeros((r, k), dtype=np.int64)
+        self.final = np.zeros((r, k), dtype=bool)
+        self.continuous = np.zeros((r, k), dtype=bool)
+        self.reset_exit = np.zeros((r, k), dtype=bool)
+        self.reset_exc = np.zeros((r, k), dtype=bool)
+        self.req = np.zeros((r, k), dtype=np.int8)
+        self.initial = np.zeros(r, dtype=np.int64)
+        self.t_kon = np.zeros(r)
+        self.free_mode = np.zeros(r, dtype=bool)
+        self._mask_groups: Dict[Any, List[Tuple[int, int]]] = {}
+        self._abort_groups: Dict[Tuple[str, ...], List[Tuple[int, int]]] = {}
+        for i, (det, phases) in enumerate(zip(self.row_dets, tables)):
+            slot_of = self._slot_of[i]
+            self.initial[i] = slot_of[det.config.initial_phase_id]
+            self.t_kon[i] = float(det.config.t_kon)
+            self.free_mode[i] = det.config.completion_mode == CompletionMode.FREE_TIME
+            for s, p in enumerate(phases):
+                self.exists[i, s] = True
+                self.dur[i, s] = float(p.duration)
+                self.final[i, s] = int(p.next_phase_id) < 0
+                self.next_slot[i, s] = -1 if int(p.next_phase_id) < 0 else slot_of[p.next_phase_id]
+                self.continuous[i, s] = p.timer_mode == "continuous"
+                self.reset_exit[i, s] = bool(p.reset_on_exit)
+                self.reset_exc[i, s] = bool(p.reset_on_exception)
+                self.req[i, s] = _REQ_CODES.get(p.requires_neighbors, 0)
+                if p.mask_fn is not None:
+                    self._mask_groups.setdefault(p.mask_fn, []).append((i, s))
+                keys = tuple(p.abort_exception_keys or ())
+                if keys:
+                    self._abort_groups.setdefault(keys, []).append((i, s))
+        # Маски без векторного аналога (сигналы, can_lock, замыкания фабрик) —
+        # вызываются по строкам и только для фаз, до которых дошло формирование.
+        self.scalar_mask = np.zeros((r, k), dtype=object)
+        for fn, cells in self._mask_groups.items():
+            if fn not in _VECTOR_MASKS:
+                for i, s in cells:
+                    self.scalar_mask[i, s] = fn
+        self.has_scalar_mask = self.scalar_mask != 0
+        self._mask_groups_np = [
+            (_VECTOR_MASKS[fn], np.array([rs[0] for rs in cells]), np.array([rs[1] for rs in cells]))
+            for fn, cells in self._mask_groups.items()
+            if fn in _VECTOR_MASKS
+        ]
+        self._abort_groups_np = [
+            (keys, np.array([rs[0] for rs in cells]), np.array([rs[1] for rs in cells]))
+            for keys, cells in self._abort_groups.items()
+        ]
+
+    def _build_units(self) -> None:
+        row_units = [u for u in self.units if u.rows is not None]
+        self._unit_starts = np.array([u.rows[0] for u in row_units], dtype=np.int64)
+        self._row_units = row_units
+        pos = {id(u): k for k, u in enumerate(row_units)}
+        self._unit_pos = [pos.get(id(u), -1) for u in self.units]
+        self._unit_is_wrapper = [isinstance(u.obj, BaseVariantWrapper) for u in self.units]
+        self._wrappers = [u.obj for u, w in zip(self.units, self._unit_is_wrapper) if w and u.rows is not None]
+        # Сброс при смене топологии (_reset_formation), по РЦ: строки детекторов с
+        # reset_on_topology (группы подряд: начала и длины) и объекты вне массивов.
+        self._topo_rows: List[Tuple[Any, Any, Any]] = []
+        self._topo_objs: List[List[Any]] = []
+        for ri in range(len(self.rc_ids)):
+            units = [u for u in self.units if u.rc == ri and u.spec.reset_on_topology]
+            groups = [u.rows for u in units if u.rows is not None]
+            lens = [len(g) for g in groups]
+            starts = [sum(lens[:k]) for k in range(len(lens))]
+            self._topo_rows.append((
+                np.array([r for g in groups for r in g], dtype=np.int64),
+                np.array(starts, dtype=np.int64),
+                np.array(lens, dtype=np.int64),
+            ))
+            self._topo_objs.append([u.obj for u in units if u.rows is None])
+
+    def _col_of(self, rc_id: Any) -> int:
+        if rc_id is None:
+            return 0
+        col = self._col.get(rc_id)
+        if col is None:
+            col = self._col[rc_id] = len(self._ids)
+            self._ids.append(rc_id)
+        return col
+
+    # ------------------------------------------------------------ объекты <-> массивы
+
+    def _state_arrays(self) -> Tuple[Any, ...]:
+        return (
+            self.slot,
+            self.timer,
+            self.active,
+            self.completion_timer,
+            self.last_open_offset,
+            self.last_close_offset,
+            self.at_rest,
+        )
+
+    def load(self, rc_ids: Optional[List[str]] = None) -> None:
+        """Состояние объектов BaseDetector -> массивы (всех РЦ или только rc_ids)."""
+        if rc_ids is None:
+            rows: Any = list(range(self.n_rows))
+        else:
+            rcs = [self._rc_index[rc_id] for rc_id in rc_ids]
+            rows = np.flatnonzero(np.isin(self.row_rc, rcs)).tolist()
+        for i in rows:
+            det = self.row_dets[i]
+            slot_of = self._slot_of[i]
+            if det.current_phase_id not in slot_of:
+                raise ValueError(f"{det.config.variant_name}: фаза {det.current_phase_id} вне таблицы фаз")
+            self.slot[i] = slot_of[det.current_phase_id]
+            self.timer[i] = det.timer
+            self.active[i] = det.active
+            self.completion_timer[i] = det.completion_timer
+            self.last_open_offset[i] = np.nan if det.last_open_offset is None else det.last_open_offset
+            self.last_close_offset[i] = np.nan if det.last_close_offset is None else det.last_close_offset
+            self.at_rest[i] = det.at_rest
+        # Загруженные строки совпадают с объектами
+        for synced, cur in zip(self._synced, self._state_arrays()):
+            synced[rows] = cur[rows]
+
+    def write_back(self) -> None:
+        """
+        Массивы -> объекты BaseDetector (и агрегаты BaseVariantWrapper).
+        Переносятся только строки, изменившиеся с прошлой синхронизации.
+        """
+        arrays = self._state_arrays()
+        changed = np.zeros(self.n_rows, dtype=bool)
+        for cur, old in zip(arrays, self._synced):
+            if cur.dtype.kind == "f":
+                changed |= (cur != old) & ~(np.isnan(cur) & np.isnan(old))
+            else:
+                changed |= cur != old
+        idx = np.flatnonzero(changed)
+        if not idx.size:
+            return
+        for synced, cur in zip(self._synced, arrays):
+            synced[idx] = cur[idx]
+        # tolist() — сразу Python float/bool/int, без поэлементных преобразований numpy
+        rows = idx.tolist()
+        slot, timer, active, compl, lo_all, lc_all, at_rest = (a[idx].tolist() for a in arrays)
+        for k, i in enumerate(rows):
+            det = self.row_dets[i]
+            det.current_phase_id = self._slot_pids[i][slot[k]]
+            det.timer = timer[k]
+            det.active = active[k]
+            det.completion_timer = compl[k]
+            lo, lc = lo_all[k], lc_all[k]
+            det.last_open_offset = None if lo != lo else lo  # NaN — нет смещения
+            det.last_close_offset = None if lc != lc else lc
+            det.at_rest = at_rest[k]
+        for wrapper in self._wrappers:
+            wrapper.active = any(d.active for d in wrapper.detectors)
+
+    def _reset_rows(self, rows: Any) -> None:
+        self.slot[rows] = self.initial[rows]
+        self.timer[rows] = 0.0
+        self.active[rows] = False
+        self.completion_timer[rows] = 0.0
+        self.last_open_offset[rows] = np.nan
+        self.last_close_offset[rows] = np.nan
+        self.at_rest[rows] = False
+
+    # ------------------------------------------------------------------- шаг
+
+    def advance(
+        self,
+        steps: Mapping[str, Any],
+        dt: Union[float, Mapping[str, float]],
+    ) -> Dict[str, DetectorsResult]:
+        """
+        Один шаг для всех РЦ. steps: rc_id -> шаг детекторов (detector_step:
+        rc_states по ID, signal_states, modes, effective_prev_rc/next_rc, ctrl_rc_name).
+        dt — общий или по РЦ. РЦ без шага в steps не обновляются.
+        """
+        n_rc = len(self.rc_ids)
+        rc_dt = np.zeros(n_rc)
+        rc_on = np.zeros(n_rc, dtype=bool)
+        rc_pco = np.ones(n_rc, dtype=bool)
+        rc_nco = np.ones(n_rc, dtype=bool)
+        rc_pnc = np.zeros(n_rc, dtype=bool)
+        rc_nnc = np.zeros(n_rc, dtype=bool)
+        rc_p_none = np.ones(n_rc, dtype=bool)
+        rc_n_none = np.ones(n_rc, dtype=bool)
+        rc_p_empty = np.ones(n_rc, dtype=bool)
+        rc_n_empty = np.ones(n_rc, dtype=bool)
+        rc_pcol = np.zeros(n_rc, dtype=np.int64)
+        rc_ncol = np.zeros(n_rc, dtype=np.int64)
+        rc_ccol = np.zeros(n_rc, dtype=np.int64)
+        rc_ctrl_ok = np.zeros(n_rc, dtype=bool)
+        rc_group = np.zeros(n_rc, dtype=np.int64)
+        groups: List[Any] = []
+        group_of: Dict[int, int] = {}
+        step_list: List[Any] = [None] * n_rc
+        rc_modes: List[Mapping[str, Any]] = [{}] * n_rc
+
+        for rc_id, step in steps.items():
+            ri = self._rc_index[rc_id]
+            state = self.states[rc_id]
+            step_list[ri] = step
+            rc_on[ri] = True
+            rc_dt[ri] = float(dt[rc_id]) if isinstance(dt, Mapping) else float(dt)
+            prev = step.effective_prev_rc
+            nxt = step.effective_next_rc
+            # Смена топологии: сброс фаз формирования неактивных детекторов (как update_detectors).
+            if state.last_effective_prev != prev or state.last_effective_next != nxt:
+                self._reset_formation(ri)
+            state.last_effective_prev = prev
+            state.last_effective_next = nxt
+            modes = rc_modes[ri] = getattr(step, "modes", {}) or {}
+            rc_pco[ri] = bool(modes.get("prev_control_ok", True))
+            rc_nco[ri] = bool(modes.get("next_control_ok", True))
+            rc_pnc[ri] = bool(modes.get("prev_nc", False))
+            rc_nnc[ri] = bool(modes.get("next_nc", False))
+            rc_p_none[ri] = prev is None
+            rc_n_none[ri] = nxt is None
+            rc_p_empty[ri] = not prev
+            rc_n_empty[ri] = not nxt
+            rc_pcol[ri] = self._col_of(prev)
+            rc_ncol[ri] = self._col_of(nxt)
+            ctrl = getattr(step, "ctrl_rc_name", None) or ""
+            rc_ctrl_ok[ri] = bool(ctrl)
+            rc_ccol[ri] = self._col_of(ctrl) if ctrl else 0
+            key = id(step.rc_states)
+            g = group_of.get(key)
+            if g is None:
+                g = group_of[key] = len(groups)
+                groups.append(step.rc_states)
+            rc_group[ri] = g
+
+        # Классы состояний РЦ: (группа rc_states, столбец РЦ) -> биты FREE/OCCUPIED/LOCKED.
+        ids = self._ids
+        n_cols = len(ids)
+        cls = np.zeros((max(len(groups), 1), n_cols), dtype=np.int64)
+        present = np.zeros((max(len(groups), 1), n_cols), dtype=bool)
+        known = self.rc_bits
+        for g, rc_states in enumerate(groups):
+            cls[g, 1:] = np.fromiter(
+                (_state_class(rc_states.get(k, 0)) if k in known else 0 for k in ids[1:]),
+                dtype=np.int64,
+                count=n_cols - 1,
+            )
+            present[g, 1:] = np.fromiter((k in rc_states for k in ids[1:]), dtype=bool, count=n_cols - 1)
+
+        rr = self.row_rc
+        row_on = rc_on[rr]
+        row_dt = rc_dt[rr]
+        row_g = rc_group[rr]
+        ccol = np.where(self._row_ctrl_from_step, rc_ccol[rr], self.row_ctrl_col)
+        row_ctrl_ok = np.where(self._row_ctrl_from_step, rc_ctrl_ok[rr], True)
+        pcls = cls[row_g, rc_pcol[rr]]
+        ccls = cls[row_g, ccol]
+        ncls = cls[row_g, rc_ncol[rr]]
+        lanes = _Lanes(
+            pf=(pcls & FREE) != 0, po=(pcls & OCCUPIED) != 0, pl=(pcls & LOCKED) != 0,
+            cf=(ccls & FREE) != 0, co=(ccls & OCCUPIED) != 0, cl=(ccls & LOCKED) != 0,
+            nf=(ncls & FREE) != 0, no=(ncls & OCCUPIED) != 0, nl=(ncls & LOCKED) != 0,
+            p_none=rc_p_none[rr], n_none=rc_n_none[rr],
+            p_empty=rc_p_empty[rr], n_empty=rc_n_empty[rr],
+            pnc=rc_pnc[rr], nnc=rc_nnc[rr],
+        )
+        row_pco, row_nco = rc_pco[rr], rc_nco[rr]
+        ctrl_present = present[row_g, ccol]
+
+        active0 = self.active.copy()
+        need_cond = row_on & ~active0
+
+        # Условия фаз (R, K): требование к соседям & ctrl & маска.
+        req_ok = np.select(
+            [self.req == 1, self.req == 2, self.req == 3, self.req == 4],
+            [
+                (row_pco & row_nco)[:, None],
+                ctrl_present[:, None],
+                (lanes.pnc | lanes.nnc)[:, None],
+                (~lanes.p_empty | ~lanes.n_empty)[:, None],
+            ],
+            default=True,
+        )
+        req_ok &= row_ctrl_ok[:, None]
+        cond = np.zeros(self.dur.shape, dtype=bool)
+        for vec, r_idx, s_idx in self._mask_groups_np:
+            cond[r_idx, s_idx] = vec(lanes)[r_idx]
+        cond &= req_ok
+
+        def scalar_cond(r: Any, s: Any) -> Any:
+            out = cond[r, s]
+            for k in np.flatnonzero(req_ok[r, s] & self.has_scalar_mask[r, s]).tolist():
+                step = step_list[rr[r[k]]]
+                fn = self.scalar_mask[r[k], s[k]]
+                out[k] = bool(fn(step, step.effective_prev_rc, self._ids[ccol[r[k]]], step.effective_next_rc))
+            return out
+
+        abort = np.zeros(self.dur.shape, dtype=bool)
+        for keys, r_idx, s_idx in self._abort_groups_np:
+            rc_hit = np.array(
+                [any(bool(m.get(k, False)) for k in keys) for m in rc_modes],
+                dtype=bool,
+            )
+            abort[r_idx, s_idx] = rc_hit[rr[r_idx]]
+
+        before = (self.slot.copy(), self.timer.copy(), self.completion_timer.copy())
+        self.last_open_offset[row_on] = np.nan
+        self.last_close_offset[row_on] = np.nan
+        opened = np.zeros(self.n_rows, dtype=bool)
+        closed = np.zeros(self.n_rows, dtype=bool)
+
+        # --- формирование (BaseDetector._update_formation)
+        idx = np.flatnonzero(need_cond)
+        if idx.size:
+            slot = self.slot[idx]
+            timer = self.timer[idx]
+            rem = row_dt[idx].copy()
+            live = np.ones(idx.size, dtype=bool)
+            op = np.zeros(idx.size, dtype=bool)
+            pco_ok = (row_pco & row_nco)[idx]
+            for _guard in range(32):
+                live &= rem > _EPS
+                j = np.flatnonzero(live)
+                if not j.size:
+                    break
+                r = idx[j]
+                s = slot[j]
+                ex = self.exists[r, s]
+                live[j[~ex]] = False
+                j, r, s = j[ex], r[ex], s[ex]
+                ab = abort[r, s]
+                if ab.any():
+                    ja, ra, sa = j[ab], r[ab], s[ab]
+                    timer[ja] = 0.0
+                    rex = self.reset_exc[ra, sa]
+                    slot[ja[rex]] = self.initial[ra[rex]]
+                    live[ja] = False
+                    j, r, s = j[~ab], r[~ab], s[~ab]
+                c = scalar_cond(r, s)
+                if not c.all():
+                    jn, rn, sn = j[~c], r[~c], s[~c]
+                    lost = (self.req[rn, sn] == 1) & ~pco_ok[jn]
+                    timer[jn[lost]] = 0.0
+                    slot[jn[lost]] = self.initial[rn[lost]]
+                    cont = ~lost & self.continuous[rn, sn]
+                    timer[jn[cont]] = 0.0
+                    live[jn] = False
+                    j, r, s = j[c], r[c], s[c]
+                dur = self.dur[r, s]
+                t = timer[j]
+                rm = rem[j]
+                need = np.maximum(dur - t, 0.0)
+                consume = np.where(need <= _EPS, rm, np.minimum(rm, need))
+                t = t + consume
+                timer[j] = t
+                rem[j] = rm - consume
+                below = t + _EPS < dur
+                live[j[below]] = False
+                j, r, s = j[~below], r[~below], s[~below]
+                fin = self.final[r, s]
+                jf = j[fin]
+                op[jf] = True
+                timer[jf] = 0.0
+                live[jf] = False
+                jt, rt, st = j[~fin], r[~fin], s[~fin]
+                slot[jt] = self.next_slot[rt, st]
+                timer[jt[self.reset_exit[rt, st]]] = 0.0
+            self.slot[idx] = slot
+            self.timer[idx] = timer
+            ro = idx[op]
+            opened[ro] = True
+            self.active[ro] = True
+            self.completion_timer[ro] = 0.0
+            self.last_open_offset[ro] = row_dt[ro] - rem[op]
+            # Остаток интервала после открытия — сразу на фазу завершения.
+            tail = op & (rem > 0.0)
+            if tail.any():
+                rt = idx[tail]
+                open_off = self.last_open_offset[rt].copy()
+                hit, off = self._completion(rt, rem[tail], ccls, row_ctrl_ok)
+                closed[rt[hit]] = True
+                self.last_close_offset[rt[hit]] = open_off[hit] + off[hit]
+
+        # --- завершение (BaseDetector._update_completion) для открытых на начало шага
+        act = np.flatnonzero(row_on & active0)
+        if act.size:
+            hit, off = self._completion(act, row_dt[act], ccls, row_ctrl_ok)
+            closed[act[hit]] = True
+            self.last_close_offset[act[hit]] = off[hit]
+
+        self.at_rest[row_on] = (
+            ~opened & ~closed
+            & (before[0] == self.slot) & (before[1] == self.timer)
+            & (active0 == self.active) & (before[2] == self.completion_timer)
+        )[row_on]
+
+        return self._results(step_list, rc_dt, opened, closed)
+
+    def _completion(self, rows: Any, dt: Any, ccls: Any, ctrl_ok: Any) -> Tuple[Any, Any]:
+        # ctrl не определён -> "свободна" (completion_fn BaseDetector)
+        free = ~ctrl_ok[rows] | ((ccls[rows] & FREE) != 0)
+        occ = ctrl_ok[rows] & ((ccls[rows] & OCCUPIED) != 0)
+        ok = np.where(self.free_mode[rows], free, occ)
+        prev = self.completion_timer[rows]
+        cur = np.where(ok, prev + dt, 0.0)
+        self.completion_timer[rows] = cur
+        t_kon = self.t_kon[rows]
+        hit = cur >= t_kon
+        off = np.minimum(dt, np.maximum(t_kon - prev, 0.0))
+        if hit.any():
+            self._reset_rows(rows[hit])
+        return hit, off
+
+    def _reset_formation(self, ri: int) -> None:
+        for obj in self._topo_objs[ri]:
+            if not getattr(obj, "active", True):
+                obj.reset()
+        rows, starts, lens = self._topo_rows[ri]
+        if rows.size:
+            # Детектор сбрасывается целиком, если ни одна его ветка не активна
+            idle = ~np.logical_or.reduceat(self.active[rows], starts)
+            self._reset_rows(rows[np.repeat(idle, lens)])
+
+    def _results(
+        self,
+        step_list: List[Any],
+        rc_dt: Any,
+        opened: Any,
+        closed: Any,
+    ) -> Dict[str, DetectorsResult]:
+        # Агрегаты по детекторам варианта (ветки wrapper): any / min смещений.
+        starts = self._unit_starts
+        u_open: List[bool] = []
+        u_close: List[bool] = []
+        u_active: List[bool] = []
+        u_open_off: List[float] = []
+        u_close_off: List[float] = []
+        if starts.size:
+            u_open = np.logical_or.reduceat(opened, starts).tolist()
+            u_close = np.logical_or.reduceat(closed, starts).tolist()
+            u_active = np.logical_or.reduceat(self.active, starts).tolist()
+            lo = np.where(opened & ~np.isnan(self.last_open_offset), self.last_open_offset, np.inf)
+            lc = np.where(closed & ~np.isnan(self.last_close_offset), self.last_close_offset, np.inf)
+            u_open_off = np.minimum.reduceat(lo, starts).tolist()
+            u_close_off = np.minimum.reduceat(lc, starts).tolist()
+
+        out: Dict[str, DetectorsResult] = {}
+        variants_active: Dict[int, List[int]] = {}
+        for ui, u in enumerate(self.units):
+            step = step_list[u.rc]
+            if step is None:
+                continue
+            res = out.get(self.rc_ids[u.rc])
+            if res is None:
+                res = out[self.rc_ids[u.rc]] = DetectorsResult()
+            if u.rows is None:
+                o, c = u.obj.update(step, float(rc_dt[u.rc]))
+                open_off = getattr(u.obj, "last_open_offset", None) if o else None
+                close_off = getattr(u.obj, "last_close_offset", None) if c else None
+                is_active = bool(u.obj.active)
+            else:
+                k = self._unit_pos[ui]
+                o, c, is_active = u_open[k], u_close[k], u_active[k]
+                open_off = u_open_off[k] if o and u_open_off[k] != _INF else None
+                close_off = u_close_off[k] if c and u_close_off[k] != _INF else None
+                if self._unit_is_wrapper[ui]:
+                    u.obj.active = is_active
+                    u.obj.last_open_offset = open_off
+                    u.obj.last_close_offset = close_off
+            spec = u.spec
+            if o:
+                if open_off is not None and (res.open_offset is None or open_off < res.open_offset):
+                    res.open_offset = float(open_off)
+                if spec.marks_event:
+                    res.opened = True
+                setattr(res, spec.open_attr, True)
+                res.bits |= spec.open_bit
+            if c:
+                if close_off is not None and (res.close_offset is None or close_off < res.close_offset):
+                    res.close_offset = float(close_off)
+                if spec.marks_event:
+                    res.closed = True
+                setattr(res, spec.closed_attr, True)
+                res.bits |= spec.closed_bit
+            if is_active:
+                variants_active.setdefault(u.rc, []).append(spec.variant)
+        for ri, variants in variants_active.items():
+            res = out.get(self.rc_ids[ri])
+            if res is not None:
+                res.active_variant = max(variants)
+        return out
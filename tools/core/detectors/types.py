@@ -1,6 +1,6 @@
 # -*- coding: utf-8 -*-
 from dataclasses import dataclass, field
-from typing import Any, Dict, List, Optional
+from typing import Any, Dict, List, Optional, Tuple
 
 from core.base_detector import BaseDetector
 
@@ -190,6 +190,16 @@ class DetectorsState:
     last_effective_prev: Optional[str] = None
     last_effective_next: Optional[str] = None
 
+    # Таблица возможностей РЦ (rc_id -> caps) для _StepAdapter.
+    # Строится один раз (init_detectors_engine / первый update_detectors) и
+    # передаётся по ссылке; пересчитывается только при смене station_model.
+    rc_capabilities: Optional[Dict[str, Dict[str, Any]]] = None
+    rc_capabilities_model: Optional[Any] = None
+
+    # Компактный список (DetectorSpec, детектор) включённых вариантов
+    # (core.detectors.registry); None — построить по полям при первом обращении.
+    enabled: Optional[Tuple[Tuple[Any, Any], ...]] = None
+
 
 @dataclass
 class DetectorsResult:
@@ -243,3 +253,5 @@ class DetectorsResult:
     open_offset: Optional[float] = None
     close_offset: Optional[float] = None
     flags: List[str] = field(default_factory=list)
+    # Биты открытия/закрытия (core.flag_bits) — те же события, что поля *_open/*_closed
+    bits: int = 0
@@ -0,0 +1,253 @@
+# -*- coding: utf-8 -*-
+"""
+flag_bits.py — битовое представление флагов шага.
+
+Внутри ядра флаги — одно целое (FlagBits): по три бита на вариант ЛЗ/ЛС
+(active/open/closed), бит no_lz_when_occupied, бит dsp_detector_gate, коды
+причин подавления ЛЗ и ЛС и маски подавленных вариантов (по номеру варианта).
+Проверки вида `any(f.startswith("llz_v") ...)` превращаются в `bits & mask`.
+
+Строки ("llz_v8_open", "lls_9", "lz_suppressed:v2:local_mu", ...) — только
+представление: render_flags(bits) даёт ровно тот список, который раньше
+собирался вручную (тот же порядок), parse_flags(flags) — обратное
+преобразование для шагов, построенных из строк (тесты, внешние вызовы).
+Строка, не входящая в словарь, — ошибка (ValueError): молча потерянный флаг
+при обратном рендере исчез бы из результата.
+
+TimelineStep хранит только flag_bits; TimelineStep.flags — свойство, которое
+рендерит строки при чтении (поиск в lru_cache _render и копия списка) и
+разбирает их при записи, так что два представления не расходятся.
+
+Порядок строк всегда канонический (порядок рендера), в том числе у шага из
+нескольких подшагов (смена топологии внутри шага): раньше флаги подшагов
+склеивались в порядке первого появления, теперь merge_flag_bits объединяет
+биты, а рендер упорядочивает их как для одного подшага.
+
+Для C: uint128 (или два uint64) + таблица строк для рендера.
+"""
+
+from __future__ import annotations
+
+import re
+from functools import lru_cache
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+FlagBits = int
+
+
+class _Slot(NamedTuple):
+    kind: str  # "lz" | "ls"
+    variant: int
+    name: str
+
+
+def _slot(kind: str, v: int) -> _Slot:
+    return _Slot(kind, v, f"llz_v{v}" if kind == "lz" else f"lls_{v}")
+
+
+# Порядок флагов активности (как в build_flags_simple) — он же порядок вариантов
+# при извлечении "первого" варианта и при рендере подавленных вариантов.
+_ACTIVE_ORDER: Tuple[_Slot, ...] = tuple(
+    [_slot("lz", v) for v in range(1, 9)]
+    + [_slot("ls", v) for v in (9, 1, 2, 4, 5)]
+    + [_slot("lz", v) for v in (9, 12, 11, 13, 10)]
+    + [_slot("ls", 6)]
+)
+# Порядок флагов открытия/закрытия.
+_EVENT_ORDER: Tuple[_Slot, ...] = tuple(
+    [_slot("lz", v) for v in range(1, 14)] + [_slot("ls", v) for v in (1, 2, 4, 5, 6, 9)]
+)
+
+_SLOT_INDEX: Dict[Tuple[str, int], int] = {(s.kind, s.variant): i for i, s in enumerate(_ACTIVE_ORDER)}
+NSLOTS = len(_ACTIVE_ORDER)
+
+ACTIVE, OPEN, CLOSED = 0, 1, 2
+
+
+def variant_bit(kind: str, variant: int, what: int = ACTIVE) -> FlagBits:
+    return 1 << (3 * _SLOT_INDEX[(kind, variant)] + what)
+
+
+NO_LZ_WHEN_OCCUPIED: FlagBits = 1 << (3 * NSLOTS)
+LZ_DSP_GATE: FlagBits = NO_LZ_WHEN_OCCUPIED << 1
+# Флаги-биты (варианты, no_lz_when_occupied, dsp-гейт) — всё, кроме кодов причин
+_VARIANT_FLAGS_MASK: FlagBits = (LZ_DSP_GATE << 1) - 1
+
+_LZ_REASON_SHIFT = 3 * NSLOTS + 2
+_LS_REASON_SHIFT = _LZ_REASON_SHIFT + 3
+_REASON_FIELD = 0b111
+_LZ_SUPP_SHIFT = _LS_REASON_SHIFT + 3
+_LS_SUPP_SHIFT = _LZ_SUPP_SHIFT + 14
+_SUPP_FIELD = (1 << 14) - 1
+
+LZ_REASONS: Tuple[str, ...] = ("", "local_mu", "recent_ls", "dsp_autoaction_timeout")
+LS_REASONS: Tuple[str, ...] = ("", "local_mu", "after_lz", "dsp_autoaction", "priority_lz", "priority_lz_same_time")
+
+_VARIANT_BITS: FlagBits = (1 << (3 * NSLOTS)) - 1
+LZ_ANY: FlagBits = 0
+LS_ANY: FlagBits = 0
+for _s in _ACTIVE_ORDER:
+    _m = 0b111 << (3 * _SLOT_INDEX[(_s.kind, _s.variant)])
+    if _s.kind == "lz":
+        LZ_ANY |= _m
+    else:
+        LS_ANY |= _m
+
+
+def _variant_flag_names() -> List[Tuple[str, FlagBits]]:
+    out = [(s.name, variant_bit(s.kind, s.variant, ACTIVE)) for s in _ACTIVE_ORDER]
+    for s in _EVENT_ORDER:
+        out.append((f"{s.name}_open", variant_bit(s.kind, s.variant, OPEN)))
+        out.append((f"{s.name}_closed", variant_bit(s.kind, s.variant, CLOSED)))
+    return out
+
+
+_RENDER_ORDER: Tuple[Tuple[str, FlagBits], ...] = tuple(_variant_flag_names())
+_NAME_BITS: Dict[str, FlagBits] = dict(_RENDER_ORDER)
+_NAME_BITS["no_lz_when_occupied"] = NO_LZ_WHEN_OCCUPIED
+_NAME_BITS["lz_suppressed:dsp_detector_gate"] = LZ_DSP_GATE
+
+
+@lru_cache(maxsize=None)
+def prefix_mask(prefix: str) -> FlagBits:
+    """Биты вариантов, чьи флаги начинаются с prefix (семантика str.startswith)."""
+    mask = 0
+    for name, bit in _RENDER_ORDER:
+        if name.startswith(prefix):
+            mask |= bit
+    return mask
+
+
+@lru_cache(maxsize=None)
+def open_prefix_mask(prefix: str) -> FlagBits:
+    """Биты флагов "*_open" с данным префиксом."""
+    mask = 0
+    for name, bit in _RENDER_ORDER:
+        if name.startswith(prefix) and "_open" in name:
+            mask |= bit
+    return mask
+
+
+@lru_cache(maxsize=None)
+def variants(bits: FlagBits, kind: str) -> Tuple[int, ...]:
+    """Номера вариантов kind с любым установленным битом, в порядке _ACTIVE_ORDER."""
+    return tuple(
+        s.variant
+        for s in _ACTIVE_ORDER
+        if s.kind == kind and (bits >> (3 * _SLOT_INDEX[(s.kind, s.variant)])) & 0b111
+    )
+
+
+def lz_reason(bits: FlagBits) -> int:
+    return (bits >> _LZ_REASON_SHIFT) & _REASON_FIELD
+
+
+def ls_reason(bits: FlagBits) -> int:
+    return (bits >> _LS_REASON_SHIFT) & _REASON_FIELD
+
+
+def with_lz_suppressed(bits: FlagBits, reason: str, suppressed: Tuple[int, ...]) -> FlagBits:
+    """Причина подавления ЛЗ (+ подавленные варианты) — одна на шаг."""
+    mask = 0
+    for v in suppressed:
+        mask |= 1 << v
+    bits &= ~((_REASON_FIELD << _LZ_REASON_SHIFT) | (_SUPP_FIELD << _LZ_SUPP_SHIFT))
+    return bits | (LZ_REASONS.index(reason) << _LZ_REASON_SHIFT) | (mask << _LZ_SUPP_SHIFT)
+
+
+def with_ls_suppressed(bits: FlagBits, reason: str, suppressed: Tuple[int, ...]) -> FlagBits:
+    """Причина подавления ЛС (+ подавленные варианты) — одна на шаг."""
+    mask = 0
+    for v in suppressed:
+        mask |= 1 << v
+    bits &= ~((_REASON_FIELD << _LS_REASON_SHIFT) | (_SUPP_FIELD << _LS_SUPP_SHIFT))
+    return bits | (LS_REASONS.index(reason) << _LS_REASON_SHIFT) | (mask << _LS_SUPP_SHIFT)
+
+
+def _supp_variants(bits: FlagBits, shift: int, kind: str) -> List[int]:
+    mask = (bits >> shift) & _SUPP_FIELD
+    out = [s.variant for s in _ACTIVE_ORDER if s.kind == kind and mask & (1 << s.variant)]
+    # Номера вне вариантов своего типа (например, ЛС под причиной ЛЗ) — в конце.
+    out += [v for v in range(14) if mask & (1 << v) and v not in out]
+    return out
+
+
+@lru_cache(maxsize=4096)
+def _render(bits: FlagBits) -> Tuple[str, ...]:
+    out = [name for name, bit in _RENDER_ORDER if bits & bit]
+    if bits & NO_LZ_WHEN_OCCUPIED:
+        out.append("no_lz_when_occupied")
+    if bits & LZ_DSP_GATE:
+        out.append("lz_suppressed:dsp_detector_gate")
+    reason = lz_reason(bits)
+    if reason:
+        out.append(f"lz_suppressed:{LZ_REASONS[reason]}")
+        out += [f"lz_suppressed:v{v}:{LZ_REASONS[reason]}" for v in _supp_variants(bits, _LZ_SUPP_SHIFT, "lz")]
+    reason = ls_reason(bits)
+    if reason:
+        out.append(f"ls_suppressed:{LS_REASONS[reason]}")
+        out += [f"ls_suppressed:v{v}:{LS_REASONS[reason]}" for v in _supp_variants(bits, _LS_SUPP_SHIFT, "ls")]
+    return tuple(out)
+
+
+def render_flags(bits: FlagBits) -> List[str]:
+    """Строковые флаги (новый список) для FlagBits."""
+    return list(_render(bits))
+
+
+_SUPP_RE = re.compile(r"^(lz|ls)_suppressed:(?:v(\d+):)?([a-z_]+)$")
+
+
+@lru_cache(maxsize=None)
+def parse_flag(flag: str) -> FlagBits:
+    """Биты одной строки флага; неизвестная строка — ValueError."""
+    bit = _NAME_BITS.get(flag)
+    if bit is not None:
+        return bit
+    m = _SUPP_RE.match(flag)
+    if m is None:
+        raise ValueError(f"unknown flag: {flag!r}")
+    side, v, reason = m.group(1), m.group(2), m.group(3)
+    reasons, shift, supp_shift = (
+        (LZ_REASONS, _LZ_REASON_SHIFT, _LZ_SUPP_SHIFT) if side == "lz" else (LS_REASONS, _LS_REASON_SHIFT, _LS_SUPP_SHIFT)
+    )
+    if reason not in reasons or (v is not None and int(v) >= 14):
+        raise ValueError(f"unknown flag: {flag!r}")
+    out = reasons.index(reason) << shift
+    if v is not None:
+        out |= 1 << (int(v) + supp_shift)
+    return out
+
+
+def parse_flags(flags: Optional[List[str]]) -> FlagBits:
+    bits = 0
+    for f in flags or ():
+        bits |= parse_flag(str(f))
+    return bits
+
+
+def merge_flag_bits(acc: FlagBits, bits: FlagBits) -> FlagBits:
+    """
+    Флаги шага из нескольких подшагов: биты вариантов объединяются, причина
+    подавления ЛЗ/ЛС (код, а не маска) берётся от первого подшага, где она есть;
+    подавленные варианты той же причины объединяются.
+    """
+    out = (acc | bits) & _VARIANT_FLAGS_MASK
+    for reason_shift, supp_shift in ((_LZ_REASON_SHIFT, _LZ_SUPP_SHIFT), (_LS_REASON_SHIFT, _LS_SUPP_SHIFT)):
+        field = (_REASON_FIELD << reason_shift) | (_SUPP_FIELD << supp_shift)
+        first, other = acc & field, bits & field
+        if first and other and (first >> reason_shift) & _REASON_FIELD == (other >> reason_shift) & _REASON_FIELD:
+            first |= other
+        out |= first or other
+    return out
+
+
+def step_flag_bits(step) -> FlagBits:
+    """FlagBits шага (TimelineStep или совместимый объект со списком flags)."""
+    bits = getattr(step, "flag_bits", None)
+    return parse_flags(step.flags) if bits is None else bits
+
+
+def set_flag_bits(step, bits: FlagBits) -> None:
+    """Меняет флаги шага (TimelineStep.flags — производное от flag_bits)."""
+    step.flag_bits = bits
@@ -0,0 +1,124 @@
+# -*- coding: utf-8 -*-
+"""
+phase_trace.py — трассировка фаз детекторов и топологии (замена DEBUG print).
+
+Выключено по умолчанию и ничего не стоит: горячий путь проверяет один
+модульный флаг `ENABLED` и только при включённой трассировке берёт текущий
+трассировщик из contextvar (у каждого прогона/запроса свой).
+
+    tracer = PhaseTracer(PhaseTraceConfig(detectors=["v1"], rc_ids=["108"]))
+    with tracing(tracer):
+        ctx.run()
+    events = tracer.events()   # кольцевой буфер, последние buffer_size событий
+
+Для C: флаг трассировки + кольцевой буфер фиксированного размера.
+"""
+
+import logging
+from collections import deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field, fields
+from threading import Lock
+from typing import Any, Deque, Dict, FrozenSet, Iterator, List, Optional
+
+
+logger = logging.getLogger(__name__)
+
+# Быстрая проверка в горячем пути: True, пока активен хотя бы один tracing().
+ENABLED: bool = False
+
+_CURRENT: ContextVar[Optional["PhaseTracer"]] = ContextVar("phase_tracer", default=None)
+_ACTIVE_COUNT = 0
+_ACTIVE_LOCK = Lock()
+
+
+@dataclass
+class PhaseTraceConfig:
+    """Настройки трассировки; пустой фильтр = без ограничений."""
+    detectors: List[str] = field(default_factory=list)  # variant_name ("v1", "LZ4_PrevNC", ...) или "topology"
+    rc_ids: List[str] = field(default_factory=list)     # контролируемые РЦ (ID)
+    buffer_size: int = 2000                             # 0 — без буфера (только echo)
+    echo: bool = False                                  # дублировать события в logging (DEBUG)
+
+    @classmethod
+    def from_dict(cls, data: Any) -> "PhaseTraceConfig":
+        """Настройки из JSON (API): неизвестные ключи и неверные типы — ValueError."""
+        if not isinstance(data, dict):
+            raise ValueError("trace must be an object")
+        unknown = sorted(set(data) - {f.name for f in fields(cls)})
+        if unknown:
+            raise ValueError(f"Unknown trace options: {unknown}")
+        for key in ("detectors", "rc_ids"):
+            if key in data and not isinstance(data[key], list):
+                raise ValueError(f"trace.{key} must be a list")
+        size = data.get("buffer_size", 0)
+        if isinstance(size, bool) or not isinstance(size, int) or size < 0:
+            raise ValueError("trace.buffer_size must be a non-negative integer")
+        if not isinstance(data.get("echo", False), bool):
+            raise ValueError("trace.echo must be a boolean")
+        return cls(**data)
+
+
+class PhaseTracer:
+    """Фильтр + кольцевой буфер событий трассировки."""
+
+    def __init__(self, config: Optional[PhaseTraceConfig] = None) -> None:
+        self.config = config or PhaseTraceConfig()
+        self._detectors: FrozenSet[str] = frozenset(str(x) for x in self.config.detectors)
+        self._rc_ids: FrozenSet[str] = frozenset(str(x) for x in self.config.rc_ids)
+        size = max(0, int(self.config.buffer_size))
+        self._buffer: Optional[Deque[Dict[str, Any]]] = deque(maxlen=size) if size else None
+        self.time: float = 0.0
+        self.dropped: int = 0
+
+    def wants(self, detector: Optional[str], rc_id: Optional[str]) -> bool:
+        if self._detectors and str(detector) not in self._detectors:
+            return False
+        if self._rc_ids and str(rc_id) not in self._rc_ids:
+            return False
+        return True
+
+    def emit(self, kind: str, detector: Optional[str], rc_id: Optional[str], **fields: Any) -> None:
+        event: Dict[str, Any] = {"t": self.time, "kind": kind, "detector": detector, "rc_id": rc_id}
+        event.update(fields)
+        if self._buffer is not None:
+            if len(self._buffer) == self._buffer.maxlen:
+                self.dropped += 1
+            self._buffer.append(event)
+        if self.config.echo:
+            logger.debug("trace %s", event)
+
+    def events(self) -> List[Dict[str, Any]]:
+        return list(self._buffer) if self._buffer is not None else []
+
+
+def current_tracer() -> Optional[PhaseTracer]:
+    return _CURRENT.get()
+
+
+def set_time(t: float) -> None:
+    """Время начала текущего (под)шага для событий; вызывать только при ENABLED."""
+    tracer = _CURRENT.get()
+    if tracer is not None:
+        tracer.time = float(t)
+
+
+@contextmanager
+def tracing(tracer: Optional[PhaseTracer]) -> Iterator[Optional[PhaseTracer]]:
+    """Включает трассировку на время блока (None — no-op)."""
+    global ENABLED, _ACTIVE_COUNT
+    if tracer is None:
+        yield None
+        return
+    token = _CURRENT.set(tracer)
+    with _ACTIVE_LOCK:
+        _ACTIVE_COUNT += 1
+        ENABLED = True
+    try:
+        yield tracer
+    finally:
+        _CURRENT.reset(token)
+        with _ACTIVE_LOCK:
+            _ACTIVE_COUNT -= 1
+            ENABLED = _ACTIVE_COUNT > 0
@@ -0,0 +1,432 @@
+# -*- coding: utf-8 -*-
+"""
+sim_columnar.py — компактное колоночное хранилище результата симуляции.
+
+TimelineStep держит полные копии rc_states/switch_states/signal_states/modes
+на каждую (шаг, РЦ); при 10k шагов и 17 РЦ это сотни тысяч словарей с одними
+и теми же ключами. ColumnarTimeline хранит тот же результат по колонкам:
+
+- имена объектов (РЦ, стрелки, сигналы, ключи modes) интернированы в ObjectIndex,
+  соседи effective_prev_rc/next_rc — индексы в array('i');
+- скаляры (t, step_duration, lz_state, lz_variant, mu/nas/chas/dsp) — array;
+- словари состояний — дельты: на запись только изменившиеся (ключ, значение)
+  относительно предыдущей записи, плюс опорные полные снимки каждые
+  KEYFRAME_EVERY записей (и при удалении ключа) для быстрого доступа;
+- flags — индекс в таблице уникальных FlagBits (core.flag_bits), строки
+  рендерятся при обращении.
+
+Записи идут построчно: запись = шаг * len(ctrl_rc_ids) + слот РЦ. У РЦ одного
+кадра входы общие, поэтому их дельты между соседними записями пустые.
+
+Доступ — ленивые TimelineStepView с атрибутами TimelineStep: словари
+восстанавливаются при обращении (последовательный обход — O(дельты) на шаг).
+
+Для C: массивы структур фиксированного размера + пул дельт (idx, value).
+"""
+
+from __future__ import annotations
+
+from array import array
+from bisect import bisect_right
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple, Union
+
+from core.flag_bits import render_flags, step_flag_bits
+from core.sim_types import TimelineStep
+
+KEYFRAME_EVERY = 256
+
+_NONE = -1
+_NO_INT = -(2 ** 31)
+
+
+class ObjectIndex:
+    """Интернирование имён объектов: name <-> int."""
+
+    __slots__ = ("names", "_ids")
+
+    def __init__(self) -> None:
+        self.names: List[str] = []
+        self._ids: Dict[str, int] = {}
+
+    def intern(self, name: str) -> int:
+        idx = self._ids.get(name)
+        if idx is None:
+            idx = len(self.names)
+            self._ids[name] = idx
+            self.names.append(name)
+        return idx
+
+    def __len__(self) -> int:
+        return len(self.names)
+
+
+class _ValueTable:
+    """Интернирование произвольных значений modes (с учётом типа: True != 1)."""
+
+    __slots__ = ("values", "_ids")
+
+    def __init__(self) -> None:
+        self.values: List[Any] = []
+        self._ids: Dict[Tuple[type, Any], int] = {}
+
+    def intern(self, value: Any) -> int:
+        try:
+            key = (type(value), value)
+            idx = self._ids.get(key)
+        except TypeError:
+            # Нехешируемое значение: храним как есть, без дедупликации.
+            self.values.append(value)
+            return len(self.values) - 1
+        if idx is None:
+            idx = len(self.values)
+            self._ids[key] = idx
+            self.values.append(value)
+        return idx
+
+
+def _same(a: Any, b: Any) -> bool:
+    return a is b or (type(a) is type(b) and a == b)
+
+
+class _DeltaColumn:
+    """
+    Колонка словарей {name: value} в дельта-кодировке.
+
+    ints=True — значения целые, хранятся прямо в array('b') (расширяется
+    до array('q') при первом выходе за диапазон); иначе — индексы _ValueTable.
+    Нецелое значение (float и т.п.) в ints-колонке переводит её на _ValueTable.
+    """
+
+    _MISSING = object()
+
+    def __init__(self, names: ObjectIndex, ints: bool) -> None:
+        self._names = names
+        self._ints = ints
+        self._table: Optional[_ValueTable] = None if ints else _ValueTable()
+        self._starts = array("I")
+        self._keys = array("I")
+        self._vals: array = array("b") if ints else array("I")
+        self._keyframes = array("I")
+        self._last: Dict[str, Any] = {}
+        # Кэш последнего восстановленного словаря (последовательный обход).
+        self._cache_at = -1
+        self._cache: Dict[str, Any] = {}
+
+    def __len__(self) -> int:
+        return len(self._starts)
+
+    def _push(self, name: str, value: Any) -> None:
+        self._keys.append(self._names.intern(name))
+        if self._table is not None:
+            self._vals.append(self._table.intern(value))
+            return
+        if not isinstance(value, int):
+            self._to_table()
+            self._vals.append(self._table.intern(value))
+            return
+        try:
+            self._vals.append(value)
+        except OverflowError:
+            self._vals = array("q", self._vals)
+            self._vals.append(value)
+
+    def _to_table(self) -> None:
+        table = _ValueTable()
+        self._vals = array("I", (table.intern(v) for v in self._vals))
+        self._table = table
+
+    def append(self, d: Dict[str, Any]) -> None:
+        entry = len(self._starts)
+        self._starts.append(len(self._keys))
+        last = self._last
+        full = entry % KEYFRAME_EVERY == 0 or len(d) < len(last) or any(k not in d for k in last)
+        if full:
+            self._keyframes.append(entry)
+            for name, value in d.items():
+                self._push(name, value)
+        else:
+            missing = self._MISSING
+            for name, value in d.items():
+                if not _same(last.get(name, missing), value):
+                    self._push(name, value)
+        self._last = dict(d)
+
+    def _apply(self, out: Dict[str, Any], entry: int) -> None:
+        lo = self._starts[entry]
+        hi = self._starts[entry + 1] if entry + 1 < len(self._starts) else len(self._keys)
+        names = self._names.names
+        if self._table is None:
+            for j in range(lo, hi):
+                out[names[self._keys[j]]] = self._vals[j]
+        else:
+            values = self._table.values
+            for j in range(lo, hi):
+                out[names[self._keys[j]]] = values[self._vals[j]]
+
+    def get(self, entry: int) -> Dict[str, Any]:
+        kf = self._keyframes[bisect_right(self._keyframes, entry) - 1]
+        if kf <= self._cache_at <= entry:
+            cur, start = self._cache, self._cache_at + 1
+        else:
+            cur, start = {}, kf
+        for e in range(start, entry + 1):
+            if e == kf:
+                cur = {}
+            self._apply(cur, e)
+        self._cache_at, self._cache = entry, cur
+        return dict(cur)
+
+
+class TimelineStepView:
+    """
+    Ленивая read-only проекция одной записи ColumnarTimeline с атрибутами
+    TimelineStep. Словари/списки собираются при каждом обращении.
+    """
+
+    __slots__ = ("_store", "_entry")
+
+    def __init__(self, store: "ColumnarTimeline", entry: int) -> None:
+        self._store = store
+        self._entry = entry
+
+    @property
+    def t(self) -> float:
+        return self._store._t[self._entry]
+
+    @property
+    def step_duration(self) -> float:
+        return self._store._dur[self._entry]
+
+    @property
+    def ctrl_rc_id(self) -> str:
+        s = self._store
+        return s.ctrl_rc_ids[self._entry % len(s.ctrl_rc_ids)]
+
+    @property
+    def effective_prev_rc(self) -> Optional[str]:
+        return self._store._name(self._store._prev[self._entry])
+
+    @property
+    def effective_next_rc(self) -> Optional[str]:
+        return self._store._name(self._store._next[self._entry])
+
+    @property
+    def rc_states(self) -> Dict[str, int]:
+        return self._store._rc_states.get(self._entry)
+
+    @property
+    def switch_states(self) -> Dict[str, int]:
+        return self._store._switch_states.get(self._entry)
+
+    @property
+    def signal_states(self) -> Dict[str, int]:
+        return self._store._signal_states.get(self._entry)
+
+    @property
+    def modes(self) -> Dict[str, Any]:
+        return self._store._modes.get(self._entry)
+
+    @property
+    def lz_state(self) -> bool:
+        return bool(self._store._lz_state[self._entry])
+
+    @property
+    def lz_variant(self) -> int:
+        return self._store._lz_variant[self._entry]
+
+    @property
+    def flags(self) -> List[str]:
+        return render_flags(self.flag_bits)
+
+    @property
+    def flag_bits(self) -> int:
+        return self._store._flag_sets[self._store._flags[self._entry]]
+
+    @property
+    def mu_state(self) -> Optional[int]:
+        return self._store._opt(self._store._mu, self._entry)
+
+    @property
+    def nas_state(self) -> Optional[int]:
+        return self._store._opt(self._store._nas, self._entry)
+
+    @property
+    def chas_state(self) -> Optional[int]:
+        return self._store._opt(self._store._chas, self._entry)
+
+    @property
+    def dsp_state(self) -> Optional[int]:
+        return self._store._opt(self._store._dsp, self._entry)
+
+    def materialize(self) -> TimelineStep:
+        """Полноценный TimelineStep (копия) для кода, который его мутирует."""
+        return TimelineStep(
+            t=self.t,
+            step_duration=self.step_duration,
+            ctrl_rc_id=self.ctrl_rc_id,
+            effective_prev_rc=self.effective_prev_rc,
+            effective_next_rc=self.effective_next_rc,
+            rc_states=self.rc_states,
+            switch_states=self.switch_states,
+            signal_states=self.signal_states,
+            modes=self.modes,
+            lz_state=self.lz_state,
+            lz_variant=self.lz_variant,
+            mu_state=self.mu_state,
+            nas_state=self.nas_state,
+            chas_state=self.chas_state,
+            dsp_state=self.dsp_state,
+            flag_bits=self.flag_bits,
+        )
+
+    def __repr__(self) -> str:
+        return f"TimelineStep({self.ctrl_rc_id}, t={self.t}, lz={self.lz_state}, flags={self.flags})"
+
+
+class ColumnarTimeline:
+    """
+    Колоночный результат прогона: len() — число кадров, [i] — кадр
+    Dict[rc_id, TimelineStepView] (как элемент run() в multi-RC режиме).
+    """
+
+    def __init__(self, ctrl_rc_ids: List[str]) -> None:
+        self.ctrl_rc_ids: List[str] = list(ctrl_rc_ids)
+        self.names = ObjectIndex()
+        self._t = array("d")
+        self._dur = array("d")
+        self._prev = array("i")
+        self._next = array("i")
+        self._lz_state = array("b")
+        self._lz_variant = array("i")
+        self._flags = array("I")
+        self._flag_sets: List[int] = []
+        self._flag_set_ids: Dict[int, int] = {}
+        self._mu = array("i")
+        self._nas = array("i")
+        self._chas = array("i")
+        self._dsp = array("i")
+        self._rc_states = _DeltaColumn(self.names, ints=True)
+        self._switch_states = _DeltaColumn(self.names, ints=True)
+        self._signal_states = _DeltaColumn(self.names, ints=True)
+        self._modes = _DeltaColumn(self.names, ints=False)
+
+    @classmethod
+    def from_frames(
+        cls,
+        frames: Iterable[Dict[str, TimelineStep]],
+        ctrl_rc_ids: List[str],
+    ) -> "ColumnarTimeline":
+        store = cls(ctrl_rc_ids)
+        for frame in frames:
+            store.append_frame(frame)
+        return store
+
+    def _name(self, idx: int) -> Optional[str]:
+        return None if idx == _NONE else self.names.names[idx]
+
+    def _intern_opt_name(self, name: Optional[str]) -> int:
+        return _NONE if name is None else self.names.intern(name)
+
+    @staticmethod
+    def _opt(col: array, entry: int) -> Optional[int]:
+        v = col[entry]
+        return None if v == _NO_INT else v
+
+    def _intern_flags(self, key: int) -> int:
+        idx = self._flag_set_ids.get(key)
+        if idx is None:
+            idx = len(self._flag_sets)
+            self._flag_set_ids[key] = idx
+            self._flag_sets.append(key)
+        return idx
+
+    def append_frame(self, frame: Dict[str, TimelineStep]) -> None:
+        """Добавляет кадр; РЦ берутся в порядке ctrl_rc_ids."""
+        for rc_id in self.ctrl_rc_ids:
+            step = frame[rc_id]
+            self._t.append(float(step.t))
+            self._dur.append(float(step.step_duration))
+            self._prev.append(self._intern_opt_name(step.effective_prev_rc))
+            self._next.append(self._intern_opt_name(step.effective_next_rc))
+            self._lz_state.append(1 if step.lz_state else 0)
+            self._lz_variant.append(int(step.lz_variant))
+            self._flags.append(self._intern_flags(step_flag_bits(step)))
+            for col, v in (
+                (self._mu, step.mu_state),
+                (self._nas, step.nas_state),
+                (self._chas, step.chas_state),
+                (self._dsp, step.dsp_state),
+            ):
+                col.append(_NO_INT if v is None else int(v))
+            self._rc_states.append(step.rc_states)
+            self._switch_states.append(step.switch_states)
+            self._signal_states.append(step.signal_states)
+            self._modes.append(step.modes)
+
+    def __len__(self) -> int:
+        return len(self._t) // max(1, len(self.ctrl_rc_ids))
+
+    def view(self, index: int, rc_id: str) -> TimelineStepView:
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError(index)
+        return TimelineStepView(self, index * len(self.ctrl_rc_ids) + self.ctrl_rc_ids.index(rc_id))
+
+    def __getitem__(self, index: int) -> Dict[str, TimelineStepView]:
+        n = len(self)
+        if index < 0:
+            index += n
+        if not 0 <= index < n:
+            raise IndexError(index)
+        base = index * len(self.ctrl_rc_ids)
+        return {rc_id: TimelineStepView(self, base + slot) for slot, rc_id in enumerate(self.ctrl_rc_ids)}
+
+    def __iter__(self) -> Iterator[Dict[str, TimelineStepView]]:
+        for i in range(len(self)):
+            yield self[i]
+
+    def as_run_output(self) -> Union[List[TimelineStepView], List[Dict[str, TimelineStepView]]]:
+        """Форма результата как у SimulationContext.run(): для одной РЦ — список шагов."""
+        if len(self.ctrl_rc_ids) == 1:
+            rc_id = self.ctrl_rc_ids[0]
+            return [self.view(i, rc_id) for i in range(len(self))]
+        return list(self)
+
+    def iter_records(self) -> Iterator[Dict[str, Any]]:
+        """
+        Записи подряд (шаг * РЦ) словарями с полями TimelineStep без flag_bits —
+        прямо из колонок, без TimelineStepView и копий DTO.
+        Списки flags рендерятся один раз на уникальный набор битов.
+        """
+        names = self.names.names
+        ids = self.ctrl_rc_ids
+        rendered: Dict[int, List[str]] = {}
+        for entry in range(len(self._t)):
+            flag_idx = self._flags[entry]
+            flags = rendered.get(flag_idx)
+            if flags is None:
+                flags = rendered[flag_idx] = render_flags(self._flag_sets[flag_idx])
+            prev, nxt = self._prev[entry], self._next[entry]
+            yield {
+                "t": self._t[entry],
+                "step_duration": self._dur[entry],
+                "ctrl_rc_id": ids[entry % len(ids)],
+                "effective_prev_rc": None if prev == _NONE else names[prev],
+                "effective_next_rc": None if nxt == _NONE else names[nxt],
+                "rc_states": self._rc_states.get(entry),
+                "switch_states": self._switch_states.get(entry),
+                "signal_states": self._signal_states.get(entry),
+                "modes": self._modes.get(entry),
+                "lz_state": bool(self._lz_state[entry]),
+                "lz_variant": self._lz_variant[entry],
+                "flags": list(flags),
+                "mu_state": self._opt(self._mu, entry),
+                "nas_state": self._opt(self._nas, entry),
+                "chas_state": self._opt(self._chas, entry),
+                "dsp_state": self._opt(self._dsp, entry),
+            }
+
+    def to_frames(self) -> List[Dict[str, TimelineStep]]:
+        return [{rc_id: v.materialize() for rc_id, v in frame.items()} for frame in self]
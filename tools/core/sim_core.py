@@ -7,25 +7,38 @@ sim_core.py вЂ” РѕР±С‰РёР№ РєР°СЂРєР°СЃ СЃРёРј
 Р”Р»СЏ C: СЃС‚СЂСѓРєС‚СѓСЂС‹ СЃ РїР»РѕСЃРєРёРјРё РїРѕР»СЏРјРё, СЏРІРЅРѕРµ СѓРїСЂР°РІР»РµРЅРёРµ РїР°РјСЏС‚СЊСЋ, Р±РµР· РІРёСЂС‚СѓР°Р»СЊРЅС‹С… РјРµС‚РѕРґРѕРІ.
 """
 
-from typing import Dict, List, Any, Optional, Iterable, Tuple, Union
+import dataclasses
+from typing import Dict, List, Any, Optional, Iterable, Iterator, Sequence, Tuple, Union
 
-from station.station_model import load_station_from_config, StationModel
+from station.station_model import StationModel
+from station.station_snapshot import SignalIndex, get_station_snapshot
 from core.topology_manager import UniversalTopologyManager
 
 from core.detectors_engine import (
     DetectorsState,
+    _ensure_rc_states_by_id,
     init_detectors_engine,
+    next_detectors_deadline,
 )
 from core.detectors.types import DetectorsConfig
-from core.sim_types import ScenarioStep, SimulationConfig, TimelineStep
+from core.sim_types import LazyScenario, ScenarioStep, SimulationConfig, TimelineStep
 from exceptions.exceptions_engine import (
+    ExceptionsConfig,
     build_exception_context,
     make_exceptions_config,
 )
-from exceptions.exceptions_objects_registry import ExceptionsObjectsRegistry
+from exceptions.exceptions_objects_registry import ExceptionsObjectsEvaluator, ExceptionsObjectsRegistry
+from exceptions.exceptions_tracker import ExceptionsContextTracker
 from core.sim_result import SingleResultWrapper
-from core.sim_runner import run_context
-from core.sim_step_runner import step_single_rc
+from core.detectors.registry import LZ_SPECS_BY_VARIANT
+from core.detectors.soa import SoADetectorEngine
+from core.flag_bits import LS_ANY, LZ_ANY, LZ_DSP_GATE, prefix_mask, set_flag_bits, step_flag_bits
+from core.sim_columnar import ColumnarTimeline
+from core.step_classes import StepClasses
+from core.station_frame import StationFrame, build_station_frame
+from core.sim_runner import iter_context, run_context
+from core.phase_trace import PhaseTracer, tracing
+from core.sim_step_runner import step_rcs_soa, step_single_rc
 
 
 
@@ -48,7 +61,10 @@ class SimulationContext:
         ctrl_rc_id: Optional[str] = None,
     ) -> None:
         self.config = config
-        self.scenario_steps: List[ScenarioStep] = list(scenario)
+        # DeltaScenario (LazyScenario) разворачивается лениво при обходе — хранится как есть
+        self.scenario_steps: Sequence[ScenarioStep] = (
+            scenario if isinstance(scenario, LazyScenario) and isinstance(scenario, Sequence) else list(scenario)
+        )
         
         # РћРїСЂРµРґРµР»СЏРµРј СЃРїРёСЃРѕРє РєРѕРЅС‚СЂРѕР»РёСЂСѓРµРјС‹С… Р Р¦
         if ctrl_rc_id is not None:
@@ -68,9 +84,19 @@ class SimulationContext:
             raise ValueError("РќРµ СѓРєР°Р·Р°РЅС‹ РєРѕРЅС‚СЂРѕР»РёСЂСѓРµРјС‹Рµ Р Р¦ (ctrl_rc_ids РёР»Рё ctrl_rc_id)")
         
         # РњРѕРґРµР»СЊ СЃС‚Р°РЅС†РёРё + С‚РѕРїРѕР»РѕРіРёСЏ (РѕРґРЅР° РЅР° РІСЃРµ Р Р¦)
-        self.model: StationModel = load_station_from_config()
-        self.topology = UniversalTopologyManager(self.model, t_pk=config.t_pk)
-        self.exceptions_registry = ExceptionsObjectsRegistry.load(config.exceptions_objects_path)
+        # Снимок станции и реестр исключений разделяются между контекстами (кэш на процесс);
+        # свои у контекста только TopologyState (latches) в UniversalTopologyManager.
+        snapshot = get_station_snapshot(config.station)
+        self.model: StationModel = snapshot.model
+        self.signal_index: SignalIndex = snapshot.signals
+        self._rc_bits = snapshot.rc_bits
+        self.topology = UniversalTopologyManager(self.model, t_pk=config.t_pk, template=snapshot.topology)
+        self.exceptions_registry = ExceptionsObjectsRegistry.load_cached(config.exceptions_objects_path)
+        # Результаты объектов исключений по РЦ, пересчёт только при смене их индикаторов
+        self.exceptions_objects = ExceptionsObjectsEvaluator(self.exceptions_registry)
+        self.tracer: Optional[PhaseTracer] = (
+            PhaseTracer(config.phase_trace) if config.phase_trace is not None else None
+        )
 
         # РўРµРєСѓС‰РµРµ РІСЂРµРјСЏ Рё СЃРѕСЃС‚РѕСЏРЅРёСЏ (РѕР±С‰РёРµ РґР»СЏ РІСЃРµС… Р Р¦)
         self.time: float = 0.0
@@ -87,9 +113,18 @@ class SimulationContext:
                 self.detectors_states[rc_id] = init_detectors_engine(
                     cfg=cfg,
                     rc_ids=list(self.model.rc_nodes.keys()),
+                    station_model=self.model,
                 )
             else:
                 raise ValueError(f"РќРµС‚ РєРѕРЅС„РёРіСѓСЂР°С†РёРё РґР»СЏ Р Р¦ {rc_id}")
+        # Движок детекторов в массивах (SimulationConfig.detector_engine); объекты
+        # остаются синхронными с ним после каждого подшага. Трассировка фаз идёт
+        # через BaseDetector.update, поэтому с ней — объекты.
+        if config.detector_engine not in ("objects", "soa"):
+            raise ValueError(f"Unknown detector_engine: {config.detector_engine!r}")
+        self.soa_engine: Optional[SoADetectorEngine] = None
+        if config.detector_engine == "soa" and self.tracer is None:
+            self.soa_engine = SoADetectorEngine(self.detectors_states, rc_bits=self._rc_bits)
 
         # РРЅРёС†РёР°Р»РёР·Р°С†РёСЏ РЅР°С‡Р°Р»СЊРЅС‹РјРё РґР°РЅРЅС‹РјРё
         if self.scenario_steps:
@@ -102,7 +137,65 @@ class SimulationContext:
         self._scenario_history_runtime: List[ScenarioStep] = []
         self._timeline_history_runtime: Dict[str, List[TimelineStep]] = {rc_id: [] for rc_id in self.ctrl_rc_ids}
         self._scenario_history_by_rc: Dict[str, List[ScenarioStep]] = {rc_id: [] for rc_id in self.ctrl_rc_ids}
+        # Incremental exception windows (O(1) per step instead of rescanning histories).
+        self._exception_trackers: Dict[str, ExceptionsContextTracker] = {
+            rc_id: ExceptionsContextTracker(rc_id) for rc_id in self.ctrl_rc_ids
+        }
         self._dsp_maneuver_timer_by_rc: Dict[str, float] = {rc_id: 0.0 for rc_id in self.ctrl_rc_ids}
+        # Время до срабатывания ДСП-гейта, пока его таймер идёт (для событийного режима)
+        self._dsp_gate_pending_by_rc: Dict[str, Optional[float]] = {}
+        # False (streaming without negative durations): histories are dropped as the
+        # incremental trackers ingest them, so memory does not grow with the scenario.
+        self._keep_history: bool = True
+        # Классы состояний РЦ/светофоров текущего шага (общие для всех ctrl РЦ).
+        self._step_classes: Optional[StepClasses] = None
+        self._step_classes_src: Optional[Dict[str, int]] = None
+        # Светофоры между ctrl и соседями: (ctrl, prev, next) -> modes sig_*.
+        # Тройка меняется только при переводе стрелок, поэтому кэш не сбрасывается.
+        self._signal_modes_cache: Dict[Tuple[str, Optional[str], Optional[str]], Dict[str, Optional[str]]] = {}
+        # Общий кадр станции текущего шага (core.station_frame)
+        self._station_frame: Optional[StationFrame] = None
+        # ExceptionsConfig по РЦ: конфиги детекторов не меняются после init
+        self._exceptions_configs: Dict[str, ExceptionsConfig] = {}
+
+    def step_classes(self) -> StepClasses:
+        """
+        Классы состояний текущего шага (core.step_classes): строятся один раз по
+        rc_states (по ID) и signal_states и переиспользуются всеми РЦ, детекторами
+        и фазами, пока эти словари не заменены.
+        """
+        c = self._step_classes
+        if c is None or self._step_classes_src is not self.rc_states or c.signal_states is not self.signal_states:
+            c = StepClasses(_ensure_rc_states_by_id(self.rc_states), self.signal_states, self._rc_bits)
+            self._step_classes = c
+            self._step_classes_src = self.rc_states
+        return c
+
+    def station_frame(self) -> StationFrame:
+        """
+        Кадр станции текущего шага: строится один раз по словарям состояний
+        контекста и общий для всех контролируемых РЦ, пока словари не заменены.
+        """
+        frame = self._station_frame
+        if frame is None or not frame.matches(self.rc_states, self.switch_states, self.signal_states):
+            frame = build_station_frame(
+                rc_states=self.rc_states,
+                switch_states=self.switch_states,
+                signal_states=self.signal_states,
+                classes=self.step_classes(),
+                topology=self.topology,
+                ctrl_rc_ids=self.ctrl_rc_ids,
+            )
+            self._station_frame = frame
+        return frame
+
+    def exceptions_config(self, rc_id: str) -> ExceptionsConfig:
+        """make_exceptions_config для РЦ (один раз на контекст)."""
+        cfg = self._exceptions_configs.get(rc_id)
+        if cfg is None:
+            cfg = make_exceptions_config(self.config.detectors_configs.get(rc_id))
+            self._exceptions_configs[rc_id] = cfg
+        return cfg
 
     def _compute_effective_neighbors_with_control(
         self,
@@ -124,20 +217,7 @@ class SimulationContext:
         prev_sec: Optional[str],
         next_sec: Optional[str],
     ) -> Optional[str]:
-        exact: Optional[str] = None
-        by_next: Optional[str] = None
-        by_prev: Optional[str] = None
-        for sig in self.model.signal_nodes.values():
-            ps = sig.prev_sec
-            ns = sig.next_sec
-            if prev_sec and next_sec and ps == prev_sec and ns == next_sec:
-                exact = sig.signal_id
-                break
-            if by_next is None and next_sec and ns == next_sec:
-                by_next = sig.signal_id
-            if by_prev is None and prev_sec and ps == prev_sec:
-                by_prev = sig.signal_id
-        return exact or by_next or by_prev
+        return self.signal_index.pick(prev_sec, next_sec)
 
     def _compute_dynamic_signal_modes(
         self,
@@ -145,16 +225,23 @@ class SimulationContext:
         effective_prev_rc: Optional[str],
         effective_next_rc: Optional[str],
     ) -> Dict[str, Optional[str]]:
+        """Светофоры sig_* для modes (результат общий, не изменять)."""
+        key = (ctrl_rc_id, effective_prev_rc, effective_next_rc)
+        cached = self._signal_modes_cache.get(key)
+        if cached is not None:
+            return cached
         sig_prev_to_ctrl = self._pick_signal(effective_prev_rc, ctrl_rc_id) if effective_prev_rc else None
         sig_ctrl_to_prev = self._pick_signal(ctrl_rc_id, effective_prev_rc) if effective_prev_rc else None
         sig_ctrl_to_next = self._pick_signal(ctrl_rc_id, effective_next_rc) if effective_next_rc else None
         sig_next_to_ctrl = self._pick_signal(effective_next_rc, ctrl_rc_id) if effective_next_rc else None
-        return {
+        modes = {
             "sig_prev_to_ctrl": sig_prev_to_ctrl,
             "sig_ctrl_to_prev": sig_ctrl_to_prev,
             "sig_ctrl_to_next": sig_ctrl_to_next,
             "sig_next_to_ctrl": sig_next_to_ctrl,
         }
+        self._signal_modes_cache[key] = modes
+        return modes
 
     def _step_single_rc(
         self,
@@ -178,25 +265,10 @@ class SimulationContext:
         return st in (6, 7, 8)
 
     def _reset_variant_detector(self, det_state: DetectorsState, variant: int) -> None:
-        mapping = {
-            1: "v1",
-            2: "v2",
-            3: "v3",
-            4: "v4",
-            5: "v5",
-            6: "v6",
-            7: "v7",
-            8: "v8",
-            9: "lz9",
-            10: "lz10",
-            11: "lz11",
-            12: "lz12",
-            13: "lz13",
-        }
-        attr = mapping.get(int(variant))
-        if not attr:
+        spec = LZ_SPECS_BY_VARIANT.get(int(variant))
+        if spec is None:
             return
-        det = getattr(det_state, attr, None)
+        det = getattr(det_state, spec.key, None)
         if det is not None and hasattr(det, "reset"):
             det.reset()
 
@@ -210,6 +282,7 @@ class SimulationContext:
         policy = self.exceptions_registry.get_dsp_policy(rc_id, det_cfg)
         if not bool(policy.get("enabled", False)):
             self._dsp_maneuver_timer_by_rc[rc_id] = 0.0
+            self._dsp_gate_pending_by_rc[rc_id] = None
             return {"triggered": False, "variants": [], "policy": policy}
 
         dsp_state = (
@@ -234,38 +307,46 @@ class SimulationContext:
             self._dsp_maneuver_timer_by_rc[rc_id] = 0.0
 
         t_maneuver = float(policy.get("t_maneuver", 600.0))
-        triggered = self._dsp_maneuver_timer_by_rc[rc_id] >= t_maneuver > 0.0
+        timer = self._dsp_maneuver_timer_by_rc[rc_id]
+        triggered = timer >= t_maneuver > 0.0
+        self._dsp_gate_pending_by_rc[rc_id] = t_maneuver - timer if 0.0 < timer < t_maneuver else None
         variants = [int(v) for v in (policy.get("variants") or [])]
         if triggered:
             det_state = self.detectors_states.get(rc_id)
             if det_state is not None:
                 for v in variants:
                     self._reset_variant_detector(det_state, v)
+                if self.soa_engine is not None:
+                    self.soa_engine.load([rc_id])
         return {"triggered": triggered, "variants": variants, "policy": policy}
 
     def _build_overlay_step_for_rc(self, step: ScenarioStep, rc_id: str) -> ScenarioStep:
-        obj_eval = self.exceptions_registry.evaluate(step.indicator_states or {}, rc_id)
-        merged_mu = dict(step.mu)
-        if obj_eval["mu_active"]:
+        """
+        Шаг с наложением объектов исключений РЦ (МУ/НАС/ЧАС/ДСП), копирование при записи:
+        словари общие с step, новый словарь — только у изменённого поля (mu/auto_actions);
+        без изменений возвращается сам step. Результат только для чтения.
+        """
+        obj_eval = self.exceptions_objects.evaluate(step.indicator_states or {}, rc_id)
+        merged_mu = step.mu
+        if obj_eval["mu_active"] and merged_mu.get(rc_id) != 1:
+            merged_mu = dict(merged_mu)
             merged_mu[rc_id] = 1
-        merged_auto = dict(step.auto_actions)
-        if obj_eval["nas_active"] and "nas" not in merged_auto:
-            merged_auto["nas"] = 0
-        if obj_eval["chas_active"] and "chas" not in merged_auto:
-            merged_auto["chas"] = 0
+        added_auto: Dict[str, int] = {}
+        if obj_eval["nas_active"] and "nas" not in step.auto_actions:
+            added_auto["nas"] = 0
+        if obj_eval["chas_active"] and "chas" not in step.auto_actions:
+            added_auto["chas"] = 0
+        merged_auto = {**step.auto_actions, **added_auto} if added_auto else step.auto_actions
         merged_dsp = step.dispatcher_control_state
         if merged_dsp is None and obj_eval["dsp_active"]:
             merged_dsp = 4
-        return ScenarioStep(
-            t=step.t,
-            rc_states=dict(step.rc_states),
-            switch_states=dict(step.switch_states),
-            signal_states=dict(step.signal_states),
-            modes=dict(step.modes),
+        if merged_mu is step.mu and merged_auto is step.auto_actions and merged_dsp == step.dispatcher_control_state:
+            return step
+        return dataclasses.replace(
+            step,
             mu=merged_mu,
             dispatcher_control_state=merged_dsp,
             auto_actions=merged_auto,
-            indicator_states=dict(step.indicator_states),
         )
 
     def step(self, step: ScenarioStep) -> Union[TimelineStep, Dict[str, TimelineStep]]:
@@ -283,54 +364,75 @@ class SimulationContext:
         self.rc_states = dict(step.rc_states)
         self.switch_states = dict(step.switch_states)
         self.signal_states = dict(step.signal_states)
+        # Соседи РЦ без изменившихся стрелок — с прошлого шага (кэш топологии)
+        self.topology.begin_step(self.switch_states)
 
         # NEW: РІС‹С‡РёСЃР»СЏРµРј С€Р°Рі РґР»СЏ РєР°Р¶РґРѕР№ РєРѕРЅС‚СЂРѕР»РёСЂСѓРµРјРѕР№ Р Р¦
         results: Dict[str, TimelineStep] = {}
+        # Наложения объектов исключений: одно на (шаг, РЦ), оно же идёт в историю
+        overlays: Dict[str, ScenarioStep] = {}
+        exc_ctxs: Dict[str, Dict[str, bool]] = {}
+        gates: Dict[str, Dict[str, object]] = {}
         for rc_id in self.ctrl_rc_ids:
             det_cfg = self.config.detectors_configs.get(rc_id)
-            exc_cfg = make_exceptions_config(det_cfg)
+            exc_cfg = self.exceptions_config(rc_id)
             step_for_exc = self._build_overlay_step_for_rc(step, rc_id)
+            overlays[rc_id] = step_for_exc
             dsp_gate = self._apply_dsp_detector_gate(rc_id, step_for_exc, det_cfg, dt)
-            scenario_hist_current = self._scenario_history_by_rc.get(rc_id, []) + [step_for_exc]
-            exc_ctx = build_exception_context(
-                ctrl_rc_id=rc_id,
-                current_step=step_for_exc,
-                scenario_history=scenario_hist_current,
-                timeline_history=self._timeline_history_runtime.get(rc_id, []),
-                cfg=exc_cfg,
-            )
+            tracker = self._exception_trackers.setdefault(rc_id, ExceptionsContextTracker(rc_id))
+            tracker.push_step(step_for_exc)
+            if self._keep_history:
+                tracker.observe_timeline(self._timeline_history_runtime.get(rc_id, []))
+            else:
+                tracker.drain_timeline(self._timeline_history_runtime.setdefault(rc_id, []))
+            if tracker.incremental:
+                exc_ctx = tracker.build_context(exc_cfg)
+            else:
+                # Negative step durations: fall back to the full-history scan.
+                scenario_hist_current = self._scenario_history_by_rc.get(rc_id, []) + [step_for_exc]
+                exc_ctx = build_exception_context(
+                    ctrl_rc_id=rc_id,
+                    current_step=step_for_exc,
+                    scenario_history=scenario_hist_current,
+                    timeline_history=self._timeline_history_runtime.get(rc_id, []),
+                    cfg=exc_cfg,
+                )
             if bool(dsp_gate.get("triggered", False)):
                 exc_ctx["exc_dsp_detector_gate"] = True
-            results[rc_id] = self._step_single_rc(
-                rc_id,
-                step,
-                dt,
-                exception_context=exc_ctx,
-                step_override=step_for_exc,
-            )
+            exc_ctxs[rc_id] = exc_ctx
+            gates[rc_id] = dsp_gate
+            if self.soa_engine is None:
+                results[rc_id] = self._step_single_rc(
+                    rc_id,
+                    step,
+                    dt,
+                    exception_context=exc_ctx,
+                    step_override=step_for_exc,
+                )
+        if self.soa_engine is not None:
+            # Входы всех РЦ готовы — детекторы всех РЦ за один проход движка
+            results = step_rcs_soa(self, step, dt, exc_ctxs, overlays)
+        for rc_id, dsp_gate in gates.items():
             if bool(dsp_gate.get("triggered", False)):
                 vset = set(int(x) for x in (dsp_gate.get("variants") or []))
                 if vset:
-                    results[rc_id].flags = [
-                        f for f in results[rc_id].flags
-                        if not any(f.startswith(f"llz_v{v}") for v in vset)
-                    ]
-                    results[rc_id].flags.append("lz_suppressed:dsp_detector_gate")
-                    has_lz = any(fl.startswith("llz_v") for fl in results[rc_id].flags)
-                    has_ls = any(fl.startswith("lls_") for fl in results[rc_id].flags)
-                    results[rc_id].lz_state = bool(has_lz or has_ls)
+                    gated = 0
+                    for v in vset:
+                        gated |= prefix_mask(f"llz_v{v}")
+                    bits = (step_flag_bits(results[rc_id]) & ~gated) | LZ_DSP_GATE
+                    set_flag_bits(results[rc_id], bits)
+                    results[rc_id].lz_state = bool(bits & (LZ_ANY | LS_ANY))
                     if not results[rc_id].lz_state:
                         results[rc_id].lz_variant = 0
 
         # РЎРґРІРёРіР°РµРј РІСЂРµРјСЏ (РѕРґРЅРѕ РЅР° РІСЃРµ Р Р¦)
         self.time += dt
-        self._scenario_history_runtime.append(step)
         for rc_id, tl in results.items():
             self._timeline_history_runtime.setdefault(rc_id, []).append(tl)
-        for rc_id in self.ctrl_rc_ids:
-            self._scenario_history_by_rc.setdefault(rc_id, []).append(
-                self._build_overlay_step_for_rc(step, rc_id)
-            )
+        if self._keep_history:
+            self._scenario_history_runtime.append(step)
+            for rc_id in self.ctrl_rc_ids:
+                self._scenario_history_by_rc.setdefault(rc_id, []).append(overlays[rc_id])
 
         # Р”Р»СЏ РѕР±СЂР°С‚РЅРѕР№ СЃРѕРІРјРµСЃС‚РёРјРѕСЃС‚Рё: РµСЃР»Рё РѕРґРЅР° Р Р¦ вЂ” РІРѕР·РІСЂР°С‰Р°РµРј РµС‘ РЅР°РїСЂСЏРјСѓСЋ
         # РќРѕ СЃРѕС…СЂР°РЅСЏРµРј РІРѕР·РјРѕР¶РЅРѕСЃС‚СЊ РїРѕР»СѓС‡РёС‚СЊ РєР°Рє СЃР»РѕРІР°СЂСЊ
@@ -354,6 +456,81 @@ class SimulationContext:
         
         Р”Р»СЏ C: РґРІСѓРјРµСЂРЅС‹Р№ РјР°СЃСЃРёРІ РёР»Рё РјР°СЃСЃРёРІ СЃС‚СЂСѓРєС‚СѓСЂ СЃ РїРѕР»РµРј rc_id.
         """
-        return run_context(self)
+        with tracing(self.tracer):
+            return run_context(self)
+
+    def iter_frames(self) -> Iterator[Dict[str, TimelineStep]]:
+        """
+        Потоковый прогон: кадры Dict[rc_id, TimelineStep] по мере расчёта
+        (те же, что в run(), но без накопления всего таймлайна).
+
+        Если в сценарии нет отрицательных длительностей, истории исключений
+        не копятся (инкрементальные трекеры их не требуют) — память ограничена.
+        Трассировка включается на время расчёта каждого кадра, а не на весь
+        генератор: потребитель может забирать кадры из разных потоков/контекстов.
+        """
+        steps = self.scenario_steps
+        self._keep_history = (
+            steps.has_negative_t() if isinstance(steps, LazyScenario)
+            else any(float(s.t) < 0.0 for s in steps)
+        )
+        frames = iter_context(self, keep_history=self._keep_history)
+        while True:
+            with tracing(self.tracer):
+                frame = next(frames, None)
+            if frame is None:
+                return
+            yield frame
+
+    def run_columnar(self) -> ColumnarTimeline:
+        """
+        Прогон с компактным колоночным результатом (см. sim_columnar): кадры
+        из iter_frames() сразу упаковываются, полный список TimelineStep не строится.
+        """
+        return ColumnarTimeline.from_frames(self.iter_frames(), self.ctrl_rc_ids)
+
+    def next_deadline(self, inputs_changed: bool = False) -> Optional[float]:
+        """
+        Ближайший порог по всем контролируемым РЦ при неизменных входах: детекторы
+        (фаза / t_kon) и таймеры шага (next_timer_deadline). None — все в покое.
+        """
+        best = self.next_timer_deadline()
+        for rc_id in self.ctrl_rc_ids:
+            det_state = self.detectors_states.get(rc_id)
+            d = next_detectors_deadline(det_state, inputs_changed) if det_state is not None else None
+            if d is not None and (best is None or d < best):
+                best = d
+        return best
+
+    def next_timer_deadline(self) -> Optional[float]:
+        """
+        Ближайшее срабатывание таймеров вне детекторов при неизменных входах:
+        окна исключений (t_mu, t_recent_ls, t_ls_after_lz, ДСП), таймер ДСП-гейта,
+        удержание соседей (T_PK). None — ни один не идёт. Пока какой-то идёт,
+        событийный режим не сливает шаги (значения окон зависят от разбиения).
+        """
+        candidates: List[float] = []
+        for rc_id in self.ctrl_rc_ids:
+            tracker = self._exception_trackers.get(rc_id)
+            if tracker is not None:
+                d = tracker.next_window_change(
+                    self.exceptions_config(rc_id), self._timeline_history_runtime.get(rc_id, [])
+                )
+                if d is not None:
+                    candidates.append(d)
+            gate = self._dsp_gate_pending_by_rc.get(rc_id)
+            if gate is not None:
+                candidates.append(gate)
+            topo = self.topology.states.get(rc_id)
+            if topo is not None:
+                # Удержание идёт, пока time_since_* > 0 (0.0 — сосед под контролем)
+                for since in (topo.time_since_prev_lost, topo.time_since_next_lost):
+                    if since:
+                        candidates.append(max(self.topology.T_PK - since, 0.0))
+        return min(candidates) if candidates else None
+
+    def trace_events(self) -> List[Dict[str, Any]]:
+        """События трассировки фаз (пусто, если config.phase_trace не задан)."""
+        return self.tracer.events() if self.tracer is not None else []
 
 
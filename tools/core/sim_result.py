@@ -23,6 +23,10 @@ class SingleResultWrapper:
         self.lz_state = step.lz_state
         self.lz_variant = step.lz_variant
         self.flags = step.flags
+        self.mu_state = step.mu_state
+        self.nas_state = step.nas_state
+        self.chas_state = step.chas_state
+        self.dsp_state = step.dsp_state
 
     def __getitem__(self, key):
         if isinstance(key, int):
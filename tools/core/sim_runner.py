@@ -1,29 +1,121 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Dict, List, Union
+import dataclasses
+from typing import TYPE_CHECKING, Dict, Iterable, Iterator, List, Optional, Tuple, Union
 
 from core.sim_result import SingleResultWrapper
+from core.sim_sharded import iter_sharded_frames, shards_for
 from core.sim_types import ScenarioStep, TimelineStep
-from exceptions.exceptions_engine import apply_exceptions, make_exceptions_config
+from exceptions.exceptions_tracker import ExceptionsPostProcessor
 
 if TYPE_CHECKING:
     from core.sim_core import SimulationContext
 
 
-def run_context(ctx: "SimulationContext") -> Union[List[TimelineStep], List[Dict[str, TimelineStep]]]:
+def _same_inputs(a: ScenarioStep, b: ScenarioStep) -> bool:
+    return (
+        a.rc_states == b.rc_states
+        and a.switch_states == b.switch_states
+        and a.signal_states == b.signal_states
+        and a.modes == b.modes
+        and a.mu == b.mu
+        and a.dispatcher_control_state == b.dispatcher_control_state
+        and a.auto_actions == b.auto_actions
+        and a.indicator_states == b.indicator_states
+    )
+
+
+def split_input_runs(steps: Iterable[ScenarioStep]) -> Iterator[Tuple[ScenarioStep, List[float]]]:
     """
-    Прогон сценария для SimulationContext.
-    Вынесено из sim_core.py для упрощения чтения и сопровождения.
+    Серии подряд идущих шагов с одинаковыми входами: (первый шаг, длительности
+    всех шагов серии). Шаги с t <= 0 — всегда отдельная серия: у нулевых шагов
+    своя семантика (мгновенные события).
+    """
+    head: Optional[ScenarioStep] = None
+    durations: List[float] = []
+    for step in steps:
+        t = float(step.t)
+        if head is not None and t > 0.0 and float(head.t) > 0.0 and _same_inputs(head, step):
+            durations.append(t)
+            continue
+        if head is not None:
+            yield head, durations
+        head, durations = step, [t]
+    if head is not None:
+        yield head, durations
+
+
+# Пороги ближе этого не дробят интервал (защита от нулевых подшагов).
+_DEADLINE_EPS = 1e-9
+
+
+def _samples_before(durations: List[float], start: int, deadline: Optional[float]) -> int:
+    """
+    Сколько отсчётов серии, начиная с start, целиком укладываются до порога
+    (не меньше одного). Отсчёт, на котором порог достигается, идёт отдельным
+    шагом — детектор видит его так же, как посекундный прогон.
+    """
+    n = len(durations) - start
+    if deadline is None:
+        return n
+    total = 0.0
+    k = 0
+    while k < n and total + durations[start + k] < deadline - _DEADLINE_EPS:
+        total += durations[start + k]
+        k += 1
+    return max(k, 1)
+
+
+def _event_driven_steps(
+    ctx: "SimulationContext",
+    steps: Iterable[ScenarioStep],
+    post: ExceptionsPostProcessor,
+) -> Iterator[ScenarioStep]:
     """
-    timeline: List[Dict[str, TimelineStep]] = []
-    scenario_history: List[ScenarioStep] = []
-    timeline_by_rc: Dict[str, List[TimelineStep]] = {rc_id: [] for rc_id in ctx.ctrl_rc_ids}
+    Событийный режим: первый шаг серии одинаковых входов идёт отдельно, хвост
+    серии сливается в отрезки, которые режутся только по границам исходных
+    отсчётов перед ближайшим порогом (детекторы, окна исключений, ДСП, T_PK).
+    Пока идёт таймер вне детекторов (окно исключения, ДСП-гейт, удержание
+    соседа), хвост идёт по одному отсчёту — как в посекундном прогоне.
+    Генератор: порог берётся после шага предыдущего отрезка.
+    """
+    exc_configs = {rc_id: ctx.exceptions_config(rc_id) for rc_id in ctx.ctrl_rc_ids}
+    for head, durations in split_input_runs(steps):
+        yield head
+        i = 1
+        while i < len(durations):
+            if ctx.next_timer_deadline() is not None or post.next_window_change(exc_configs) is not None:
+                k = 1
+            else:
+                k = _samples_before(durations, i, ctx.next_deadline())
+            piece = durations[i] if k == 1 else sum(durations[i:i + k])
+            i += k
+            yield dataclasses.replace(head, t=piece)
+
+
+def iter_context(ctx: "SimulationContext", keep_history: bool = True) -> Iterator[Dict[str, TimelineStep]]:
+    """
+    Генератор кадров (Dict[rc_id, TimelineStep] после пост-прохода исключений).
+    keep_history=False — пост-проход не копит истории (см. SimulationContext.iter_frames).
+    """
+    # Потоковый пост-проход исключений: O(1) на кадр вместо пересчета по всей истории.
+    post = ExceptionsPostProcessor(ctx.ctrl_rc_ids, keep_history=keep_history)
 
     if not ctx.scenario_steps:
-        return timeline
+        return
+
+    # Шардированный режим (config.shard_workers > 1): РЦ считаются в пуле процессов
+    shards = shards_for(ctx)
+    if shards is not None:
+        yield from iter_sharded_frames(ctx, shards, keep_history=keep_history)
+        return
+
+    steps: Iterable[ScenarioStep] = ctx.scenario_steps
+    if ctx.config.event_driven:
+        steps = _event_driven_steps(ctx, steps, post)
 
-    for step in ctx.scenario_steps:
-        scenario_history.append(step)
+    for step in steps:
+        post.push_step(step)
         step_results = ctx.step(step)
         if isinstance(step_results, SingleResultWrapper):
             step_dict = dict(step_results._dict)
@@ -32,19 +124,18 @@ def run_context(ctx: "SimulationContext") -> Union[List[TimelineStep], List[Dict
 
         processed: Dict[str, TimelineStep] = {}
         for rc_id, current in step_dict.items():
-            det_cfg = ctx.config.detectors_configs.get(rc_id)
-            exc_cfg = make_exceptions_config(det_cfg)
-            current = apply_exceptions(
-                ctrl_rc_id=rc_id,
-                current=current,
-                scenario_history=scenario_history,
-                timeline_history=timeline_by_rc.get(rc_id, []),
-                cfg=exc_cfg,
-            )
-            timeline_by_rc.setdefault(rc_id, []).append(current)
+            current = post.apply(rc_id, current, ctx.exceptions_config(rc_id))
             processed[rc_id] = current
 
-        timeline.append(processed)
+        yield processed
+
+
+def run_context(ctx: "SimulationContext") -> Union[List[TimelineStep], List[Dict[str, TimelineStep]]]:
+    """
+    Прогон сценария для SimulationContext.
+    Вынесено из sim_core.py для упрощения чтения и сопровождения.
+    """
+    timeline: List[Dict[str, TimelineStep]] = list(iter_context(ctx))
 
     if len(ctx.ctrl_rc_ids) == 1:
         single_rc_id = ctx.ctrl_rc_ids[0]
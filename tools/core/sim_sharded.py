@@ -0,0 +1,170 @@
+# -*- coding: utf-8 -*-
+"""
+sim_sharded.py — шардированный прогон SimulationContext по процессам.
+
+Контролируемые РЦ независимы: у каждой свои DetectorsState, overlay-шаг,
+трекер исключений (в шаге и в пост-проходе), DSP-таймер и latch-состояние
+топологии (UniversalTopologyManager.states[rc_id]). Общие только входы шага
+и модель станции (только чтение). Поэтому ctrl_rc_ids делятся на шарды, и
+каждый шард целиком прогоняет сценарий (iter_context: шаг + пост-проход
+исключений) обычным серийным контекстом только для своих РЦ.
+
+Обмен — одно сообщение на шард за прогон: туда конфигурация, РЦ шарда и
+сценарий, обратно только поля TimelineStep, которые считает РЦ (t, соседи,
+modes, lz, FlagBits, mu/nas/chas/dsp); modes без изменений — тот же объект, он
+пиклится один раз. rc/switch/signal_states кадра — это входы шага, родитель
+берёт их из своего сценария (один словарь на кадр, как в серийном шаге).
+Процессы — общий на процесс пул фиксированного размера (os.cpu_count()),
+живущий между контекстами: модель станции в воркерах строится один раз.
+
+Результат побайтово совпадает с серийным режимом: шард выполняет ровно те же
+вычисления для своих РЦ, кадры собираются в порядке ctrl_rc_ids. Кадры
+отдаются после завершения всех шардов (поток кадров не инкрементальный).
+
+Не шардируются: одна РЦ, трассировка фаз (буфер процесса) и событийный режим
+(разбиение шагов зависит от порогов всех РЦ сразу).
+
+Для C: массив потоков/процессов, каждый владеет срезом массива DetectorsState.
+"""
+
+from __future__ import annotations
+
+import dataclasses
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, Any, Dict, Iterator, List, Optional, Sequence, Tuple
+
+from core.sim_types import ScenarioStep, SimulationConfig, TimelineStep
+
+if TYPE_CHECKING:
+    from core.sim_core import SimulationContext
+
+
+# Один пул на процесс: создаётся лениво, размер не меняется; shard_workers
+# прогона ограничивает только число его шардов.
+_POOL: Optional[ProcessPoolExecutor] = None
+_POOL_SIZE = max(1, os.cpu_count() or 1)
+_POOL_LOCK = threading.Lock()
+
+# Поля TimelineStep, которые шард возвращает на (шаг, РЦ)
+_RcRow = Tuple[
+    float, float, Optional[str], Optional[str], Dict[str, Any], bool, int, int,
+    Optional[int], Optional[int], Optional[int], Optional[int],
+]
+
+
+def partition_rc_ids(ctrl_rc_ids: List[str], shards: int) -> List[List[str]]:
+    """Делит РЦ на непустые шарды по кругу (соседние по списку РЦ — в разные шарды)."""
+    n = max(1, min(int(shards), len(ctrl_rc_ids)))
+    out: List[List[str]] = [[] for _ in range(n)]
+    for i, rc_id in enumerate(ctrl_rc_ids):
+        out[i % n].append(rc_id)
+    return out
+
+
+def _warm_worker() -> None:
+    """Инициализатор воркера: снимок станции строится один раз на процесс."""
+    from station.station_snapshot import get_station_snapshot
+
+    get_station_snapshot()
+
+
+def _run_shard(
+    config: SimulationConfig,
+    rc_ids: List[str],
+    steps: Sequence[ScenarioStep],
+    keep_history: bool,
+) -> Dict[str, List[_RcRow]]:
+    from core.sim_core import SimulationContext
+    from core.sim_runner import iter_context
+
+    ctx = SimulationContext(config=config, scenario=steps, ctrl_rc_ids=rc_ids)
+    ctx._keep_history = keep_history
+    rows: Dict[str, List[_RcRow]] = {rc_id: [] for rc_id in rc_ids}
+    last_modes: Dict[str, Dict[str, Any]] = {}
+    for frame in iter_context(ctx, keep_history=keep_history):
+        for rc_id, tl in frame.items():
+            modes = last_modes.get(rc_id)
+            if modes != tl.modes:
+                modes = last_modes[rc_id] = tl.modes
+            rows[rc_id].append((
+                tl.t, tl.step_duration, tl.effective_prev_rc, tl.effective_next_rc, modes,
+                tl.lz_state, tl.lz_variant, tl.flag_bits,
+                tl.mu_state, tl.nas_state, tl.chas_state, tl.dsp_state,
+            ))
+    return rows
+
+
+def _get_pool() -> ProcessPoolExecutor:
+    global _POOL
+    with _POOL_LOCK:
+        if _POOL is None:
+            _POOL = ProcessPoolExecutor(max_workers=_POOL_SIZE, initializer=_warm_worker)
+        return _POOL
+
+
+def shutdown_shard_pool() -> None:
+    """Останавливает общий пул (тесты, завершение процесса); следующий прогон создаст новый."""
+    global _POOL
+    with _POOL_LOCK:
+        pool, _POOL = _POOL, None
+    if pool is not None:
+        pool.shutdown(wait=True)
+
+
+def shards_for(ctx: "SimulationContext") -> Optional[List[List[str]]]:
+    """Разбиение ctrl_rc_ids на шарды, если режим включён и имеет смысл, иначе None."""
+    workers = int(ctx.config.shard_workers or 0)
+    if workers <= 1 or len(ctx.ctrl_rc_ids) <= 1 or ctx.tracer is not None or ctx.config.event_driven:
+        return None
+    return partition_rc_ids(ctx.ctrl_rc_ids, workers)
+
+
+def iter_sharded_frames(
+    ctx: "SimulationContext",
+    shards: List[List[str]],
+    keep_history: bool = True,
+) -> Iterator[Dict[str, TimelineStep]]:
+    """
+    Кадры прогона ctx (как iter_context), посчитанные шардами в общем пуле.
+    Родитель не шагает сам: его детекторы и истории не меняются, идёт только ctx.time.
+    """
+    steps = ctx.scenario_steps
+    # Внутри шарда — обычный серийный контекст.
+    shard_cfg = dataclasses.replace(ctx.config, shard_workers=0)
+    pool = _get_pool()
+    futures = [pool.submit(_run_shard, shard_cfg, rc_ids, steps, keep_history) for rc_ids in shards]
+    rows: Dict[str, List[_RcRow]] = {}
+    for fut in futures:
+        rows.update(fut.result())
+
+    by_rc = [(rc_id, rows[rc_id]) for rc_id in ctx.ctrl_rc_ids]
+    for i, step in enumerate(steps):
+        ctx.time += max(0.0, float(step.t))
+        # Словари состояний кадра общие для его РЦ (как ctx.rc_states в серийном шаге)
+        rc_states = dict(step.rc_states)
+        switch_states = dict(step.switch_states)
+        signal_states = dict(step.signal_states)
+        frame: Dict[str, TimelineStep] = {}
+        for rc_id, rc_rows in by_rc:
+            t, dur, prev_rc, next_rc, modes, lz_state, lz_variant, bits, mu, nas, chas, dsp = rc_rows[i]
+            frame[rc_id] = TimelineStep(
+                t=t,
+                step_duration=dur,
+                ctrl_rc_id=rc_id,
+                effective_prev_rc=prev_rc,
+                effective_next_rc=next_rc,
+                rc_states=rc_states,
+                switch_states=switch_states,
+                signal_states=signal_states,
+                modes=dict(modes),
+                lz_state=lz_state,
+                lz_variant=lz_variant,
+                mu_state=mu,
+                nas_state=nas,
+                chas_state=chas,
+                dsp_state=dsp,
+                flag_bits=bits,
+            )
+        yield frame
@@ -1,8 +1,10 @@
 from __future__ import annotations
 
-from typing import TYPE_CHECKING, Any, Dict, List, Optional
+from typing import TYPE_CHECKING, Any, Dict, Optional
 
+from core import phase_trace
 from core.detectors_engine import DetectorsState, update_detectors
+from core.flag_bits import FlagBits, merge_flag_bits
 from core.flags_engine import build_flags_simple
 from core.sim_types import ScenarioStep, TimelineStep
 
@@ -10,6 +12,140 @@ if TYPE_CHECKING:
     from core.sim_core import SimulationContext
 
 
+class _RcChunks:
+    """Подшаги одной РЦ внутри шага: остаток, событие, соседи, флаги (общее для движков)."""
+
+    __slots__ = ("remaining", "elapsed", "event_time", "prev_rc", "next_rc", "modes", "bits", "lz_state", "lz_variant")
+
+    def __init__(self, dt: float) -> None:
+        self.remaining = float(dt)
+        self.elapsed = 0.0
+        self.event_time: Optional[float] = None
+        self.prev_rc: Optional[str] = None
+        self.next_rc: Optional[str] = None
+        self.modes: Optional[Dict[str, Any]] = None
+        self.bits: FlagBits = 0
+        self.lz_state = False
+        self.lz_variant = 0
+
+
+def _next_chunk_dt(ctx: "SimulationContext", frame: Any, ctrl_rc_id: str, remaining: float) -> float:
+    """Длина подшага: до конца шага или до истечения удержания соседа (T_PK)."""
+    change_dt = None
+    if frame.latch_may_expire(ctrl_rc_id):
+        change_dt = ctx.topology.get_next_topology_change_dt(
+            rc_id=ctrl_rc_id,
+            switch_states=frame.switch_states,
+            max_dt=remaining,
+        )
+    return remaining if not change_dt else min(remaining, float(change_dt))
+
+
+def _chunk_inputs(
+    ctx: "SimulationContext",
+    ctrl_rc_id: str,
+    active_step: ScenarioStep,
+    chunk_dt: float,
+    exception_context: Optional[Dict[str, bool]],
+    run: _RcChunks,
+) -> Dict[str, Any]:
+    """Соседи и modes детекторов подшага (в run); возвращает topology_info."""
+    effective_prev_rc, effective_next_rc, prev_ok, next_ok, prev_nc, next_nc = ctx._compute_effective_neighbors_with_control(
+        ctrl_rc_id, chunk_dt
+    )
+
+    modes_for_detectors = dict(active_step.modes)
+    modes_for_detectors["prev_control_ok"] = prev_ok
+    modes_for_detectors["next_control_ok"] = next_ok
+    modes_for_detectors["prev_nc"] = prev_nc
+    modes_for_detectors["next_nc"] = next_nc
+    modes_for_detectors.update(
+        ctx._compute_dynamic_signal_modes(
+            ctrl_rc_id=ctrl_rc_id,
+            effective_prev_rc=effective_prev_rc,
+            effective_next_rc=effective_next_rc,
+        )
+    )
+    if exception_context:
+        modes_for_detectors.update(exception_context)
+
+    run.prev_rc = effective_prev_rc
+    run.next_rc = effective_next_rc
+    run.modes = modes_for_detectors
+    return {
+        "ctrl_rc_id": ctrl_rc_id,
+        "effective_prev_rc": effective_prev_rc,
+        "effective_next_rc": effective_next_rc,
+    }
+
+
+def _apply_chunk(
+    ctx: "SimulationContext",
+    run: _RcChunks,
+    ctrl_rc_id: str,
+    frame: Any,
+    det_state: DetectorsState,
+    det_result: Any,
+    chunk_dt: float,
+) -> None:
+    """Флаги и время события подшага по результату детекторов."""
+    flags_res = build_flags_simple(
+        ctrl_rc_id=ctrl_rc_id,
+        det_state=det_state,
+        det_result=det_result,
+        rc_states=frame.rc_states_by_id,
+        switch_states=frame.switch_states,
+    )
+    run.lz_state = flags_res.lz
+    run.lz_variant = flags_res.variant
+    run.bits = merge_flag_bits(run.bits, flags_res.bits)
+
+    if run.event_time is None:
+        if det_result.opened:
+            off = float(det_result.open_offset or 0.0)
+            run.event_time = float(ctx.time) + run.elapsed + off
+        elif det_result.closed:
+            off = float(det_result.close_offset or 0.0)
+            run.event_time = float(ctx.time) + run.elapsed + off
+
+    run.elapsed += chunk_dt
+    run.remaining -= chunk_dt
+
+
+def _timeline_step(
+    ctx: "SimulationContext",
+    ctrl_rc_id: str,
+    step: ScenarioStep,
+    active_step: ScenarioStep,
+    dt: float,
+    frame: Any,
+    run: _RcChunks,
+) -> TimelineStep:
+    return TimelineStep(
+        t=run.event_time if run.event_time is not None else float(ctx.time),
+        step_duration=dt,
+        ctrl_rc_id=ctrl_rc_id,
+        effective_prev_rc=run.prev_rc,
+        effective_next_rc=run.next_rc,
+        # Словари кадра общие для РЦ шага; modes — свой словарь последнего подшага
+        rc_states=frame.rc_states,
+        switch_states=frame.switch_states,
+        signal_states=frame.signal_states,
+        modes=run.modes if run.modes is not None else dict(active_step.modes),
+        lz_state=run.lz_state,
+        lz_variant=run.lz_variant,
+        mu_state=int(step.mu.get(ctrl_rc_id, 0)) if step.mu else None,
+        nas_state=int(active_step.auto_actions.get("nas")) if "nas" in (active_step.auto_actions or {}) else None,
+        chas_state=int(active_step.auto_actions.get("chas")) if "chas" in (active_step.auto_actions or {}) else None,
+        dsp_state=int(active_step.dispatcher_control_state)
+        if active_step.dispatcher_control_state is not None
+        else int(active_step.modes.get("dispatcher_control_state"))
+        if "dispatcher_control_state" in active_step.modes
+        else None,
+        flag_bits=run.bits,
+    )
+
+
 def step_single_rc(
     ctx: "SimulationContext",
     ctrl_rc_id: str,
@@ -22,121 +158,101 @@ def step_single_rc(
     Подшаговая обработка одной контролируемой РЦ.
     Вынесено из SimulationContext для декомпозиции sim_core.py.
     """
-    from core.detectors_engine import DetectorsResult, _ensure_rc_states_by_id
+    from core.detectors_engine import DetectorsResult
 
     active_step = step_override if step_override is not None else step
-    rc_states_by_id = _ensure_rc_states_by_id(ctx.rc_states)
+    # Кадр станции (состояния по ID, классы, соседи) — один на шаг для всех РЦ
+    frame = ctx.station_frame()
+    run = _RcChunks(dt)
 
-    remaining = float(dt)
-    elapsed = 0.0
-    event_time: Optional[float] = None
-
-    effective_prev_rc: Optional[str] = None
-    effective_next_rc: Optional[str] = None
-    modes_for_detectors: Dict[str, Any] = dict(active_step.modes)
-    merged_flags: List[str] = []
-    last_lz_state = False
-    last_lz_variant = 0
-
-    while remaining > 0.0:
-        change_dt = ctx.topology.get_next_topology_change_dt(
-            rc_id=ctrl_rc_id,
-            switch_states=ctx.switch_states,
-            max_dt=remaining,
-        )
-        chunk_dt = remaining if not change_dt else min(remaining, float(change_dt))
+    while run.remaining > 0.0:
+        chunk_dt = _next_chunk_dt(ctx, frame, ctrl_rc_id, run.remaining)
         if chunk_dt <= 0.0:
             break
+        if phase_trace.ENABLED:
+            phase_trace.set_time(float(ctx.time) + run.elapsed)
 
-        effective_prev_rc, effective_next_rc, prev_ok, next_ok, prev_nc, next_nc = ctx._compute_effective_neighbors_with_control(
-            ctrl_rc_id, chunk_dt
-        )
-
-        topology_info = {
-            "ctrl_rc_id": ctrl_rc_id,
-            "effective_prev_rc": effective_prev_rc,
-            "effective_next_rc": effective_next_rc,
-        }
-
-        modes_for_detectors = dict(active_step.modes)
-        modes_for_detectors["prev_control_ok"] = prev_ok
-        modes_for_detectors["next_control_ok"] = next_ok
-        modes_for_detectors["prev_nc"] = prev_nc
-        modes_for_detectors["next_nc"] = next_nc
-        modes_for_detectors.update(
-            ctx._compute_dynamic_signal_modes(
-                ctrl_rc_id=ctrl_rc_id,
-                effective_prev_rc=effective_prev_rc,
-                effective_next_rc=effective_next_rc,
-            )
-        )
-        if exception_context:
-            modes_for_detectors.update(exception_context)
+        topology_info = _chunk_inputs(ctx, ctrl_rc_id, active_step, chunk_dt, exception_context, run)
 
         det_state = ctx.detectors_states.get(ctrl_rc_id)
         if det_state:
             new_det_state, det_result = update_detectors(
                 det_state=det_state,
                 station_model=ctx.model,
-                t=ctx.time + elapsed,
+                t=ctx.time + run.elapsed,
                 dt=chunk_dt,
-                rc_states=rc_states_by_id,
-                switch_states=ctx.switch_states,
-                signal_states=ctx.signal_states,
+                rc_states=frame.rc_states_by_id,
+                switch_states=frame.switch_states,
+                signal_states=frame.signal_states,
                 topology_info=topology_info,
                 cfg=ctx.config.detectors_configs[ctrl_rc_id],
-                modes=modes_for_detectors,
+                modes=run.modes,
+                rc_classes=frame.classes,
             )
             ctx.detectors_states[ctrl_rc_id] = new_det_state
         else:
             det_result = DetectorsResult()
             new_det_state = DetectorsState()
 
-        flags_res = build_flags_simple(
-            ctrl_rc_id=ctrl_rc_id,
-            det_state=new_det_state,
-            det_result=det_result,
-            rc_states=rc_states_by_id,
-            switch_states=ctx.switch_states,
-        )
-        last_lz_state = flags_res.lz
-        last_lz_variant = flags_res.variant
-        for f in flags_res.flags:
-            if f not in merged_flags:
-                merged_flags.append(f)
+        _apply_chunk(ctx, run, ctrl_rc_id, frame, new_det_state, det_result, chunk_dt)
 
-        if event_time is None:
-            if det_result.opened:
-                off = float(det_result.open_offset or 0.0)
-                event_time = float(ctx.time) + elapsed + off
-            elif det_result.closed:
-                off = float(det_result.close_offset or 0.0)
-                event_time = float(ctx.time) + elapsed + off
+    return _timeline_step(ctx, ctrl_rc_id, step, active_step, dt, frame, run)
 
-        elapsed += chunk_dt
-        remaining -= chunk_dt
 
-    timeline_t = event_time if event_time is not None else float(ctx.time)
+def step_rcs_soa(
+    ctx: "SimulationContext",
+    step: ScenarioStep,
+    dt: float,
+    exception_contexts: Dict[str, Dict[str, bool]],
+    step_overrides: Dict[str, ScenarioStep],
+) -> Dict[str, TimelineStep]:
+    """
+    Шаг всех контролируемых РЦ на движке SoADetectorEngine (ctx.soa_engine).
 
-    return TimelineStep(
-        t=timeline_t,
-        step_duration=dt,
-        ctrl_rc_id=ctrl_rc_id,
-        effective_prev_rc=effective_prev_rc,
-        effective_next_rc=effective_next_rc,
-        rc_states=dict(ctx.rc_states),
-        switch_states=dict(ctx.switch_states),
-        signal_states=dict(ctx.signal_states),
-        modes=dict(modes_for_detectors),
-        lz_state=last_lz_state,
-        lz_variant=last_lz_variant,
-        flags=list(merged_flags),
-        mu_state=int(step.mu.get(ctrl_rc_id, 0)) if step.mu else None,
-        nas_state=int(active_step.auto_actions.get("nas")) if "nas" in (active_step.auto_actions or {}) else None,
-        chas_state=int(active_step.auto_actions.get("chas")) if "chas" in (active_step.auto_actions or {}) else None,
-        dsp_state=int(active_step.dispatcher_control_state)
-        if active_step.dispatcher_control_state is not None
-        else int(active_step.modes.get("dispatcher_control_state"))
-        if "dispatcher_control_state" in active_step.modes
-        else None,
-    )
+    Подшаги и флаги — как в step_single_rc; детекторы всех РЦ, у которых
+    остался интервал, обновляются одним advance() на подшаг. После него
+    состояние переносится в объекты (write_back): флаги, next_deadline и
+    исключения читают объекты детекторов.
+    """
+    from core.detectors.soa import detector_step
+    from core.detectors_engine import DetectorsResult
+
+    engine = ctx.soa_engine
+    frame = ctx.station_frame()
+    runs = {rc_id: _RcChunks(dt) for rc_id in ctx.ctrl_rc_ids}
+    pending = list(ctx.ctrl_rc_ids)
+    while pending:
+        det_steps: Dict[str, Any] = {}
+        chunk_dts: Dict[str, float] = {}
+        for rc_id in pending:
+            run = runs[rc_id]
+            chunk_dt = _next_chunk_dt(ctx, frame, rc_id, run.remaining)
+            if chunk_dt <= 0.0:
+                continue
+            topology_info = _chunk_inputs(
+                ctx, rc_id, step_overrides.get(rc_id, step), chunk_dt, exception_contexts.get(rc_id), run
+            )
+            det_steps[rc_id] = detector_step(
+                ctx.detectors_states[rc_id],
+                ctx.config.detectors_configs[rc_id],
+                frame.rc_states_by_id,
+                frame.signal_states,
+                topology_info,
+                run.modes,
+                station_model=ctx.model,
+                rc_classes=frame.classes,
+            )
+            chunk_dts[rc_id] = chunk_dt
+        if not det_steps:
+            break
+        det_results = engine.advance(det_steps, chunk_dts)
+        engine.write_back()
+        for rc_id, chunk_dt in chunk_dts.items():
+            det_result = det_results.get(rc_id) or DetectorsResult()
+            _apply_chunk(ctx, runs[rc_id], rc_id, frame, ctx.detectors_states[rc_id], det_result, chunk_dt)
+        pending = [rc_id for rc_id in chunk_dts if runs[rc_id].remaining > 0.0]
+
+    return {
+        rc_id: _timeline_step(ctx, rc_id, step, step_overrides.get(rc_id, step), dt, frame, runs[rc_id])
+        for rc_id in ctx.ctrl_rc_ids
+    }
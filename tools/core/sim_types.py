@@ -1,8 +1,10 @@
 # -*- coding: utf-8 -*-
-from dataclasses import dataclass, field
-from typing import Any, Dict, Optional
+from dataclasses import InitVar, dataclass, field
+from typing import Any, Dict, List, Optional, Protocol, runtime_checkable
 
 from core.detectors_engine import DetectorsConfig
+from core.flag_bits import parse_flags, render_flags
+from core.phase_trace import PhaseTraceConfig
 
 
 @dataclass
@@ -19,6 +21,17 @@ class ScenarioStep:
     indicator_states: Dict[str, int] = field(default_factory=dict)
 
 
+@runtime_checkable
+class LazyScenario(Protocol):
+    """
+    Сценарий, который SimulationContext хранит как есть и обходит лениво
+    (core.delta_scenario.DeltaScenario). Протокол, а не класс: API грузит
+    модуль и как tools.core.*, isinstance по классу там не сработает.
+    """
+
+    def has_negative_t(self) -> bool: ...
+
+
 @dataclass
 class TimelineStep:
     """Результат симуляции для одной контролируемой РЦ на одном шаге."""
@@ -33,11 +46,39 @@ class TimelineStep:
     modes: Dict[str, Any]
     lz_state: bool
     lz_variant: int
-    flags: list[str]
+    # Строковые флаги только для построения шага из строк (тесты, внешние вызовы);
+    # хранится одно flag_bits, а step.flags — свойство, см. ниже.
+    flags: InitVar[Optional[List[str]]] = None
     mu_state: Optional[int] = None
     nas_state: Optional[int] = None
     chas_state: Optional[int] = None
     dsp_state: Optional[int] = None
+    # Флаги шага (core.flag_bits); None — разобрать из flags
+    flag_bits: Optional[int] = None
+
+    def __post_init__(self, flags: Optional[List[str]]):
+        if flags is None:
+            if self.flag_bits is None:
+                self.flag_bits = 0
+            return
+        bits = parse_flags(flags)
+        if self.flag_bits is not None and self.flag_bits != bits:
+            raise ValueError(f"flags {flags!r} do not match flag_bits {self.flag_bits:#x}")
+        self.flag_bits = bits
+
+
+def _get_step_flags(step: TimelineStep) -> List[str]:
+    return render_flags(step.flag_bits)
+
+
+def _set_step_flags(step: TimelineStep, flags: List[str]) -> None:
+    step.flag_bits = parse_flags(flags)
+
+
+# flags — представление flag_bits, а не второе хранимое поле: чтение рендерит
+# (кэш _render в flag_bits, новый список), запись разбирает строки в биты.
+# Свойство ставится после @dataclass, иначе оно стало бы значением по умолчанию.
+TimelineStep.flags = property(_get_step_flags, _set_step_flags)  # type: ignore[assignment]
 
 
 @dataclass
@@ -47,6 +88,18 @@ class SimulationConfig:
     detectors_configs: Dict[str, DetectorsConfig] = field(default_factory=dict)
     exceptions_objects_path: Optional[str] = "tools/exceptions_objects.json"
     detectors_config: Optional[DetectorsConfig] = None
+    # Трассировка фаз детекторов (None — выключена, без накладных расходов)
+    phase_trace: Optional[PhaseTraceConfig] = None
+    # Число шардов ctrl_rc_ids для прогона в пуле процессов (0/1 — серийный режим, см. sim_sharded)
+    shard_workers: int = 0
+    # Событийный режим: одинаковые подряд шаги сценария сливаются в интервал, который
+    # режется только на порогах детекторов (кадр на отрезок, а не на каждый отсчёт)
+    event_driven: bool = False
+    # Станция (ключ снимка в station_snapshot)
+    station: str = "default"
+    # Движок детекторов: "objects" — объекты BaseDetector (эталон), "soa" — массивы
+    # NumPy на все РЦ шага (core.detectors.soa; при трассировке — объекты)
+    detector_engine: str = "objects"
 
     def __post_init__(self):
         if self.detectors_config is not None and not self.detectors_configs:
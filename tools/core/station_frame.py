@@ -0,0 +1,77 @@
+# -*- coding: utf-8 -*-
+"""
+station_frame.py — общий кадр станции на шаг для всех контролируемых РЦ.
+
+Станционная часть шага не зависит от контролируемой РЦ: состояния РЦ по ID,
+классы состояний (StepClasses), физические соседи (без latch T_PK). StationFrame
+строится один раз на шаг; шаг каждой РЦ читает его и хранит ссылки на общие
+словари (rc_states/switch_states/signal_states в TimelineStep не копируются).
+
+Кадр и его словари — только для чтения. Новый шаг — новый кадр (словари
+состояний SimulationContext заменяются на шаге, а не меняются на месте).
+
+Для C: структура кадра с указателями на массивы состояний шага.
+"""
+
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, Mapping
+
+from core.step_classes import StepClasses
+
+
+@dataclass(frozen=True)
+class StationFrame:
+    """Станционные данные одного шага (общие для всех РЦ)."""
+    rc_states: Dict[str, int]  # как в шаге (ключи — имена или ID)
+    switch_states: Dict[str, int]
+    signal_states: Dict[str, int]
+    classes: StepClasses  # rc_states по ID + классы РЦ/светофоров
+    # Физические соседи и потеря контроля по сторонам (стрелки шага), по ctrl РЦ
+    neighbors: Mapping[str, Any]
+
+    @property
+    def rc_states_by_id(self) -> Dict[str, int]:
+        return self.classes.rc_states
+
+    def matches(self, rc_states: Any, switch_states: Any, signal_states: Any) -> bool:
+        """Построен ли кадр по этим же словарям состояний (проверка по идентичности)."""
+        return (
+            self.rc_states is rc_states
+            and self.switch_states is switch_states
+            and self.signal_states is signal_states
+        )
+
+    def latch_may_expire(self, rc_id: str) -> bool:
+        """
+        Может ли на шаге истечь удержание соседа (T_PK): только если на какой-то
+        стороне физического соседа нет из-за потери контроля стрелки.
+        """
+        phys = self.neighbors.get(rc_id)
+        if phys is None:
+            return True
+        return (phys.prev_control_lost and not phys.prev) or (phys.next_control_lost and not phys.next)
+
+
+def build_station_frame(
+    rc_states: Dict[str, int],
+    switch_states: Dict[str, int],
+    signal_states: Dict[str, int],
+    classes: StepClasses,
+    topology: Any,
+    ctrl_rc_ids: Iterable[str],
+) -> StationFrame:
+    """Кадр шага: классы переданы готовыми, соседи — из кэша UniversalTopologyManager."""
+    neighbors: Dict[str, Any] = {}
+    for rc_id in ctrl_rc_ids:
+        phys = topology.physical_neighbors(rc_id, switch_states)
+        if phys is not None:
+            neighbors[rc_id] = phys
+    return StationFrame(
+        rc_states=rc_states,
+        switch_states=switch_states,
+        signal_states=signal_states,
+        classes=classes,
+        neighbors=neighbors,
+    )
@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+"""
+step_classes.py — классы состояний РЦ и светофоров на одном шаге.
+
+Один проход по rc_states на шаг: битовые множества РЦ free/occupied/locked/
+no_control (бит РЦ — c.bit(rc_id)). Маски variants_common проверяют их побитово
+вместо rc_states.get + rc_is_* на каждый вызов: `c.free & need == need`.
+
+Биты РЦ раздаются по снимку станции (StationSnapshot.rc_bits, rc_bit_table по
+ID РЦ модели), а не реестром на процесс. Ключ вне таблицы (None, "", имя,
+объект другой станции) получает общий бит NO_CLASS_BIT, который не входит ни
+в одно множество, — "нет класса", как РЦ без контроля.
+
+Светофоры: множества открытых/закрытых с учётом типа из NODES (3 — маневровый,
+4 — поездной, иначе — как в _is_signal_open/_is_signal_closed). Считаются лениво,
+при первом обращении (многие шаги светофоры не проверяют).
+
+РЦ без записи в rc_states — состояние 0 (нет контроля), как rc_states.get(x, 0):
+их бит не входит ни в одно множество.
+
+Для C: битовые массивы по индексу РЦ + таблица "код -> класс".
+"""
+
+from __future__ import annotations
+
+from typing import Any, Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+from core.uni_states import (
+    no_control_state,
+    rc_is_free,
+    rc_is_locked,
+    rc_is_occupied,
+    shunting_signal_is_closed,
+    shunting_signal_is_open,
+    signal_is_closed,
+    signal_is_open,
+)
+from station.station_config import NODES
+
+FREE, OCCUPIED, LOCKED, NO_CONTROL = 1, 2, 4, 8
+
+# Бит ключей вне таблицы РЦ: никогда не ставится в множества
+NO_CLASS_BIT = 1
+
+_STATE_CLASS: Dict[Any, int] = {}
+
+
+def rc_bit_table(rc_ids: Iterable[str]) -> Dict[str, int]:
+    """Биты РЦ станции по порядку ID (бит 0 — NO_CLASS_BIT)."""
+    return {rc_id: 1 << (i + 1) for i, rc_id in enumerate(rc_ids)}
+
+
+def _default_rc_bits() -> Mapping[str, int]:
+    # Шаги вне SimulationContext (тесты, прямой вызов update_detectors) — станция по умолчанию
+    from station.station_snapshot import get_station_snapshot
+
+    return get_station_snapshot().rc_bits
+
+
+def _state_class(state: Any) -> int:
+    cls = _STATE_CLASS.get(state)
+    if cls is None:
+        cls = (
+            (FREE if rc_is_free(state) else 0)
+            | (OCCUPIED if rc_is_occupied(state) else 0)
+            | (LOCKED if rc_is_locked(state) else 0)
+            | (NO_CONTROL if no_control_state(state) else 0)
+        )
+        _STATE_CLASS[state] = cls
+    return cls
+
+
+def _signal_open_closed(sig_id: Any, state: Any) -> Tuple[bool, bool]:
+    node = NODES.get(sig_id)
+    t = node.get("type") if node else None
+    if t == 3:  # Shunting
+        return shunting_signal_is_open(state), shunting_signal_is_closed(state)
+    if t == 4:  # Train
+        return signal_is_open(state), signal_is_closed(state)
+    # Тип неизвестен: открыт — любой из двух, закрыт — только красный (15).
+    return signal_is_open(state) or shunting_signal_is_open(state), signal_is_closed(state)
+
+
+class StepClasses:
+    """Классы состояний РЦ (битовые множества) и светофоров одного шага."""
+
+    __slots__ = ("rc_states", "signal_states", "rc_bits", "free", "occupied", "locked", "no_control", "_signals")
+
+    def __init__(
+        self,
+        rc_states: Mapping[str, int],
+        signal_states: Optional[Mapping[str, int]] = None,
+        rc_bits: Optional[Mapping[str, int]] = None,
+    ) -> None:
+        self.rc_states = rc_states
+        self.signal_states = signal_states
+        if rc_bits is None:
+            rc_bits = _default_rc_bits()
+        self.rc_bits = rc_bits
+        free = occupied = locked = no_control = 0
+        for rc_id, state in rc_states.items():
+            b = rc_bits.get(rc_id)
+            if b is None:
+                continue
+            cls = _STATE_CLASS.get(state)
+            if cls is None:
+                cls = _state_class(state)
+            if cls & FREE:
+                free |= b
+            elif cls & OCCUPIED:
+                occupied |= b
+            elif cls & NO_CONTROL:
+                no_control |= b
+            if cls & LOCKED:
+                locked |= b
+        self.free = free
+        self.occupied = occupied
+        self.locked = locked
+        self.no_control = no_control
+        self._signals: Optional[Tuple[FrozenSet[Any], FrozenSet[Any]]] = None
+
+    def bit(self, rc_id: Any) -> int:
+        """Бит РЦ в множествах; ключ вне таблицы — NO_CLASS_BIT (ни в одном множестве)."""
+        return self.rc_bits.get(rc_id, NO_CLASS_BIT)
+
+    def matches(self, rc_states: Mapping[str, int], signal_states: Optional[Mapping[str, int]]) -> bool:
+        """Построен ли объект по этим же словарям (проверка по идентичности)."""
+        return self.rc_states is rc_states and self.signal_states is signal_states
+
+    def _signal_sets(self) -> Tuple[FrozenSet[Any], FrozenSet[Any]]:
+        sets = self._signals
+        if sets is None:
+            opened, closed = [], []
+            for sig_id, state in (self.signal_states or {}).items():
+                is_open, is_closed = _signal_open_closed(sig_id, state)
+                if is_open:
+                    opened.append(sig_id)
+                if is_closed:
+                    closed.append(sig_id)
+            sets = self._signals = (frozenset(opened), frozenset(closed))
+        return sets
+
+    @property
+    def signals_open(self) -> FrozenSet[Any]:
+        return self._signal_sets()[0]
+
+    @property
+    def signals_closed(self) -> FrozenSet[Any]:
+        return self._signal_sets()[1]
+
+    def is_free(self, rc_id: Any) -> bool:
+        return bool(self.free & self.bit(rc_id))
+
+    def is_occupied(self, rc_id: Any) -> bool:
+        return bool(self.occupied & self.bit(rc_id))
+
+    def is_locked(self, rc_id: Any) -> bool:
+        return bool(self.locked & self.bit(rc_id))
+
+
+def step_classes(step: Any) -> StepClasses:
+    """
+    StepClasses шага: готовый step.classes (его ставит update_detectors) или
+    новый по step.rc_states/step.signal_states. Кэшируется только на объектах
+    с полем classes (_StepAdapter); у прочих (тестовые шаги) rc_states может
+    меняться на месте между вызовами.
+    """
+    c = getattr(step, "classes", None)
+    signal_states = getattr(step, "signal_states", None)
+    if c is not None and c.matches(step.rc_states, signal_states):
+        return c
+    c = StepClasses(step.rc_states, signal_states, c.rc_bits if c is not None else None)
+    if hasattr(step, "classes"):
+        step.classes = c
+    return c
@@ -1,8 +1,9 @@
 ﻿# -*- coding: utf-8 -*-
-from typing import Tuple, Optional, Dict, List
+from typing import Any, Tuple, Optional, Dict, List, NamedTuple
 from dataclasses import dataclass
 
 from station.station_model import StationModel
+from core import phase_trace
 from core.uni_states import sw_no_control  # РѕР±С‰РёР№ РєСЂРёС‚РµСЂРёР№ "СЃС‚СЂРµР»РєР° Р±РµР· РєРѕРЅС‚СЂРѕР»СЏ"
 
 
@@ -19,6 +20,42 @@ class TopologyState:
     time_since_next_lost: Optional[float] = None
 
 
+class _PhysNeighbors(NamedTuple):
+    """Физические соседи и потеря контроля по сторонам при данных положениях стрелок."""
+    prev: str
+    next: str
+    prev_control_lost: bool
+    next_control_lost: bool
+
+
+class TopologyTemplate:
+    """
+    Неизменяемая часть топологии станции, общая для всех контекстов (см. station_snapshot).
+
+    rc_switches: РЦ -> стрелки её связей (в порядке связей prev, затем next);
+    switch_rcs: стрелка -> РЦ, связи которых от неё зависят;
+    phys_cache: физические соседи РЦ по кортежу состояний её стрелок — чистая
+    функция модели, поэтому кэш разделяется (значения при гонке одинаковы).
+    """
+
+    def __init__(self, model: StationModel):
+        self.model = model
+        self.rc_switches: Dict[str, Tuple[str, ...]] = {}
+        switch_rcs: Dict[str, List[str]] = {}
+        for rc_id, node in model.rc_nodes.items():
+            sw_ids = tuple(dict.fromkeys(
+                sw_id for _target, sw_id, _req in list(node.prev_links) + list(node.next_links)
+                if sw_id is not None
+            ))
+            self.rc_switches[rc_id] = sw_ids
+            for sw_id in sw_ids:
+                switch_rcs.setdefault(sw_id, []).append(rc_id)
+        self.switch_rcs: Dict[str, Tuple[str, ...]] = {k: tuple(v) for k, v in switch_rcs.items()}
+        self.phys_cache: Dict[str, Dict[Tuple[Any, ...], "_PhysNeighbors"]] = {
+            rc_id: {} for rc_id in model.rc_nodes
+        }
+
+
 class UniversalTopologyManager:
     """
     РЈРЅРёРІРµСЂСЃР°Р»СЊРЅС‹Р№ РјРµРЅРµРґР¶РµСЂ С‚РѕРїРѕР»РѕРіРёРё.
@@ -41,13 +78,32 @@ class UniversalTopologyManager:
     Р·Р°РґР°С‘С‚СЃСЏ РЅР° СѓСЂРѕРІРЅРµ apply_switch_topology_rules.
     """
 
-    def __init__(self, model: StationModel, t_pk: float = 30.0):
+    def __init__(
+        self,
+        model: StationModel,
+        t_pk: float = 30.0,
+        template: Optional[TopologyTemplate] = None,
+    ):
+        if template is None or template.model is not model:
+            template = TopologyTemplate(model)
         self.model = model
         self.T_PK = t_pk
+        # Своё у менеджера — только latches (TopologyState) и шаговый кэш
         self.states: Dict[str, TopologyState] = {
             rc_id: TopologyState(rc_id) for rc_id in model.rc_nodes.keys()
         }
 
+        # Стрелки, от которых зависят связи РЦ, и кэш физических соседей по их
+        # состояниям — из общего шаблона; latch (T_PK) считается поверх.
+        self.template = template
+        self.rc_switches: Dict[str, Tuple[str, ...]] = template.rc_switches
+        self._switch_rcs: Dict[str, Tuple[str, ...]] = template.switch_rcs
+        self._phys_cache: Dict[str, Dict[Tuple[Any, ...], _PhysNeighbors]] = template.phys_cache
+        # Шаговый быстрый путь (begin_step): словарь стрелок шага и соседи РЦ,
+        # посчитанные по нему; при смене шага сбрасываются только РЦ изменившихся стрелок.
+        self._step_switches: Optional[Dict[str, int]] = None
+        self._step_phys: Dict[str, _PhysNeighbors] = {}
+
     # --- РќРѕРІС‹Р№ СѓСЂРѕРІРµРЅСЊ: СЃРѕСЃРµРґРё + РєРѕРЅС‚СЂРѕР»СЊ ---
 
     def get_neighbors_with_control(
@@ -110,12 +166,11 @@ class UniversalTopologyManager:
         if not node or not state:
             return "", ""
 
-        current_prev_phys = self._find_phys_neighbor(node.prev_links, switch_states)
-        current_next_phys = self._find_phys_neighbor(node.next_links, switch_states)
-
-        # РћРїСЂРµРґРµР»СЏРµРј, РµСЃС‚СЊ Р»Рё РїРѕС‚РµСЂСЏ РєРѕРЅС‚СЂРѕР»СЏ РґР»СЏ prev/next
-        is_prev_control_lost = self._is_control_lost_for_links(node.prev_links, switch_states)
-        is_next_control_lost = self._is_control_lost_for_links(node.next_links, switch_states)
+        phys = self._physical(rc_id, node, switch_states)
+        current_prev_phys = phys.prev
+        current_next_phys = phys.next
+        is_prev_control_lost = phys.prev_control_lost
+        is_next_control_lost = phys.next_control_lost
 
         resolved_prev = self._resolve_with_latch(
             current_phys=current_prev_phys,
@@ -135,6 +190,19 @@ class UniversalTopologyManager:
             dt=dt,
         )
 
+        if phase_trace.ENABLED:
+            tracer = phase_trace.current_tracer()
+            if tracer is not None and tracer.wants("topology", rc_id):
+                tracer.emit(
+                    "neighbors", "topology", rc_id,
+                    prev=resolved_prev,
+                    next=resolved_next,
+                    prev_phys=current_prev_phys,
+                    next_phys=current_next_phys,
+                    prev_control_lost=is_prev_control_lost,
+                    next_control_lost=is_next_control_lost,
+                )
+
         return resolved_prev, resolved_next
 
     def get_next_topology_change_dt(
@@ -155,11 +223,12 @@ class UniversalTopologyManager:
         if not node or not state:
             return None
 
+        phys = self._physical(rc_id, node, switch_states)
         candidates: List[float] = []
         candidates.extend(
             self._get_side_expire_candidates(
-                links=node.prev_links,
-                switch_states=switch_states,
+                current_phys=phys.prev,
+                is_control_lost=phys.prev_control_lost,
                 latched_val=state.latched_prev,
                 time_val=state.time_since_prev_lost,
                 max_dt=max_dt,
@@ -167,8 +236,8 @@ class UniversalTopologyManager:
         )
         candidates.extend(
             self._get_side_expire_candidates(
-                links=node.next_links,
-                switch_states=switch_states,
+                current_phys=phys.next,
+                is_control_lost=phys.next_control_lost,
                 latched_val=state.latched_next,
                 time_val=state.time_since_next_lost,
                 max_dt=max_dt,
@@ -180,6 +249,53 @@ class UniversalTopologyManager:
 
     # ---------- Р’СЃРїРѕРјРѕРіР°С‚РµР»СЊРЅС‹Рµ РјРµС‚РѕРґС‹ ----------
 
+    def begin_step(self, switch_states: Dict[str, int]) -> None:
+        """
+        Новый шаг со словарём стрелок switch_states (не изменять на месте до
+        следующего begin_step). Соседи РЦ, у которых не сменилась ни одна
+        значимая стрелка, берутся с прошлого шага без пересчёта ключа.
+        """
+        prev = self._step_switches
+        if prev is None:
+            self._step_phys.clear()
+        else:
+            for sw_id, rc_ids in self._switch_rcs.items():
+                if prev.get(sw_id) != switch_states.get(sw_id):
+                    for rc_id in rc_ids:
+                        self._step_phys.pop(rc_id, None)
+        self._step_switches = switch_states
+
+    def physical_neighbors(self, rc_id: str, switch_states: Dict[str, int]) -> Optional[_PhysNeighbors]:
+        """Физические соседи РЦ без учёта latch (None — РЦ нет в модели)."""
+        node = self.model.rc_nodes.get(rc_id)
+        if node is None:
+            return None
+        return self._physical(rc_id, node, switch_states)
+
+    def _physical(self, rc_id: str, node: Any, switch_states: Dict[str, int]) -> _PhysNeighbors:
+        """Физические соседи РЦ (без latch): кэш по состояниям значимых стрелок."""
+        on_step = switch_states is self._step_switches
+        if on_step:
+            phys = self._step_phys.get(rc_id)
+            if phys is not None:
+                return phys
+        key = tuple(switch_states.get(sw_id) for sw_id in self.rc_switches.get(rc_id, ()))
+        cache = self._phys_cache.get(rc_id)
+        if cache is None:
+            cache = self._phys_cache.setdefault(rc_id, {})
+        phys = cache.get(key)
+        if phys is None:
+            phys = _PhysNeighbors(
+                self._find_phys_neighbor(node.prev_links, switch_states),
+                self._find_phys_neighbor(node.next_links, switch_states),
+                self._is_control_lost_for_links(node.prev_links, switch_states),
+                self._is_control_lost_for_links(node.next_links, switch_states),
+            )
+            cache[key] = phys
+        if on_step:
+            self._step_phys[rc_id] = phys
+        return phys
+
     def _find_phys_neighbor(
         self,
         links: List[Tuple[str, Optional[str], int]],
@@ -203,9 +319,6 @@ class UniversalTopologyManager:
           Р’РЎР• СЌС‚Рё СѓСЃР»РѕРІРёСЏ РІС‹РїРѕР»РЅРµРЅС‹ (Р»РѕРіРёС‡РµСЃРєРѕРµ AND РїРѕ СЃС‚СЂРµР»РєР°Рј).
         """
         from core.uni_states import sw_is_plus, sw_is_minus  # Р»РѕРєР°Р»СЊРЅС‹Р№ РёРјРїРѕСЂС‚
-
-        if links:
-            print(f"DEBUG: _find_phys_neighbor links={links} sw_states={ {k:v for k,v in switch_states.items() if k in [l[1] for l in links if l[1]]} }")
         
         # РЎРЅР°С‡Р°Р»Р° Р±С‹СЃС‚СЂС‹Р№ РїСѓС‚СЊ: Р±РµР·СѓСЃР»РѕРІРЅС‹Рµ СЃРІСЏР·Рё (РІРѕРѕР±С‰Рµ Р±РµР· SwID)
         for target_rc, sw_id, required_state in links:
@@ -267,8 +380,8 @@ class UniversalTopologyManager:
 
     def _get_side_expire_candidates(
         self,
-        links: List[Tuple[str, Optional[str], int]],
-        switch_states: Dict[str, int],
+        current_phys: str,
+        is_control_lost: bool,
         latched_val: str,
         time_val: Optional[float],
         max_dt: float,
@@ -279,8 +392,6 @@ class UniversalTopologyManager:
         if not latched_val:
             return []
 
-        current_phys = self._find_phys_neighbor(links, switch_states)
-        is_control_lost = self._is_control_lost_for_links(links, switch_states)
         if current_phys or not is_control_lost:
             return []
 
@@ -1,5 +1,6 @@
 ﻿from typing import Any, Optional, Sequence
 from core.uni_states import rc_is_free, rc_is_occupied, rc_is_locked, signal_is_closed, shunting_signal_is_closed, signal_is_open, shunting_signal_is_open
+from core.step_classes import step_classes
 from station.station_config import NODES
 
 
@@ -15,16 +16,10 @@ def mask_000(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     """
     if not ctrl:
         return False
-    
-    s_prev = step.rc_states.get(prev, 0) if prev else 0
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0) if next else 0
-    
-    # None   (0),    ctrl 
-    prev_ok = rc_is_free(s_prev) if prev else True
-    next_ok = rc_is_free(s_next) if next else True
-    
-    return prev_ok and rc_is_free(s_ctrl) and next_ok
+    c = step_classes(step)
+    # None = "свободна" (граница), проверяем только существующих соседей
+    need = c.bit(ctrl) | (c.bit(prev) if prev else 0) | (c.bit(next) if next else 0)
+    return c.free & need == need
 
 
 def mask_010(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -34,15 +29,9 @@ def mask_010(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     """
     if not ctrl:
         return False
-    
-    s_prev = step.rc_states.get(prev, 0) if prev else 0
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0) if next else 0
-    
-    prev_ok = rc_is_free(s_prev) if prev else True
-    next_ok = rc_is_free(s_next) if next else True
-    
-    return prev_ok and rc_is_occupied(s_ctrl) and next_ok
+    c = step_classes(step)
+    side = (c.bit(prev) if prev else 0) | (c.bit(next) if next else 0)
+    return bool(c.occupied & c.bit(ctrl)) and c.free & side == side
 
 
 def mask_101(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -52,12 +41,9 @@ def mask_101(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     """
     if not ctrl or prev is None or next is None:
         return False
-    
-    s_prev = step.rc_states.get(prev, 0)
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0)
-    
-    return rc_is_occupied(s_prev) and rc_is_free(s_ctrl) and rc_is_occupied(s_next)
+    c = step_classes(step)
+    side = c.bit(prev) | c.bit(next)
+    return c.occupied & side == side and bool(c.free & c.bit(ctrl))
 
 
 def mask_111(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -67,12 +53,9 @@ def mask_111(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     """
     if not ctrl or prev is None or next is None:
         return False
-    
-    s_prev = step.rc_states.get(prev, 0)
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0)
-    
-    return rc_is_occupied(s_prev) and rc_is_occupied(s_ctrl) and rc_is_occupied(s_next)
+    c = step_classes(step)
+    need = c.bit(prev) | c.bit(ctrl) | c.bit(next)
+    return c.occupied & need == need
 
 
 # ============================================================================
@@ -86,12 +69,12 @@ def mask_100(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     """
     if not ctrl or prev is None:
         return False
-    
-    s_prev = step.rc_states.get(prev, 0)
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0) if next else 0
-    
-    return rc_is_occupied(s_prev) and rc_is_free(s_ctrl) and rc_is_free(s_next)
+    # next = None: состояние 0 (не свободна) -> маска не выполняется
+    if not next:
+        return False
+    c = step_classes(step)
+    free_need = c.bit(ctrl) | c.bit(next)
+    return bool(c.occupied & c.bit(prev)) and c.free & free_need == free_need
 
 
 def mask_110(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -101,12 +84,12 @@ def mask_110(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     """
     if not ctrl or prev is None:
         return False
-    
-    s_prev = step.rc_states.get(prev, 0)
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0) if next else 0
-    
-    return rc_is_occupied(s_prev) and rc_is_occupied(s_ctrl) and rc_is_free(s_next)
+    # next = None: состояние 0 (не свободна) -> маска не выполняется
+    if not next:
+        return False
+    c = step_classes(step)
+    occ_need = c.bit(prev) | c.bit(ctrl)
+    return c.occupied & occ_need == occ_need and bool(c.free & c.bit(next))
 
 
 def mask_100_or_000(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -121,12 +104,12 @@ def mask_001(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     """
     if not ctrl or next is None:
         return False
-    
-    s_prev = step.rc_states.get(prev, 0) if prev else 0
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0)
-    
-    return rc_is_free(s_prev) and rc_is_free(s_ctrl) and rc_is_occupied(s_next)
+    # prev = None: состояние 0 (не свободна) -> маска не выполняется
+    if not prev:
+        return False
+    c = step_classes(step)
+    free_need = c.bit(prev) | c.bit(ctrl)
+    return c.free & free_need == free_need and bool(c.occupied & c.bit(next))
 
 
 def mask_011(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -136,12 +119,12 @@ def mask_011(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     """
     if not ctrl or next is None:
         return False
-    
-    s_prev = step.rc_states.get(prev, 0) if prev else 0
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0)
-    
-    return rc_is_free(s_prev) and rc_is_occupied(s_ctrl) and rc_is_occupied(s_next)
+    # prev = None: состояние 0 (не свободна) -> маска не выполняется
+    if not prev:
+        return False
+    c = step_classes(step)
+    occ_need = c.bit(ctrl) | c.bit(next)
+    return bool(c.free & c.bit(prev)) and c.occupied & occ_need == occ_need
 
 
 def mask_001_or_000(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -162,8 +145,7 @@ def mask_x0x(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
         return False
     if prev is not None or next is not None:
         return False
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    return rc_is_free(s_ctrl)
+    return step_classes(step).is_free(ctrl)
 
 
 def mask_x1x(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -172,8 +154,7 @@ def mask_x1x(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
         return False
     if prev is not None or next is not None:
         return False
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    return rc_is_occupied(s_ctrl)
+    return step_classes(step).is_occupied(ctrl)
 
 
 def mask_00x(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -187,16 +168,11 @@ def mask_00x(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     # no_prev branch must have no previous adjacent RC in effective topology
     if prev is not None:
         return False
-    
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    
-    # next     
     if next is None:
         return False
-    s_next = step.rc_states.get(next, 0)
-    next_ok = rc_is_free(s_next)
-    
-    return rc_is_free(s_ctrl) and next_ok
+    c = step_classes(step)
+    need = c.bit(ctrl) | c.bit(next)
+    return c.free & need == need
 
 
 def mask_01x(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -207,12 +183,8 @@ def mask_01x(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     # no_prev branch must have no previous adjacent RC in effective topology
     if prev is not None:
         return False
-    
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0)
-    next_ok = rc_is_free(s_next)  # next   !
-    
-    return rc_is_occupied(s_ctrl) and next_ok
+    c = step_classes(step)
+    return bool(c.occupied & c.bit(ctrl)) and bool(c.free & c.bit(next))
 
 
 def mask_x00(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -222,20 +194,15 @@ def mask_x00(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     """
     if not ctrl:
         return False
-    
-    # prev     
     if prev is None:
         return False
-    s_prev = step.rc_states.get(prev, 0)
-    prev_ok = rc_is_free(s_prev)
-    
-    s_ctrl = step.rc_states.get(ctrl, 0)
 
     # no_next branch must have no next adjacent RC in effective topology
     if next is not None:
         return False
-    
-    return prev_ok and rc_is_free(s_ctrl)
+    c = step_classes(step)
+    need = c.bit(prev) | c.bit(ctrl)
+    return c.free & need == need
 
 
 def mask_x10(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -243,16 +210,11 @@ def mask_x10(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) ->
     if not ctrl or prev is None:
         return False
     
-    s_prev = step.rc_states.get(prev, 0)
-    prev_ok = rc_is_free(s_prev)  # prev   !
-    
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    
     # no_next branch must have no next adjacent RC in effective topology
     if next is not None:
         return False
-
-    return prev_ok and rc_is_occupied(s_ctrl)
+    c = step_classes(step)
+    return bool(c.free & c.bit(prev)) and bool(c.occupied & c.bit(ctrl))
 
 
 # Backward-compatible aliases for old v7 names
@@ -272,11 +234,9 @@ def mask_110_or_111(step: Any, prev: Optional[str], ctrl: str, next: Optional[st
     """
     if not ctrl or prev is None:
         return False
-    
-    s_prev = step.rc_states.get(prev, 0)
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    
-    return rc_is_occupied(s_prev) and rc_is_occupied(s_ctrl)
+    c = step_classes(step)
+    need = c.bit(prev) | c.bit(ctrl)
+    return c.occupied & need == need
 
 
 def mask_011_or_111(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -286,11 +246,9 @@ def mask_011_or_111(step: Any, prev: Optional[str], ctrl: str, next: Optional[st
     """
     if not ctrl or next is None:
         return False
-    
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0)
-    
-    return rc_is_occupied(s_ctrl) and rc_is_occupied(s_next)
+    c = step_classes(step)
+    need = c.bit(ctrl) | c.bit(next)
+    return c.occupied & need == need
 
 
 def mask_01X_or_X10(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
@@ -300,16 +258,11 @@ def mask_01X_or_X10(step: Any, prev: Optional[str], ctrl: str, next: Optional[st
     """
     if not ctrl:
         return False
-    
-    s_prev = step.rc_states.get(prev, 0) if prev else 0
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0) if next else 0
-    
-    curr_occ = rc_is_occupied(s_ctrl)
-    prev_free = rc_is_free(s_prev) if prev else True  # None = 
-    next_free = rc_is_free(s_next) if next else True  # None = 
-    
-    return curr_occ and (prev_free or next_free)
+    c = step_classes(step)
+    if not c.occupied & c.bit(ctrl):
+        return False
+    # None = "свободна"
+    return not prev or not next or bool(c.free & (c.bit(prev) | c.bit(next)))
 
 
 # Backward-compatible alias (old non-canonical name)
@@ -321,13 +274,11 @@ mask_01x_or_x10 = mask_01X_or_X10
 
 def mask_0_not_locked(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """ :  ,    can_lock=True."""
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    
-    #  :    
-    if not (rc_is_free(s_ctrl) and not rc_is_locked(s_ctrl)):
+    c = step_classes(step)
+    b = c.bit(ctrl)
+    if not (c.free & b) or c.locked & b:
         return False
     
-    #  can_lock  rc_capabilities
     caps = getattr(step, 'rc_capabilities', {})
     ctrl_caps = caps.get(ctrl, {})
     return ctrl_caps.get('can_lock', False)
@@ -335,13 +286,11 @@ def mask_0_not_locked(step: Any, prev: Optional[str], ctrl: str, next: Optional[
 
 def mask_1_not_locked(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """ :  ,    can_lock=True."""
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    
-    #  :    
-    if not (rc_is_occupied(s_ctrl) and not rc_is_locked(s_ctrl)):
+    c = step_classes(step)
+    b = c.bit(ctrl)
+    if not (c.occupied & b) or c.locked & b:
         return False
     
-    #  can_lock  rc_capabilities
     caps = getattr(step, 'rc_capabilities', {})
     ctrl_caps = caps.get(ctrl, {})
     return ctrl_caps.get('can_lock', False)
@@ -353,9 +302,7 @@ def mask_ctrl_free(step, prev, ctrl, next) -> bool:
     """
     if not ctrl:
         return False
-    #    (0=, 1=,  ..)
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    return rc_is_free(s_ctrl)
+    return step_classes(step).is_free(ctrl)
 
 
 def mask_ctrl_occupied(step, prev, ctrl, next) -> bool:
@@ -364,8 +311,7 @@ def mask_ctrl_occupied(step, prev, ctrl, next) -> bool:
     """
     if not ctrl:
         return False
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    return rc_is_occupied(s_ctrl)
+    return step_classes(step).is_occupied(ctrl)
 
 
 # ============================================================================
@@ -376,32 +322,30 @@ def mask_rc_1l_0l_0l(step: Any, prev: Optional[str], ctrl: str, next: Optional[s
     """LS5 Branch Prev Phase 0: Prev(Occ+Lock), Ctrl(Free+Lock)"""
     if not ctrl or prev is None:
         return False
-    s_prev = step.rc_states.get(prev, 0)
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    return rc_is_occupied(s_prev) and rc_is_locked(s_prev) and \
-           rc_is_free(s_ctrl) and rc_is_locked(s_ctrl)
+    c = step_classes(step)
+    b_prev, b_ctrl = c.bit(prev), c.bit(ctrl)
+    need = b_prev | b_ctrl
+    return bool(c.occupied & b_prev) and bool(c.free & b_ctrl) and c.locked & need == need
 
 
 def mask_rc_0l_0l_1l(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """LS5 Branch Next Phase 0: Next(Occ+Lock), Ctrl(Free+Lock)"""
     if not ctrl or next is None:
         return False
-    s_next = step.rc_states.get(next, 0)
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    return rc_is_occupied(s_next) and rc_is_locked(s_next) and \
-           rc_is_free(s_ctrl) and rc_is_locked(s_ctrl)
+    c = step_classes(step)
+    b_next, b_ctrl = c.bit(next), c.bit(ctrl)
+    need = b_next | b_ctrl
+    return bool(c.occupied & b_next) and bool(c.free & b_ctrl) and c.locked & need == need
 
 
 def mask_rc_1l_0l_1l(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """LS5 Phase 1: Both(Occ+Lock), Ctrl(Free+Lock)"""
     if not ctrl or prev is None or next is None:
         return False
-    s_prev = step.rc_states.get(prev, 0)
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0)
-    return rc_is_occupied(s_prev) and rc_is_locked(s_prev) and \
-           rc_is_occupied(s_next) and rc_is_locked(s_next) and \
-           rc_is_free(s_ctrl) and rc_is_locked(s_ctrl)
+    c = step_classes(step)
+    side, b_ctrl = c.bit(prev) | c.bit(next), c.bit(ctrl)
+    need = side | b_ctrl
+    return c.occupied & side == side and bool(c.free & b_ctrl) and c.locked & need == need
 
 # Backward-compatible LS5 aliases
 mask_ls5_prev_locked_p0 = mask_rc_1l_0l_0l
@@ -417,45 +361,35 @@ def mask_rc_n_1_0l(step: Any, prev: Optional[str], ctrl: str, next: Optional[str
     """LZ12 Prev-NC P0/KOGDA: prev=NC, ctrl=occ+locked, next=free+locked."""
     if not step.modes.get("prev_nc", False) or not next:
         return False
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0)
-    return (
-        rc_is_occupied(s_ctrl) and rc_is_locked(s_ctrl) and
-        rc_is_free(s_next) and rc_is_locked(s_next)
-    )
+    c = step_classes(step)
+    b_ctrl, b_next = c.bit(ctrl), c.bit(next)
+    need = b_ctrl | b_next
+    return bool(c.occupied & b_ctrl) and bool(c.free & b_next) and c.locked & need == need
 
 def mask_rc_n_1_1l(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """LZ12 Prev-NC P1: prev=NC, ctrl=occ+locked, next=occ+locked."""
     if not step.modes.get("prev_nc", False) or not next:
         return False
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    s_next = step.rc_states.get(next, 0)
-    return (
-        rc_is_occupied(s_ctrl) and rc_is_locked(s_ctrl) and
-        rc_is_occupied(s_next) and rc_is_locked(s_next)
-    )
+    c = step_classes(step)
+    need = c.bit(ctrl) | c.bit(next)
+    return c.occupied & need == need and c.locked & need == need
 
 def mask_rc_l0_1_n(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """LZ12 Next-NC P0/KOGDA: next=NC, ctrl=occ+locked, prev=free+locked."""
     if not step.modes.get("next_nc", False) or not prev:
         return False
-    s_prev = step.rc_states.get(prev, 0)
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    return (
-        rc_is_occupied(s_ctrl) and rc_is_locked(s_ctrl) and
-        rc_is_free(s_prev) and rc_is_locked(s_prev)
-    )
+    c = step_classes(step)
+    b_ctrl, b_prev = c.bit(ctrl), c.bit(prev)
+    need = b_ctrl | b_prev
+    return bool(c.occupied & b_ctrl) and bool(c.free & b_prev) and c.locked & need == need
 
 def mask_rc_l1_1_n(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """LZ12 Next-NC P1: next=NC, ctrl=occ+locked, prev=occ+locked."""
     if not step.modes.get("next_nc", False) or not prev:
         return False
-    s_prev = step.rc_states.get(prev, 0)
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    return (
-        rc_is_occupied(s_ctrl) and rc_is_locked(s_ctrl) and
-        rc_is_occupied(s_prev) and rc_is_locked(s_prev)
-    )
+    c = step_classes(step)
+    need = c.bit(ctrl) | c.bit(prev)
+    return c.occupied & need == need and c.locked & need == need
 
 # Backward-compatible LZ12 aliases
 mask_lz12_prev_nc_p0 = mask_rc_n_1_0l
@@ -471,19 +405,19 @@ def _is_free_or_nc(step: Any, rc_id: Optional[str], side: str) -> bool:
     """:       NC ()."""
     if not rc_id or step.modes.get(f"{side}_nc", False):
         return True
-    return rc_is_free(step.rc_states.get(rc_id, 0))
+    return step_classes(step).is_free(rc_id)
 
 def _is_occ_and_not_nc(step: Any, rc_id: Optional[str], side: str) -> bool:
     """:   (   ,  NC)."""
     if not rc_id or step.modes.get(f"{side}_nc", False):
         return False
-    return rc_is_occupied(step.rc_states.get(rc_id, 0))
+    return step_classes(step).is_occupied(rc_id)
 
 def _is_locked(step: Any, rc_id: Optional[str]) -> bool:
     """:   (=1)."""
     if not rc_id:
         return False
-    return rc_is_locked(step.rc_states.get(rc_id, 0))
+    return step_classes(step).is_locked(rc_id)
 
 def _is_signal_closed(
     step: Any,
@@ -500,18 +434,8 @@ def _is_signal_closed(
     )
     if not resolved_sig:
         return False
-    st = step.signal_states.get(resolved_sig, 0)
-    
-    node = NODES.get(resolved_sig)
-    if node:
-        t = node.get("type")
-        if t == 3: # Shunting
-            return shunting_signal_is_closed(st)
-        if t == 4: # Train
-            return signal_is_closed(st)
-            
-    # Fallback for unknown type: treat as train signal (strict red=15 only).
-    return signal_is_closed(st)
+    # Тип светофора (NODES) учтён при классификации шага; отсутствующий — код 0, не закрыт.
+    return resolved_sig in step_classes(step).signals_closed
 
 def _is_signal_open(
     step: Any,
@@ -528,18 +452,7 @@ def _is_signal_open(
     )
     if not resolved_sig:
         return False
-    st = step.signal_states.get(resolved_sig, 0)
-    
-    node = NODES.get(resolved_sig)
-    if node:
-        t = node.get("type")
-        if t == 3: # Shunting
-            return shunting_signal_is_open(st)
-        if t == 4: # Train
-            return signal_is_open(st)
-            
-    # Fallback: check both if type unknown
-    return signal_is_open(st) or shunting_signal_is_open(st)
+    return resolved_sig in step_classes(step).signals_open
 
 
 
@@ -576,10 +489,9 @@ def make_mask_rc_0_1_0_sig_1(
     def mask_rc_0_1_0_sig_1(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
         if not prev or not next:
             return False
-        s_prev = step.rc_states.get(prev, 0)
-        s_ctrl = step.rc_states.get(ctrl, 0)
-        s_next = step.rc_states.get(next, 0)
-        return rc_is_free(s_prev) and rc_is_occupied(s_ctrl) and rc_is_free(s_next) and _is_signal_open(
+        c = step_classes(step)
+        side = c.bit(prev) | c.bit(next)
+        return c.free & side == side and bool(c.occupied & c.bit(ctrl)) and _is_signal_open(
             step, sig_id, mode_key=mode_key, fallback_mode_keys=fallback_mode_keys
         )
     return mask_rc_0_1_0_sig_1
@@ -595,13 +507,12 @@ def make_mask_rc_0_1_1_sig_1(
     def mask_rc_0_1_1_sig_1(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
         if not prev or not next:
             return False
-        s_prev = step.rc_states.get(prev, 0)
-        s_ctrl = step.rc_states.get(ctrl, 0)
-        s_next = step.rc_states.get(next, 0)
+        c = step_classes(step)
         if direction == "to_next":
-            state_ok = rc_is_free(s_prev) and rc_is_occupied(s_ctrl) and rc_is_occupied(s_next)
+            free_need, occ_need = c.bit(prev), c.bit(ctrl) | c.bit(next)
         else:
-            state_ok = rc_is_occupied(s_prev) and rc_is_occupied(s_ctrl) and rc_is_free(s_next)
+            free_need, occ_need = c.bit(next), c.bit(prev) | c.bit(ctrl)
+        state_ok = bool(c.free & free_need) and c.occupied & occ_need == occ_need
         return state_ok and _is_signal_open(
             step, sig_id, mode_key=mode_key, fallback_mode_keys=fallback_mode_keys
         )
@@ -618,13 +529,12 @@ def make_mask_rc_0_1_1_sig_0(
     def mask_rc_0_1_1_sig_0(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
         if not prev or not next:
             return False
-        s_prev = step.rc_states.get(prev, 0)
-        s_ctrl = step.rc_states.get(ctrl, 0)
-        s_next = step.rc_states.get(next, 0)
+        c = step_classes(step)
         if direction == "to_next":
-            state_ok = rc_is_free(s_prev) and rc_is_occupied(s_ctrl) and rc_is_occupied(s_next)
+            free_need, occ_need = c.bit(prev), c.bit(ctrl) | c.bit(next)
         else:
-            state_ok = rc_is_occupied(s_prev) and rc_is_occupied(s_ctrl) and rc_is_free(s_next)
+            free_need, occ_need = c.bit(next), c.bit(prev) | c.bit(ctrl)
+        state_ok = bool(c.free & free_need) and c.occupied & occ_need == occ_need
         return state_ok and _is_signal_closed(
             step, sig_id, mode_key=mode_key, fallback_mode_keys=fallback_mode_keys
         )
@@ -640,10 +550,9 @@ def make_mask_rc_0_1_0_sig_0(
     def mask_rc_0_1_0_sig_0(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
         if not prev or not next:
             return False
-        s_prev = step.rc_states.get(prev, 0)
-        s_ctrl = step.rc_states.get(ctrl, 0)
-        s_next = step.rc_states.get(next, 0)
-        return rc_is_free(s_prev) and rc_is_occupied(s_ctrl) and rc_is_free(s_next) and _is_signal_closed(
+        c = step_classes(step)
+        side = c.bit(prev) | c.bit(next)
+        return c.free & side == side and bool(c.occupied & c.bit(ctrl)) and _is_signal_closed(
             step, sig_id, mode_key=mode_key, fallback_mode_keys=fallback_mode_keys
         )
     return mask_rc_0_1_0_sig_0
@@ -694,41 +603,35 @@ make_mask_lz10_kogda_sig_closed = make_mask_rc_0_1_0_sig_0
 
 def mask_rc_0_0l_0(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """LZ9:  -  ,    NC."""
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    if not rc_is_free(s_ctrl): return False
+    if not step_classes(step).is_free(ctrl): return False
     return _is_free_or_nc(step, prev, "prev") and _is_free_or_nc(step, next, "next")
 
 def mask_rc_ctrl_1_adj_free_or_nc(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """LZ9:  ,      NC."""
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    if not rc_is_occupied(s_ctrl): return False
+    if not step_classes(step).is_occupied(ctrl): return False
     return _is_free_or_nc(step, prev, "prev") and _is_free_or_nc(step, next, "next")
 
 def mask_rc_ctrl_0_adj_occ(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """LZ9:  ,  -   ( NC) ."""
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    if not rc_is_free(s_ctrl): return False
+    if not step_classes(step).is_free(ctrl): return False
     any_adj_occ = _is_occ_and_not_nc(step, prev, "prev") or _is_occ_and_not_nc(step, next, "next")
     return any_adj_occ
 
 def mask_rc_ctrl_1_adj_occ(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """LZ9:  -    -   ( NC) ."""
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    if not rc_is_occupied(s_ctrl): return False
+    if not step_classes(step).is_occupied(ctrl): return False
     any_adj_occ = _is_occ_and_not_nc(step, prev, "prev") or _is_occ_and_not_nc(step, next, "next")
     return any_adj_occ
 
 def mask_rc_ctrl_1_prev_occ(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """LZ9:      prev (prev  NC)."""
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    if not rc_is_occupied(s_ctrl):
+    if not step_classes(step).is_occupied(ctrl):
         return False
     return _is_occ_and_not_nc(step, prev, "prev")
 
 def mask_rc_ctrl_1_next_occ(step: Any, prev: Optional[str], ctrl: str, next: Optional[str]) -> bool:
     """LZ9:      next (next  NC)."""
-    s_ctrl = step.rc_states.get(ctrl, 0)
-    if not rc_is_occupied(s_ctrl):
+    if not step_classes(step).is_occupied(ctrl):
         return False
     return _is_occ_and_not_nc(step, next, "next")
 
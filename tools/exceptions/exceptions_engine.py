@@ -1,8 +1,20 @@
 ﻿from __future__ import annotations
 
 from dataclasses import dataclass
-import re
-from typing import List, Iterable, Set, TYPE_CHECKING, Any, Dict
+from typing import List, Iterable, Optional, Set, TYPE_CHECKING, Any, Dict, Tuple
+
+from core.flag_bits import (
+    LS_ANY,
+    LZ_ANY,
+    FlagBits,
+    open_prefix_mask,
+    prefix_mask,
+    set_flag_bits,
+    step_flag_bits,
+    variants,
+    with_lz_suppressed,
+    with_ls_suppressed,
+)
 
 if TYPE_CHECKING:
     from core.sim_core import ScenarioStep, TimelineStep
@@ -104,35 +116,36 @@ def _recent_flag(history: List[TimelineStep], prefix: str, t_window: float) -> b
     if not history or t_window <= 0.0:
         return False
     t_now = sum(float(x.step_duration) for x in history)
+    mask = prefix_mask(prefix)
     t_start = max(0.0, t_now - t_window)
     t_acc = 0.0
     for step in history:
         dt = float(step.step_duration)
         t_next = t_acc + dt
-        if t_next > t_start and any(f.startswith(prefix) for f in (step.flags or [])):
+        if t_next > t_start and step_flag_bits(step) & mask:
             return True
         t_acc = t_next
     return False
 
 
 def _recompute_state(step: TimelineStep) -> None:
-    flags = step.flags or []
-    has_ls = any(f.startswith("lls_") for f in flags)
-    has_lz = any(f.startswith("llz_v") for f in flags)
+    bits = step_flag_bits(step)
+    has_ls = bool(bits & LS_ANY)
+    has_lz = bool(bits & LZ_ANY)
     step.lz_state = bool(has_ls or has_lz)
     if not step.lz_state:
         step.lz_variant = 0
         return
     # Prefer explicit variant parsed from detector flags.
     if has_lz:
-        lz_variants = _extract_suppressed_variants(flags, "llz_v")
+        lz_variants = _extract_suppressed_variants(bits, "llz_v")
         if lz_variants:
             step.lz_variant = int(lz_variants[0])
         elif step.lz_variant >= 100:
             step.lz_variant = 0
         return
     if has_ls:
-        ls_variants = _extract_suppressed_variants(flags, "lls_")
+        ls_variants = _extract_suppressed_variants(bits, "lls_")
         if ls_variants:
             step.lz_variant = 100 + int(ls_variants[0])
         elif step.lz_variant < 100:
@@ -140,26 +153,17 @@ def _recompute_state(step: TimelineStep) -> None:
 
 
 def _suppress_prefix(step: TimelineStep, prefix: str) -> None:
-    step.flags = [f for f in (step.flags or []) if not f.startswith(prefix)]
-
-
-def _extract_suppressed_variants(flags: List[str], prefix: str) -> List[int]:
-    out: List[int] = []
-    for f in flags or []:
-        raw = str(f)
-        if prefix == "llz_v":
-            m = re.match(r"^llz_v(\d+)(?:_|$)", raw)
-        else:
-            m = re.match(r"^lls_(?:v)?(\d+)(?:_|$)", raw)
-        if m:
-            v = int(m.group(1))
-            if v not in out:
-                out.append(v)
-    return out
+    set_flag_bits(step, step_flag_bits(step) & ~prefix_mask(prefix))
+
+
+def _extract_suppressed_variants(bits: FlagBits, prefix: str) -> Tuple[int, ...]:
+    # Same matching as the former regexes over flag strings: "llz_v" picks LZ
+    # variants, any other prefix (including "llz_v8") picks "lls_<n>" variants.
+    return variants(bits, "lz" if prefix == "llz_v" else "ls")
 
 
-def _has_open_flag(flags: List[str], prefix: str) -> bool:
-    return any(str(f).startswith(prefix) and "_open" in str(f) for f in (flags or []))
+def _has_open_flag(bits: FlagBits, prefix: str) -> bool:
+    return bool(bits & open_prefix_mask(prefix))
 
 
 def _opened_at_same_time(
@@ -171,7 +175,7 @@ def _opened_at_same_time(
     for step in history or []:
         if abs(float(step.t) - float(t_current)) > eps:
             continue
-        if _has_open_flag(step.flags or [], prefix):
+        if _has_open_flag(step_flag_bits(step), prefix):
             return True
     return False
 
@@ -242,6 +246,33 @@ def build_exception_context(
     }
 
 
+class _HistoryWindows:
+    """Window checks over full histories (reference implementation for apply_exceptions)."""
+
+    def __init__(
+        self,
+        ctrl_rc_id: str,
+        scenario_history: List[ScenarioStep],
+        timeline_history: List[TimelineStep],
+    ) -> None:
+        self.ctrl_rc_id = ctrl_rc_id
+        self.scenario_history = scenario_history
+        self.timeline_history = timeline_history
+        self.t_now = _sum_time(scenario_history)
+
+    def mu_active_in_window(self, rc_ids: Set[str], t_window: float) -> bool:
+        return _mu_active_in_window(self.scenario_history, rc_ids, self.t_now, t_window)
+
+    def occupied_continuously(self, t_window: float) -> bool:
+        return _occupied_continuously(self.scenario_history, self.ctrl_rc_id, self.t_now, t_window)
+
+    def recent_flag(self, prefix: str, t_window: float) -> bool:
+        return _recent_flag(self.timeline_history, prefix, t_window)
+
+    def opened_at_same_time(self, prefix: str, t_current: float) -> bool:
+        return _opened_at_same_time(self.timeline_history, prefix, t_current)
+
+
 def apply_exceptions(
     ctrl_rc_id: str,
     current: TimelineStep,
@@ -249,77 +280,68 @@ def apply_exceptions(
     timeline_history: List[TimelineStep],
     cfg: ExceptionsConfig,
 ) -> TimelineStep:
-    out = current
-    t_now = _sum_time(scenario_history)
     current_step = scenario_history[-1] if scenario_history else None
+    windows = _HistoryWindows(ctrl_rc_id, scenario_history, timeline_history)
+    return apply_exceptions_with_windows(ctrl_rc_id, current, current_step, windows, cfg)
+
+
+def apply_exceptions_with_windows(
+    ctrl_rc_id: str,
+    current: TimelineStep,
+    current_step: Optional[ScenarioStep],
+    windows: Any,
+    cfg: ExceptionsConfig,
+) -> TimelineStep:
+    """
+    Post-pass core: `windows` answers mu_active_in_window / occupied_continuously /
+    recent_flag / opened_at_same_time (full-history _HistoryWindows or the
+    incremental ExceptionsContextTracker).
+    """
+    out = current
     adj = _adjacent_ids(out, ctrl_rc_id)
 
+    bits = step_flag_bits(out)
+
     # LZ suppressors.
-    has_lz_now = any(f.startswith("llz_v") for f in (out.flags or []))
-    has_lz8_now = any(f.startswith("llz_v8") for f in (out.flags or []))
+    has_lz_now = bool(bits & LZ_ANY)
+    has_lz8_now = bool(bits & prefix_mask("llz_v8"))
     if has_lz_now and current_step is not None:
-        if cfg.enable_lz_exc_mu and _mu_active_in_window(scenario_history, adj, t_now, cfg.t_mu):
-            suppressed = _extract_suppressed_variants(out.flags or [], "llz_v")
-            _suppress_prefix(out, "llz_v")
-            out.flags.append("lz_suppressed:local_mu")
-            for v in suppressed:
-                out.flags.append(f"lz_suppressed:v{v}:local_mu")
-        elif cfg.enable_lz_exc_recent_ls and _recent_flag(timeline_history, "lls_", cfg.t_recent_ls):
-            suppressed = _extract_suppressed_variants(out.flags or [], "llz_v")
-            _suppress_prefix(out, "llz_v")
-            out.flags.append("lz_suppressed:recent_ls")
-            for v in suppressed:
-                out.flags.append(f"lz_suppressed:v{v}:recent_ls")
+        if cfg.enable_lz_exc_mu and windows.mu_active_in_window(adj, cfg.t_mu):
+            suppressed = _extract_suppressed_variants(bits, "llz_v")
+            bits = with_lz_suppressed(bits & ~LZ_ANY, "local_mu", suppressed)
+        elif cfg.enable_lz_exc_recent_ls and windows.recent_flag("lls_", cfg.t_recent_ls):
+            suppressed = _extract_suppressed_variants(bits, "llz_v")
+            bits = with_lz_suppressed(bits & ~LZ_ANY, "recent_ls", suppressed)
         elif has_lz8_now and cfg.enable_lz_exc_dsp and _is_dsp_mode(current_step) and _auto_action_off(current_step):
-            if _occupied_continuously(scenario_history, ctrl_rc_id, t_now, cfg.t_min_maneuver_v8):
-                suppressed = _extract_suppressed_variants(out.flags or [], "llz_v8")
-                _suppress_prefix(out, "llz_v8")
-                out.flags.append("lz_suppressed:dsp_autoaction_timeout")
-                for v in suppressed:
-                    out.flags.append(f"lz_suppressed:v{v}:dsp_autoaction_timeout")
+            if windows.occupied_continuously(cfg.t_min_maneuver_v8):
+                suppressed = _extract_suppressed_variants(bits, "llz_v8")
+                bits = with_lz_suppressed(bits & ~prefix_mask("llz_v8"), "dsp_autoaction_timeout", suppressed)
 
     # LS suppressors.
-    has_ls_now = any(f.startswith("lls_") for f in (out.flags or []))
+    has_ls_now = bool(bits & LS_ANY)
     if has_ls_now and current_step is not None:
-        if cfg.enable_ls_exc_mu and _mu_active_in_window(scenario_history, adj, t_now, cfg.t_ls_mu):
-            suppressed = _extract_suppressed_variants(out.flags or [], "lls_")
-            _suppress_prefix(out, "lls_")
-            out.flags.append("ls_suppressed:local_mu")
-            for v in suppressed:
-                out.flags.append(f"ls_suppressed:v{v}:local_mu")
-        elif cfg.enable_ls_exc_after_lz and _recent_flag(timeline_history, "llz_v", cfg.t_ls_after_lz):
-            suppressed = _extract_suppressed_variants(out.flags or [], "lls_")
-            _suppress_prefix(out, "lls_")
-            out.flags.append("ls_suppressed:after_lz")
-            for v in suppressed:
-                out.flags.append(f"ls_suppressed:v{v}:after_lz")
+        if cfg.enable_ls_exc_mu and windows.mu_active_in_window(adj, cfg.t_ls_mu):
+            suppressed = _extract_suppressed_variants(bits, "lls_")
+            bits = with_ls_suppressed(bits & ~LS_ANY, "local_mu", suppressed)
+        elif cfg.enable_ls_exc_after_lz and windows.recent_flag("llz_v", cfg.t_ls_after_lz):
+            suppressed = _extract_suppressed_variants(bits, "lls_")
+            bits = with_ls_suppressed(bits & ~LS_ANY, "after_lz", suppressed)
         elif cfg.enable_ls_exc_dsp and _is_dsp_mode(current_step) and _auto_action_off(current_step):
-            if _occupied_continuously(scenario_history, ctrl_rc_id, t_now, cfg.t_ls_dsp):
-                suppressed = _extract_suppressed_variants(out.flags or [], "lls_")
-                _suppress_prefix(out, "lls_")
-                out.flags.append("ls_suppressed:dsp_autoaction")
-                for v in suppressed:
-                    out.flags.append(f"ls_suppressed:v{v}:dsp_autoaction")
+            if windows.occupied_continuously(cfg.t_ls_dsp):
+                suppressed = _extract_suppressed_variants(bits, "lls_")
+                bits = with_ls_suppressed(bits & ~LS_ANY, "dsp_autoaction", suppressed)
 
     # Arbitration rule: if LZ and LS are detected simultaneously, keep LZ.
-    has_lz_now = any(f.startswith("llz_v") for f in (out.flags or []))
-    has_ls_now = any(f.startswith("lls_") for f in (out.flags or []))
-    if has_lz_now and has_ls_now:
-        suppressed = _extract_suppressed_variants(out.flags or [], "lls_")
-        _suppress_prefix(out, "lls_")
-        out.flags.append("ls_suppressed:priority_lz")
-        for v in suppressed:
-            out.flags.append(f"ls_suppressed:v{v}:priority_lz")
-    else:
+    if bits & LZ_ANY and bits & LS_ANY:
+        suppressed = _extract_suppressed_variants(bits, "lls_")
+        bits = with_ls_suppressed(bits & ~LS_ANY, "priority_lz", suppressed)
+    elif _has_open_flag(bits, "lls_") and windows.opened_at_same_time("llz_v", out.t):
         # Time-based arbitration: same absolute open moment, even if recorded in different steps.
-        has_ls_open_now = _has_open_flag(out.flags or [], "lls_")
-        if has_ls_open_now and _opened_at_same_time(timeline_history, "llz_v", out.t):
-            suppressed = _extract_suppressed_variants(out.flags or [], "lls_")
-            _suppress_prefix(out, "lls_")
-            out.flags.append("ls_suppressed:priority_lz_same_time")
-            for v in suppressed:
-                out.flags.append(f"ls_suppressed:v{v}:priority_lz_same_time")
+        suppressed = _extract_suppressed_variants(bits, "lls_")
+        bits = with_ls_suppressed(bits & ~LS_ANY, "priority_lz_same_time", suppressed)
 
+    if bits != out.flag_bits:
+        set_flag_bits(out, bits)
     _recompute_state(out)
     return out
 
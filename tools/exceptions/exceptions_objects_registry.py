@@ -1,14 +1,17 @@
 ﻿from __future__ import annotations
 
 import json
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Optional, Set, Any
+from typing import Dict, FrozenSet, List, Mapping, Optional, Set, Any, Tuple
 from exceptions.indicator_states import INDICATOR_ON
 
 
 VALID_KINDS = {"MU", "NAS", "CHAS", "DSP"}
 
+# Process-wide cache for load_cached(): resolved path -> ((mtime_ns, size), registry).
+_REGISTRY_CACHE: Dict[str, Tuple[Tuple[int, int], "ExceptionsObjectsRegistry"]] = {}
+
 
 @dataclass(frozen=True)
 class ExceptionObject:
@@ -35,6 +38,25 @@ class ExceptionsObjectsRegistry:
     by_id: Dict[str, ExceptionObject]
     dsp_policy_default: Dict[str, Any]
     dsp_policy_rc_overrides: Dict[str, Dict[str, Any]]
+    # Indexes built from objects (__post_init__): rc_id -> targeted objects,
+    # global (DSP) objects, indicator id -> RCs it affects (None = every RC).
+    by_rc: Dict[str, Tuple[ExceptionObject, ...]] = field(default_factory=dict, init=False, repr=False)
+    global_objects: Tuple[ExceptionObject, ...] = field(default=(), init=False, repr=False)
+    rcs_by_indicator: Dict[str, Optional[FrozenSet[str]]] = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        by_rc: Dict[str, List[ExceptionObject]] = {}
+        global_objects: List[ExceptionObject] = []
+        for obj in self.objects:
+            if obj.kind == "DSP":
+                global_objects.append(obj)
+                self.rcs_by_indicator[obj.obj_id] = None
+                continue
+            for rc_id in obj.target_rc_ids:
+                by_rc.setdefault(rc_id, []).append(obj)
+            self.rcs_by_indicator[obj.obj_id] = frozenset(obj.target_rc_ids)
+        self.by_rc = {rc_id: tuple(objs) for rc_id, objs in by_rc.items()}
+        self.global_objects = tuple(global_objects)
 
     @staticmethod
     def empty() -> "ExceptionsObjectsRegistry":
@@ -97,15 +119,35 @@ class ExceptionsObjectsRegistry:
             dsp_policy_rc_overrides=dsp_rc_overrides,
         )
 
+    @staticmethod
+    def load_cached(path: Optional[str]) -> "ExceptionsObjectsRegistry":
+        """
+        Same as load(), but parses the file once per (path, mtime, size).
+        The returned registry is shared and must be treated as read-only.
+        """
+        if not path:
+            return ExceptionsObjectsRegistry.empty()
+        p = Path(path)
+        try:
+            st = p.stat()
+        except OSError:
+            return ExceptionsObjectsRegistry.empty()
+        key = str(p.resolve())
+        stamp = (st.st_mtime_ns, st.st_size)
+        cached = _REGISTRY_CACHE.get(key)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        registry = ExceptionsObjectsRegistry.load(path)
+        _REGISTRY_CACHE[key] = (stamp, registry)
+        return registry
+
     def evaluate(self, indicator_states: Dict[str, int], rc_id: str) -> Dict[str, bool]:
         mu_active = False
         nas_active = False
         chas_active = False
         dsp_active = False
 
-        for obj in self.objects:
-            if not obj.applies_to_rc(rc_id):
-                continue
+        for obj in self.by_rc.get(rc_id, ()) + self.global_objects:
             state = int(indicator_states.get(obj.obj_id, 0))
             if not obj.is_active(state):
                 continue
@@ -142,3 +184,41 @@ class ExceptionsObjectsRegistry:
             policy["t_maneuver"] = float(getattr(det_cfg, "t_min_maneuver_v8", 600.0))
         return policy
 
+
+class ExceptionsObjectsEvaluator:
+    """
+    Change-driven evaluate() for one simulation (the registry itself is shared).
+
+    Results are cached per RC and dropped only for RCs affected by an indicator
+    whose state changed since the previous call. Every call compares the given
+    states with the snapshot of the previous one, so a caller may reuse and
+    mutate one dict; with unchanged states (the usual case) this is one dict
+    comparison. Returned dicts are shared and must be treated as read-only.
+    """
+
+    def __init__(self, registry: ExceptionsObjectsRegistry) -> None:
+        self.registry = registry
+        self._states: Dict[str, int] = {}  # snapshot the cached results were computed for
+        self._results: Dict[str, Dict[str, bool]] = {}
+
+    def _sync(self, indicator_states: Mapping[str, int]) -> None:
+        prev = self._states
+        if prev == indicator_states:
+            return
+        self._states = dict(indicator_states)
+        for obj_id, rc_ids in self.registry.rcs_by_indicator.items():
+            if prev.get(obj_id, 0) == indicator_states.get(obj_id, 0):
+                continue
+            if rc_ids is None:
+                self._results.clear()
+                return
+            for rc_id in rc_ids:
+                self._results.pop(rc_id, None)
+
+    def evaluate(self, indicator_states: Mapping[str, int], rc_id: str) -> Dict[str, bool]:
+        self._sync(indicator_states)
+        result = self._results.get(rc_id)
+        if result is None:
+            result = self.registry.evaluate(self._states, rc_id)
+            self._results[rc_id] = result
+        return result
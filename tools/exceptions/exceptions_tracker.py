@@ -0,0 +1,356 @@
+from __future__ import annotations
+
+from bisect import bisect_left, insort
+from typing import TYPE_CHECKING, Dict, Iterable, List, Optional, Sequence, Set
+
+from core.flag_bits import LS_ANY, LZ_ANY, step_flag_bits
+from exceptions.exceptions_engine import (
+    ExceptionsConfig,
+    _auto_action_off,
+    _has_open_flag,
+    _is_dsp_mode,
+    apply_exceptions,
+    apply_exceptions_with_windows,
+)
+
+if TYPE_CHECKING:
+    from core.sim_core import ScenarioStep, TimelineStep
+
+
+_MU_ACTIVE_VALUES = (1, 4)
+_OCCUPIED_STATES = (6, 7, 8)
+
+
+class ExceptionsContextTracker:
+    """
+    Incremental equivalent of build_exception_context for one controlled RC.
+
+    Instead of rescanning the whole scenario/timeline history on every step,
+    the tracker keeps running clocks and, per signal of interest, the latest
+    end time of a step where it was seen (MU per RC, ctrl RC not occupied,
+    LZ/LS flags). A window check "was X seen in (t_now - T, t_now]" then
+    becomes a single comparison with t_start, so each step costs O(1)
+    amortized regardless of history length.
+
+    Step boundaries are accumulated in the same order as the full-history
+    scans (_mu_active_in_window / _occupied_continuously / _recent_flag),
+    including their early-break rule: a trailing run of zero-duration steps
+    is not visible to the window until a step with positive duration follows.
+
+    Negative step durations break the monotonic clock assumption; in that case
+    `incremental` turns False and the caller must use the full-history path.
+    """
+
+    def __init__(self, ctrl_rc_id: str) -> None:
+        self.ctrl_rc_id = ctrl_rc_id
+        self.incremental: bool = True
+
+        # Scenario clock (sum of ScenarioStep.t).
+        self._steps_count: int = 0
+        self._t_scenario: float = 0.0
+        self._current_step: Optional[ScenarioStep] = None
+        self._mu_last_end: Dict[str, float] = {}
+        self._unoccupied_last_end: Optional[float] = None
+        # Zero-duration steps after the last positive one (not yet visible).
+        self._pending_mu: Set[str] = set()
+        self._pending_unoccupied: bool = False
+
+        # Timeline clock (sum of TimelineStep.step_duration).
+        self._timeline_seen: int = 0
+        self._t_timeline: float = 0.0
+        self._lz_last_end: Optional[float] = None
+        self._ls_last_end: Optional[float] = None
+        self._last_prev_rc: Optional[str] = None
+        self._last_next_rc: Optional[str] = None
+        # Sorted TimelineStep.t of steps with an open LZ flag (same-time arbitration).
+        self._lz_open_times: List[float] = []
+
+    # --- Ingest ---
+
+    def push_step(self, step: ScenarioStep) -> None:
+        """Registers the scenario step of the current tick (already overlaid for this RC)."""
+        dt = float(step.t)
+        if dt < 0.0:
+            self.incremental = False
+
+        mu = getattr(step, "mu", None) or {}
+        mu_rc_ids = [rc_id for rc_id, val in mu.items() if int(val) in _MU_ACTIVE_VALUES]
+        unoccupied = int(step.rc_states.get(self.ctrl_rc_id, 0)) not in _OCCUPIED_STATES
+
+        t_end = self._t_scenario + dt
+        if self._steps_count == 0 or dt > 0.0:
+            # Zero-duration steps before this one become visible at their end (= our start).
+            t_start = self._t_scenario
+            for rc_id in self._pending_mu:
+                self._mark(self._mu_last_end, rc_id, t_start)
+            if self._pending_unoccupied:
+                self._unoccupied_last_end = self._max_opt(self._unoccupied_last_end, t_start)
+            self._pending_mu = set()
+            self._pending_unoccupied = False
+
+            for rc_id in mu_rc_ids:
+                self._mark(self._mu_last_end, rc_id, t_end)
+            if unoccupied:
+                self._unoccupied_last_end = self._max_opt(self._unoccupied_last_end, t_end)
+        else:
+            self._pending_mu.update(mu_rc_ids)
+            self._pending_unoccupied = self._pending_unoccupied or unoccupied
+
+        self._t_scenario = t_end
+        self._steps_count += 1
+        self._current_step = step
+
+    def observe_timeline(self, timeline_history: Sequence[TimelineStep]) -> None:
+        """
+        Ingests timeline steps appended since the previous call.
+
+        Steps are read lazily (on the next tick) so that in-place post-processing
+        of the last step (apply_exceptions) is already reflected in its flags.
+        """
+        for tl in timeline_history[self._timeline_seen:]:
+            self._t_timeline = self._t_timeline + float(tl.step_duration)
+            bits = step_flag_bits(tl)
+            if bits & LZ_ANY:
+                self._lz_last_end = self._max_opt(self._lz_last_end, self._t_timeline)
+            if bits & LS_ANY:
+                self._ls_last_end = self._max_opt(self._ls_last_end, self._t_timeline)
+            if _has_open_flag(bits, "llz_v"):
+                insort(self._lz_open_times, float(tl.t))
+            self._last_prev_rc = tl.effective_prev_rc
+            self._last_next_rc = tl.effective_next_rc
+        self._timeline_seen = len(timeline_history)
+
+    def drain_timeline(self, timeline_history: List[TimelineStep]) -> None:
+        """
+        observe_timeline + drops the ingested prefix from the list (bounded memory).
+        Only valid while `incremental`: the full-history fallback needs the whole list.
+        """
+        self.observe_timeline(timeline_history)
+        del timeline_history[:self._timeline_seen]
+        self._timeline_seen = 0
+
+    # --- Queries ---
+
+    def mu_active_in_window(self, rc_ids: Set[str], t_window: float) -> bool:
+        if not self._steps_count or t_window <= 0.0:
+            return False
+        t_start = max(0.0, self._t_scenario - t_window)
+        for rc_id in rc_ids:
+            t_end = self._mu_last_end.get(rc_id)
+            if t_end is not None and t_end > t_start:
+                return True
+        return False
+
+    def occupied_continuously(self, t_window: float) -> bool:
+        if not self._steps_count or t_window <= 0.0:
+            return False
+        t_now = self._t_scenario
+        t_start = max(0.0, t_now - t_window)
+        if self._unoccupied_last_end is not None and self._unoccupied_last_end > t_start:
+            return False
+        return (t_now - t_start) >= t_window
+
+    def recent_flag(self, prefix: str, t_window: float) -> bool:
+        if not self._timeline_seen or t_window <= 0.0:
+            return False
+        if prefix == "llz_v":
+            t_end = self._lz_last_end
+        elif prefix == "lls_":
+            t_end = self._ls_last_end
+        else:
+            raise ValueError(f"Unsupported flag prefix for incremental tracking: {prefix}")
+        t_start = max(0.0, self._t_timeline - t_window)
+        return t_end is not None and t_end > t_start
+
+    def opened_at_same_time(self, prefix: str, t_current: float, eps: float = 1e-9) -> bool:
+        if prefix != "llz_v":
+            raise ValueError(f"Unsupported flag prefix for incremental tracking: {prefix}")
+        times = self._lz_open_times
+        t_current = float(t_current)
+        # Candidates are checked with the same predicate as _opened_at_same_time.
+        i = bisect_left(times, t_current - 2.0 * eps)
+        while i < len(times) and times[i] <= t_current + 2.0 * eps:
+            if abs(times[i] - t_current) <= eps:
+                return True
+            i += 1
+        return False
+
+    def next_window_change(
+        self, cfg: ExceptionsConfig, timeline_history: Sequence[TimelineStep] = ()
+    ) -> Optional[float]:
+        """
+        Time until the nearest enabled exception window opens or closes while
+        inputs stay unchanged (None: no window pending).
+
+        timeline_history is the list passed to observe_timeline; steps not yet
+        ingested are only peeked at (their flags may still be post-processed),
+        which can only report more pending windows, never fewer. Used by the
+        event-driven runner, which does not coalesce steps while a window is pending.
+        """
+        if not self.incremental or self._pending_mu or self._pending_unoccupied:
+            return 0.0
+        out: List[float] = []
+        t_now = self._t_scenario
+
+        mu_windows = [w for on, w in ((cfg.enable_lz_exc_mu, cfg.t_mu), (cfg.enable_ls_exc_mu, cfg.t_ls_mu)) if on]
+        for t_end in self._mu_last_end.values():
+            out.extend(t_end + w - t_now for w in mu_windows)
+
+        t_tl = self._t_timeline
+        lz_end, ls_end = self._lz_last_end, self._ls_last_end
+        for tl in timeline_history[self._timeline_seen:]:
+            t_tl += float(tl.step_duration)
+            bits = step_flag_bits(tl)
+            if bits & LZ_ANY:
+                lz_end = t_tl
+            if bits & LS_ANY:
+                ls_end = t_tl
+        if cfg.enable_lz_exc_recent_ls and ls_end is not None:
+            out.append(ls_end + cfg.t_recent_ls - t_tl)
+        if cfg.enable_ls_exc_after_lz and lz_end is not None:
+            out.append(lz_end + cfg.t_ls_after_lz - t_tl)
+
+        # DSP: continuous occupation of the ctrl RC is counting towards the threshold
+        current = self._current_step
+        counting = (
+            current is not None
+            and _is_dsp_mode(current)
+            and _auto_action_off(current)
+            and (self._unoccupied_last_end is None or self._unoccupied_last_end < t_now)
+        )
+        if counting:
+            occupied_since = self._unoccupied_last_end or 0.0
+            for on, w in ((cfg.enable_lz_exc_dsp, cfg.t_min_maneuver_v8), (cfg.enable_ls_exc_dsp, cfg.t_ls_dsp)):
+                if on:
+                    out.append(occupied_since + w - t_now)
+
+        pending = [d for d in out if d > 0.0]
+        return min(pending) if pending else None
+
+    def build_context(self, cfg: ExceptionsConfig) -> Dict[str, bool]:
+        """Same keys and values as build_exception_context for the ingested history."""
+        current = self._current_step
+        adj = {self.ctrl_rc_id}
+        if self._timeline_seen:
+            if self._last_prev_rc:
+                adj.add(self._last_prev_rc)
+            if self._last_next_rc:
+                adj.add(self._last_next_rc)
+
+        lz_mu = cfg.enable_lz_exc_mu and self.mu_active_in_window(adj, cfg.t_mu)
+        lz_recent_ls = cfg.enable_lz_exc_recent_ls and self.recent_flag("lls_", cfg.t_recent_ls)
+        lz_dsp = (
+            cfg.enable_lz_exc_dsp
+            and current is not None
+            and _is_dsp_mode(current)
+            and _auto_action_off(current)
+            and self.occupied_continuously(cfg.t_min_maneuver_v8)
+        )
+
+        ls_mu = cfg.enable_ls_exc_mu and self.mu_active_in_window(adj, cfg.t_ls_mu)
+        ls_after_lz = cfg.enable_ls_exc_after_lz and self.recent_flag("llz_v", cfg.t_ls_after_lz)
+        ls_dsp = (
+            cfg.enable_ls_exc_dsp
+            and current is not None
+            and _is_dsp_mode(current)
+            and _auto_action_off(current)
+            and self.occupied_continuously(cfg.t_ls_dsp)
+        )
+
+        return {
+            "exc_lz_mu_active": bool(lz_mu),
+            "exc_lz_recent_ls": bool(lz_recent_ls),
+            "exc_lz_dsp_timeout": bool(lz_dsp),
+
+            "exc_ls_mu_active": bool(ls_mu),
+            "exc_ls_after_lz": bool(ls_after_lz),
+            "exc_ls_dsp_timeout": bool(ls_dsp),
+        }
+
+    # --- Helpers ---
+
+    @staticmethod
+    def _max_opt(current: Optional[float], value: float) -> float:
+        return value if current is None or value > current else current
+
+    @staticmethod
+    def _mark(table: Dict[str, float], key: str, value: float) -> None:
+        prev = table.get(key)
+        if prev is None or value > prev:
+            table[key] = value
+
+
+class ExceptionsPostProcessor:
+    """
+    Streaming replacement for the apply_exceptions post-pass in run_context.
+
+    Keeps one ExceptionsContextTracker per RC (running time, last seen MU/LZ/LS)
+    so each processed frame costs O(1) instead of rescanning the scenario and
+    timeline histories. Falls back to apply_exceptions over full histories
+    when a tracker cannot answer incrementally (negative durations).
+
+    keep_history=False drops the histories as they are ingested (streaming runs);
+    only valid when the scenario has no negative durations.
+    """
+
+    def __init__(self, ctrl_rc_ids: Iterable[str] = (), keep_history: bool = True) -> None:
+        self.keep_history = keep_history
+        self.scenario_history: List[ScenarioStep] = []
+        self.timeline_by_rc: Dict[str, List[TimelineStep]] = {}
+        self._current_step: Optional[ScenarioStep] = None
+        self._trackers: Dict[str, ExceptionsContextTracker] = {}
+        for rc_id in ctrl_rc_ids:
+            self._tracker(rc_id)
+
+    def push_step(self, step: ScenarioStep) -> None:
+        """Registers the raw scenario step of the current frame (before apply)."""
+        self._current_step = step
+        if self.keep_history:
+            self.scenario_history.append(step)
+        for tracker in self._trackers.values():
+            tracker.push_step(step)
+
+    def apply(self, rc_id: str, current: TimelineStep, cfg: ExceptionsConfig) -> TimelineStep:
+        """Same result as apply_exceptions with the histories accumulated so far."""
+        tracker = self._tracker(rc_id)
+        timeline_history = self.timeline_by_rc[rc_id]
+        if tracker.incremental:
+            if self.keep_history:
+                tracker.observe_timeline(timeline_history)
+            else:
+                tracker.drain_timeline(timeline_history)
+            out = apply_exceptions_with_windows(rc_id, current, self._current_step, tracker, cfg)
+        elif not self.keep_history:
+            raise RuntimeError("Negative step durations need keep_history=True")
+        else:
+            out = apply_exceptions(
+                ctrl_rc_id=rc_id,
+                current=current,
+                scenario_history=self.scenario_history,
+                timeline_history=timeline_history,
+                cfg=cfg,
+            )
+        timeline_history.append(out)
+        return out
+
+    def next_window_change(self, configs: Dict[str, ExceptionsConfig]) -> Optional[float]:
+        """Nearest pending exception window over the post-pass trackers (see the tracker method)."""
+        best: Optional[float] = None
+        for rc_id, tracker in self._trackers.items():
+            cfg = configs.get(rc_id)
+            if cfg is None:
+                continue
+            d = tracker.next_window_change(cfg, self.timeline_by_rc.get(rc_id, []))
+            if d is not None and (best is None or d < best):
+                best = d
+        return best
+
+    def _tracker(self, rc_id: str) -> ExceptionsContextTracker:
+        tracker = self._trackers.get(rc_id)
+        if tracker is None:
+            tracker = ExceptionsContextTracker(rc_id)
+            for step in self.scenario_history:
+                tracker.push_step(step)
+            self._trackers[rc_id] = tracker
+            self.timeline_by_rc.setdefault(rc_id, [])
+        return tracker
@@ -0,0 +1,244 @@
+# -*- coding: utf-8 -*-
+"""
+Кэш модели станции на процесс.
+
+load_station_from_config() + apply_switch_topology_rules дорогие и дают один и
+тот же результат для одной станции, поэтому StationModel строится один раз и
+разделяется между всеми SimulationContext (API-запросы, тесты).
+
+Снимок считается неизменяемым: контексты только читают model и общий шаблон
+топологии (TopologyTemplate: стрелки связей РЦ и кэш физических соседей);
+изменяемое состояние (TopologyState latches) каждый контекст создаёт сам.
+
+Ключ кэша: (станция, mtime файлов конфигурации станции). Константы
+конфигурации (NODES, RC_CAPABILITIES, ...) читаются при импорте и разобраны
+по модулям через from ... import, поэтому "горячей" перезагрузки нет: если
+файлы изменились после импорта, get_station_snapshot поднимает
+StationConfigChanged — нужен перезапуск процесса. Станции — пакеты
+конфигурации в _STATION_PACKAGES; неизвестная станция — ValueError.
+
+Модуль импортируется только как station.station_snapshot (tools/ в sys.path),
+в том числе из API: под другим именем он был бы вторым кэшем со своей моделью.
+
+Вместе с моделью строятся индексы светофоров по секциям (SignalIndex): выбор
+светофора между двумя РЦ — поиск в словаре вместо обхода signal_nodes, — и
+таблица битов РЦ для классов шага (rc_bits, см. core.step_classes).
+
+build_dependency_closure(): объекты станции, от которых зависит расчёт набора
+РЦ (сами РЦ, соседи по связям, стрелки связей, светофоры на их границах).
+Состояния остальных объектов на результат этих РЦ не влияют и могут быть
+отброшены до симуляции.
+"""
+
+import importlib
+from dataclasses import dataclass
+from pathlib import Path
+from threading import Lock
+from typing import Dict, FrozenSet, Iterable, Mapping, Optional, Tuple
+
+from core.step_classes import rc_bit_table
+from core.topology_manager import TopologyTemplate
+from station.station_model import StationModel
+
+
+DEFAULT_STATION = "default"
+
+# Станция -> пакет с её модулями конфигурации
+_STATION_PACKAGES: Dict[str, str] = {DEFAULT_STATION: "station"}
+_STATION_DIRS: Dict[str, Path] = {DEFAULT_STATION: Path(__file__).resolve().parent}
+
+# Модули, из констант которых строится StationModel (их mtime — часть ключа)
+_STATION_CONFIG_MODULES = (
+    "station_config",
+    "station_rc_sections",
+    "station_capabilities",
+    "station_signals_logic",
+    "station_switch_logic",
+    "station_switch_rules",
+    "station_model",
+)
+
+
+@dataclass(frozen=True)
+class SignalIndex:
+    """
+    Светофоры по секциям (prev_sec -> next_sec), первый по порядку signal_nodes.
+
+    pick() — тот же приоритет, что у полного обхода: точная пара, затем
+    совпадение по next_sec, затем по prev_sec.
+    """
+    by_pair: Dict[Tuple[str, str], str]
+    by_next: Dict[str, str]
+    by_prev: Dict[str, str]
+
+    def pick(self, prev_sec: Optional[str], next_sec: Optional[str]) -> Optional[str]:
+        if prev_sec and next_sec:
+            exact = self.by_pair.get((prev_sec, next_sec))
+            if exact:
+                return exact
+        by_next = self.by_next.get(next_sec) if next_sec else None
+        if by_next:
+            return by_next
+        return self.by_prev.get(prev_sec) if prev_sec else None
+
+
+def build_signal_index(model: StationModel) -> SignalIndex:
+    by_pair: Dict[Tuple[str, str], str] = {}
+    by_next: Dict[str, str] = {}
+    by_prev: Dict[str, str] = {}
+    for sig in model.signal_nodes.values():
+        by_pair.setdefault((sig.prev_sec, sig.next_sec), sig.signal_id)
+        by_next.setdefault(sig.next_sec, sig.signal_id)
+        by_prev.setdefault(sig.prev_sec, sig.signal_id)
+    return SignalIndex(by_pair=by_pair, by_next=by_next, by_prev=by_prev)
+
+
+@dataclass(frozen=True)
+class DependencyClosure:
+    """
+    Зависимости набора контролируемых РЦ (по ID).
+
+    rc_ids: сами РЦ и все соседи из prev_links/next_links (любое положение стрелок);
+    switch_ids: стрелки этих связей (выбор соседа и потеря контроля);
+    signal_ids: светофоры, у которых prev_sec или next_sec в rc_ids
+    (динамические sig_* в modes), плюс явно указанные в конфигурации.
+    """
+    rc_ids: FrozenSet[str]
+    switch_ids: FrozenSet[str]
+    signal_ids: FrozenSet[str]
+
+    def prune(
+        self,
+        rc_states: Dict[str, int],
+        switch_states: Dict[str, int],
+        signal_states: Dict[str, int],
+    ) -> Tuple[Dict[str, int], Dict[str, int], Dict[str, int]]:
+        """Состояния шага (по ID) только для объектов замыкания."""
+        return (
+            {k: v for k, v in rc_states.items() if k in self.rc_ids},
+            {k: v for k, v in switch_states.items() if k in self.switch_ids},
+            {k: v for k, v in signal_states.items() if k in self.signal_ids},
+        )
+
+
+def build_dependency_closure(
+    model: StationModel,
+    rc_ids: Iterable[str],
+    referenced_ids: Iterable[Optional[str]] = (),
+) -> DependencyClosure:
+    """
+    Замыкание зависимостей для rc_ids.
+
+    referenced_ids — ID объектов из конфигурации детекторов (prev/next РЦ,
+    sig_*): попадают в замыкание по типу (РЦ или светофор).
+    """
+    rcs = set()
+    switches = set()
+    for rc_id in rc_ids:
+        rcs.add(rc_id)
+        node = model.rc_nodes.get(rc_id)
+        if node is None:
+            continue
+        for target, sw_id, _req in list(node.prev_links) + list(node.next_links):
+            if target:
+                rcs.add(target)
+            if sw_id is not None:
+                switches.add(sw_id)
+
+    signals = set()
+    for ref in referenced_ids:
+        if not ref:
+            continue
+        if ref in model.rc_nodes:
+            rcs.add(ref)
+        elif ref in model.signal_nodes:
+            signals.add(ref)
+    for sig in model.signal_nodes.values():
+        if sig.prev_sec in rcs or sig.next_sec in rcs:
+            signals.add(sig.signal_id)
+
+    return DependencyClosure(
+        rc_ids=frozenset(rcs),
+        switch_ids=frozenset(switches),
+        signal_ids=frozenset(signals),
+    )
+
+
+@dataclass(frozen=True)
+class StationSnapshot:
+    """Разделяемая (только для чтения) модель станции и шаблон её топологии."""
+    key: Tuple
+    model: StationModel
+    signals: SignalIndex
+    topology: TopologyTemplate
+    # Биты РЦ в множествах StepClasses (core.step_classes), по ID РЦ модели
+    rc_bits: Mapping[str, int]
+
+
+class StationConfigChanged(RuntimeError):
+    """Файлы конфигурации станции изменились после импорта — нужен перезапуск."""
+
+
+_SNAPSHOTS: Dict[str, StationSnapshot] = {}
+_LOCK = Lock()
+
+
+def _station_package(station: str) -> str:
+    package = _STATION_PACKAGES.get(station)
+    if package is None:
+        raise ValueError(f"Unknown station: {station}")
+    return package
+
+
+def _config_mtimes(station: str) -> Tuple[int, ...]:
+    _station_package(station)
+    base = _STATION_DIRS[station]
+    out = []
+    for name in _STATION_CONFIG_MODULES:
+        try:
+            out.append((base / f"{name}.py").stat().st_mtime_ns)
+        except OSError:
+            out.append(0)
+    return tuple(out)
+
+
+# mtime файлов, из которых загружены модули конфигурации (по станциям)
+_LOADED_MTIMES: Dict[str, Tuple[int, ...]] = {DEFAULT_STATION: _config_mtimes(DEFAULT_STATION)}
+
+
+def _load_station_model(station: str, mtimes: Tuple[int, ...]) -> StationModel:
+    """StationModel станции из уже импортированных констант конфигурации."""
+    package = _station_package(station)
+    loaded = _LOADED_MTIMES.setdefault(station, mtimes)
+    if loaded != mtimes:
+        raise StationConfigChanged(
+            f"Station config of {station!r} changed on disk after import; restart the process"
+        )
+    station_model = importlib.import_module(f"{package}.station_model")
+    return station_model.load_station_from_config()
+
+
+def get_station_snapshot(station: str = DEFAULT_STATION) -> StationSnapshot:
+    """Возвращает снимок станции, построенный не более одного раза на ключ."""
+    key = (station, _config_mtimes(station))
+    snap = _SNAPSHOTS.get(station)
+    if snap is not None and snap.key == key:
+        return snap
+    with _LOCK:
+        snap = _SNAPSHOTS.get(station)
+        if snap is None or snap.key != key:
+            model = _load_station_model(station, key[1])
+            snap = StationSnapshot(
+                key=key,
+                model=model,
+                signals=build_signal_index(model),
+                topology=TopologyTemplate(model),
+                rc_bits=rc_bit_table(model.rc_nodes),
+            )
+            _SNAPSHOTS[station] = snap
+    return snap
+
+
+def clear_station_cache() -> None:
+    with _LOCK:
+        _SNAPSHOTS.clear()
@@ -1,4 +1,13 @@
-﻿from api_contract.api import get_metadata, run_simulation
+﻿import pytest
+
+from api_contract.api import build_simulation_context, get_metadata, iter_simulation, run_simulation
+from api_contract.api import _build_context
+from api_contract.api_adapter import normalize_run_output, timeline_step_to_dto
+from api_contract.api_schema import RunRequestDTO, RunResponseDTO, dto_to_dict
+from core.detectors_engine import DetectorsConfig
+from core.sim_core import ScenarioStep
+from api_contract import api_batch
+from api_contract.api_batch import run_simulation_batch, shutdown_batch_pool
 
 
 def test_api_run_simulation_single_rc_contract():
@@ -67,3 +76,129 @@ def test_api_metadata_contract():
     assert "llz_v10_open" in meta["flags"]
 
 
+
+
+def test_api_run_simulation_returns_trace_when_requested():
+    payload = {
+        "t_pk": 30.0,
+        "ctrl_rc_id": "108",
+        "detectors_config": {"ctrl_rc_id": "108", "prev_rc_name": "59", "next_rc_name": "83", "enable_lz1": True},
+        "scenario": [
+            {"t": 2.0, "rc_states": {"59": 6, "108": 6, "83": 3}, "switch_states": {"110": 3, "88": 3}},
+        ],
+    }
+    assert run_simulation(payload)["trace"] is None
+
+    payload["trace"] = {"detectors": ["v1"], "buffer_size": 100}
+    trace = run_simulation(payload)["trace"]
+    assert trace
+    assert {e["detector"] for e in trace} == {"v1"}
+
+    payload["trace"] = {"bogus": 1}
+    with pytest.raises(ValueError, match="bogus"):
+        run_simulation(payload)
+
+
+def _batch_payload(ctrl_rc_id: str, prev_rc: str, next_rc: str) -> dict:
+    return {
+        "t_pk": 30.0,
+        "ctrl_rc_id": ctrl_rc_id,
+        "detectors_config": {"ctrl_rc_id": ctrl_rc_id, "prev_rc_name": prev_rc, "next_rc_name": next_rc, "enable_lz1": True},
+        "scenario": [
+            {"t": 2.0, "rc_states": {prev_rc: 6, ctrl_rc_id: 3, next_rc: 3}, "switch_states": {"110": 3, "88": 3}},
+            {"t": 2.0, "rc_states": {prev_rc: 6, ctrl_rc_id: 6, next_rc: 3}, "switch_states": {"110": 3, "88": 3}},
+            {"t": 2.0, "rc_states": {prev_rc: 3, ctrl_rc_id: 6, next_rc: 3}, "switch_states": {"110": 3, "88": 3}},
+        ],
+    }
+
+
+def _batch_payloads() -> list:
+    bad = _batch_payload("108", "59", "83")
+    bad["scenario"] = [{"t": "x"}]
+    return [_batch_payload("108", "59", "83"), bad, _batch_payload("108", "47", "83")]
+
+
+def test_api_run_simulation_batch_serial_keeps_order_and_timing():
+    payloads = _batch_payloads()
+    resp = run_simulation_batch(payloads, max_workers=1)
+    assert resp["workers"] == 1
+    assert [r["index"] for r in resp["results"]] == [0, 1, 2]
+    assert [r["ok"] for r in resp["results"]] == [True, False, True]
+    assert resp["results"][1]["error"]
+    assert all(r["elapsed_ms"] >= 0.0 for r in resp["results"])
+    assert resp["results"][0]["result"] == run_simulation(payloads[0])
+    assert resp["results"][2]["result"] == run_simulation(payloads[2])
+
+
+def test_api_run_simulation_batch_pool_matches_serial(monkeypatch):
+    shutdown_batch_pool()
+    monkeypatch.setattr(api_batch, "_POOL_SIZE", 3)
+    payloads = _batch_payloads()
+    try:
+        resp = run_simulation_batch(payloads, max_workers=2)
+        pool = api_batch._POOL
+        assert pool is not None
+        resp3 = run_simulation_batch(payloads, max_workers=3)
+        assert api_batch._POOL is pool
+    finally:
+        shutdown_batch_pool()
+    assert resp["workers"] == 2
+    assert resp3["workers"] == 3
+    assert [r["result"] for r in resp3["results"]] == [r["result"] for r in resp["results"]]
+    serial = run_simulation_batch(payloads, max_workers=1)
+    assert [r["result"] for r in resp["results"]] == [r["result"] for r in serial["results"]]
+    assert [r["ok"] for r in resp["results"]] == [True, False, True]
+
+
+def test_api_run_simulation_columnar_response_matches_dto_path():
+    # The response is serialized straight from the columns; it must equal the DTO path.
+    single = _extras_payload()
+    multi = dict(single, detectors_config=None, ctrl_rc_id=None, detectors_configs={
+        "108": single["detectors_config"],
+        "59": {"ctrl_rc_id": "59", "prev_rc_name": "47", "next_rc_name": "108", "enable_lz1": True},
+    })
+    for payload in (single, multi):
+        ctx = _build_context(RunRequestDTO(**payload))
+        frames, timeline, mode, ctrl_rc_ids = normalize_run_output(ctx.run())
+        expected = dto_to_dict(RunResponseDTO(mode=mode, ctrl_rc_ids=ctrl_rc_ids, timeline=timeline, frames=frames))
+        assert run_simulation(payload) == expected
+
+
+def test_api_iter_simulation_matches_run_simulation():
+    payload = _batch_payload("108", "59", "83")
+    assert list(iter_simulation(payload)) == run_simulation(payload)["frames"]
+
+
+def _extras_payload() -> dict:
+    # MU, DSP, auto actions and indicators change along the scenario; MU/DSP exceptions are on.
+    payload = _batch_payload("108", "59", "83")
+    payload["detectors_config"].update(enable_lz_exc_mu=True, enable_ls_exc_mu=True, enable_lz_exc_dsp=True)
+    extras = [
+        {"mu": {"108": 1}, "dispatcher_control_state": 4, "auto_actions": {"nas": 1}, "indicator_states": {"ind": 1}},
+        {"mu": {}, "dispatcher_control_state": 4, "auto_actions": {"chas": 0}, "indicator_states": {"ind": 0}},
+        {"mu": {"108": 1}, "dispatcher_control_state": None, "auto_actions": {}, "indicator_states": {}},
+    ]
+    payload["scenario"] = [dict(step, t=t, **extra) for step in payload["scenario"] for t, extra in zip((2.0, 5.0, 3.0), extras)]
+    return payload
+
+
+def test_in_process_context_uses_steps_as_is_and_matches_contract():
+    payload = _extras_payload()
+    steps = [
+        ScenarioStep(t=s["t"], rc_states=s["rc_states"], switch_states=s["switch_states"],
+                     signal_states={}, modes={}, mu=s["mu"],
+                     dispatcher_control_state=s["dispatcher_control_state"],
+                     auto_actions=s["auto_actions"], indicator_states=s["indicator_states"])
+        for s in payload["scenario"]
+    ]
+    ctx = build_simulation_context(
+        steps, {"108": DetectorsConfig(**payload["detectors_config"])}, t_pk=payload["t_pk"]
+    )
+    frames = list(ctx.iter_frames())
+    assert ctx.scenario_steps[0] is steps[0]
+    contract = run_simulation(payload)["frames"]
+    assert [{rc: dto_to_dict(timeline_step_to_dto(st)) for rc, st in f.items()} for f in frames] == contract
+    # The contract carries mu / auto actions / dispatcher control instead of dropping them.
+    assert {f["108"]["mu_state"] for f in contract} == {None, 1}
+    assert {f["108"]["dsp_state"] for f in contract} >= {4}
+    assert {f["108"]["nas_state"] for f in contract} >= {1}
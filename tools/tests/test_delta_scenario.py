@@ -0,0 +1,69 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from core.delta_scenario import RC, SIGNAL, STATE_MAX, SWITCH, DeltaScenario
+from core.detectors_engine import DetectorsConfig
+from core.sim_core import ScenarioStep, SimulationConfig, SimulationContext
+from core.sim_types import LazyScenario
+
+OBJECTS = [(RC, "59"), (RC, "108"), (RC, "83"), (SWITCH, "110"), (SWITCH, "88"), (SIGNAL, "114")]
+
+
+def _scenarios(n, seed):
+    rng = random.Random(seed)
+    state = [3, 3, 3, 1, 1, 15]
+    delta = DeltaScenario(OBJECTS, state)
+    full = []
+    for _ in range(n):
+        changes = [(i, rng.choice((3, 6))) for i in rng.sample(range(3), rng.randint(0, 2))]
+        if rng.random() < 0.1:
+            changes.append((5, rng.choice((3, 15))))
+        for i, v in changes:
+            state[i] = v
+        t = rng.choice((1.0, 2.0))
+        delta.append(t, changes)
+        by_kind = {RC: {}, SWITCH: {}, SIGNAL: {}}
+        for (kind, obj_id), v in zip(OBJECTS, state):
+            by_kind[kind][obj_id] = v
+        full.append(ScenarioStep(t=t, rc_states=by_kind[RC], switch_states=by_kind[SWITCH],
+                                 signal_states=by_kind[SIGNAL], modes={}))
+    return delta, full
+
+
+def test_delta_scenario_expands_lazily_and_shares_unchanged_dicts():
+    delta, full = _scenarios(50, 23)
+    steps = list(delta)
+    assert steps == full
+    assert delta[7] == full[7] and delta[-1] == full[-1]
+    assert all(a.switch_states is b.switch_states for a, b in zip(steps, steps[1:]))
+    delta.append(1.0, [(1, 7)], mu={"108": 1})
+    assert delta[-1].rc_states["108"] == 7 and delta[-1].mu == {"108": 1}
+
+
+def test_simulation_on_delta_scenario_matches_full_steps():
+    delta, full = _scenarios(120, 5)
+
+    def run(scenario):
+        cfg = SimulationConfig(t_pk=30.0, detectors_configs={"108": DetectorsConfig(
+            ctrl_rc_id="108", prev_rc_name="59", ctrl_rc_name="108", next_rc_name="83", enable_lz1=True,
+        )})
+        ctx = SimulationContext(config=cfg, scenario=scenario, ctrl_rc_ids=["108"])
+        return ctx, [(f["108"].flags, f["108"].lz_variant) for f in ctx.iter_frames()]
+
+    assert isinstance(delta, LazyScenario) and not isinstance(full, LazyScenario)
+    ctx, got = run(delta)
+    assert ctx.scenario_steps is delta
+    assert got == run(full)[1]
+    assert any(flags for flags, _v in got)
+
+
+def test_delta_scenario_rejects_states_outside_int32():
+    with pytest.raises(ValueError):
+        DeltaScenario(OBJECTS, [3, 3, 3, 1, 1, 2 ** 40])
+    delta = DeltaScenario(OBJECTS, [3, 3, 3, 1, 1, STATE_MAX])
+    with pytest.raises(ValueError):
+        delta.append(1.0, [(1, 6), (0, STATE_MAX + 1)])
+    delta.append(1.0, [(0, 6)])
+    assert len(delta) == 1 and delta[0].rc_states["108"] == 3
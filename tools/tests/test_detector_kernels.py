@@ -0,0 +1,117 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+from core import phase_trace
+from core.detectors import kernels
+from core.detectors.phase_exceptions import iter_base_detectors_with_key
+from core.detectors.registry import DETECTOR_SPECS
+from core.detectors_engine import DetectorsConfig, init_detectors_engine, update_detectors
+
+
+@pytest.fixture(autouse=True)
+def _parity_check(monkeypatch):
+    # Только в этом модуле: каждый вызов ядра сверяется с BaseDetector.
+    monkeypatch.setattr(kernels, "PARITY_CHECK", True)
+
+
+def _all_enabled_cfg(**extra):
+    return DetectorsConfig(
+        ctrl_rc_id="108",
+        prev_rc_name="59",
+        ctrl_rc_name="108",
+        next_rc_name="83",
+        **{s.enable_attr: True for s in DETECTOR_SPECS},
+        **extra,
+    )
+
+
+def test_every_variant_gets_an_inspectable_kernel():
+    state = init_detectors_engine(_all_enabled_cfg(), ["59", "108", "83"])
+    dets = list(iter_base_detectors_with_key(state))
+    assert dets
+    for _key, det in dets:
+        src = kernels.kernel_source(det)
+        assert src is not None and "def update(det, step, dt):" in src
+        assert det._kernel.filename.startswith("<detector-kernel:")
+
+
+def test_kernels_match_interpreter_on_random_steps():
+    rng = random.Random(14)
+    cfg = _all_enabled_cfg(enable_lz_exc_mu=True, enable_ls_exc_mu=True)
+    state = init_detectors_engine(cfg, ["59", "108", "83"])
+    codes = (0, 3, 4, 6, 7)
+    for i in range(400):
+        prev = rng.choice(("59", None))
+        nxt = rng.choice(("83", None))
+        modes = {
+            "prev_control_ok": rng.random() > 0.1,
+            "next_control_ok": rng.random() > 0.1,
+            "prev_nc": prev is None and rng.random() > 0.5,
+            "next_nc": nxt is None and rng.random() > 0.5,
+            "exc_lz_mu_active": rng.random() > 0.95,
+            "exc_ls_mu_active": rng.random() > 0.95,
+        }
+        state, _res = update_detectors(
+            det_state=state,
+            t=float(i),
+            dt=rng.choice((0.5, 1.0, 3.0, 7.0)),
+            rc_states={"59": rng.choice(codes), "108": rng.choice(codes), "83": rng.choice(codes)},
+            switch_states={},
+            signal_states={},
+            topology_info={"ctrl_rc_id": "108", "effective_prev_rc": prev, "effective_next_rc": nxt},
+            cfg=cfg,
+            modes=modes,
+        )
+
+
+def test_disabled_compiler_leaves_interpreter(monkeypatch):
+    monkeypatch.setattr(kernels, "ENABLED", False)
+    state = init_detectors_engine(_all_enabled_cfg(), ["59", "108", "83"])
+    assert all(det._kernel is None for _key, det in iter_base_detectors_with_key(state))
+
+
+def _first_detector(state):
+    return next(det for _key, det in iter_base_detectors_with_key(state))
+
+
+def _counting_kernel(det):
+    calls = []
+    kernel = det._kernel
+
+    def update(d, step, dt):
+        calls.append(dt)
+        return kernel.update(d, step, dt)
+
+    det._kernel = kernel._replace(update=update)
+    return calls
+
+
+def test_tracing_elsewhere_keeps_kernels(monkeypatch):
+    det = _first_detector(init_detectors_engine(_all_enabled_cfg(), ["59", "108", "83"]))
+    calls = _counting_kernel(det)
+    step = type("Step", (), {"rc_states": {"108": 3}, "modes": {}, "signal_states": {}})()
+    # Трассировка в другом потоке: глобальный ENABLED поднят, у этого контекста трассировщика нет
+    monkeypatch.setattr(phase_trace, "ENABLED", True)
+    det.update(step, 1.0)
+    assert calls == [1.0]
+    tracer = phase_trace.PhaseTracer()
+    with phase_trace.tracing(tracer):
+        det.update(step, 1.0)
+    assert calls == [1.0]
+
+
+def test_parity_mismatch_raises_explicit_error():
+    det = _first_detector(init_detectors_engine(_all_enabled_cfg(), ["59", "108", "83"]))
+    inner = kernels.compile_detector(det)
+
+    def broken(d, step, dt):
+        got = inner.update(d, step, dt)
+        d.timer += 1.0
+        return got
+
+    det._kernel = kernels._with_parity_check(inner._replace(update=broken))
+    step = type("Step", (), {"rc_states": {"108": 3}, "modes": {}, "signal_states": {}})()
+    with pytest.raises(kernels.KernelMismatch):
+        det.update(step, 1.0)
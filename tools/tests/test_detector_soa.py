@@ -0,0 +1,175 @@
+# -*- coding: utf-8 -*-
+import random
+
+import pytest
+
+np = pytest.importorskip("numpy")
+
+from core.detectors.kernels import _snapshot
+from core.detectors.phase_exceptions import iter_base_detectors_with_key
+from core.detectors.registry import DETECTOR_SPECS
+from core.detectors.soa import SoADetectorEngine, detector_step
+from core.detectors_engine import DetectorsConfig, init_detectors_engine, update_detectors
+
+# Три РЦ подряд: 59 - 108 - 83 - 47; у каждой свой набор детекторов.
+CHAIN = {"108": ("59", "83"), "83": ("108", "47"), "59": (None, "108")}
+
+
+def _cfg(ctrl, prev, nxt):
+    return DetectorsConfig(
+        ctrl_rc_id=ctrl,
+        prev_rc_name=prev,
+        ctrl_rc_name=ctrl,
+        next_rc_name=nxt,
+        enable_lz_exc_mu=True,
+        **{s.enable_attr: True for s in DETECTOR_SPECS},
+    )
+
+
+def _pair():
+    cfgs = {rc: _cfg(rc, *CHAIN[rc]) for rc in CHAIN}
+    ids = ["59", "108", "83", "47"]
+    ref = {rc: init_detectors_engine(cfgs[rc], ids) for rc in CHAIN}
+    soa = {rc: init_detectors_engine(cfgs[rc], ids) for rc in CHAIN}
+    return cfgs, ref, soa
+
+
+def test_soa_engine_matches_update_detectors():
+    rng = random.Random(15)
+    cfgs, ref, soa_states = _pair()
+    engine = SoADetectorEngine(soa_states)
+    assert engine.n_rows and any(u.rows is None for u in engine.units)
+    codes = (0, 3, 4, 6, 7, 8)
+    for i in range(300):
+        rc_states = {rc: rng.choice(codes) for rc in ("59", "108", "83", "47")}
+        dt = rng.choice((0.5, 1.0, 3.0, 7.0))
+        steps, want = {}, {}
+        for rc, (prev, nxt) in CHAIN.items():
+            topo = {
+                "effective_prev_rc": prev if rng.random() > 0.1 else None,
+                "effective_next_rc": nxt if rng.random() > 0.1 else None,
+            }
+            modes = {
+                "prev_control_ok": rng.random() > 0.1,
+                "next_control_ok": rng.random() > 0.1,
+                "prev_nc": topo["effective_prev_rc"] is None and rng.random() > 0.5,
+                "next_nc": topo["effective_next_rc"] is None and rng.random() > 0.5,
+                "exc_lz_mu_active": rng.random() > 0.95,
+            }
+            _, want[rc] = update_detectors(
+                ref[rc], float(i), dt, rc_states, {}, {}, topo, cfgs[rc], modes
+            )
+            steps[rc] = detector_step(soa_states[rc], cfgs[rc], rc_states, {}, topo, modes)
+        got = engine.advance(steps, dt)
+        assert got == want, i
+        if i % 25 == 0:
+            engine.write_back()
+            for rc in CHAIN:
+                a = [_snapshot(d) for _k, d in iter_base_detectors_with_key(ref[rc])]
+                b = [_snapshot(d) for _k, d in iter_base_detectors_with_key(soa_states[rc])]
+                assert a == b, (i, rc)
+
+
+def test_write_back_then_load_round_trips():
+    _cfgs, _ref, soa_states = _pair()
+    engine = SoADetectorEngine(soa_states)
+    engine.timer[:] = 1.5
+    engine.active[0] = True
+    engine.write_back()
+    engine.timer[:] = 0.0
+    engine.load()
+    assert (engine.timer == 1.5).all() and engine.active[0]
+
+
+def _ctx_dump(detector_engine, cfg_fn, t_pk, steps, ctrl_ids, **extra):
+    import dataclasses
+    import json
+
+    from core.sim_core import SimulationConfig, SimulationContext
+    from tests.test_exceptions_tracker import _frames, _with_exceptions
+
+    configs = {cid: _with_exceptions(cfg_fn(cid)) for cid in ctrl_ids}
+    cfg = SimulationConfig(t_pk=t_pk, detectors_configs=configs, detector_engine=detector_engine, **extra)
+    ctx = SimulationContext(config=cfg, scenario=steps, ctrl_rc_ids=list(ctrl_ids))
+    assert (ctx.soa_engine is not None) == (detector_engine == "soa")
+    frames = _frames(ctx.run())
+    return [json.dumps({rc: dataclasses.asdict(tl) for rc, tl in f.items()}, sort_keys=True) for f in frames]
+
+
+def _first_mismatch(got, want):
+    """Номер первого различающегося кадра (None — совпадают); без огромного diff в отчёте."""
+    if len(got) != len(want):
+        return min(len(got), len(want))
+    return next((i for i, (a, b) in enumerate(zip(got, want)) if a != b), None)
+
+
+@pytest.mark.parametrize("event_driven", [False, True])
+def test_context_soa_engine_matches_objects(event_driven):
+    from tests import test_user_exact_grouped_vs_1s_compare as exact_case
+    from tests import test_user_multivariant_grouped_vs_1s as multi_case
+    from tests.test_exceptions_tracker import _with_mu
+
+    ctrl_ids = ["108", "104", "59", "83", "47"]
+    cases = [
+        (exact_case._config, 30.0, exact_case._grouped_steps()),
+        (exact_case._config, 30.0, exact_case._expand_to_1s(exact_case._grouped_steps())),
+        (multi_case._make_cfg, 3.0, multi_case._base_steps_grouped()),
+    ]
+    for cfg_fn, t_pk, steps in cases:
+        steps = _with_mu(steps, "59")
+        want = _ctx_dump("objects", cfg_fn, t_pk, steps, ctrl_ids, event_driven=event_driven)
+        assert _first_mismatch(_ctx_dump("soa", cfg_fn, t_pk, steps, ctrl_ids, event_driven=event_driven), want) is None
+
+
+def test_context_soa_engine_matches_objects_on_random_station_run(tmp_path):
+    # Вся станция, случайные занятости/стрелки, шаги разной длины (подшаги по T_PK),
+    # МУ и ДСП-гейт со сбросом детекторов (перезагрузка строк движка).
+    import json
+
+    from core.sim_core import ScenarioStep
+    from station.station_snapshot import get_station_snapshot
+
+    policy = tmp_path / "dsp_policy.json"
+    policy.write_text(json.dumps({
+        "version": 1,
+        "dsp_policy": {"default": {
+            "enabled": True, "mode": "detector_global", "count_scope": "always",
+            "variants": [1, 2, 8], "t_maneuver": 3.0,
+        }},
+        "objects": [{"id": "dsp_obj", "kind": "DSP", "target_rc_ids": [], "active_states": [6]}],
+    }), encoding="utf-8")
+    model = get_station_snapshot().model
+    rc_ids = sorted(model.rc_nodes)
+
+    def cfg_fn(rc):
+        node = model.rc_nodes[rc]
+        prev = node.prev_links[0][0] if node.prev_links else None
+        nxt = node.next_links[0][0] if node.next_links else None
+        return _cfg(rc, prev, nxt)
+
+    rng = random.Random(151)
+    steps = [
+        ScenarioStep(
+            t=rng.choice((1.0, 1.0, 2.0, 5.0)),
+            rc_states={rc: rng.choice((3, 3, 4, 6, 7, 8)) for rc in rc_ids},
+            switch_states={sw: rng.choice((1, 3, 9)) for sw in model.switches},
+            signal_states={},
+            modes={},
+            mu={rc_ids[0]: 1} if rng.random() < 0.05 else {},
+            auto_actions={"nas": 0},
+            indicator_states={"dsp_obj": 6 if rng.random() < 0.5 else 0},
+        )
+        for _ in range(150)
+    ]
+    extra = {"exceptions_objects_path": str(policy)}
+    want = _ctx_dump("objects", cfg_fn, 3.0, steps, rc_ids, **extra)
+    assert any("dsp_detector_gate" in frame for frame in want)
+    assert _first_mismatch(_ctx_dump("soa", cfg_fn, 3.0, steps, rc_ids, **extra), want) is None
+
+
+def test_context_rejects_unknown_detector_engine():
+    from core.sim_core import SimulationConfig, SimulationContext
+
+    cfg = SimulationConfig(t_pk=30.0, detectors_configs={"108": _cfg("108", "59", "83")}, detector_engine="simd")
+    with pytest.raises(ValueError):
+        SimulationContext(config=cfg, scenario=[], ctrl_rc_ids=["108"])
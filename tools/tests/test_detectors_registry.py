@@ -0,0 +1,50 @@
+# -*- coding: utf-8 -*-
+import dataclasses
+
+from core.detectors.registry import DETECTOR_SPECS, enabled_detectors
+from core.detectors_engine import DetectorsConfig, DetectorsState, init_detectors_engine, update_detectors
+
+
+def test_registry_covers_every_enable_flag():
+    enable_flags = {f.name for f in dataclasses.fields(DetectorsConfig) if f.name.startswith("enable_l") and "_exc_" not in f.name}
+    assert {s.enable_attr for s in DETECTOR_SPECS} == enable_flags
+    assert len({s.key for s in DETECTOR_SPECS}) == len(DETECTOR_SPECS)
+
+
+def test_only_enabled_detectors_are_built_and_updated():
+    cfg = DetectorsConfig(
+        ctrl_rc_id="108",
+        prev_rc_name="59",
+        ctrl_rc_name="108",
+        next_rc_name="83",
+        enable_lz1=True,
+        enable_ls9=True,
+        **{s.enable_attr: False for s in DETECTOR_SPECS if s.key not in ("v1", "ls9")},
+    )
+    state = init_detectors_engine(cfg, ["59", "108", "83"])
+    assert [spec.key for spec, _ in state.enabled] == ["v1", "ls9"]
+    assert all(getattr(state, s.key) is None for s in DETECTOR_SPECS if s.key not in ("v1", "ls9"))
+
+    topology = {"ctrl_rc_id": "108", "effective_prev_rc": "59", "effective_next_rc": "83"}
+    opened_at = None
+    for i in range(12):
+        rc_states = {"59": 3, "108": 3 if i < 4 else 6, "83": 3}
+        state, res = update_detectors(
+            det_state=state,
+            t=float(i),
+            dt=1.0,
+            rc_states=rc_states,
+            switch_states={},
+            signal_states={},
+            topology_info=topology,
+            cfg=cfg,
+            modes={},
+        )
+        if res.lz1_open:
+            opened_at = i
+            assert res.opened and res.bits
+    assert opened_at is not None
+
+
+def test_empty_state_builds_empty_enabled_list():
+    assert enabled_detectors(DetectorsState()) == ()
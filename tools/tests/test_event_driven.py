@@ -0,0 +1,135 @@
+# -*- coding: utf-8 -*-
+import dataclasses
+import random
+
+import pytest
+
+from core import sim_step_runner
+from core.sim_core import ScenarioStep, SimulationConfig, SimulationContext
+from core.sim_runner import split_input_runs
+from tests import test_user_exact_grouped_vs_1s_compare as exact_case
+from tests import test_user_multivariant_grouped_vs_1s as multi_case
+
+
+def _run(cfg_fn, t_pk, steps, ctrl_ids, event_driven):
+    cfg = SimulationConfig(
+        t_pk=t_pk,
+        detectors_configs={cid: cfg_fn(cid) for cid in ctrl_ids},
+        event_driven=event_driven,
+    )
+    return list(SimulationContext(config=cfg, scenario=steps, ctrl_rc_ids=ctrl_ids).run())
+
+
+def _count_evaluations(monkeypatch, fn):
+    calls = {"n": 0}
+    orig = sim_step_runner.update_detectors
+
+    def counting(**kw):
+        calls["n"] += 1
+        return orig(**kw)
+
+    monkeypatch.setattr(sim_step_runner, "update_detectors", counting)
+    out = fn()
+    monkeypatch.setattr(sim_step_runner, "update_detectors", orig)
+    return out, calls["n"]
+
+
+def test_split_input_runs_groups_identical_inputs_only():
+    a = ScenarioStep(t=1.0, rc_states={"108": 3}, switch_states={}, signal_states={}, modes={})
+    b = dataclasses.replace(a, rc_states={"108": 6})
+    zero = dataclasses.replace(a, t=0.0)
+    runs = list(split_input_runs([a, a, a, a, b, b, zero, a, a]))
+    # Zero-duration steps are runs of their own; sample durations are kept for cutting.
+    assert [(head.rc_states["108"], durations) for head, durations in runs] == [
+        (3, [1.0, 1.0, 1.0, 1.0]), (6, [1.0, 1.0]), (3, [0.0]), (3, [1.0, 1.0]),
+    ]
+    assert list(split_input_runs([])) == []
+
+
+def test_event_driven_matches_1s_open_close_events():
+    ctrl_ids = [exact_case.RC_1P, exact_case.RC_3P]
+    steps = exact_case._expand_to_1s(exact_case._grouped_steps())
+    serial = _run(exact_case._config, 30.0, steps, ctrl_ids, event_driven=False)
+    event = _run(exact_case._config, 30.0, steps, ctrl_ids, event_driven=True)
+    assert len(event) < len(serial)
+    assert set(exact_case._events(event, True)) == set(exact_case._events(serial, True))
+
+    steps = multi_case._expand_to_1s(multi_case._base_steps_grouped())
+    serial = _run(multi_case._make_cfg, 3.0, steps, ctrl_ids, event_driven=False)
+    event = _run(multi_case._make_cfg, 3.0, steps, ctrl_ids, event_driven=True)
+    assert multi_case._collect_open_close_events(event) == multi_case._collect_open_close_events(serial)
+
+
+def test_event_driven_skips_quiet_periods(monkeypatch):
+    ctrl_ids = [exact_case.RC_1P, exact_case.RC_3P]
+    quiet = exact_case._mk_step(300.0, {})
+    steps = exact_case._expand_to_1s([quiet] + exact_case._grouped_steps() + [quiet])
+
+    serial, n_serial = _count_evaluations(
+        monkeypatch, lambda: _run(exact_case._config, 30.0, steps, ctrl_ids, event_driven=False)
+    )
+    event, n_event = _count_evaluations(
+        monkeypatch, lambda: _run(exact_case._config, 30.0, steps, ctrl_ids, event_driven=True)
+    )
+    assert n_event * 10 <= n_serial
+    assert set(exact_case._events(event, True)) == set(exact_case._events(serial, True))
+
+
+_RANDOM_RCS = ("59", "108", "83", "47", "104", "86", "98")
+_RANDOM_CTRL = [exact_case.RC_1P, exact_case.RC_3P]
+
+
+def _random_case(seed: int, exceptions: bool):
+    rng = random.Random(seed)
+    timers = {}
+
+    def cfg_fn(ctrl_rc_id):
+        cfg = multi_case._make_cfg(ctrl_rc_id)
+        for f in dataclasses.fields(cfg):
+            if f.name.startswith(("ts0", "tlz", "tkon", "t_")) and isinstance(getattr(cfg, f.name), float):
+                setattr(cfg, f.name, timers.setdefault(f.name, float(rng.randint(2, 12))))
+            if f.name.startswith(("enable_lz_exc", "enable_ls_exc")):
+                setattr(cfg, f.name, exceptions)
+        return cfg
+
+    steps = []
+    for _ in range(8):
+        base = ScenarioStep(
+            t=1.0,
+            rc_states={rc: rng.choice([3, 3, 6, 6, 4, 7]) for rc in _RANDOM_RCS},
+            switch_states={sw: rng.choice([3, 3, 9, 1]) for sw in ("87", "88", "110")},
+            signal_states={},
+            modes={},
+            mu={rc: 1 for rc in _RANDOM_RCS if exceptions and rng.random() < 0.15},
+            dispatcher_control_state=rng.choice([None, 4]) if exceptions else None,
+            auto_actions={"nas": rng.choice([0, 1])} if exceptions and rng.random() < 0.5 else {},
+        )
+        steps += [dataclasses.replace(base) for _ in range(rng.randint(1, 40))]
+    return cfg_fn, steps
+
+
+def _all_events(frames):
+    # Transitions (_open/_closed) belong to the frame start; state flags
+    # (suppression, exceptions) hold for the whole frame, so expand them per second.
+    events = set()
+    for frame in frames:
+        for rc_id, step in frame.items():
+            t0 = float(step.t)
+            span = max(1, int(round(float(step.step_duration or 1.0))))
+            for flag in step.flags:
+                if flag.endswith(("_open", "_closed")):
+                    events.add((rc_id, round(t0, 6), flag))
+                elif flag.startswith(("lz_suppressed", "ls_suppressed", "exc_")):
+                    events.update((rc_id, round(t0 + k, 6), flag) for k in range(span))
+    return events
+
+
+@pytest.mark.parametrize("exceptions", [False, True])
+def test_event_driven_matches_1s_on_random_scenarios(exceptions):
+    # Random 8-segment scenarios, all detectors on, random timers (with MU/DSP/recent-LS
+    # exception windows when enabled): event-driven events must equal 1 s stepping.
+    for seed in range(30):
+        cfg_fn, steps = _random_case(seed, exceptions)
+        serial = _run(cfg_fn, 3.0, steps, _RANDOM_CTRL, event_driven=False)
+        event = _run(cfg_fn, 3.0, steps, _RANDOM_CTRL, event_driven=True)
+        assert _all_events(event) == _all_events(serial), f"seed={seed}"
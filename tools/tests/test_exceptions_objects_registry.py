@@ -2,7 +2,7 @@
 import json
 from pathlib import Path
 
-from exceptions.exceptions_objects_registry import ExceptionsObjectsRegistry
+from exceptions.exceptions_objects_registry import ExceptionsObjectsEvaluator, ExceptionsObjectsRegistry
 
 
 def test_registry_load_and_evaluate():
@@ -61,3 +61,59 @@ def test_registry_default_active_state_is_6():
     finally:
         p.unlink(missing_ok=True)
 
+
+
+def test_registry_load_cached_reuses_until_file_changes():
+    p = Path("tools/_test_exceptions_objects_registry_cached.json")
+    p.write_text(json.dumps({"objects": [{"id": "mu_3", "kind": "MU", "target_rc_ids": ["108"]}]}), encoding="utf-8")
+    try:
+        reg1 = ExceptionsObjectsRegistry.load_cached(str(p))
+        reg2 = ExceptionsObjectsRegistry.load_cached(str(p))
+        assert reg1 is reg2
+
+        p.write_text(
+            json.dumps({"objects": [
+                {"id": "mu_3", "kind": "MU", "target_rc_ids": ["108"]},
+                {"id": "dsp_3", "kind": "DSP", "target_rc_ids": []},
+            ]}),
+            encoding="utf-8",
+        )
+        reg3 = ExceptionsObjectsRegistry.load_cached(str(p))
+        assert reg3 is not reg1
+        assert len(reg3.objects) == 2
+    finally:
+        p.unlink(missing_ok=True)
+
+    assert ExceptionsObjectsRegistry.load_cached(str(p)).objects == []
+
+
+def test_evaluator_recomputes_only_rcs_of_changed_indicators():
+    p = Path("tools/_test_exceptions_objects_registry_evaluator.json")
+    p.write_text(json.dumps({"objects": [
+        {"id": "mu_a", "kind": "MU", "target_rc_ids": ["108"], "active_states": [6]},
+        {"id": "nas_b", "kind": "NAS", "target_rc_ids": ["59", "108"], "active_states": [6]},
+        {"id": "dsp_c", "kind": "DSP", "target_rc_ids": [], "active_states": [6]},
+    ]}), encoding="utf-8")
+    try:
+        reg = ExceptionsObjectsRegistry.load(str(p))
+        assert [o.obj_id for o in reg.by_rc["108"]] == ["mu_a", "nas_b"]
+        assert reg.rcs_by_indicator["dsp_c"] is None
+
+        ev = ExceptionsObjectsEvaluator(reg)
+        r108 = ev.evaluate({"mu_a": 6}, "108")
+        r59 = ev.evaluate({"mu_a": 6}, "59")
+        assert r108["mu_active"] and not r59["mu_active"]
+        # Те же состояния новым словарём — результаты из кэша
+        assert ev.evaluate({"mu_a": 6, "unrelated": 1}, "108") is r108
+        # mu_a влияет только на 108
+        assert ev.evaluate({"mu_a": 3}, "59") is r59
+        assert ev.evaluate({"mu_a": 3}, "108") == reg.evaluate({"mu_a": 3}, "108")
+        # DSP — на все РЦ
+        assert ev.evaluate({"mu_a": 3, "dsp_c": 6}, "59")["dsp_active"] is True
+        # Тот же словарь, изменённый на месте, — результат пересчитан
+        states = {"mu_a": 6}
+        assert ev.evaluate(states, "108")["mu_active"] is True
+        states["mu_a"] = 3
+        assert ev.evaluate(states, "108")["mu_active"] is False
+    finally:
+        p.unlink(missing_ok=True)
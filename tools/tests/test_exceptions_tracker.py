@@ -0,0 +1,227 @@
+# -*- coding: utf-8 -*-
+import dataclasses
+import random
+from typing import Dict, List
+
+from exceptions.exceptions_engine import (
+    ExceptionsConfig,
+    apply_exceptions,
+    build_exception_context,
+    make_exceptions_config,
+)
+from exceptions.exceptions_tracker import ExceptionsContextTracker
+from core.sim_core import ScenarioStep, SimulationConfig, SimulationContext, TimelineStep
+from core.sim_result import SingleResultWrapper
+from core.sim_runner import run_context
+from tests import test_user_exact_grouped_vs_1s_compare as exact_case
+from tests import test_user_multivariant_grouped_vs_1s as multi_case
+from tests.test_regression_payload_1p_ls9 import _build_user_like_context
+
+
+_RC_IDS = ["108", "59", "83", "47"]
+_DURATIONS = [0.0, 0.5, 1.0, 1.0, 2.0, 3.5, 7.0]
+
+
+def _all_enabled_cfg(**kw) -> ExceptionsConfig:
+    base = dict(
+        enable_lz_exc_mu=True,
+        enable_lz_exc_recent_ls=True,
+        enable_lz_exc_dsp=True,
+        enable_ls_exc_mu=True,
+        enable_ls_exc_after_lz=True,
+        enable_ls_exc_dsp=True,
+        t_mu=5.0,
+        t_recent_ls=6.0,
+        t_min_maneuver_v8=8.0,
+        t_ls_mu=3.0,
+        t_ls_after_lz=4.0,
+        t_ls_dsp=10.0,
+    )
+    base.update(kw)
+    return ExceptionsConfig(**base)
+
+
+def _random_scenario_step(rnd: random.Random) -> ScenarioStep:
+    dsp = rnd.choice([None, 4, 4, 1])
+    mu = {rc: rnd.choice([1, 4, 2]) for rc in _RC_IDS if rnd.random() < 0.15}
+    return ScenarioStep(
+        t=rnd.choice(_DURATIONS),
+        rc_states={rc: rnd.choice([3, 6, 6, 6, 7, 8]) for rc in _RC_IDS},
+        switch_states={},
+        signal_states={},
+        modes={"dispatcher_control_state": dsp} if dsp is not None else {},
+        mu=mu,
+        dispatcher_control_state=dsp,
+        auto_actions={"nas": rnd.choice([0, 1, 3])},
+    )
+
+
+def _random_timeline_step(rnd: random.Random, dt: float) -> TimelineStep:
+    flags = []
+    if rnd.random() < 0.15:
+        flags.append("llz_v3_open")
+    if rnd.random() < 0.15:
+        flags.append("lls_2_open")
+    return TimelineStep(
+        t=0.0,
+        step_duration=dt,
+        ctrl_rc_id="108",
+        effective_prev_rc=rnd.choice([None, "59", "47"]),
+        effective_next_rc=rnd.choice([None, "83"]),
+        rc_states={},
+        switch_states={},
+        signal_states={},
+        modes={},
+        lz_state=bool(flags),
+        lz_variant=0,
+        flags=flags,
+    )
+
+
+def _assert_parity(seed: int, n_steps: int, cfg: ExceptionsConfig) -> None:
+    rnd = random.Random(seed)
+    tracker = ExceptionsContextTracker("108")
+    scenario_history = []
+    timeline_history = []
+    for i in range(n_steps):
+        step = _random_scenario_step(rnd)
+        tracker.push_step(step)
+        tracker.observe_timeline(timeline_history)
+        expected = build_exception_context(
+            ctrl_rc_id="108",
+            current_step=step,
+            scenario_history=scenario_history + [step],
+            timeline_history=timeline_history,
+            cfg=cfg,
+        )
+        assert tracker.incremental
+        assert tracker.build_context(cfg) == expected, f"seed={seed} step={i}"
+        scenario_history.append(step)
+        timeline_history.append(_random_timeline_step(rnd, float(step.t)))
+
+
+def test_tracker_matches_full_history_scan():
+    for seed in range(40):
+        _assert_parity(seed, 120, _all_enabled_cfg())
+
+
+def test_tracker_matches_full_history_scan_with_disabled_checks():
+    cfg = _all_enabled_cfg(enable_lz_exc_mu=False, enable_ls_exc_dsp=False, t_recent_ls=0.0)
+    for seed in range(10):
+        _assert_parity(seed, 80, cfg)
+
+
+def test_tracker_zero_duration_tail_is_not_visible_yet():
+    tracker = ExceptionsContextTracker("108")
+    busy = dict(t=5.0, rc_states={"108": 6}, switch_states={}, signal_states={}, modes={})
+    tracker.push_step(ScenarioStep(**busy))
+    tracker.push_step(ScenarioStep(**{**busy, "t": 0.0, "mu": {"108": 1}}))
+    assert not tracker.mu_active_in_window({"108"}, 3.0)
+    tracker.push_step(ScenarioStep(**{**busy, "t": 1.0}))
+    assert tracker.mu_active_in_window({"108"}, 3.0)
+
+
+def test_tracker_disables_incremental_on_negative_duration():
+    tracker = ExceptionsContextTracker("108")
+    tracker.push_step(
+        ScenarioStep(t=-1.0, rc_states={"108": 6}, switch_states={}, signal_states={}, modes={})
+    )
+    assert tracker.incremental is False
+
+
+# --- Streaming post-pass (run_context) vs full-history apply_exceptions ---
+
+def _run_reference(ctx: SimulationContext) -> List[Dict[str, TimelineStep]]:
+    # Previous run_context loop: apply_exceptions over the full histories.
+    timeline: List[Dict[str, TimelineStep]] = []
+    scenario_history: List[ScenarioStep] = []
+    timeline_by_rc: Dict[str, List[TimelineStep]] = {rc_id: [] for rc_id in ctx.ctrl_rc_ids}
+    for step in ctx.scenario_steps:
+        scenario_history.append(step)
+        step_results = ctx.step(step)
+        if isinstance(step_results, SingleResultWrapper):
+            step_dict = dict(step_results._dict)
+        else:
+            step_dict = dict(step_results)
+        processed: Dict[str, TimelineStep] = {}
+        for rc_id, current in step_dict.items():
+            current = apply_exceptions(
+                ctrl_rc_id=rc_id,
+                current=current,
+                scenario_history=scenario_history,
+                timeline_history=timeline_by_rc.get(rc_id, []),
+                cfg=make_exceptions_config(ctx.config.detectors_configs.get(rc_id)),
+            )
+            timeline_by_rc.setdefault(rc_id, []).append(current)
+            processed[rc_id] = current
+        timeline.append(processed)
+    return timeline
+
+
+def _frames(result) -> List[Dict[str, TimelineStep]]:
+    return [r._dict if isinstance(r, SingleResultWrapper) else r for r in result]
+
+
+def _snapshot(frames: List[Dict[str, TimelineStep]]):
+    return [
+        {rc_id: (tl.t, tl.lz_state, tl.lz_variant, list(tl.flags)) for rc_id, tl in frame.items()}
+        for frame in frames
+    ]
+
+
+def _with_exceptions(det_cfg):
+    return dataclasses.replace(
+        det_cfg,
+        enable_lz_exc_mu=True,
+        enable_lz_exc_recent_ls=True,
+        enable_lz_exc_dsp=True,
+        enable_ls_exc_mu=True,
+        enable_ls_exc_after_lz=True,
+        enable_ls_exc_dsp=True,
+        t_mu=4.0,
+        t_recent_ls=6.0,
+        t_ls_mu=3.0,
+        t_ls_after_lz=5.0,
+    )
+
+
+def _with_mu(steps: List[ScenarioStep], rc_id: str) -> List[ScenarioStep]:
+    out = []
+    for i, step in enumerate(steps):
+        mu = {rc_id: 1} if i % 7 == 3 else {}
+        out.append(dataclasses.replace(step, mu=mu))
+    return out
+
+
+def _scenario_cases():
+    for module, cfg_fn, t_pk in (
+        (exact_case, exact_case._config, 30.0),
+        (multi_case, multi_case._make_cfg, 3.0),
+    ):
+        grouped = module._grouped_steps() if module is exact_case else module._base_steps_grouped()
+        for steps in (grouped, module._expand_to_1s(grouped)):
+            for exc in (False, True):
+                yield cfg_fn, t_pk, steps, exc
+
+
+def test_streaming_post_pass_matches_full_history_apply_exceptions():
+    ctrl_ids = ["108", "104"]
+    for cfg_fn, t_pk, steps, exc in _scenario_cases():
+        def make_ctx():
+            configs = {cid: cfg_fn(cid) for cid in ctrl_ids}
+            scenario = steps
+            if exc:
+                configs = {cid: _with_exceptions(c) for cid, c in configs.items()}
+                scenario = _with_mu(steps, "59")
+            cfg = SimulationConfig(t_pk=t_pk, detectors_configs=configs)
+            return SimulationContext(config=cfg, scenario=scenario, ctrl_rc_ids=ctrl_ids)
+
+        expected = _snapshot(_run_reference(make_ctx()))
+        actual = _snapshot(_frames(run_context(make_ctx())))
+        assert actual == expected
+
+
+def test_streaming_post_pass_matches_on_regression_payload():
+    expected = _snapshot(_run_reference(_build_user_like_context()))
+    actual = _snapshot(_frames(run_context(_build_user_like_context())))
+    assert actual == expected
@@ -0,0 +1,122 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from core.flag_bits import (
+    LS_ANY,
+    LZ_ANY,
+    merge_flag_bits,
+    parse_flags,
+    prefix_mask,
+    render_flags,
+    variants,
+    with_ls_suppressed,
+    with_lz_suppressed,
+)
+from core.sim_types import TimelineStep
+
+
+def test_render_parse_roundtrip_keeps_legacy_order():
+    flags = [
+        "llz_v2",
+        "lls_9",
+        "llz_v10",
+        "llz_v2_open",
+        "llz_v10_closed",
+        "lls_9_open",
+        "no_lz_when_occupied",
+        "lz_suppressed:dsp_detector_gate",
+        "ls_suppressed:priority_lz",
+        "ls_suppressed:v9:priority_lz",
+    ]
+    bits = parse_flags(flags)
+    assert render_flags(bits) == flags
+    for unknown in ("unknown_flag", "lz_suppressed:no_such_reason", "ls_suppressed:v20:priority_lz"):
+        with pytest.raises(ValueError):
+            parse_flags(["llz_v2", unknown])
+
+
+def test_prefix_masks_follow_startswith_semantics():
+    bits = parse_flags(["llz_v10", "llz_v10_open"])
+    # "llz_v1" — строковый префикс и для llz_v10..13, как раньше в startswith.
+    assert bits & prefix_mask("llz_v1")
+    assert not bits & prefix_mask("llz_v2")
+    assert bits & LZ_ANY and not bits & LS_ANY
+    assert variants(parse_flags(["llz_v12", "llz_v3_open", "lls_1"]), "lz") == (3, 12)
+
+
+def test_suppression_renders_reason_and_variants():
+    bits = parse_flags(["llz_v2", "llz_v2_open", "lls_1"])
+    bits = with_lz_suppressed(bits & ~LZ_ANY, "local_mu", variants(bits, "lz"))
+    bits = with_ls_suppressed(bits & ~LS_ANY, "after_lz", (1,))
+    assert render_flags(bits) == [
+        "lz_suppressed:local_mu",
+        "lz_suppressed:v2:local_mu",
+        "ls_suppressed:after_lz",
+        "ls_suppressed:v1:after_lz",
+    ]
+
+
+def _step(**kw):
+    return TimelineStep(
+        t=0.0,
+        step_duration=1.0,
+        ctrl_rc_id="108",
+        effective_prev_rc=None,
+        effective_next_rc=None,
+        rc_states={},
+        switch_states={},
+        signal_states={},
+        modes={},
+        lz_state=True,
+        lz_variant=8,
+        **kw,
+    )
+
+
+def test_timeline_step_parses_flag_bits_from_strings():
+    step = TimelineStep(
+        t=0.0,
+        step_duration=1.0,
+        ctrl_rc_id="108",
+        effective_prev_rc=None,
+        effective_next_rc=None,
+        rc_states={},
+        switch_states={},
+        signal_states={},
+        modes={},
+        lz_state=True,
+        lz_variant=8,
+        flags=["llz_v8", "llz_v8_open"],
+    )
+    assert step.flag_bits == parse_flags(step.flags) != 0
+
+
+def test_timeline_step_flags_follow_flag_bits():
+    step = _step(flag_bits=parse_flags(["llz_v8"]))
+    assert step.flags == ["llz_v8"]
+    step.flags = ["llz_v8", "llz_v8_closed"]
+    assert step.flag_bits == parse_flags(["llz_v8", "llz_v8_closed"])
+    step.flag_bits = 0
+    assert step.flags == []
+    assert "flags" not in vars(step)
+    with pytest.raises(ValueError):
+        _step(flags=["llz_v8"], flag_bits=parse_flags(["llz_v2"]))
+
+
+def test_multi_chunk_step_renders_flags_in_canonical_order():
+    # Подшаги шага: сначала открытие v3, потом активный v1. До FlagBits флаги
+    # склеивались в порядке появления (llz_v3_open, llz_v1); теперь порядок рендера.
+    bits = merge_flag_bits(parse_flags(["llz_v3_open"]), parse_flags(["llz_v1"]))
+    assert render_flags(bits) == ["llz_v1", "llz_v3_open"]
+
+
+def test_merge_keeps_first_suppression_reason():
+    first = with_lz_suppressed(parse_flags(["llz_v2"]), "local_mu", (2,))
+    same = with_lz_suppressed(0, "local_mu", (8,))
+    other = with_lz_suppressed(0, "recent_ls", (3,))
+    assert render_flags(merge_flag_bits(first, same)) == [
+        "llz_v2", "lz_suppressed:local_mu", "lz_suppressed:v2:local_mu", "lz_suppressed:v8:local_mu",
+    ]
+    # Коды причин не объединяются по OR (local_mu | recent_ls дал бы чужую причину)
+    assert merge_flag_bits(first, other) == first
+    assert merge_flag_bits(0, other) == other
@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+import pytest
+
+from core import phase_trace
+from core.detectors_engine import DetectorsConfig
+from core.phase_trace import PhaseTraceConfig, PhaseTracer, tracing
+from core.sim_core import ScenarioStep, SimulationConfig, SimulationContext
+
+
+def _steps():
+    return [
+        ScenarioStep(t=3.0, rc_states={"59": 3, "108": 3, "83": 3}, switch_states={"110": 3, "88": 3}, signal_states={}, modes={}),
+        ScenarioStep(t=3.0, rc_states={"59": 6, "108": 6, "83": 3}, switch_states={"110": 3, "88": 3}, signal_states={}, modes={}),
+        ScenarioStep(t=3.0, rc_states={"59": 3, "108": 6, "83": 6}, switch_states={"110": 3, "88": 3}, signal_states={}, modes={}),
+    ]
+
+
+def _ctx(trace=None) -> SimulationContext:
+    det_cfg = DetectorsConfig(ctrl_rc_id="108", prev_rc_name="59", next_rc_name="83", enable_lz1=True, enable_lz2=True)
+    cfg = SimulationConfig(t_pk=30.0, detectors_configs={"108": det_cfg}, phase_trace=trace)
+    return SimulationContext(config=cfg, scenario=_steps(), ctrl_rc_ids=["108"])
+
+
+def test_trace_disabled_by_default(capsys):
+    ctx = _ctx()
+    ctx.run()
+    assert ctx.trace_events() == []
+    assert phase_trace.ENABLED is False
+    assert capsys.readouterr().out == ""
+
+
+def test_trace_filters_by_detector_and_ring_buffer():
+    ctx = _ctx(PhaseTraceConfig(detectors=["v1"], buffer_size=5))
+    ctx.run()
+    events = ctx.trace_events()
+    assert 0 < len(events) <= 5
+    assert {e["detector"] for e in events} == {"v1"}
+    assert all(e["rc_id"] == "108" for e in events)
+    assert ctx.tracer.dropped > 0
+    assert phase_trace.ENABLED is False
+
+
+def test_trace_topology_and_rc_filter():
+    ctx = _ctx(PhaseTraceConfig(detectors=["topology"], rc_ids=["108"]))
+    ctx.run()
+    events = ctx.trace_events()
+    assert events
+    assert all(e["kind"] == "neighbors" and e["rc_id"] == "108" for e in events)
+    assert events[0]["prev"] == "59"
+
+    other = _ctx(PhaseTraceConfig(rc_ids=["104"]))
+    other.run()
+    assert other.trace_events() == []
+
+
+def test_tracing_context_is_scoped():
+    tracer = PhaseTracer()
+    with tracing(tracer):
+        assert phase_trace.ENABLED is True
+        assert phase_trace.current_tracer() is tracer
+    assert phase_trace.ENABLED is False
+    assert phase_trace.current_tracer() is None
+
+
+def test_trace_config_from_dict_rejects_unknown_keys_and_types():
+    cfg = PhaseTraceConfig.from_dict({"detectors": ["v1"], "rc_ids": ["108"], "buffer_size": 10})
+    assert cfg.detectors == ["v1"] and cfg.buffer_size == 10
+    for bad in ({"bogus": 1}, {"detectors": "v1"}, {"buffer_size": -1}, {"buffer_size": "5"}, {"echo": 1}, ["v1"]):
+        with pytest.raises(ValueError):
+            PhaseTraceConfig.from_dict(bad)
@@ -0,0 +1,94 @@
+# -*- coding: utf-8 -*-
+import dataclasses
+import json
+import tracemalloc
+
+from core import sim_columnar
+from core.sim_columnar import ColumnarTimeline
+from core.sim_core import SimulationConfig, SimulationContext
+from core.sim_types import TimelineStep
+from tests import test_user_exact_grouped_vs_1s_compare as exact_case
+
+
+def _dump(frames):
+    return json.dumps(
+        [{rc: dataclasses.asdict(st) for rc, st in frame.items()} for frame in frames],
+        sort_keys=True,
+        default=str,
+    )
+
+
+def _ctx():
+    ctrl_ids = [exact_case.RC_1P, exact_case.RC_3P]
+    cfg = SimulationConfig(t_pk=30.0, detectors_configs={cid: exact_case._config(cid) for cid in ctrl_ids})
+    steps = exact_case._expand_to_1s(exact_case._grouped_steps())
+    return SimulationContext(config=cfg, scenario=steps, ctrl_rc_ids=ctrl_ids)
+
+
+def test_columnar_roundtrip_matches_run(monkeypatch):
+    # Короткий период опорных снимков, чтобы сценарий пересёк несколько.
+    monkeypatch.setattr(sim_columnar, "KEYFRAME_EVERY", 5)
+    expected = _ctx().run()
+    store = _ctx().run_columnar()
+    assert len(store) == len(expected)
+    assert _dump(store.to_frames()) == _dump(expected)
+
+    # Произвольный доступ (мимо кэша последовательного обхода) и атрибуты вида.
+    for i in (len(store) - 1, 0, 7, 6, -2):
+        for rc_id, view in store[i].items():
+            ref = expected[i][rc_id]
+            assert view.ctrl_rc_id == rc_id
+            assert (view.t, view.flags, view.modes, view.rc_states) == (ref.t, ref.flags, ref.modes, ref.rc_states)
+
+
+def _synthetic_frames(n_steps, rc_ids):
+    frames = []
+    for i in range(n_steps):
+        rc_states = {rc: (6 if (i // 7 + k) % 5 == 0 else 3) for k, rc in enumerate(rc_ids)}
+        switch_states = {f"sw{k}": (3 if (i // 50 + k) % 2 else 4) for k in range(12)}
+        signal_states = {f"sig{k}": 15 for k in range(20)}
+        frame = {}
+        for rc in rc_ids:
+            frame[rc] = TimelineStep(
+                t=float(i),
+                step_duration=1.0,
+                ctrl_rc_id=rc,
+                effective_prev_rc=rc_ids[0],
+                effective_next_rc=rc_ids[-1],
+                rc_states=dict(rc_states),
+                switch_states=dict(switch_states),
+                signal_states=dict(signal_states),
+                modes={"prev_control_ok": True, "next_control_ok": True, "prev_nc": False, "next_nc": False},
+                lz_state=False,
+                lz_variant=0,
+                flags=[],
+            )
+        frames.append(frame)
+    return frames
+
+
+def _allocated(build):
+    tracemalloc.start()
+    try:
+        obj = build()
+        size, _ = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return obj, size
+
+
+def test_columnar_store_is_a_fraction_of_timeline_memory():
+    rc_ids = [f"rc{k}" for k in range(17)]
+    frames, frames_size = _allocated(lambda: _synthetic_frames(300, rc_ids))
+    store, store_size = _allocated(lambda: ColumnarTimeline.from_frames(frames, rc_ids))
+    assert store_size * 10 < frames_size
+    assert _dump(store.to_frames()) == _dump(frames)
+
+
+def test_delta_column_switches_to_value_table_on_floats():
+    col = sim_columnar._DeltaColumn(sim_columnar.ObjectIndex(), ints=True)
+    rows = [{"a": 3, "b": 6}, {"a": 3, "b": 2 ** 40}, {"a": 1.5, "b": 6}, {"a": 1.5, "b": 7}]
+    for row in rows:
+        col.append(row)
+    assert [col.get(i) for i in range(len(rows))] == rows
+    assert type(col.get(2)["a"]) is float
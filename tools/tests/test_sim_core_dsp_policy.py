@@ -84,3 +84,40 @@ def test_dsp_policy_detector_global_blocks_lz8_open():
     finally:
         policy_path.unlink(missing_ok=True)
 
+
+
+def test_overlay_step_shares_base_dicts_and_feeds_history(tmp_path):
+    policy_path = tmp_path / "objects.json"
+    policy_path.write_text(json.dumps({
+        "version": 1,
+        "objects": [
+            {"id": "mu_obj", "kind": "MU", "target_rc_ids": ["108"], "active_states": [6]},
+            {"id": "chas_obj", "kind": "CHAS", "target_rc_ids": ["108"], "active_states": [6]},
+        ],
+    }), encoding="utf-8")
+    sim_cfg = SimulationConfig(
+        t_pk=30.0,
+        detectors_configs={rc: DetectorsConfig(ctrl_rc_id=rc, enable_lz1=True) for rc in ("108", "83")},
+        exceptions_objects_path=str(policy_path),
+    )
+    step = ScenarioStep(
+        t=1.0,
+        rc_states={"108": 3, "83": 3},
+        switch_states={},
+        signal_states={},
+        modes={},
+        auto_actions={"nas": 1},
+        indicator_states={"mu_obj": 6, "chas_obj": 6},
+    )
+    ctx = SimulationContext(config=sim_cfg, scenario=[step], ctrl_rc_ids=["108", "83"])
+
+    overlay = ctx._build_overlay_step_for_rc(step, "108")
+    assert overlay.mu == {"108": 1} and step.mu == {}
+    assert overlay.auto_actions == {"nas": 1, "chas": 0} and step.auto_actions == {"nas": 1}
+    assert overlay.rc_states is step.rc_states and overlay.indicator_states is step.indicator_states
+    # Для 83 объекты не действуют — наложение и есть исходный шаг
+    assert ctx._build_overlay_step_for_rc(step, "83") is step
+
+    ctx.step(step)
+    assert ctx._scenario_history_by_rc["83"][-1] is step
+    assert ctx._scenario_history_by_rc["108"][-1].rc_states is step.rc_states
@@ -0,0 +1,71 @@
+# -*- coding: utf-8 -*-
+import dataclasses
+import json
+
+from core.sim_core import SimulationConfig, SimulationContext
+from core import sim_sharded
+from core.sim_sharded import partition_rc_ids, shutdown_shard_pool
+from tests import test_user_exact_grouped_vs_1s_compare as exact_case
+from tests import test_user_multivariant_grouped_vs_1s as multi_case
+from tests.test_exceptions_tracker import _frames, _with_exceptions, _with_mu
+
+
+_CTRL_IDS = ["108", "104", "59", "83", "47"]
+
+
+def _run(cfg_fn, t_pk, steps, shard_workers):
+    configs = {cid: _with_exceptions(cfg_fn(cid)) for cid in _CTRL_IDS}
+    cfg = SimulationConfig(t_pk=t_pk, detectors_configs=configs, shard_workers=shard_workers)
+    ctx = SimulationContext(config=cfg, scenario=_with_mu(steps, "59"), ctrl_rc_ids=list(_CTRL_IDS))
+    return _frames(ctx.run())
+
+
+def _dump(frames) -> bytes:
+    rows = [{rc_id: dataclasses.asdict(tl) for rc_id, tl in frame.items()} for frame in frames]
+    return json.dumps(rows, sort_keys=True).encode("utf-8")
+
+
+def test_partition_rc_ids_round_robin():
+    assert partition_rc_ids(["a", "b", "c", "d", "e"], 2) == [["a", "c", "e"], ["b", "d"]]
+    assert partition_rc_ids(["a", "b"], 8) == [["a"], ["b"]]
+    assert partition_rc_ids(["a", "b"], 0) == [["a", "b"]]
+
+
+def test_sharded_run_is_byte_identical_to_serial():
+    grouped_exact = exact_case._grouped_steps()
+    grouped_multi = multi_case._base_steps_grouped()
+    cases = [
+        (exact_case._config, 30.0, exact_case._expand_to_1s(grouped_exact)),
+        (multi_case._make_cfg, 3.0, grouped_multi),
+    ]
+    try:
+        for cfg_fn, t_pk, steps in cases:
+            serial = _run(cfg_fn, t_pk, steps, shard_workers=0)
+            for workers in (2, 3):
+                sharded = _run(cfg_fn, t_pk, steps, shard_workers=workers)
+                assert [list(f.keys()) for f in sharded] == [list(f.keys()) for f in serial]
+                assert sharded == serial
+                assert _dump(sharded) == _dump(serial)
+    finally:
+        shutdown_shard_pool()
+
+
+def test_shard_pool_is_shared_across_contexts():
+    steps = multi_case._base_steps_grouped()
+    try:
+        first = _run(multi_case._make_cfg, 3.0, steps, shard_workers=2)
+        pool = sim_sharded._POOL
+        assert pool is not None
+        # Пул живёт между контекстами и не зависит от shard_workers прогона
+        assert _run(multi_case._make_cfg, 3.0, steps, shard_workers=3) == first
+        assert sim_sharded._POOL is pool
+    finally:
+        shutdown_shard_pool()
+
+
+def test_sharded_mode_stays_serial_for_single_rc():
+    sim_cfg = SimulationConfig(t_pk=30.0, detectors_configs={"108": exact_case._config("108")}, shard_workers=4)
+    ctx = SimulationContext(config=sim_cfg, scenario=exact_case._grouped_steps(), ctrl_rc_ids=["108"])
+    assert sim_sharded.shards_for(ctx) is None
+    ctx.config.shard_workers = 1
+    assert sim_sharded.shards_for(ctx) is None
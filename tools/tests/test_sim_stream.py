@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import dataclasses
+import json
+
+from core.sim_core import SimulationConfig, SimulationContext
+from tests import test_user_exact_grouped_vs_1s_compare as exact_case
+
+
+def _ctx():
+    ctrl_ids = [exact_case.RC_1P, exact_case.RC_3P]
+    cfg = SimulationConfig(t_pk=30.0, detectors_configs={cid: exact_case._config(cid) for cid in ctrl_ids})
+    steps = exact_case._expand_to_1s(exact_case._grouped_steps())
+    return SimulationContext(config=cfg, scenario=steps, ctrl_rc_ids=ctrl_ids), ctrl_ids
+
+
+def _dump(frames):
+    return json.dumps(
+        [{rc: dataclasses.asdict(st) for rc, st in frame.items()} for frame in frames],
+        sort_keys=True,
+        default=str,
+    )
+
+
+def test_iter_frames_matches_run_with_bounded_history():
+    ctx, _ = _ctx()
+    expected = _dump(ctx.run())
+
+    ctx, ctrl_ids = _ctx()
+    frames = []
+    for frame in ctx.iter_frames():
+        frames.append(frame)
+        # Без отрицательных длительностей история не копится: остаётся только последний кадр.
+        assert all(len(ctx._timeline_history_runtime[rc]) <= 1 for rc in ctrl_ids)
+        assert not ctx._scenario_history_runtime
+    assert _dump(frames) == expected
@@ -0,0 +1,33 @@
+# -*- coding: utf-8 -*-
+from core.detectors_engine import DetectorsConfig
+from core.sim_core import ScenarioStep, SimulationConfig, SimulationContext
+
+
+def _ctx(steps):
+    ids = ["108", "83"]
+    cfg = SimulationConfig(
+        t_pk=30.0,
+        detectors_configs={rc: DetectorsConfig(ctrl_rc_id=rc, enable_lz1=True) for rc in ids},
+    )
+    return SimulationContext(config=cfg, scenario=steps, ctrl_rc_ids=ids)
+
+
+def test_rcs_of_one_step_share_the_station_frame():
+    steps = [
+        ScenarioStep(t=1.0, rc_states={"108": 3, "83": 3}, switch_states={}, signal_states={}, modes={}),
+        ScenarioStep(t=1.0, rc_states={"108": 6, "83": 3}, switch_states={}, signal_states={}, modes={}),
+    ]
+    ctx = _ctx(steps)
+    first = ctx.step(steps[0])
+    frame = ctx.station_frame()
+    assert ctx.station_frame() is frame
+    assert first["108"].rc_states is first["83"].rc_states is frame.rc_states
+    assert first["108"].switch_states is first["83"].switch_states
+    assert first["108"].modes is not first["83"].modes
+    assert set(frame.neighbors) == {"108", "83"}
+
+    second = ctx.step(steps[1])
+    assert ctx.station_frame() is not frame
+    assert second["108"].rc_states == {"108": 6, "83": 3}
+    assert first["108"].rc_states == {"108": 3, "83": 3}
+    assert ctx.exceptions_config("108") is ctx.exceptions_config("108")
@@ -0,0 +1,138 @@
+# -*- coding: utf-8 -*-
+import random
+
+from core.detectors.registry import DETECTOR_SPECS
+from core.sim_core import ScenarioStep, SimulationConfig, SimulationContext
+from core.detectors_engine import DetectorsConfig
+import pytest
+
+import station.station_snapshot as station_snapshot
+from station.station_snapshot import build_dependency_closure, clear_station_cache, get_station_snapshot
+
+
+def _ctx() -> SimulationContext:
+    cfg = SimulationConfig(t_pk=30.0, detectors_configs={"108": DetectorsConfig(ctrl_rc_id="108")})
+    step = ScenarioStep(t=1.0, rc_states={"108": 3}, switch_states={}, signal_states={}, modes={})
+    return SimulationContext(config=cfg, scenario=[step], ctrl_rc_ids=["108"])
+
+
+def test_snapshot_is_built_once_per_process():
+    clear_station_cache()
+    snap1 = get_station_snapshot()
+    snap2 = get_station_snapshot()
+    assert snap1 is snap2
+    assert "108" in snap1.model.rc_nodes
+
+
+def test_changed_config_requires_restart(monkeypatch):
+    clear_station_cache()
+    snap = get_station_snapshot()
+    # Файлы конфигурации новее импортированных констант: модели не пересобираются
+    real_mtimes = station_snapshot._config_mtimes
+    monkeypatch.setattr(station_snapshot, "_config_mtimes", lambda st: real_mtimes(st) + (1,))
+    with pytest.raises(station_snapshot.StationConfigChanged):
+        get_station_snapshot()
+    monkeypatch.undo()
+    assert get_station_snapshot() is snap
+
+
+def test_unknown_station_is_rejected():
+    with pytest.raises(ValueError):
+        get_station_snapshot("no-such-station")
+
+
+def test_contexts_share_model_but_not_topology_latches():
+    a = _ctx()
+    b = _ctx()
+    assert a.model is b.model
+    assert a.topology.template is b.topology.template
+    assert a.topology._phys_cache is b.topology._phys_cache
+    assert a.topology is not b.topology
+    assert a.topology.states["108"] is not b.topology.states["108"]
+
+    a.topology.states["108"].latched_prev = "59"
+    assert b.topology.states["108"].latched_prev == ""
+
+
+def test_rc_capabilities_table_is_built_once_per_detectors_state():
+    ctx = _ctx()
+    det_state = ctx.detectors_states["108"]
+    caps = det_state.rc_capabilities
+    assert caps is not None
+    assert det_state.rc_capabilities_model is ctx.model
+    assert "108" in caps
+
+    ctx.run()
+    assert ctx.detectors_states["108"].rc_capabilities is caps
+
+
+def _pick_by_scan(model, prev_sec, next_sec):
+    exact = by_next = by_prev = None
+    for sig in model.signal_nodes.values():
+        if prev_sec and next_sec and sig.prev_sec == prev_sec and sig.next_sec == next_sec:
+            exact = sig.signal_id
+            break
+        if by_next is None and next_sec and sig.next_sec == next_sec:
+            by_next = sig.signal_id
+        if by_prev is None and prev_sec and sig.prev_sec == prev_sec:
+            by_prev = sig.signal_id
+    return exact or by_next or by_prev
+
+
+def test_signal_index_matches_linear_scan_and_modes_are_memoized():
+    ctx = _ctx()
+    secs = [None, ""] + list(ctx.model.rc_nodes)
+    for a in secs:
+        for b in secs:
+            assert ctx._pick_signal(a, b) == _pick_by_scan(ctx.model, a, b), (a, b)
+
+    modes = ctx._compute_dynamic_signal_modes("108", "59", "83")
+    assert ctx._compute_dynamic_signal_modes("108", "59", "83") is modes
+    assert ctx._compute_dynamic_signal_modes("108", None, "83") is not modes
+
+
+def _full_cfg(model, rc_id):
+    node = model.rc_nodes[rc_id]
+    return DetectorsConfig(
+        ctrl_rc_id=rc_id,
+        prev_rc_name=node.prev_links[0][0] if node.prev_links else "",
+        ctrl_rc_name=rc_id,
+        next_rc_name=node.next_links[0][0] if node.next_links else "",
+        **{s.enable_attr: True for s in DETECTOR_SPECS},
+    )
+
+
+def _outputs(frames, rc_ids):
+    return [
+        [(f[rc].flags, f[rc].lz_state, f[rc].lz_variant, f[rc].effective_prev_rc, f[rc].effective_next_rc)
+         for rc in rc_ids]
+        for f in frames
+    ]
+
+
+def test_dependency_closure_pruning_keeps_target_results():
+    model = get_station_snapshot().model
+    closure = build_dependency_closure(model, ["108"])
+    assert {"108", "59", "83"} <= closure.rc_ids
+    assert closure.rc_ids < set(model.rc_nodes)
+
+    rng = random.Random(21)
+    targets = ["108", "83"]
+    closure = build_dependency_closure(model, targets)
+    full, pruned = [], []
+    for _ in range(120):
+        rc = {rc_id: rng.choice((3, 4, 6, 7)) for rc_id in model.rc_nodes}
+        # Положения стрелок: без контроля (0/1) и плюс/минус (3..14) — от них зависит топология.
+        sw = {sw_id: rng.choice((0, 1) + tuple(range(3, 15))) for sw_id in model.switches}
+        sig = {sig_id: rng.choice((3, 15)) for sig_id in model.signal_nodes}
+        t = rng.choice((1.0, 2.0, 5.0))
+        full.append(ScenarioStep(t=t, rc_states=rc, switch_states=sw, signal_states=sig, modes={}))
+        pruned.append(ScenarioStep(t=t, modes={}, **dict(zip(
+            ("rc_states", "switch_states", "signal_states"), closure.prune(rc, sw, sig)
+        ))))
+
+    def run(steps):
+        cfg = SimulationConfig(t_pk=30.0, detectors_configs={rc: _full_cfg(model, rc) for rc in targets})
+        return SimulationContext(config=cfg, scenario=steps, ctrl_rc_ids=targets).run()
+
+    assert _outputs(run(pruned), targets) == _outputs(run(full), targets)
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+from types import SimpleNamespace
+
+from core.detectors_engine import _StepAdapter
+from core.step_classes import NO_CLASS_BIT, StepClasses, rc_bit_table, step_classes
+from core.uni_states import rc_is_free, rc_is_locked, rc_is_occupied
+from core.variants_common import (
+    _is_signal_closed,
+    _is_signal_open,
+    mask_000,
+    mask_001,
+    mask_01X_or_X10,
+    mask_101,
+    mask_rc_1l_0l_1l,
+)
+
+
+def test_classes_agree_with_uni_states():
+    rc_states = {str(s): s for s in (0, 1, 2, 3, 4, 5, 6, 7, 8, 9, 100)}
+    c = StepClasses(rc_states, rc_bits=rc_bit_table(rc_states))
+    for rc_id, s in rc_states.items():
+        assert c.is_free(rc_id) == rc_is_free(s)
+        assert c.is_occupied(rc_id) == rc_is_occupied(s)
+        assert c.is_locked(rc_id) == rc_is_locked(s)
+    # РЦ без записи — состояние 0: ни в одном множестве
+    assert not (c.free | c.occupied | c.locked) & c.bit("missing")
+
+
+def test_rc_bits_come_from_station_snapshot():
+    from station.station_snapshot import get_station_snapshot
+
+    snap = get_station_snapshot()
+    assert set(snap.rc_bits) == set(snap.model.rc_nodes)
+    # Ключи вне станции не получают битов: "нет класса", таблица не растёт
+    c = StepClasses({"108": 3, "no_such_rc": 3, "": 3})
+    assert c.rc_bits is snap.rc_bits and len(snap.rc_bits) == len(snap.model.rc_nodes)
+    assert c.is_free("108")
+    for key in (None, "", "no_such_rc"):
+        assert c.bit(key) == NO_CLASS_BIT
+        assert not c.is_free(key) and not c.is_occupied(key)
+    assert not (c.free | c.occupied | c.locked | c.no_control) & NO_CLASS_BIT
+    # "Свободны обе": неизвестный ключ условие не выполняет, а не пропускается
+    need = c.bit("108") | c.bit("no_such_rc")
+    assert c.free & need != need
+
+
+def test_masks_keep_none_and_missing_semantics():
+    step = SimpleNamespace(rc_states={"59": 7, "108": 4, "83": 7}, signal_states={}, modes={})
+    assert mask_101(step, "59", "108", "83")
+    assert mask_rc_1l_0l_1l(step, "59", "108", "83")
+    assert not mask_101(step, None, "108", "83")
+    # Отсутствующая смежная для 000 — "свободна", для 001 prev=None — не свободна
+    step.rc_states = {"108": 3, "83": 6}
+    assert mask_000(step, None, "108", None)
+    assert not mask_001(step, None, "108", "83")
+    assert mask_01X_or_X10(SimpleNamespace(rc_states={"108": 6, "83": 6}), None, "108", "83")
+
+
+def test_signal_sets_use_node_type():
+    # 82 — маневровый (открыт 4/5, закрыт 3/7), 78 — поездной (закрыт только 15)
+    step = SimpleNamespace(rc_states={}, signal_states={"82": 3, "78": 15, "x": 5}, modes={"sig": "78"})
+    assert _is_signal_closed(step, "82") and not _is_signal_open(step, "82")
+    assert _is_signal_closed(step, None, mode_key="sig")
+    # Неизвестный тип: открыт по любой из двух таблиц, закрыт — только 15
+    assert _is_signal_open(step, "x") and not _is_signal_closed(step, "x")
+    assert not _is_signal_open(step, "nope") and not _is_signal_closed(step, "nope")
+
+
+def test_adapter_classifies_once_until_states_replaced():
+    adapter = _StepAdapter(
+        rc_states={"108": 3},
+        modes={},
+        signal_states={},
+        effective_prev_rc=None,
+        effective_next_rc=None,
+        ctrl_rc_name="108",
+    )
+    c = step_classes(adapter)
+    assert step_classes(adapter) is c
+    adapter.rc_states = {"108": 6}
+    assert step_classes(adapter) is not c and step_classes(adapter).is_occupied("108")
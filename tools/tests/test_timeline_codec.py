@@ -0,0 +1,88 @@
+# -*- coding: utf-8 -*-
+import json
+import random
+
+import pytest
+
+from api.sim import timeline_codec
+from api.sim.timeline_codec import (
+    COMPACT_JSON_MEDIA_TYPE,
+    MSGPACK_MEDIA_TYPE,
+    accepts_gzip,
+    decode_compact_timeline,
+    encode_compact_timeline,
+    timeline_media_type,
+)
+
+
+def _rows(n, seed):
+    rng = random.Random(seed)
+    rows = []
+    rc = {"1П": 3, "1-7СП": 3, "10-12СП": 3}
+    for i in range(n):
+        rc = dict(rc)
+        rc[rng.choice(sorted(rc))] = rng.choice((3, 4, 6))
+        modes = {"prev_control_ok": rng.random() > 0.2, "sig_prev_to_ctrl": rng.choice((None, "Ч1"))}
+        if i % 7 == 0:
+            modes["exc_lz_mu_active"] = True
+        flags = [
+            {"variant": "v1", "type": "LZ", "rc_id": "108", "phase": rng.choice(("opened", "closed")), "raw": "llz_v1"}
+        ] if rng.random() > 0.7 else []
+        rows.append({
+            "t": float(i), "step_duration": 1.0, "ctrl_rc_id": "108", "lz_state": bool(flags),
+            "variant": 1 if flags else 0, "effective_prev_rc": rng.choice(("", "10-12СП")), "effective_next_rc": "1-7СП",
+            "topology_by_rc": {"108": {"prev": "10-12СП", "next": rng.choice(("1-7СП", ""))}},
+            "flags": flags, "modes": modes, "rc_states": rc, "switch_states": {"1": 1},
+            "signal_states": {} if i % 5 else {"Ч1": 15}, "mu_state": None, "nas_state": None,
+            "chas_state": None, "dsp_state": rng.choice((None, 3)),
+        })
+    return rows
+
+
+def test_compact_timeline_round_trips_and_is_smaller():
+    rows = _rows(300, 25)
+    doc = json.loads(json.dumps(encode_compact_timeline(rows), ensure_ascii=False))
+    assert decode_compact_timeline(doc) == rows
+    assert len(json.dumps(doc)) * 3 < len(json.dumps(rows))
+    assert decode_compact_timeline(encode_compact_timeline([])) == []
+
+
+@pytest.mark.parametrize("accept, expected", [
+    ("", "application/json"),
+    ("*/*", "application/json"),
+    ("text/html", "application/json"),
+    (MSGPACK_MEDIA_TYPE, MSGPACK_MEDIA_TYPE),
+    (f"{MSGPACK_MEDIA_TYPE};q=0", "application/json"),
+    (f"{MSGPACK_MEDIA_TYPE};q=0, {COMPACT_JSON_MEDIA_TYPE}", COMPACT_JSON_MEDIA_TYPE),
+    (f"{MSGPACK_MEDIA_TYPE};q=0.5, application/json", "application/json"),
+    (f"application/json;q=0.1, {MSGPACK_MEDIA_TYPE}", MSGPACK_MEDIA_TYPE),
+    (f"{COMPACT_JSON_MEDIA_TYPE};q=0.9, {MSGPACK_MEDIA_TYPE};q=0.8", COMPACT_JSON_MEDIA_TYPE),
+    (f"{COMPACT_JSON_MEDIA_TYPE}, {MSGPACK_MEDIA_TYPE}", MSGPACK_MEDIA_TYPE),
+    (f"{COMPACT_JSON_MEDIA_TYPE}; Q=0 ", "application/json"),
+    (f"{MSGPACK_MEDIA_TYPE}, */*;q=0.1", MSGPACK_MEDIA_TYPE),
+])
+def test_timeline_media_type_honours_q_values(monkeypatch, accept, expected):
+    monkeypatch.setattr(timeline_codec, "msgpack", object())
+    assert timeline_media_type(accept) == expected
+
+
+def test_timeline_media_type_without_msgpack(monkeypatch):
+    monkeypatch.setattr(timeline_codec, "msgpack", None)
+    assert timeline_media_type(MSGPACK_MEDIA_TYPE) is None
+    assert timeline_media_type(f"{MSGPACK_MEDIA_TYPE}, application/json;q=0.5") == "application/json"
+    assert timeline_media_type(f"{MSGPACK_MEDIA_TYPE}, {COMPACT_JSON_MEDIA_TYPE};q=0.5") == COMPACT_JSON_MEDIA_TYPE
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("", False),
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("gzip;q=0", False),
+    ("br, gzip;q=0, *", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("deflate", False),
+    ("x-gzip-like", False),
+])
+def test_accepts_gzip_honours_q_values(header, expected):
+    assert accepts_gzip(header) is expected
@@ -34,3 +34,30 @@ def test_topology_recomputes_neighbors_for_1p_when_switch_changes():
     prev_back, next_back = topo.get_active_neighbors("108", sw_plus, dt=1.0)
     assert prev_back == "59"
     assert next_back == "83"
+
+
+def test_neighbor_cache_is_keyed_by_relevant_switches_only():
+    model = load_station_from_config()
+    topo = UniversalTopologyManager(model, t_pk=30.0)
+    relevant = set(topo.rc_switches["108"])
+    assert {"110", "88"} <= relevant
+
+    sw_plus = {"110": 3, "88": 3, "79": 3, "55": 3, "150": 3, "72": 3, "74": 3, "73": 3}
+    topo.begin_step(sw_plus)
+    assert topo.get_active_neighbors("108", sw_plus, dt=1.0) == ("59", "83")
+    phys = topo._step_phys["108"]
+
+    # Стрелка, не влияющая на 108: соседи 108 переносятся с прошлого шага
+    other = next(sw for sw in topo._switch_rcs if sw not in relevant)
+    step2 = dict(sw_plus, **{other: 9})
+    topo.begin_step(step2)
+    assert topo._step_phys["108"] is phys
+
+    # Значимая стрелка: пересчёт, затем возврат в плюс — из кэша по ключу
+    step3 = dict(step2, **{"110": 9, "88": 9})
+    topo.begin_step(step3)
+    assert "108" not in topo._step_phys
+    assert topo.get_active_neighbors("108", step3, dt=1.0) == ("", "")
+    topo.begin_step(dict(step3, **{"110": 3, "88": 3}))
+    assert topo.get_active_neighbors("108", topo._step_switches, dt=1.0) == ("59", "83")
+    assert topo._step_phys["108"] is phys
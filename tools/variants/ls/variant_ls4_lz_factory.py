@@ -44,6 +44,7 @@ class LS4WindowDetector:
         self.active = False
         self.last_open_offset: Optional[float] = None
         self.last_close_offset: Optional[float] = None
+        self.at_rest = False
 
     def reset(self) -> None:
         self.phase_id = 0
@@ -52,6 +53,20 @@ class LS4WindowDetector:
         self.active = False
         self.last_open_offset = None
         self.last_close_offset = None
+        self.at_rest = False
+
+    def next_deadline(self, inputs_changed: bool = False) -> Optional[float]:
+        """Время до ближайшего порога (tlz02 / ts02 / tkon); None — в покое или фаза 0."""
+        if self.at_rest and not inputs_changed:
+            return None
+        if self.active:
+            return max(self.tkon - self.completion_timer, 0.0)
+        if self.phase_id == 1:
+            return max(self.tlz02 - self.timer, 0.0)
+        if self.phase_id == 2:
+            return max(self.ts02 - self.timer, 0.0)
+        # Фаза 0: накопленное 111 только разрешает переход при смене входов.
+        return None
 
     def get_current_mask_id(self) -> Optional[int]:
         if self.active:
@@ -125,6 +140,14 @@ class LS4WindowDetector:
         return False
 
     def update(self, step: Any, dt: float) -> Tuple[bool, bool]:
+        before = (self.phase_id, self.timer, self.active, self.completion_timer)
+        opened, closed = self._update(step, dt)
+        self.at_rest = not opened and not closed and before == (
+            self.phase_id, self.timer, self.active, self.completion_timer
+        )
+        return opened, closed
+
+    def _update(self, step: Any, dt: float) -> Tuple[bool, bool]:
         self.last_open_offset = None
         self.last_close_offset = None
 
@@ -54,8 +54,33 @@ class TimingDetectorLZ9:
         self.t_ctrl_occ: Optional[float] = None
         self.t_adj_occ: Optional[float] = None
         self.global_time = 0.0
+        self.at_rest = False
+
+    def next_deadline(self, inputs_changed: bool = False) -> Optional[float]:
+        """Время до ближайшего порога (ts01 / окно tlz / t_kon); None — в покое."""
+        if self.at_rest and not inputs_changed:
+            return None
+        if self.active:
+            return max(self.t_kon - self.timer, 0.0)
+        if self.phase == "given":
+            return max(self.ts01_lz9 - self.timer, 0.0)
+        first_t = self.t_ctrl_occ or self.t_adj_occ
+        if first_t is None:
+            return None
+        # Окно синхронности истекает строго после tlz.
+        return max(first_t + self.tlz_lz9 - self.global_time, 0.0)
 
     def update(self, step: Any, dt: float) -> Tuple[bool, bool]:
+        before = (self.phase, self.timer, self.active, self.t_ctrl_occ, self.t_adj_occ)
+        opened, closed = self._update(step, dt)
+        # В фазе wait окно синхронности истекает по global_time — это не покой
+        window_running = self.phase == "wait" and (self.t_ctrl_occ is not None or self.t_adj_occ is not None)
+        self.at_rest = not opened and not closed and not window_running and before == (
+            self.phase, self.timer, self.active, self.t_ctrl_occ, self.t_adj_occ
+        )
+        return opened, closed
+
+    def _update(self, step: Any, dt: float) -> Tuple[bool, bool]:
         self.global_time += dt
         opened = False
         closed = False